@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Lista de alertas de stock bajo mantenida con cada cambio de stock
+
+alertas_stock contiene solo los productos en alerta (stock_actual <= umbral),
+así que listar las alertas cuesta lo que haya en alerta y no lo que mida el
+catálogo. El umbral de un producto es el de su categoría si está definido en
+umbrales_categoria y, si no, su stock_minimo.
+
+Unos triggers la mantienen al día desde cualquier camino que escriba
+productos (CLI, servicio, cola de escrituras, conteos, backend de Node) y
+cuando cambia el umbral de una categoría. Cada vez que un producto entra o
+sale de la lista se agrega un renglón a alertas_stock_eventos ('nueva' o
+'resuelta'); vigilar() sigue esos eventos por id, así que solo lee lo que
+cambió. Los eventos solo registran transiciones (no cada venta) y pueden
+borrarse por fecha sin afectar la lista.
+
+resumen_global.productos_stock_bajo (resumenes.py) se mantiene con los
+mismos triggers, de modo que estadisticas y stock-bajo siempre coinciden.
+"""
+
+import json
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import salida
+
+INTERVALO_DEFAULT_S = 1.0
+
+
+def _umbral(fila: str) -> str:
+    """Umbral en efecto de una fila de productos (new, old o un alias)"""
+    return (f"COALESCE((SELECT u.stock_minimo FROM umbrales_categoria u"
+            f" WHERE u.categoria = {fila}.categoria), {fila}.stock_minimo)")
+
+
+def _recalcular_categoria(categoria: str) -> str:
+    """Sentencias de trigger que ajustan la lista a un cambio de umbral"""
+    return f"""
+        DELETE FROM alertas_stock WHERE producto_id IN (
+            SELECT a.producto_id FROM alertas_stock a JOIN productos p ON p.id = a.producto_id
+            WHERE p.categoria = {categoria} AND NOT COALESCE(p.stock_actual <= {_umbral('p')}, 0)
+        );
+        INSERT INTO alertas_stock (producto_id, stock_actual, umbral)
+        SELECT p.id, p.stock_actual, {_umbral('p')} FROM productos p
+        WHERE p.categoria = {categoria} AND p.stock_actual <= {_umbral('p')}
+        ON CONFLICT (producto_id) DO UPDATE SET umbral = excluded.umbral;
+    """
+
+
+# Migración 10 de inicializar_db (junto con resumenes.separar_stock_bajo)
+SQL_CREAR_ALERTAS = [
+    """
+    CREATE TABLE IF NOT EXISTS umbrales_categoria (
+        categoria TEXT PRIMARY KEY,
+        stock_minimo INTEGER NOT NULL CHECK (stock_minimo >= 0)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS alertas_stock (
+        producto_id INTEGER PRIMARY KEY,
+        stock_actual INTEGER NOT NULL,
+        umbral INTEGER NOT NULL,
+        desde DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # stock-bajo ordena por (stock_actual, id)
+    """
+    CREATE INDEX IF NOT EXISTS idx_alertas_stock_orden
+    ON alertas_stock (stock_actual, producto_id)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS alertas_stock_eventos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        producto_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL CHECK (tipo IN ('nueva', 'resuelta')),
+        stock_actual INTEGER,
+        umbral INTEGER,
+        fecha DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # La lista inicial se llena antes de crear los triggers de eventos:
+    # lo que ya estaba en alerta no es una alerta nueva
+    f"""
+    INSERT OR IGNORE INTO alertas_stock (producto_id, stock_actual, umbral)
+    SELECT id, stock_actual, {_umbral('productos')} FROM productos
+    WHERE stock_actual <= {_umbral('productos')}
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alertas_stock_ai AFTER INSERT ON alertas_stock BEGIN
+        INSERT INTO alertas_stock_eventos (producto_id, tipo, stock_actual, umbral)
+        VALUES (new.producto_id, 'nueva', new.stock_actual, new.umbral);
+        UPDATE resumen_global SET productos_stock_bajo = productos_stock_bajo + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alertas_stock_ad AFTER DELETE ON alertas_stock BEGIN
+        INSERT INTO alertas_stock_eventos (producto_id, tipo, stock_actual, umbral)
+        VALUES (old.producto_id, 'resuelta',
+                (SELECT stock_actual FROM productos WHERE id = old.producto_id), old.umbral);
+        UPDATE resumen_global SET productos_stock_bajo = productos_stock_bajo - 1 WHERE id = 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS alertas_productos_ai AFTER INSERT ON productos BEGIN
+        INSERT INTO alertas_stock (producto_id, stock_actual, umbral)
+        SELECT new.id, new.stock_actual, umbral FROM (SELECT {_umbral('new')} AS umbral)
+        WHERE new.stock_actual <= umbral;
+    END
+    """,
+    # Un cambio de stock casi nunca cruza el umbral: cada trigger decide en su
+    # WHEN si tiene algo que hacer y el caso común no escribe nada
+    f"""
+    CREATE TRIGGER IF NOT EXISTS alertas_productos_au_entra
+    AFTER UPDATE OF stock_actual, stock_minimo, categoria ON productos
+    WHEN new.stock_actual <= {_umbral('new')}
+    BEGIN
+        INSERT INTO alertas_stock (producto_id, stock_actual, umbral)
+        VALUES (new.id, new.stock_actual, {_umbral('new')})
+        ON CONFLICT (producto_id) DO UPDATE SET
+            stock_actual = excluded.stock_actual,
+            umbral = excluded.umbral
+        WHERE stock_actual IS NOT excluded.stock_actual OR umbral IS NOT excluded.umbral;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS alertas_productos_au_sale
+    AFTER UPDATE OF stock_actual, stock_minimo, categoria ON productos
+    WHEN NOT COALESCE(new.stock_actual <= {_umbral('new')}, 0)
+     AND EXISTS (SELECT 1 FROM alertas_stock WHERE producto_id = old.id)
+    BEGIN
+        DELETE FROM alertas_stock WHERE producto_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS alertas_productos_ad AFTER DELETE ON productos BEGIN
+        DELETE FROM alertas_stock WHERE producto_id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS alertas_umbrales_ai AFTER INSERT ON umbrales_categoria BEGIN
+        {_recalcular_categoria('new.categoria')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS alertas_umbrales_au AFTER UPDATE ON umbrales_categoria BEGIN
+        {_recalcular_categoria('old.categoria')}
+        {_recalcular_categoria('new.categoria')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS alertas_umbrales_ad AFTER DELETE ON umbrales_categoria BEGIN
+        {_recalcular_categoria('old.categoria')}
+    END
+    """,
+]
+
+# Conteo completo con los umbrales en efecto (para recalcular y verificar resúmenes)
+_SQL_CONTAR_COMPLETO = f"""
+    SELECT COUNT(*) FROM productos p WHERE p.stock_actual <= {_umbral('p')}
+"""
+
+# Columnas de la lista que reemplazan a las de productos en stock-bajo
+_COLUMNAS_ALERTA = {'id': 'a.producto_id', 'stock_actual': 'a.stock_actual',
+                    'stock_minimo': 'a.umbral'}
+
+
+class Evento(NamedTuple):
+    """Entrada o salida de un producto de la lista de alertas"""
+    id: int
+    tipo: str
+    producto_id: int
+    nombre: Optional[str]
+    codigo_barras: Optional[str]
+    categoria: Optional[str]
+    stock_actual: Optional[int]
+    umbral: Optional[int]
+    fecha: str
+
+
+def crear_alertas(conn: sqlite3.Connection):
+    """Crea la lista, los eventos y sus triggers (dentro de la transacción actual)"""
+    for sql in SQL_CREAR_ALERTAS:
+        conn.execute(sql)
+
+
+def contar_completo(conn: sqlite3.Connection) -> int:
+    """Productos en alerta recorriendo todo el catálogo"""
+    return conn.execute(_SQL_CONTAR_COMPLETO).fetchone()[0]
+
+
+def consultar(conn: sqlite3.Connection, limite: Optional[int] = None,
+              despues: Optional[str] = None, columnas: Sequence[str] = ()) -> sqlite3.Cursor:
+    """
+    Ejecuta la consulta de la lista ordenada por (stock_actual, id)
+
+    stock_minimo devuelve el umbral en efecto. Con limite None trae todas
+    las alertas; si no, pide limite + 1 filas (ver salida.emitir).
+
+    Raises:
+        ValueError: Si el token no es válido
+    """
+    seleccion = ', '.join(_COLUMNAS_ALERTA.get(c, f"p.{c}") for c in columnas)
+    condicion = ""
+    parametros: List = []
+    if despues:
+        condicion = "WHERE (a.stock_actual, a.producto_id) > (?, ?)"
+        parametros = salida.decodificar_cursor(despues, 2)
+    # CROSS JOIN fija el orden: recorrer la lista y buscar cada producto por
+    # id, aunque las estadísticas del planificador no conozcan alertas_stock.
+    # LIMIT -1: sin límite
+    return conn.execute(f"""
+        SELECT {seleccion}
+        FROM alertas_stock a
+        CROSS JOIN productos p ON p.id = a.producto_id
+        {condicion}
+        ORDER BY a.stock_actual, a.producto_id
+        LIMIT ?
+    """, (*parametros, limite + 1 if limite is not None else -1))
+
+
+def umbrales(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Umbrales definidos por categoría"""
+    return dict(conn.execute("SELECT categoria, stock_minimo FROM umbrales_categoria ORDER BY categoria"))
+
+
+def fijar_umbral(conn: sqlite3.Connection, categoria: str, minimo: Optional[int]):
+    """
+    Define (o quita, con minimo None) el umbral de una categoría
+
+    Los triggers ajustan la lista al confirmar; no abre transacción propia.
+
+    Raises:
+        ValueError: Si el mínimo es negativo
+    """
+    if minimo is None:
+        conn.execute("DELETE FROM umbrales_categoria WHERE categoria = ?", (categoria,))
+        return
+    if minimo < 0:
+        raise ValueError(f"El umbral de '{categoria}' no puede ser negativo")
+    conn.execute("""
+        INSERT INTO umbrales_categoria (categoria, stock_minimo) VALUES (?, ?)
+        ON CONFLICT (categoria) DO UPDATE SET stock_minimo = excluded.stock_minimo
+        WHERE stock_minimo IS NOT excluded.stock_minimo
+    """, (categoria, minimo))
+
+
+def ultimo_evento(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM alertas_stock_eventos").fetchone()[0]
+
+
+def activas(conn: sqlite3.Connection) -> List[Evento]:
+    """Alertas actuales como eventos 'activa' (id 0), las más escasas primero"""
+    return [Evento(0, 'activa', *fila) for fila in conn.execute("""
+        SELECT a.producto_id, p.nombre, p.codigo_barras, p.categoria,
+               a.stock_actual, a.umbral, a.desde
+        FROM alertas_stock a
+        CROSS JOIN productos p ON p.id = a.producto_id
+        ORDER BY a.stock_actual, a.producto_id
+    """)]
+
+
+def eventos_desde(conn: sqlite3.Connection, evento_id: int) -> List[Evento]:
+    """Eventos posteriores a evento_id, en orden"""
+    return [Evento(*fila) for fila in conn.execute("""
+        SELECT e.id, e.tipo, e.producto_id, p.nombre, p.codigo_barras, p.categoria,
+               e.stock_actual, e.umbral, e.fecha
+        FROM alertas_stock_eventos e
+        LEFT JOIN productos p ON p.id = e.producto_id
+        WHERE e.id > ?
+        ORDER BY e.id
+    """, (evento_id,))]
+
+
+def vigilar(conn: sqlite3.Connection, desde: Optional[int] = None,
+            intervalo_s: float = INTERVALO_DEFAULT_S,
+            duracion_s: Optional[float] = None) -> Iterator[Evento]:
+    """
+    Genera las alertas que aparecen o se resuelven mientras corre
+
+    Sin desde, empieza con las alertas activas y sigue a partir del último
+    evento. Entre lecturas solo consulta PRAGMA data_version, que cambia
+    cuando otra conexión confirma una escritura; la propia conexión no debe
+    escribir mientras vigila.
+
+    Args:
+        conn: Conexión (puede ser de solo lectura)
+        desde: Id del último evento ya procesado, para continuar sin repetir
+        intervalo_s: Segundos entre revisiones de data_version
+        duracion_s: Termina después de estos segundos (None: sin fin)
+    """
+    if desde is None:
+        ultimo = ultimo_evento(conn)
+        yield from activas(conn)
+    else:
+        ultimo = desde
+    limite = time.monotonic() + duracion_s if duracion_s is not None else None
+    version = None
+    while True:
+        actual = conn.execute("PRAGMA data_version").fetchone()[0]
+        if actual != version:
+            version = actual
+            for evento in eventos_desde(conn, ultimo):
+                ultimo = evento.id
+                yield evento
+        if limite is not None and time.monotonic() >= limite:
+            return
+        time.sleep(intervalo_s if limite is None else
+                   max(0.0, min(intervalo_s, limite - time.monotonic())))
+
+
+def emitir_json(eventos: Iterator[Evento], destino=None):
+    """Escribe un objeto JSON por línea y vacía la salida después de cada uno"""
+    destino = destino or sys.stdout
+    for evento in eventos:
+        destino.write(json.dumps(evento._asdict(), ensure_ascii=False) + "\n")
+        destino.flush()
+
+
+def parsear_umbral(texto: str) -> Tuple[str, Optional[int]]:
+    """
+    'CATEGORIA=N' define un umbral; 'CATEGORIA=' lo quita
+
+    Raises:
+        ValueError: Si el texto no tiene esa forma
+    """
+    categoria, separador, valor = texto.rpartition('=')
+    if not separador or not categoria or (valor.strip() and not valor.strip().isdigit()):
+        raise ValueError(f"Umbral inválido '{texto}': use CATEGORIA=N")
+    return categoria, int(valor) if valor.strip() else None
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Archivo de ventas históricas
+
+Las ventas anteriores a un corte (siempre el primer día de un mes) salen de
+la tabla ventas:
+
+- Las filas originales se copian a un archivo SQLite aparte (por defecto
+  backend/tlapaleria_archivo.db), que se adjunta con ATTACH como 'archivo'.
+- En la base principal quedan acumulados mensuales por producto y usuario
+  (ventas_mensuales), mucho más compactos.
+- Las estadísticas materializadas (resumenes.py) siguen contando las ventas
+  archivadas: los triggers descuentan las filas borradas y aquí se vuelven a
+  sumar en la misma transacción.
+
+Cada mes se archiva en dos pasos. Primero se copia al archivo con INSERT OR
+IGNORE y se confirma. Después, en la base principal, se acumula, se borra y
+se corrigen los resúmenes en una transacción. Si el proceso se interrumpe
+entre los dos pasos, las filas siguen en ventas y volver a archivar es seguro.
+El corte registrado avanza en la misma transacción que borra cada mes, así que
+los reportes (reportes.py) siempre saben qué parte del historial está archivada.
+
+Al final se compacta la base: la primera vez se activa auto_vacuum
+incremental con un VACUUM completo; después basta PRAGMA incremental_vacuum.
+"""
+
+import datetime
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, List, Optional
+
+from conexion_db import transaccion_escritura
+
+ESQUEMA = 'archivo'
+
+SQL_CREAR_ARCHIVO = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {ESQUEMA}.ventas (
+        id INTEGER PRIMARY KEY,
+        producto_id INTEGER NOT NULL,
+        usuario_id INTEGER NOT NULL,
+        cantidad INTEGER NOT NULL,
+        precio_unitario REAL NOT NULL,
+        total REAL NOT NULL,
+        fecha_venta DATETIME NOT NULL
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS {ESQUEMA}.idx_ventas_fecha ON ventas (fecha_venta)",
+]
+
+# Migración 5 de inicializar_db: tablas en la base principal
+SQL_CREAR_ACUMULADOS = [
+    """
+    CREATE TABLE IF NOT EXISTS ventas_mensuales (
+        mes TEXT NOT NULL,
+        producto_id INTEGER NOT NULL,
+        usuario_id INTEGER NOT NULL,
+        ventas INTEGER NOT NULL,
+        unidades INTEGER NOT NULL,
+        monto REAL NOT NULL,
+        PRIMARY KEY (mes, producto_id, usuario_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS archivo_ventas_registro (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
+        corte TEXT NOT NULL,
+        ruta TEXT NOT NULL,
+        filas INTEGER NOT NULL,
+        bytes_antes INTEGER,
+        bytes_despues INTEGER
+    )
+    """,
+]
+
+
+def crear_acumulados(conn: sqlite3.Connection):
+    """Crea las tablas de acumulados y registro (dentro de la transacción actual)"""
+    for sql in SQL_CREAR_ACUMULADOS:
+        conn.execute(sql)
+
+
+def ruta_default(db_path: str) -> str:
+    """Archivo de ventas históricas junto a la base principal"""
+    return os.path.splitext(db_path)[0] + '_archivo.db'
+
+
+def corte_actual(conn: sqlite3.Connection) -> Optional[str]:
+    """
+    Último corte aplicado ('AAAA-MM-01'), o None si nunca se ha archivado
+
+    Todas las ventas anteriores al corte están en ventas_mensuales y en el archivo.
+    """
+    try:
+        fila = conn.execute("SELECT MAX(corte) FROM archivo_ventas_registro").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return (fila[0] or None) if fila else None
+
+
+def ruta_registrada(conn: sqlite3.Connection) -> Optional[str]:
+    """Ruta del archivo usado en el último corte"""
+    try:
+        fila = conn.execute(
+            "SELECT ruta FROM archivo_ventas_registro ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return fila[0] if fila else None
+
+
+def adjuntado(conn: sqlite3.Connection) -> bool:
+    """Indica si el archivo ya está adjunto a la conexión"""
+    return any(fila[1] == ESQUEMA for fila in conn.execute("PRAGMA database_list"))
+
+
+def adjuntar(conn: sqlite3.Connection, ruta: Optional[str] = None,
+             crear: bool = False) -> bool:
+    """
+    Adjunta el archivo de ventas históricas como esquema 'archivo'
+
+    ATTACH no puede ejecutarse dentro de una transacción.
+
+    Args:
+        conn: Conexión abierta
+        ruta: Archivo a adjuntar (por defecto el del último corte)
+        crear: Crea el archivo y su esquema si no existe
+
+    Returns:
+        True si el archivo quedó adjunto, False si no existe
+    """
+    if adjuntado(conn):
+        return True
+    ruta = ruta or ruta_registrada(conn)
+    if not ruta or (not crear and not os.path.exists(ruta)):
+        return False
+    conn.execute(f"ATTACH DATABASE ? AS {ESQUEMA}", (ruta,))
+    if crear:
+        for sql in SQL_CREAR_ARCHIVO:
+            conn.execute(sql)
+        conn.commit()
+    return True
+
+
+def normalizar_corte(fecha: str) -> str:
+    """Primer día del mes de la fecha dada ('AAAA-MM-DD' -> 'AAAA-MM-01')"""
+    try:
+        return datetime.date.fromisoformat(fecha[:10]).replace(day=1).isoformat()
+    except ValueError:
+        raise ValueError(f"Fecha inválida (se espera AAAA-MM-DD): {fecha!r}")
+
+
+def corte_por_meses(conn: sqlite3.Connection, meses: int) -> str:
+    """Corte que conserva en ventas el mes actual y los 'meses' anteriores completos"""
+    return conn.execute(
+        "SELECT date('now', 'start of month', ?)", (f"-{int(meses)} months",)
+    ).fetchone()[0]
+
+
+def tamano(conn: sqlite3.Connection, esquema: str = 'main') -> Dict[str, int]:
+    """Páginas usadas y libres de una base adjunta a la conexión"""
+    tam_pagina = conn.execute(f"PRAGMA {esquema}.page_size").fetchone()[0]
+    paginas = conn.execute(f"PRAGMA {esquema}.page_count").fetchone()[0]
+    libres = conn.execute(f"PRAGMA {esquema}.freelist_count").fetchone()[0]
+    return {
+        'bytes': paginas * tam_pagina,
+        'bytes_libres': libres * tam_pagina,
+    }
+
+
+def _archivar_mes(conn: sqlite3.Connection, desde: str, hasta: str, registro_id: int) -> int:
+    """Mueve las ventas de [desde, hasta) al archivo y a ventas_mensuales"""
+    # Paso 1: copia al archivo. Es idempotente gracias al id original
+    with transaccion_escritura(conn):
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {ESQUEMA}.ventas
+                (id, producto_id, usuario_id, cantidad, precio_unitario, total, fecha_venta)
+            SELECT id, producto_id, usuario_id, cantidad, precio_unitario, total, fecha_venta
+            FROM main.ventas
+            WHERE fecha_venta >= ? AND fecha_venta < ?
+        """, (desde, hasta))
+
+    # Paso 2: acumulados, borrado y corrección de resúmenes en la base principal
+    with transaccion_escritura(conn):
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS archivo_lote (
+                mes TEXT, producto_id INTEGER, usuario_id INTEGER,
+                ventas INTEGER, unidades INTEGER, monto REAL
+            )
+        """)
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS archivo_dias (
+                fecha TEXT PRIMARY KEY, ventas INTEGER, unidades INTEGER, monto REAL
+            )
+        """)
+        conn.execute("DELETE FROM temp.archivo_lote")
+        conn.execute("DELETE FROM temp.archivo_dias")
+        conn.execute("""
+            INSERT INTO temp.archivo_lote
+            SELECT strftime('%Y-%m', fecha_venta), producto_id, usuario_id,
+                   COUNT(*), SUM(cantidad), SUM(total)
+            FROM main.ventas
+            WHERE fecha_venta >= ? AND fecha_venta < ?
+            GROUP BY 1, 2, 3
+        """, (desde, hasta))
+        conn.execute("""
+            INSERT INTO temp.archivo_dias
+            SELECT date(fecha_venta), COUNT(*), SUM(cantidad), SUM(total)
+            FROM main.ventas
+            WHERE fecha_venta >= ? AND fecha_venta < ?
+            GROUP BY 1
+        """, (desde, hasta))
+
+        conn.execute("""
+            INSERT INTO ventas_mensuales (mes, producto_id, usuario_id, ventas, unidades, monto)
+            SELECT mes, producto_id, usuario_id, ventas, unidades, monto
+            FROM temp.archivo_lote WHERE true
+            ON CONFLICT (mes, producto_id, usuario_id) DO UPDATE SET
+                ventas = ventas + excluded.ventas,
+                unidades = unidades + excluded.unidades,
+                monto = monto + excluded.monto
+        """)
+        filas = conn.execute(
+            "DELETE FROM main.ventas WHERE fecha_venta >= ? AND fecha_venta < ?", (desde, hasta)
+        ).rowcount
+
+        # Los triggers de resumenes.py descontaron las filas borradas; las
+        # ventas archivadas siguen siendo parte del historial
+        conn.execute("""
+            UPDATE resumen_global SET
+                total_ventas = total_ventas + (SELECT COALESCE(SUM(ventas), 0) FROM temp.archivo_lote),
+                monto_ventas = monto_ventas + (SELECT COALESCE(SUM(monto), 0) FROM temp.archivo_lote)
+            WHERE id = 1
+        """)
+        conn.execute("""
+            INSERT INTO resumen_productos_vendidos (producto_id, unidades, monto, ventas)
+            SELECT producto_id, SUM(unidades), SUM(monto), SUM(ventas)
+            FROM temp.archivo_lote WHERE true
+            GROUP BY producto_id
+            ON CONFLICT (producto_id) DO UPDATE SET
+                unidades = unidades + excluded.unidades,
+                monto = monto + excluded.monto,
+                ventas = ventas + excluded.ventas
+        """)
+        conn.execute("""
+            INSERT INTO resumen_ventas_diarias (fecha, ventas, unidades, monto)
+            SELECT fecha, ventas, unidades, monto FROM temp.archivo_dias WHERE true
+            ON CONFLICT (fecha) DO UPDATE SET
+                ventas = ventas + excluded.ventas,
+                unidades = unidades + excluded.unidades,
+                monto = monto + excluded.monto
+        """)
+        conn.execute("""
+            UPDATE archivo_ventas_registro SET corte = max(corte, ?), filas = filas + ?
+            WHERE id = ?
+        """, (hasta, filas, registro_id))
+    return filas
+
+
+def compactar(conn: sqlite3.Connection) -> str:
+    """
+    Devuelve al sistema de archivos las páginas libres de la base principal
+
+    Returns:
+        'vacuum' si hubo que hacer un VACUUM completo para activar
+        auto_vacuum incremental, 'incremental' en otro caso
+    """
+    if conn.in_transaction:
+        conn.commit()
+    if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] != 2:
+        # Cambiar auto_vacuum solo surte efecto con un VACUUM completo
+        conn.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM main")
+        modo = 'vacuum'
+    else:
+        # execute() da un solo paso y cada paso libera una página; executescript
+        # ejecuta la sentencia hasta el final
+        conn.executescript("PRAGMA main.incremental_vacuum;")
+        modo = 'incremental'
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return modo
+
+
+def archivar(conn: sqlite3.Connection, corte: str, ruta: str, compactar_base: bool = True,
+             progreso: Optional[Callable[[str, int], None]] = None) -> Dict:
+    """
+    Archiva las ventas anteriores al corte, un mes a la vez
+
+    Args:
+        conn: Conexión abierta a la base principal (sin transacción abierta)
+        corte: Fecha 'AAAA-MM-DD'; se ajusta al primer día de su mes
+        ruta: Archivo de ventas históricas (se crea si no existe)
+        compactar_base: Ejecuta VACUUM / incremental_vacuum al terminar
+        progreso: Función llamada con (mes, filas archivadas) después de cada mes
+
+    Returns:
+        Resumen con corte, meses, filas, segundos y los tamaños de la base
+        principal y del archivo antes y después
+    """
+    corte = normalizar_corte(corte)
+    if conn.in_transaction:
+        conn.commit()
+    registrada = ruta_registrada(conn)
+    if registrada and os.path.abspath(registrada) != os.path.abspath(ruta):
+        raise ValueError(f"Las ventas ya se archivaron en {registrada}; use ese archivo")
+
+    inicio = time.perf_counter()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    antes = tamano(conn)
+    adjuntar(conn, ruta, crear=True)
+
+    # El registro empieza con el corte anterior y avanza con cada mes archivado
+    with transaccion_escritura(conn):
+        registro_id = conn.execute("""
+            INSERT INTO archivo_ventas_registro (corte, ruta, filas, bytes_antes)
+            VALUES (COALESCE((SELECT MAX(corte) FROM archivo_ventas_registro), ''), ?, 0, ?)
+        """, (os.path.abspath(ruta), antes['bytes'])).lastrowid
+
+    meses: List[str] = [fila[0] for fila in conn.execute("""
+        SELECT DISTINCT strftime('%Y-%m-01', fecha_venta) FROM ventas
+        WHERE fecha_venta < ? ORDER BY 1
+    """, (corte,))]
+    filas = 0
+    for mes in meses:
+        fin = conn.execute("SELECT min(date(?, '+1 month'), ?)", (mes, corte)).fetchone()[0]
+        movidas = _archivar_mes(conn, mes, fin, registro_id)
+        filas += movidas
+        if progreso:
+            progreso(mes, movidas)
+
+    # Ya no quedan ventas anteriores al corte
+    with transaccion_escritura(conn):
+        conn.execute("UPDATE archivo_ventas_registro SET corte = max(corte, ?) WHERE id = ?",
+                     (corte, registro_id))
+
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    sin_compactar = tamano(conn)
+    modo = compactar(conn) if compactar_base else None
+    despues = tamano(conn)
+    with transaccion_escritura(conn):
+        conn.execute("UPDATE archivo_ventas_registro SET bytes_despues = ? WHERE id = ?",
+                     (despues['bytes'], registro_id))
+
+    return {
+        'corte': corte,
+        'meses': len(meses),
+        'filas': filas,
+        'compactacion': modo,
+        'bytes_antes': antes['bytes'],
+        'bytes_libres_sin_compactar': sin_compactar['bytes_libres'],
+        'bytes_despues': despues['bytes'],
+        'bytes_recuperados': antes['bytes'] - despues['bytes'],
+        'bytes_archivo': tamano(conn, ESQUEMA)['bytes'],
+        'segundos': round(time.perf_counter() - inicio, 2),
+    }
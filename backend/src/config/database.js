@@ -11,6 +11,10 @@ const db = new sqlite3.Database(DB_PATH, (err) => {
     console.error('Error al conectar con la base de datos:', err.message);
   } else {
     console.log('Conectado a la base de datos SQLite.');
+    // Misma configuración que la CLI de Python (conexion_db.py): WAL y espera
+    // por bloqueos para que ambos puedan escribir sin "database is locked"
+    db.configure('busyTimeout', Number(process.env.SQLITE_BUSY_TIMEOUT_MS) || 5000);
+    db.exec('PRAGMA journal_mode = WAL; PRAGMA synchronous = NORMAL;');
     initializeTables();
   }
 });
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Arranque en frío de la CLI (python3 tlapaleria_cli.py) con presupuesto
+
+Lanza un proceso nuevo por ejecución, alternando en cada ronda:
+
+    interprete  python3 -c pass, la referencia
+    importar    python3 -c "import interfaz_cli"
+    ayuda       tlapaleria_cli.py --help
+    escanear    tlapaleria_cli.py --quiet escanear CODIGO (importar más la primera consulta)
+    venta       tlapaleria_cli.py --quiet venta ID 1 (con escritura)
+
+Además separa, dentro del proceso, cuánto de escanear es importar, construir
+el parser, abrir la base (conexión, migraciones y precios programados) y la
+consulta, y lista los módulos que más tardan en importarse.
+
+El arranque es la mediana de escanear menos la del intérprete. Termina con
+código 1 si pasa de --presupuesto-ms, así que sirve como prueba de regresión
+cuando alguien agrega una importación pesada al camino de todos los comandos.
+
+Uso:
+    python3 benchmarks/arranque_cli.py --rondas 30
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generar_datos  # noqa: E402
+from conexion_db import conectar  # noqa: E402
+from inicializar_db import aplicar_migraciones  # noqa: E402
+from rendimiento import (DIRECTORIO_DATOS_DEFAULT, commit_actual, copiar_base,  # noqa: E402
+                         percentiles, preparar_datos)
+
+RONDAS_DEFAULT = 20
+# Milisegundos que escanear puede tardar por encima de python3 -c pass; antes
+# de cargar los subcomandos y módulos pesados a demanda eran unos 110
+PRESUPUESTO_MS = 100.0
+MODULOS_REPORTADOS = 10
+# Sin PYTHONDONTWRITEBYTECODE: cada proceso recompilaría los módulos que no
+# estén en __pycache__ y se mediría la compilación en lugar del arranque
+ENTORNO = {llave: valor for llave, valor in os.environ.items()
+           if llave != 'PYTHONDONTWRITEBYTECODE'}
+
+# Se ejecuta con python3 -c en cada ronda; la última línea es el JSON de las fases
+FASES = """
+import json, sys, time
+inicio = time.perf_counter()
+import interfaz_cli
+importado = time.perf_counter()
+argv = sys.argv[1:]
+parser = interfaz_cli.construir_parser(interfaz_cli.comando_pedido(argv))
+args = parser.parse_args(argv)
+interpretado = time.perf_counter()
+cli = interfaz_cli.TlapaleriaCLI(args.db, silencioso=True)
+cli.conn
+conectado = time.perf_counter()
+interfaz_cli.ejecutar_comando(cli, args, parser)
+fin = time.perf_counter()
+cli.close()
+print(json.dumps({'importar': importado - inicio, 'parser': interpretado - importado,
+                  'abrir_base': conectado - interpretado, 'consulta': fin - conectado}))
+"""
+
+
+def medir(argv) -> float:
+    """Milisegundos de un proceso nuevo de principio a fin"""
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable] + argv, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL, check=True, cwd=RAIZ, env=ENTORNO)
+    return (time.perf_counter() - inicio) * 1000
+
+
+def fases(argv) -> dict:
+    """Milisegundos de cada fase de un comando, medidos dentro del proceso"""
+    salida = subprocess.run([sys.executable, '-c', FASES] + argv, capture_output=True,
+                            text=True, check=True, cwd=RAIZ, env=ENTORNO).stdout
+    return {fase: segundos * 1000
+            for fase, segundos in json.loads(salida.strip().splitlines()[-1]).items()}
+
+
+def importaciones() -> dict:
+    """Módulos importados directamente por interfaz_cli y sus milisegundos acumulados"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import interfaz_cli'],
+                            capture_output=True, text=True, check=True, cwd=RAIZ,
+                            env=ENTORNO).stderr
+    # python -X importtime escribe cada módulo después de los que importa;
+    # la sangría de dos espacios por nivel marca la profundidad
+    directos = {}
+    for linea in stderr.splitlines():
+        coincidencia = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)', linea)
+        if not coincidencia:
+            continue
+        acumulado, sangria, modulo = coincidencia.groups()
+        if len(sangria) == 1:
+            if modulo == 'interfaz_cli':
+                break
+            directos = {}
+        elif len(sangria) == 3:
+            directos[modulo] = int(acumulado) / 1000
+    return dict(sorted(directos.items(), key=lambda par: par[1], reverse=True)[:MODULOS_REPORTADOS])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(generar_datos.ESCALAS), default='pequena',
+                        help='Tamaño de la tienda sintética')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos')
+    parser.add_argument('--rondas', type=int, default=RONDAS_DEFAULT,
+                        help='Procesos lanzados por cada medición')
+    parser.add_argument('--presupuesto-ms', type=float, default=PRESUPUESTO_MS,
+                        help='Arranque máximo sobre el intérprete solo')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    args = parser.parse_args()
+
+    productos, ventas = generar_datos.dimensiones(args.escala, None, None)
+    meta = preparar_datos(args.datos, productos, ventas, args.semilla)
+    db_trabajo = meta['db'][:-3] + '.arranque.db'
+
+    try:
+        copiar_base(meta['db'], db_trabajo)
+        # Las migraciones quedan fuera de la medición
+        conn = conectar(db_trabajo)
+        aplicar_migraciones(conn)
+        codigo, producto_id = conn.execute("""
+            SELECT codigo_barras, id FROM productos
+            WHERE codigo_barras IS NOT NULL ORDER BY stock_actual DESC LIMIT 1
+        """).fetchone()
+        conn.close()
+
+        base = ['tlapaleria_cli.py', '--db', db_trabajo, '--quiet']
+        procesos = {
+            'interprete': ['-c', 'pass'],
+            'importar': ['-c', 'import interfaz_cli'],
+            'ayuda': ['tlapaleria_cli.py', '--help'],
+            'escanear': base + ['escanear', codigo],
+            'venta': base + ['venta', str(producto_id), '1'],
+        }
+        # Una ronda sin medir llena __pycache__ y la caché de disco
+        for argv in procesos.values():
+            medir(argv)
+        muestras = {nombre: [] for nombre in procesos}
+        muestras_fases = []
+        for _ in range(args.rondas):
+            for nombre, argv in procesos.items():
+                muestras[nombre].append(medir(argv))
+            muestras_fases.append(fases(['--db', db_trabajo, 'escanear', codigo]))
+        modulos = importaciones()
+    finally:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(db_trabajo + sufijo):
+                os.remove(db_trabajo + sufijo)
+
+    latencias = {nombre: percentiles(valores) for nombre, valores in muestras.items()}
+    arranque = latencias['escanear']['p50_ms'] - latencias['interprete']['p50_ms']
+    resultado = {
+        'commit': commit_actual(),
+        'datos': {llave: meta[llave] for llave in ('productos', 'ventas', 'semilla')},
+        'latencias_ms': latencias,
+        'fases_escanear_ms': {fase: percentiles([m[fase] for m in muestras_fases])['p50_ms']
+                              for fase in muestras_fases[0]},
+        'importaciones_ms': modulos,
+        'arranque_ms': round(arranque, 1),
+        'presupuesto_ms': args.presupuesto_ms,
+    }
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if arranque > args.presupuesto_ms:
+        print(f"❌ Arranque de {arranque:.1f} ms, presupuesto {args.presupuesto_ms:.0f} ms",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Lecturas del catálogo con y sin la caché de productos (cache_productos.py)
+
+Sobre una copia de la tienda sintética simula una sesión larga (como el REPL
+o el servidor) que hace --lecturas lecturas al azar:
+
+    listar         primera página o una página a partir de un producto al azar
+    escanear       producto por código de barras
+
+Cada lectura se hace desde la caché y con la consulta SQL, y se comprueba
+que den lo mismo. Mientras tanto otra conexión escribe cada
+--escribir-cada lecturas (ventas y ajustes de stock, y de vez en cuando una
+alta y una baja), así que la caché tiene que refrescarse.
+
+Reporta los percentiles de cada lectura en ambos modos, la tasa de aciertos
+de la caché, las filas releídas y la memoria por producto, medida con
+tracemalloc y estimada por la caché. Termina con código 1 si algún
+resultado no coincide.
+
+Uso:
+    python3 benchmarks/cache_catalogo.py --escala mediana --lecturas 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cache_productos  # noqa: E402
+import generar_datos  # noqa: E402
+import inventario  # noqa: E402
+import salida  # noqa: E402
+from conexion_db import conectar, transaccion_escritura  # noqa: E402
+from inicializar_db import aplicar_migraciones  # noqa: E402
+from rendimiento import (DIRECTORIO_DATOS_DEFAULT, commit_actual, copiar_base,  # noqa: E402
+                         percentiles, preparar_datos)
+
+LECTURAS_DEFAULT = 10000
+ESCRIBIR_CADA_DEFAULT = 50
+TAMANO_PAGINA = 50
+
+COLUMNAS_LISTAR = ('id', 'nombre', 'codigo_barras', 'precio', 'stock_actual',
+                   'stock_minimo', 'categoria', 'ubicacion')
+
+
+def escribir(conn, ids, rng: random.Random, numero: int):
+    """Una escritura de otra conexión: venta, ajuste, o alta y baja"""
+    with transaccion_escritura(conn):
+        if numero % 20 == 0:
+            cursor = conn.execute("""
+                INSERT INTO productos (nombre, precio, stock_actual, stock_minimo, codigo_barras)
+                VALUES (?, ?, 0, 5, ?)
+            """, (f"Producto de prueba {numero}", 10.0, f"PRUEBA-{numero}"))
+            conn.execute("DELETE FROM productos WHERE id = ?", (rng.choice(ids),))
+            ids.append(cursor.lastrowid)
+        elif numero % 2:
+            conn.execute("""
+                UPDATE productos SET stock_actual = MAX(stock_actual - 1, 0) WHERE id = ?
+            """, (rng.choice(ids),))
+        else:
+            conn.execute("""
+                UPDATE productos SET stock_actual = ?, precio = precio + 1,
+                    fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (rng.randint(0, 30), rng.choice(ids)))
+
+
+def leer(conn, cache, operacion: str, argumento):
+    """La misma lectura desde SQL y desde la caché (None si la caché no se pudo usar)"""
+    if operacion == 'escanear':
+        directo = inventario.producto_por_codigo(conn, argumento)
+        return directo, lambda: (cache.por_codigo(argumento).producto()
+                                 if cache.por_codigo(argumento) else None)
+    return (inventario.consultar_productos(conn, TAMANO_PAGINA, argumento,
+                                           COLUMNAS_LISTAR).fetchall(),
+            lambda: cache.consultar_productos(TAMANO_PAGINA, argumento,
+                                              COLUMNAS_LISTAR).fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(generar_datos.ESCALAS), default='pequena',
+                        help='Tamaño de la tienda sintética')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos y de las lecturas')
+    parser.add_argument('--lecturas', type=int, default=LECTURAS_DEFAULT,
+                        help='Lecturas a medir en cada modo')
+    parser.add_argument('--escribir-cada', type=int, default=ESCRIBIR_CADA_DEFAULT, metavar='N',
+                        help='Lecturas entre dos escrituras de otra conexión (0: sin escrituras)')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    args = parser.parse_args()
+
+    productos, ventas = generar_datos.dimensiones(args.escala, None, None)
+    meta = preparar_datos(args.datos, productos, ventas, args.semilla)
+    db_trabajo = meta['db'][:-3] + '.cache.db'
+    rng = random.Random(args.semilla)
+
+    try:
+        copiar_base(meta['db'], db_trabajo)
+        conn = conectar(db_trabajo)
+        aplicar_migraciones(conn)
+        escritor = conectar(db_trabajo)
+        ids = [fila[0] for fila in conn.execute("SELECT id FROM productos")]
+        codigos = [fila[0] for fila in conn.execute(
+            "SELECT codigo_barras FROM productos WHERE codigo_barras IS NOT NULL")]
+        nombres = conn.execute("SELECT nombre, id FROM productos").fetchall()
+
+        tracemalloc.start()
+        antes = tracemalloc.get_traced_memory()[0]
+        cache = cache_productos.CacheProductos(conn)
+        memoria_medida = (tracemalloc.get_traced_memory()[0] - antes) / len(cache._productos)
+        tracemalloc.stop()
+        segundos_carga = cache.estadisticas['segundos_carga']
+
+        tiempos = {f"{op}_{modo}": [] for op in ('listar', 'escanear')
+                   for modo in ('sql', 'cache')}
+        diferentes = 0
+        escrituras = 0
+        for numero in range(1, args.lecturas + 1):
+            if args.escribir_cada and numero % args.escribir_cada == 0:
+                escrituras += 1
+                escribir(escritor, ids, rng, escrituras)
+
+            operacion = rng.choice(('listar', 'escanear'))
+            argumento = None
+            if operacion == 'escanear':
+                argumento = rng.choice(codigos)
+            elif operacion == 'listar' and rng.random() < 0.8:
+                argumento = salida.codificar_cursor(rng.choice(nombres))
+
+            inicio = time.perf_counter()
+            directo, desde_cache = leer(conn, cache, operacion, argumento)
+            tiempos[f"{operacion}_sql"].append((time.perf_counter() - inicio) * 1000)
+
+            inicio = time.perf_counter()
+            if not cache.vigente():
+                raise RuntimeError("La caché no debería estar en una transacción")
+            resultado = desde_cache()
+            tiempos[f"{operacion}_cache"].append((time.perf_counter() - inicio) * 1000)
+            diferentes += resultado != directo
+
+        resumen_cache = cache.resumen()
+        conn.close()
+        escritor.close()
+    finally:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(db_trabajo + sufijo):
+                os.remove(db_trabajo + sufijo)
+
+    resultado = {
+        'commit': commit_actual(),
+        'datos': {llave: meta[llave] for llave in ('productos', 'ventas', 'semilla')},
+        'lecturas': args.lecturas,
+        'escrituras': escrituras,
+        'latencias_ms': {nombre: percentiles(muestras) for nombre, muestras in tiempos.items()
+                         if muestras},
+        'cache': resumen_cache,
+        'bytes_por_producto_tracemalloc': round(memoria_medida, 1),
+        'segundos_carga': round(segundos_carga, 3),
+        'resultados_diferentes': diferentes,
+    }
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    sys.exit(1 if diferentes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del servicio asíncrono (servicio.py)
+
+Lanza muchos clientes concurrentes contra ServicioInventario durante unos
+segundos y repite la prueba con distinto número de lectores. Cada cliente
+elige al azar entre escanear un código, consultar un producto, buscar y
+listar una página; una fracción de las peticiones son ventas, que pasan por
+el hilo escritor. Reporta en JSON las peticiones por segundo y los
+percentiles de latencia de lecturas y escrituras para cada número de
+lectores, y la aceleración de las lecturas respecto a un solo lector.
+
+Las lecturas en paralelo solo escalan con varios núcleos: en una máquina
+con una CPU el resultado muestra el costo del reparto, no la ganancia.
+
+Uso:
+    python3 benchmarks/carga_servicio.py --escala mediana --lectores 1,2,4,8
+    python3 benchmarks/carga_servicio.py --clientes 64 --duracion 10 --escrituras 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generar_datos  # noqa: E402
+import inventario  # noqa: E402
+from conexion_db import conectar  # noqa: E402
+from rendimiento import (DIRECTORIO_DATOS_DEFAULT, TERMINOS_BUSQUEDA, commit_actual,  # noqa: E402
+                         copiar_base, percentiles, preparar_datos)
+from servicio import ServicioInventario  # noqa: E402
+
+CLIENTES_DEFAULT = 32
+DURACION_DEFAULT = 5.0
+# Fracción de peticiones que son ventas
+ESCRITURAS_DEFAULT = 0.05
+
+
+async def cliente(servicio: ServicioInventario, rng: random.Random, codigos: List[str],
+                  ids: List[int], fin: float, escrituras: float,
+                  latencias: Dict[str, List[float]]):
+    """Hace peticiones una tras otra hasta el instante 'fin'"""
+    while time.perf_counter() < fin:
+        sorteo = rng.random()
+        inicio = time.perf_counter()
+        if sorteo < escrituras:
+            try:
+                await servicio.registrar_venta(rng.choice(ids), 1)
+            except inventario.StockInsuficiente:
+                pass
+            latencias['escrituras'].append((time.perf_counter() - inicio) * 1000)
+            continue
+        sorteo = rng.random()
+        if sorteo < 0.4:
+            await servicio.producto_por_codigo(rng.choice(codigos))
+        elif sorteo < 0.7:
+            await servicio.producto(rng.choice(ids))
+        elif sorteo < 0.9:
+            await servicio.buscar(rng.choice(TERMINOS_BUSQUEDA), 20)
+        else:
+            await servicio.listar(50)
+        latencias['lecturas'].append((time.perf_counter() - inicio) * 1000)
+
+
+async def medir(db_path: str, lectores: int, clientes: int, duracion: float,
+                escrituras: float, semilla: int, codigos: List[str], ids: List[int]) -> Dict:
+    """Ejecuta la carga con un número de lectores y resume el resultado"""
+    latencias: Dict[str, List[float]] = {'lecturas': [], 'escrituras': []}
+    async with ServicioInventario(db_path, lectores) as servicio:
+        # Calentamiento: cada lector abre su conexión y llena su caché
+        await asyncio.gather(*(servicio.buscar('martillo') for _ in range(lectores * 2)))
+        fin = time.perf_counter() + duracion
+        inicio = time.perf_counter()
+        await asyncio.gather(*(
+            cliente(servicio, random.Random(semilla + i), codigos, ids, fin, escrituras, latencias)
+            for i in range(clientes)
+        ))
+        segundos = time.perf_counter() - inicio
+
+    resultado = {'segundos': round(segundos, 2)}
+    for tipo, muestras in latencias.items():
+        if muestras:
+            resumen = percentiles(muestras)
+            # Con clientes concurrentes el rendimiento es el total entre el
+            # tiempo de pared, no la inversa de la latencia
+            resumen['ops_por_s'] = round(len(muestras) / segundos, 1)
+            resultado[tipo] = resumen
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(generar_datos.ESCALAS), default='pequena',
+                        help='Tamaño de la tienda sintética')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos y de los clientes')
+    parser.add_argument('--lectores', default='1,2,4,8',
+                        help='Números de lectores a probar, separados por comas')
+    parser.add_argument('--clientes', type=int, default=CLIENTES_DEFAULT,
+                        help='Clientes concurrentes')
+    parser.add_argument('--duracion', type=float, default=DURACION_DEFAULT,
+                        help='Segundos de carga por cada número de lectores')
+    parser.add_argument('--escrituras', type=float, default=ESCRITURAS_DEFAULT,
+                        help='Fracción de peticiones que son ventas')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    parser.add_argument('--salida', help='Archivo donde guardar el JSON de resultados')
+    args = parser.parse_args()
+
+    productos, ventas = generar_datos.dimensiones(args.escala, None, None)
+    meta = preparar_datos(args.datos, productos, ventas, args.semilla)
+    db_trabajo = meta['db'][:-3] + '.carga.db'
+    copiar_base(meta['db'], db_trabajo)
+
+    conn = conectar(db_trabajo, solo_lectura=True)
+    muestra = conn.execute(
+        "SELECT id, codigo_barras FROM productos ORDER BY random() LIMIT 5000"
+    ).fetchall()
+    conn.close()
+    ids = [producto_id for producto_id, _ in muestra]
+    codigos = [codigo for _, codigo in muestra if codigo]
+
+    niveles = {}
+    try:
+        for lectores in (int(n) for n in args.lectores.split(',')):
+            print(f"⏱️  {lectores} lectores, {args.clientes} clientes, {args.duracion} s",
+                  file=sys.stderr)
+            niveles[str(lectores)] = asyncio.run(medir(
+                db_trabajo, lectores, args.clientes, args.duracion, args.escrituras,
+                args.semilla, codigos, ids
+            ))
+    finally:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(db_trabajo + sufijo):
+                os.remove(db_trabajo + sufijo)
+
+    base = next(iter(niveles.values())).get('lecturas', {}).get('ops_por_s')
+    for nivel in niveles.values():
+        lecturas = nivel.get('lecturas', {}).get('ops_por_s')
+        nivel['aceleracion_lecturas'] = round(lecturas / base, 2) if base and lecturas else None
+
+    resultado = {
+        'commit': commit_actual(),
+        'cpus': os.cpu_count(),
+        'datos': {llave: meta[llave] for llave in ('productos', 'ventas', 'semilla')},
+        'clientes': args.clientes,
+        'escrituras': args.escrituras,
+        'lectores': niveles,
+    }
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto + '\n')
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
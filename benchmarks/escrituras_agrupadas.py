@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Escrituras agrupadas (cola_escrituras.py) contra una transacción por operación
+
+Simula un conteo de inventario: varios clientes concurrentes mandan
+correcciones de stock (y algunas ventas) y esperan la confirmación de cada
+una antes de mandar la siguiente, como lo hace un lector de código de barras.
+Mide operaciones por segundo y latencia en cuatro modos:
+
+    individual          inventario.actualizar_stock / registrar_venta, una
+                        transacción por operación (synchronous=NORMAL)
+    individual_durable  lo mismo con synchronous=FULL (fsync por commit)
+    agrupada            ColaEscrituras con diario (fsync por lote); cada
+                        cliente espera su confirmación
+    agrupada_canalizada ColaEscrituras con hasta --ventana operaciones sin
+                        confirmar por cliente (un importador de conteos o un
+                        cliente del servicio que manda peticiones seguidas)
+
+Con clientes que esperan cada confirmación el lote nunca pasa del número de
+clientes y la latencia incluye la espera del intervalo: --agrupar-ms 0 aplica
+en cuanto el hilo escritor queda libre lo que se haya acumulado mientras
+tanto. En discos donde fsync es barato (o en tmpfs) la transacción individual
+puede salir más rápida; la ganancia aparece con fsync caro y con clientes que
+no esperan cada respuesta.
+
+Después verifica la recuperación: un proceso hijo confirma operaciones y
+muere (os._exit) a mitad de un lote ya escrito en el diario; al reabrir la
+cola, todas las operaciones confirmadas y las del lote interrumpido deben
+estar en la base. Termina con código 1 si la verificación falla.
+
+Uso:
+    python3 benchmarks/escrituras_agrupadas.py --escala mediana --clientes 16 -n 4000
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cola_escrituras  # noqa: E402
+import generar_datos  # noqa: E402
+import inventario  # noqa: E402
+from conexion_db import conectar  # noqa: E402
+from inicializar_db import aplicar_migraciones  # noqa: E402
+from rendimiento import (DIRECTORIO_DATOS_DEFAULT, commit_actual, copiar_base,  # noqa: E402
+                         percentiles, preparar_datos)
+
+CLIENTES_DEFAULT = 8
+OPERACIONES_DEFAULT = 2000
+# Fracción de operaciones que son ventas
+VENTAS_DEFAULT = 0.1
+VENTANA_DEFAULT = 64
+
+
+def generar_operaciones(ids: List[int], n: int, ventas: float, semilla: int) -> List[tuple]:
+    """Operaciones ('stock', id, valor) o ('venta', id, cantidad)"""
+    rng = random.Random(semilla)
+    return [('venta', rng.choice(ids), 1) if rng.random() < ventas
+            else ('stock', rng.choice(ids), rng.randint(0, 500)) for _ in range(n)]
+
+
+def ejecutar_clientes(operaciones: List[tuple], clientes: int, hacer) -> Dict:
+    """Reparte las operaciones entre hilos; cada uno espera cada confirmación"""
+    latencias: List[float] = []
+    bloqueo = threading.Lock()
+
+    def cliente(indice: int):
+        estado = {}
+        propias = []
+        for tipo, producto_id, valor in operaciones[indice::clientes]:
+            inicio = time.perf_counter()
+            try:
+                hacer(estado, tipo, producto_id, valor)
+            except inventario.StockInsuficiente:
+                pass
+            propias.append((time.perf_counter() - inicio) * 1000)
+        if 'conn' in estado:
+            estado['conn'].close()
+        with bloqueo:
+            latencias.extend(propias)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+    resultado = percentiles(latencias)
+    resultado['ops_por_s'] = round(len(latencias) / segundos, 1)
+    resultado['segundos'] = round(segundos, 3)
+    return resultado
+
+
+def modo_individual(db_path: str, synchronous: str):
+    def hacer(estado, tipo, producto_id, valor):
+        if 'conn' not in estado:
+            estado['conn'] = conectar(db_path, perfil={'synchronous': synchronous})
+        if tipo == 'stock':
+            inventario.actualizar_stock(estado['conn'], producto_id, valor)
+        else:
+            inventario.registrar_venta(estado['conn'], producto_id, valor)
+    return hacer
+
+
+def modo_agrupado(cola: cola_escrituras.ColaEscrituras):
+    def hacer(estado, tipo, producto_id, valor):
+        if tipo == 'stock':
+            cola.fijar_stock(producto_id, valor).result()
+        else:
+            cola.vender(producto_id, valor).result()
+    return hacer
+
+
+def ejecutar_canalizado(operaciones: List[tuple], clientes: int, ventana: int,
+                        cola: cola_escrituras.ColaEscrituras) -> Dict:
+    """Cada cliente mantiene hasta 'ventana' operaciones sin confirmar"""
+    latencias: List[float] = []
+    bloqueo = threading.Lock()
+
+    def cliente(indice: int):
+        en_vuelo = []
+        propias = []
+
+        def anotar(inicio):
+            return lambda _futuro: propias.append((time.perf_counter() - inicio) * 1000)
+
+        for tipo, producto_id, valor in operaciones[indice::clientes]:
+            if len(en_vuelo) >= ventana:
+                concurrent.futures.wait(en_vuelo, return_when=concurrent.futures.FIRST_COMPLETED)
+                en_vuelo = [f for f in en_vuelo if not f.done()]
+            inicio = time.perf_counter()
+            futuro = (cola.fijar_stock(producto_id, valor) if tipo == 'stock'
+                      else cola.vender(producto_id, valor))
+            futuro.add_done_callback(anotar(inicio))
+            en_vuelo.append(futuro)
+        concurrent.futures.wait(en_vuelo)
+        with bloqueo:
+            latencias.extend(propias)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+    resultado = percentiles(latencias)
+    resultado['ops_por_s'] = round(len(latencias) / segundos, 1)
+    resultado['segundos'] = round(segundos, 3)
+    return resultado
+
+
+def estadisticas_lotes(cola: cola_escrituras.ColaEscrituras) -> Dict:
+    estadisticas = cola.estadisticas
+    lotes = max(estadisticas['lotes'], 1)
+    return {'lotes': estadisticas['lotes'],
+            'operaciones_por_lote': round(estadisticas['operaciones'] / lotes, 1),
+            'updates_por_lote': round(estadisticas['updates'] / lotes, 1)}
+
+
+def _hijo_que_se_cae(db_path: str, diario: str, ids: List[int], confirmados_path: str):
+    """Confirma la primera mitad de las operaciones y muere a mitad de un lote"""
+    original = cola_escrituras.aplicar_lote
+    lotes = {'n': 0}
+
+    def aplicar_o_caer(conn, operaciones):
+        lotes['n'] += 1
+        if lotes['n'] > 1:
+            # El lote ya está en el diario pero nunca llega a la base
+            os._exit(9)
+        return original(conn, operaciones)
+
+    cola_escrituras.aplicar_lote = aplicar_o_caer
+    cola = cola_escrituras.ColaEscrituras(db_path, diario, intervalo_ms=50)
+    mitad = len(ids) // 2
+    futuros = [cola.fijar_stock(producto_id, 7000 + i) for i, producto_id in enumerate(ids[:mitad])]
+    for futuro in futuros:
+        futuro.result()
+    with open(confirmados_path, 'w') as archivo:
+        json.dump(ids[:mitad], archivo)
+    for i, producto_id in enumerate(ids[mitad:], mitad):
+        cola.fijar_stock(producto_id, 7000 + i)
+    time.sleep(5)
+    os._exit(0)
+
+
+def verificar_recuperacion(db_path: str, ids: List[int]) -> Dict:
+    """Provoca una caída a mitad de un lote y comprueba lo recuperado"""
+    diario = db_path + '.diario'
+    confirmados_path = db_path + '.confirmados'
+    contexto = multiprocessing.get_context('fork')
+    hijo = contexto.Process(target=_hijo_que_se_cae,
+                            args=(db_path, diario, ids, confirmados_path))
+    hijo.start()
+    hijo.join()
+    with open(confirmados_path) as archivo:
+        confirmados = json.load(archivo)
+    os.remove(confirmados_path)
+    diario_pendiente = len(cola_escrituras.leer_diario(diario))
+
+    cola = cola_escrituras.ColaEscrituras(db_path, diario)
+    recuperadas = cola.estadisticas['recuperadas']
+    cola.cerrar()
+
+    conn = conectar(db_path, solo_lectura=True)
+    esperado = {producto_id: 7000 + i for i, producto_id in enumerate(ids)}
+    actual = dict(conn.execute(
+        "SELECT id, stock_actual FROM productos WHERE id IN (SELECT value FROM json_each(?))",
+        (json.dumps(ids),)
+    ))
+    conn.close()
+    perdidas = [p for p in confirmados if actual.get(p) != esperado[p]]
+    recuperadas_ok = [p for p in ids[len(confirmados):] if actual.get(p) == esperado[p]]
+    return {
+        'codigo_salida_hijo': hijo.exitcode,
+        'confirmadas': len(confirmados),
+        'en_diario_al_caer': diario_pendiente,
+        'recuperadas': recuperadas,
+        'recuperadas_en_base': len(recuperadas_ok),
+        'confirmadas_perdidas': len(perdidas),
+        'diario_vacio': os.path.getsize(diario) == 0,
+        'ok': not perdidas and recuperadas > 0 and len(recuperadas_ok) == recuperadas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(generar_datos.ESCALAS), default='pequena',
+                        help='Tamaño de la tienda sintética')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos y de las operaciones')
+    parser.add_argument('--clientes', type=int, default=CLIENTES_DEFAULT,
+                        help='Clientes concurrentes')
+    parser.add_argument('-n', '--operaciones', type=int, default=OPERACIONES_DEFAULT,
+                        help='Operaciones por modo')
+    parser.add_argument('--ventas', type=float, default=VENTAS_DEFAULT,
+                        help='Fracción de operaciones que son ventas')
+    parser.add_argument('--agrupar-ms', type=int, default=cola_escrituras.INTERVALO_MS_DEFAULT,
+                        help='Intervalo de la cola agrupada')
+    parser.add_argument('--ventana', type=int, default=VENTANA_DEFAULT,
+                        help='Operaciones sin confirmar por cliente en el modo canalizado')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    args = parser.parse_args()
+
+    productos, ventas = generar_datos.dimensiones(args.escala, None, None)
+    meta = preparar_datos(args.datos, productos, ventas, args.semilla)
+    db_trabajo = meta['db'][:-3] + '.agrupadas.db'
+    diario = db_trabajo + '.diario'
+
+    resultado = {'commit': commit_actual(), 'cpus': os.cpu_count(),
+                 'clientes': args.clientes, 'operaciones': args.operaciones,
+                 'agrupar_ms': args.agrupar_ms, 'ventana': args.ventana, 'modos': {}}
+    try:
+        copiar_base(meta['db'], db_trabajo)
+        conn = conectar(db_trabajo)
+        aplicar_migraciones(conn)
+        ids = [fila[0] for fila in conn.execute("SELECT id FROM productos")]
+        conn.close()
+        operaciones = generar_operaciones(ids, args.operaciones, args.ventas, args.semilla)
+
+        for modo, synchronous in (('individual', 'NORMAL'), ('individual_durable', 'FULL')):
+            print(f"⏱️  {modo}", file=sys.stderr)
+            resultado['modos'][modo] = ejecutar_clientes(
+                operaciones, args.clientes, modo_individual(db_trabajo, synchronous))
+
+        print("⏱️  agrupada", file=sys.stderr)
+        cola = cola_escrituras.ColaEscrituras(db_trabajo, diario, args.agrupar_ms)
+        resultado['modos']['agrupada'] = ejecutar_clientes(operaciones, args.clientes,
+                                                           modo_agrupado(cola))
+        cola.cerrar()
+        resultado['modos']['agrupada'].update(estadisticas_lotes(cola))
+
+        print("⏱️  agrupada_canalizada", file=sys.stderr)
+        cola = cola_escrituras.ColaEscrituras(db_trabajo, diario, args.agrupar_ms)
+        resultado['modos']['agrupada_canalizada'] = ejecutar_canalizado(
+            operaciones, args.clientes, args.ventana, cola)
+        cola.cerrar()
+        resultado['modos']['agrupada_canalizada'].update(estadisticas_lotes(cola))
+
+        base = resultado['modos']['individual_durable']['ops_por_s']
+        resultado['aceleracion_vs_durable'] = {
+            modo: round(resultado['modos'][modo]['ops_por_s'] / base, 2) if base else None
+            for modo in ('agrupada', 'agrupada_canalizada')
+        }
+
+        print("💥 Verificando recuperación tras una caída", file=sys.stderr)
+        resultado['recuperacion'] = verificar_recuperacion(
+            db_trabajo, random.Random(args.semilla).sample(ids, min(len(ids), 400)))
+    finally:
+        for ruta in (db_trabajo, db_trabajo + '-wal', db_trabajo + '-shm', diario):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    sys.exit(0 if resultado['recuperacion']['ok'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Prueba de estrés: varios procesos registran ventas sobre la misma base de datos
+
+Crea una base temporal con pocos productos (para forzar contención), lanza
+varios procesos escritores que venden al azar con TlapaleriaCLI y al final
+verifica que:
+    - ningún producto quedó con stock negativo (sin sobreventa)
+    - stock_inicial - SUM(ventas.cantidad) == stock_actual (sin actualizaciones perdidas)
+    - ninguna venta falló por "database is locked"
+    - las estadísticas materializadas coinciden con el cálculo completo
+
+Termina con código 1 si alguna verificación falla.
+
+Uso:
+    python3 benchmarks/estres_concurrencia.py --procesos 8 --ventas 300
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import resumenes  # noqa: E402
+from interfaz_cli import TlapaleriaCLI  # noqa: E402
+
+
+def preparar_base(db_path, productos, stock):
+    """Crea la base con el esquema actual y productos de stock conocido"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        cli = TlapaleriaCLI(db_path)
+        for i in range(productos):
+            cli.agregar_producto(f"Producto {i}", 10.0 + i, stock,
+                                 codigo_barras=f"750000000{i:04d}")
+        cli.close()
+
+
+def escritor(db_path, ventas, productos, semilla, resultados):
+    """Proceso que registra ventas y cuenta errores de bloqueo"""
+    rng = random.Random(semilla)
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        cli = TlapaleriaCLI(db_path)
+        for _ in range(ventas):
+            if rng.random() < 0.2:
+                lineas = [(rng.randint(1, productos), rng.randint(1, 3)) for _ in range(3)]
+                cli.registrar_venta_lote([{'lineas': lineas}])
+            else:
+                cli.registrar_venta(rng.randint(1, productos), rng.randint(1, 3))
+        cli.close()
+    texto = salida.getvalue()
+    resultados.put({
+        'bloqueos': texto.count('locked'),
+        'errores': texto.count('❌ Error'),
+        'sin_stock': texto.count('Stock insuficiente'),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--procesos', type=int, default=6, help='Procesos escritores')
+    parser.add_argument('--ventas', type=int, default=200, help='Ventas por proceso')
+    parser.add_argument('--productos', type=int, default=5, help='Productos en disputa')
+    parser.add_argument('--stock', type=int, default=500, help='Stock inicial por producto')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    db_path = os.path.join(directorio, 'estres.db')
+    preparar_base(db_path, args.productos, args.stock)
+
+    resultados = multiprocessing.Queue()
+    procesos = [
+        multiprocessing.Process(target=escritor,
+                                args=(db_path, args.ventas, args.productos, semilla, resultados))
+        for semilla in range(args.procesos)
+    ]
+    inicio = time.perf_counter()
+    for proceso in procesos:
+        proceso.start()
+    totales = {'bloqueos': 0, 'errores': 0, 'sin_stock': 0}
+    for _ in procesos:
+        for llave, valor in resultados.get().items():
+            totales[llave] += valor
+    for proceso in procesos:
+        proceso.join()
+    segundos = time.perf_counter() - inicio
+
+    conn = sqlite3.connect(db_path)
+    filas = conn.execute("""
+        SELECT p.id, p.stock_actual, COALESCE(SUM(v.cantidad), 0), COUNT(v.id)
+        FROM productos p
+        LEFT JOIN ventas v ON v.producto_id = p.id
+        GROUP BY p.id
+    """).fetchall()
+    diferencias_resumen = resumenes.verificar(conn)
+    conn.close()
+
+    fallos = []
+    for producto_id, stock_actual, vendido, _ in filas:
+        if stock_actual < 0:
+            fallos.append(f"producto {producto_id} sobrevendido: stock {stock_actual}")
+        if args.stock - vendido != stock_actual:
+            fallos.append(f"producto {producto_id}: {args.stock} - {vendido} != {stock_actual}")
+    fallos.extend(diferencias_resumen)
+    if totales['bloqueos'] or totales['errores']:
+        fallos.append(f"{totales['bloqueos']} bloqueos y {totales['errores']} errores de SQLite")
+
+    print(json.dumps({
+        'procesos': args.procesos,
+        'operaciones': args.procesos * args.ventas,
+        'lineas_vendidas': sum(f[3] for f in filas),
+        'rechazadas_sin_stock': totales['sin_stock'],
+        'segundos': round(segundos, 3),
+        'operaciones_por_segundo': round(args.procesos * args.ventas / segundos, 1),
+        'fallos': fallos,
+    }, indent=2, ensure_ascii=False))
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
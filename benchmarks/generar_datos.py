@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Generador de tiendas sintéticas para medir la CLI a distintas escalas
+
+Crea una base de datos con el esquema actual (mismas migraciones que la CLI),
+un catálogo de productos con nombres, categorías, precios y stock realistas,
+e historial de ventas:
+
+- La popularidad de los productos sigue una distribución de Zipf: pocos
+  productos concentran la mayoría de las ventas y muchos casi no se venden.
+  El orden de popularidad se baraja para que no coincida con el id.
+- Las ventas se reparten en los últimos N días, en orden cronológico, con
+  más movimiento los fines de semana y un crecimiento gradual del negocio.
+
+Con la misma escala y semilla el resultado es idéntico, de modo que las
+mediciones de distintos commits son comparables.
+
+Durante la carga se quitan los triggers de inserción (FTS y resúmenes) y los
+índices de ventas; al terminar se vuelven a crear y se reconstruyen el
+índice de búsqueda y las estadísticas materializadas en una sola pasada.
+
+Uso:
+    python3 benchmarks/generar_datos.py --escala mediana --db /tmp/tienda.db
+    python3 benchmarks/generar_datos.py --productos 2000 --ventas 50000 --db /tmp/t.db
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import busqueda  # noqa: E402
+import resumenes  # noqa: E402
+from conexion_db import conectar, transaccion_escritura  # noqa: E402
+from inicializar_db import MIGRACIONES, aplicar_migraciones  # noqa: E402
+
+# Cambia cuando cambia la forma de generar los datos: una base generada con
+# otra versión no es comparable y se vuelve a generar
+VERSION_GENERADOR = 1
+
+# (productos, ventas)
+ESCALAS: Dict[str, Tuple[int, int]] = {
+    'pequena': (1_000, 10_000),
+    'mediana': (50_000, 1_000_000),
+    'grande': (500_000, 10_000_000),
+}
+
+DIAS_DEFAULT = 730
+ZIPF_S_DEFAULT = 1.1
+SEMILLA_DEFAULT = 42
+TAMANO_LOTE = 50_000
+
+# Tipo de producto -> (categoría, rango de precio)
+TIPOS = {
+    'Martillo': ('Herramientas', (80, 450)),
+    'Desarmador': ('Herramientas', (35, 180)),
+    'Pinza': ('Herramientas', (60, 320)),
+    'Llave': ('Herramientas', (45, 380)),
+    'Sierra': ('Herramientas', (120, 900)),
+    'Taladro': ('Herramientas', (650, 3500)),
+    'Cinta métrica': ('Herramientas', (40, 220)),
+    'Nivel': ('Herramientas', (70, 400)),
+    'Pintura': ('Pinturas', (120, 1200)),
+    'Brocha': ('Pinturas', (25, 140)),
+    'Rodillo': ('Pinturas', (45, 210)),
+    'Thinner': ('Pinturas', (50, 260)),
+    'Clavos': ('Ferretería', (20, 120)),
+    'Tornillos': ('Ferretería', (25, 150)),
+    'Taquetes': ('Ferretería', (15, 90)),
+    'Bisagra': ('Ferretería', (20, 160)),
+    'Candado': ('Ferretería', (60, 450)),
+    'Lija': ('Ferretería', (8, 60)),
+    'Cable': ('Eléctrico', (90, 1500)),
+    'Foco': ('Eléctrico', (25, 180)),
+    'Apagador': ('Eléctrico', (30, 150)),
+    'Contacto': ('Eléctrico', (35, 160)),
+    'Extensión': ('Eléctrico', (70, 420)),
+    'Tubo PVC': ('Plomería', (40, 380)),
+    'Codo': ('Plomería', (8, 70)),
+    'Llave de paso': ('Plomería', (90, 520)),
+    'Cinta teflón': ('Plomería', (10, 45)),
+    'Pegamento': ('Adhesivos', (18, 160)),
+    'Silicón': ('Adhesivos', (45, 190)),
+    'Cemento': ('Construcción', (180, 320)),
+    'Arena': ('Construcción', (60, 200)),
+    'Guantes': ('Seguridad', (30, 220)),
+    'Lentes de seguridad': ('Seguridad', (45, 260)),
+}
+
+MEDIDAS = ['1/4"', '3/8"', '1/2"', '3/4"', '1"', '2"', '3"', '5m', '10m', '1L', '4L', '19L',
+           '100g', '500g', '1kg', 'chico', 'mediano', 'grande', '#8', '#10', '#12']
+ATRIBUTOS = ['acero', 'cromado', 'galvanizado', 'de latón', 'profesional', 'industrial',
+             'blanco', 'negro', 'rojo', 'gris', 'mango de madera', 'mango de goma',
+             'uso rudo', 'económico', 'reforzado', 'magnético']
+MARCAS = ['Truper', 'Pretul', 'Urrea', 'Surtek', 'Volteck', 'Comex', 'Foset', 'Hermex',
+          'Rotoplas', 'Coflex', 'Fiero', 'Santul']
+PROVEEDORES = ['Ferretería Nacional', 'Herramientas México', 'Pinturas del Norte',
+               'Distribuidora del Bajío', 'Eléctricos del Centro', 'Plomería Industrial']
+
+
+def dimensiones(escala: Optional[str], productos: Optional[int],
+                ventas: Optional[int]) -> Tuple[int, int]:
+    """Resuelve productos y ventas a partir de la escala y los valores explícitos"""
+    base_productos, base_ventas = ESCALAS[escala or 'pequena']
+    return productos or base_productos, ventas if ventas is not None else base_ventas
+
+
+def pesos_zipf(n: int, s: float) -> List[float]:
+    """Pesos acumulados de Zipf para n elementos (para random.choices)"""
+    return list(itertools.accumulate(1.0 / (rango ** s) for rango in range(1, n + 1)))
+
+
+def generar_productos(n: int, rng: random.Random) -> Iterator[Tuple]:
+    """Genera filas de productos listas para INSERT (sin id)"""
+    tipos = list(TIPOS.items())
+    for i in range(n):
+        tipo, (categoria, (minimo, maximo)) = tipos[rng.randrange(len(tipos))]
+        marca = rng.choice(MARCAS)
+        atributo = rng.choice(ATRIBUTOS)
+        nombre = f"{tipo} {atributo} {rng.choice(MEDIDAS)} {marca}"
+        # Precios sesgados hacia el extremo barato del rango
+        precio = round(minimo + (maximo - minimo) * rng.random() ** 2, 2)
+        stock_minimo = rng.choice((5, 10, 10, 15, 20, 30))
+        # Alrededor del 10% de los productos queda en alerta de stock bajo
+        if rng.random() < 0.1:
+            stock = rng.randint(0, stock_minimo)
+        else:
+            stock = rng.randint(stock_minimo + 1, stock_minimo * 20)
+        yield (
+            nombre,
+            f"{tipo} {marca} {atributo}",
+            f"75{i:011d}",
+            precio,
+            stock,
+            stock_minimo,
+            categoria,
+            f"Pasillo {chr(65 + rng.randrange(8))}{rng.randint(1, 12)}",
+            rng.choice(PROVEEDORES),
+        )
+
+
+def generar_ventas(total: int, precios: List[float], dias: int, zipf_s: float,
+                   rng: random.Random, hoy: Optional[datetime.date] = None) -> Iterator[Tuple]:
+    """
+    Genera filas de ventas en orden cronológico
+
+    Args:
+        total: Número de ventas a generar
+        precios: Precio de cada producto (índice = id - 1)
+        dias: Días de historial hacia atrás desde hoy
+        zipf_s: Exponente de la distribución de popularidad
+        rng: Generador aleatorio
+        hoy: Último día del historial (por defecto la fecha actual)
+
+    Yields:
+        (producto_id, usuario_id, cantidad, precio_unitario, total, fecha_venta)
+    """
+    if total <= 0 or not precios:
+        return
+    hoy = hoy or datetime.date.today()
+    inicio = hoy - datetime.timedelta(days=dias - 1)
+
+    # Rango de popularidad -> id de producto
+    ids = list(range(1, len(precios) + 1))
+    rng.shuffle(ids)
+    acumulados = pesos_zipf(len(ids), zipf_s)
+
+    # Reparto por día: fines de semana con más ventas y crecimiento de 50%
+    # a lo largo del periodo
+    factores = []
+    for d in range(dias):
+        fecha = inicio + datetime.timedelta(days=d)
+        semana = 1.4 if fecha.weekday() >= 5 else 1.0
+        factores.append(semana * (1.0 + 0.5 * d / max(1, dias - 1)))
+    suma = sum(factores)
+    por_dia = [int(total * f / suma) for f in factores]
+    por_dia[-1] += total - sum(por_dia)
+
+    for d, cantidad_dia in enumerate(por_dia):
+        if cantidad_dia <= 0:
+            continue
+        fecha = (inicio + datetime.timedelta(days=d)).isoformat()
+        elegidos = rng.choices(ids, cum_weights=acumulados, k=cantidad_dia)
+        segundos = sorted(rng.randrange(8 * 3600, 20 * 3600) for _ in range(cantidad_dia))
+        for producto_id, segundo in zip(elegidos, segundos):
+            # La mayoría de las ventas son de 1 a 3 piezas
+            cantidad = 1 if rng.random() < 0.6 else rng.randint(2, 6 if rng.random() < 0.9 else 50)
+            precio = precios[producto_id - 1]
+            yield (
+                producto_id, 1, cantidad, precio, round(precio * cantidad, 2),
+                f"{fecha} {segundo // 3600:02d}:{segundo // 60 % 60:02d}:{segundo % 60:02d}",
+            )
+
+
+def _lotes(filas: Iterator[Tuple], tamano: int) -> Iterator[List[Tuple]]:
+    """Agrupa filas en listas de hasta 'tamano' elementos"""
+    while True:
+        lote = list(itertools.islice(filas, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def generar_tienda(db_path: str, productos: int, ventas: int, dias: int = DIAS_DEFAULT,
+                   zipf_s: float = ZIPF_S_DEFAULT, semilla: int = SEMILLA_DEFAULT,
+                   hoy: Optional[datetime.date] = None, progreso: bool = False) -> Dict:
+    """
+    Crea una base de datos nueva con una tienda sintética
+
+    Args:
+        db_path: Archivo a crear (se reemplaza si existe)
+        productos: Número de productos
+        ventas: Número de ventas
+        dias: Días de historial
+        zipf_s: Exponente de Zipf para la popularidad
+        semilla: Semilla del generador aleatorio
+        hoy: Último día del historial (por defecto la fecha actual)
+        progreso: Escribe el avance en stderr
+
+    Returns:
+        Metadatos de la generación (también se guardan en la tabla bench_meta)
+    """
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + sufijo):
+            os.remove(db_path + sufijo)
+
+    rng = random.Random(semilla)
+    inicio = time.perf_counter()
+    conn = conectar(db_path)
+    aplicar_migraciones(conn)
+
+    indices_ventas = [paso for version, _, pasos in MIGRACIONES if version == 2
+                      for paso in pasos if 'ON ventas' in paso]
+    with transaccion_escritura(conn):
+        # Carga sin triggers de inserción ni índices de ventas; se
+        # reconstruyen al final en una sola pasada
+        for trigger in ('productos_fts_ai', 'resumen_productos_ai', 'resumen_ventas_ai'):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute("DROP INDEX IF EXISTS idx_ventas_producto_fecha")
+        conn.execute("DROP INDEX IF EXISTS idx_ventas_fecha")
+
+        precios: List[float] = []
+        for lote in _lotes(generar_productos(productos, rng), TAMANO_LOTE):
+            conn.executemany("""
+                INSERT INTO productos
+                (nombre, descripcion, codigo_barras, precio, stock_actual, stock_minimo,
+                 categoria, ubicacion, proveedor)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, lote)
+            precios.extend(fila[3] for fila in lote)
+
+        escritas = 0
+        for lote in _lotes(generar_ventas(ventas, precios, dias, zipf_s, rng, hoy), TAMANO_LOTE):
+            conn.executemany("""
+                INSERT INTO ventas
+                (producto_id, usuario_id, cantidad, precio_unitario, total, fecha_venta)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, lote)
+            escritas += len(lote)
+            if progreso:
+                print(f"\r⏳ Ventas: {escritas:,}/{ventas:,}", end='', file=sys.stderr)
+        if progreso and ventas:
+            print(file=sys.stderr)
+
+        for paso in indices_ventas:
+            conn.execute(paso)
+        for sql in busqueda.SQL_CREAR_INDICE:
+            conn.execute(sql)
+        if busqueda.indice_existe(conn):
+            conn.execute("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+        resumenes.crear_resumenes(conn)
+
+        meta = {
+            'version_generador': VERSION_GENERADOR,
+            'productos': productos,
+            'ventas': ventas,
+            'dias': dias,
+            'zipf_s': zipf_s,
+            'semilla': semilla,
+            'hoy': (hoy or datetime.date.today()).isoformat(),
+        }
+        conn.execute("CREATE TABLE IF NOT EXISTS bench_meta (datos TEXT NOT NULL)")
+        conn.execute("INSERT INTO bench_meta (datos) VALUES (?)", (json.dumps(meta),))
+
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    meta['segundos'] = round(time.perf_counter() - inicio, 2)
+    return meta
+
+
+def leer_meta(db_path: str) -> Optional[Dict]:
+    """Devuelve los metadatos de una base generada, o None si no es una base generada"""
+    if not os.path.exists(db_path):
+        return None
+    conn = conectar(db_path)
+    try:
+        fila = conn.execute("SELECT datos FROM bench_meta").fetchone()
+    except sqlite3.Error:
+        fila = None
+    finally:
+        conn.close()
+    return json.loads(fila[0]) if fila else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='Archivo de base de datos a crear')
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='pequena',
+                        help='Tamaño predefinido (productos/ventas)')
+    parser.add_argument('--productos', type=int, help='Reemplaza el número de productos de la escala')
+    parser.add_argument('--ventas', type=int, help='Reemplaza el número de ventas de la escala')
+    parser.add_argument('--dias', type=int, default=DIAS_DEFAULT, help='Días de historial')
+    parser.add_argument('--zipf', type=float, default=ZIPF_S_DEFAULT,
+                        help='Exponente de Zipf de la popularidad')
+    parser.add_argument('--semilla', type=int, default=SEMILLA_DEFAULT, help='Semilla aleatoria')
+    args = parser.parse_args()
+
+    productos, ventas = dimensiones(args.escala, args.productos, args.ventas)
+    meta = generar_tienda(args.db, productos, ventas, args.dias, args.zipf, args.semilla,
+                          progreso=True)
+    print(json.dumps(meta, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Compara la latencia por comando entre la CLI de un solo uso y el servidor
+persistente (python3 tlapaleria_cli.py servidor).
+
+Mide tres caminos para cada comando de solo lectura:
+    - un_solo_uso: un proceso nuevo de tlapaleria_cli.py por comando
+    - cliente:     un proceso nuevo de tlapaleria_cliente.py por comando
+    - servidor:    la petición por socket desde un proceso ya en ejecución
+
+Uso:
+    python3 benchmarks/latencia_servidor.py --db backend/tlapaleria.db -n 50
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from tlapaleria_cliente import enviar_comando  # noqa: E402
+
+COMANDOS = [
+    ['listar', '--limit', '20'],
+    ['buscar', 'martillo'],
+    ['stock-bajo'],
+    ['estadisticas'],
+]
+
+
+def percentiles(muestras):
+    """Devuelve p50, p99 y promedio en milisegundos"""
+    ordenadas = sorted(muestras)
+    n = len(ordenadas)
+    return {
+        'p50_ms': round(ordenadas[n // 2], 3),
+        'p99_ms': round(ordenadas[min(n - 1, int(n * 0.99))], 3),
+        'promedio_ms': round(sum(ordenadas) / n, 3),
+    }
+
+
+def medir_proceso(argv, repeticiones, entorno=None):
+    """Latencia de lanzar un proceso por comando"""
+    muestras = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=False, cwd=RAIZ, env=entorno)
+        muestras.append((time.perf_counter() - inicio) * 1000)
+    return percentiles(muestras)
+
+
+def medir_servidor(comando, repeticiones, socket_path):
+    """Latencia de una petición al servidor ya iniciado"""
+    muestras = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        enviar_comando(comando, socket_path)
+        muestras.append((time.perf_counter() - inicio) * 1000)
+    return percentiles(muestras)
+
+
+def esperar_socket(socket_path, limite=10.0):
+    """Espera a que el servidor cree el socket"""
+    fin = time.time() + limite
+    while time.time() < fin:
+        if os.path.exists(socket_path):
+            return
+        time.sleep(0.05)
+    raise RuntimeError("El servidor no inició a tiempo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='backend/tlapaleria.db', help='Base de datos a usar')
+    parser.add_argument('-n', type=int, default=30, help='Repeticiones por comando')
+    args = parser.parse_args()
+    db_path = os.path.abspath(args.db)
+
+    socket_path = os.path.join(tempfile.mkdtemp(), 'tlapaleria.sock')
+    servidor = subprocess.Popen(
+        [sys.executable, 'tlapaleria_cli.py', '--db', db_path, 'servidor', '--socket', socket_path],
+        cwd=RAIZ, stdout=subprocess.DEVNULL
+    )
+    entorno = dict(os.environ, TLAPALERIA_SOCKET=socket_path)
+    resultados = {}
+    try:
+        esperar_socket(socket_path)
+        for comando in COMANDOS:
+            nombre = ' '.join(comando)
+            resultados[nombre] = {
+                'un_solo_uso': medir_proceso(
+                    [sys.executable, 'tlapaleria_cli.py', '--db', db_path] + comando, args.n),
+                'cliente': medir_proceso(
+                    [sys.executable, 'tlapaleria_cliente.py', '--db', db_path] + comando,
+                    args.n, entorno),
+                'servidor': medir_servidor(comando, args.n, socket_path),
+            }
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Consultas de stock en una fecha con el libro de movimientos (movimientos.py)
+
+Construye sobre una copia de la tienda sintética una historia de --dias días
+con --cambios cambios de stock por día (pasan por los triggers del libro,
+como cualquier venta o ajuste) y toma una instantánea cada
+--instantanea-cada días. Como todo ocurre en unos segundos, los movimientos
+y las instantáneas de cada día se fechan hacia atrás.
+
+Después mide, para productos y fechas al azar:
+
+    stock_en       última instantánea + movimientos hasta la fecha
+    repeticion     suma de todos los movimientos desde el inicio del libro
+
+y comprueba que ambos den el mismo stock. Por último mide
+verificar-stock sobre todo el catálogo. Termina con código 1 si algún
+resultado no coincide.
+
+Uso:
+    python3 benchmarks/libro_stock.py --escala mediana --dias 365 --cambios 3000
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generar_datos  # noqa: E402
+import movimientos  # noqa: E402
+from conexion_db import conectar, transaccion_escritura  # noqa: E402
+from inicializar_db import aplicar_migraciones  # noqa: E402
+from rendimiento import (DIRECTORIO_DATOS_DEFAULT, commit_actual, copiar_base,  # noqa: E402
+                         percentiles, preparar_datos)
+
+DIAS_DEFAULT = 180
+CAMBIOS_DEFAULT = 2000
+INSTANTANEA_CADA_DEFAULT = 7
+CONSULTAS_DEFAULT = 500
+
+
+def construir_historia(conn, ids, dias: int, cambios: int, cada: int, rng: random.Random) -> Dict:
+    """Aplica los cambios día por día y fecha hacia atrás movimientos e instantáneas"""
+    inicio_historia = datetime.date.today() - datetime.timedelta(days=dias + 1)
+    # La instantánea inicial de la migración es el punto de partida
+    conn.execute("UPDATE stock_instantaneas SET fecha = ?", (f"{inicio_historia} 00:00:00",))
+    conn.commit()
+    ultimo = conn.execute("SELECT COALESCE(MAX(id), 0) FROM movimientos_stock").fetchone()[0]
+    inicio = time.perf_counter()
+    for dia in range(1, dias + 1):
+        fecha = inicio_historia + datetime.timedelta(days=dia)
+        with transaccion_escritura(conn):
+            conn.executemany(
+                "UPDATE productos SET stock_actual = MAX(stock_actual + ?, 0) WHERE id = ?",
+                [(rng.randint(-5, 5) or 1, rng.choice(ids)) for _ in range(cambios)]
+            )
+            conn.execute("UPDATE movimientos_stock SET fecha = ? || ' ' || time(fecha) WHERE id > ?",
+                         (str(fecha), ultimo))
+            ultimo = conn.execute("SELECT MAX(id) FROM movimientos_stock").fetchone()[0]
+            if dia % cada == 0:
+                movimientos.tomar_instantanea(conn)
+                conn.execute("""
+                    UPDATE stock_instantaneas SET fecha = ? || ' 23:59:59'
+                    WHERE fecha > ? || ' 23:59:59'
+                """, (str(fecha), str(fecha)))
+    return {
+        'desde': str(inicio_historia),
+        'movimientos': conn.execute("SELECT COUNT(*) FROM movimientos_stock").fetchone()[0],
+        'instantaneas': conn.execute("SELECT COUNT(*) FROM stock_instantaneas").fetchone()[0],
+        'segundos_construccion': round(time.perf_counter() - inicio, 2),
+    }
+
+
+def repeticion(conn, producto_id: int, fecha: str) -> int:
+    """Stock en una fecha sumando todos los movimientos desde la instantánea inicial"""
+    inicial = conn.execute("""
+        SELECT stock FROM stock_instantaneas WHERE producto_id = ? AND movimiento_id = 0
+    """, (producto_id,)).fetchone()
+    cambio = conn.execute("""
+        SELECT COALESCE(SUM(cambio), 0) FROM movimientos_stock
+        WHERE producto_id = ? AND fecha <= ?
+    """, (producto_id, movimientos.normalizar_fecha(fecha))).fetchone()[0]
+    return (inicial[0] if inicial else 0) + cambio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(generar_datos.ESCALAS), default='pequena',
+                        help='Tamaño de la tienda sintética')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos y de la historia')
+    parser.add_argument('--dias', type=int, default=DIAS_DEFAULT, help='Días de historia')
+    parser.add_argument('--cambios', type=int, default=CAMBIOS_DEFAULT,
+                        help='Cambios de stock por día')
+    parser.add_argument('--instantanea-cada', type=int, default=INSTANTANEA_CADA_DEFAULT,
+                        metavar='DIAS', help='Días entre instantáneas')
+    parser.add_argument('--consultas', type=int, default=CONSULTAS_DEFAULT,
+                        help='Consultas de stock en una fecha a medir')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    args = parser.parse_args()
+
+    productos, ventas = generar_datos.dimensiones(args.escala, None, None)
+    meta = preparar_datos(args.datos, productos, ventas, args.semilla)
+    db_trabajo = meta['db'][:-3] + '.libro.db'
+    rng = random.Random(args.semilla)
+
+    try:
+        copiar_base(meta['db'], db_trabajo)
+        conn = conectar(db_trabajo)
+        aplicar_migraciones(conn)
+        ids = [fila[0] for fila in conn.execute("SELECT id FROM productos")]
+        # Pocos productos muy movidos, como en una tienda real
+        populares = ids[:max(1, len(ids) // 20)]
+        print(f"⏳ Construyendo {args.dias} días de historia", file=sys.stderr)
+        historia = construir_historia(conn, populares, args.dias, args.cambios,
+                                      args.instantanea_cada, rng)
+
+        consultas = []
+        for _ in range(args.consultas):
+            dia = datetime.date.fromisoformat(historia['desde']) + datetime.timedelta(
+                days=rng.randint(1, args.dias))
+            consultas.append((rng.choice(populares), str(dia)))
+
+        tiempos = {'stock_en': [], 'repeticion': []}
+        diferentes = 0
+        for producto_id, fecha in consultas:
+            inicio = time.perf_counter()
+            rapido = movimientos.stock_en(conn, producto_id, fecha)
+            tiempos['stock_en'].append((time.perf_counter() - inicio) * 1000)
+            inicio = time.perf_counter()
+            completo = repeticion(conn, producto_id, fecha)
+            tiempos['repeticion'].append((time.perf_counter() - inicio) * 1000)
+            diferentes += rapido != completo
+
+        inicio = time.perf_counter()
+        discrepancias = movimientos.verificar(conn)
+        segundos_verificar = time.perf_counter() - inicio
+        conn.close()
+    finally:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(db_trabajo + sufijo):
+                os.remove(db_trabajo + sufijo)
+
+    resultado = {
+        'commit': commit_actual(),
+        'datos': {llave: meta[llave] for llave in ('productos', 'ventas', 'semilla')},
+        'historia': historia,
+        'consultas': {nombre: percentiles(muestras) for nombre, muestras in tiempos.items()},
+        'consultas_diferentes': diferentes,
+        'verificar_segundos': round(segundos_verificar, 3),
+        'discrepancias': len(discrepancias),
+    }
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    sys.exit(1 if diferentes or discrepancias else 0)
+
+
+if __name__ == "__main__":
+    main()
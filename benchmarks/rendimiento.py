@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Suite de rendimiento de TlapaleriaCLI sobre una tienda sintética
+
+Genera (o reutiliza) una tienda con benchmarks/generar_datos.py, trabaja
+sobre una copia para que las operaciones de escritura no alteren la base
+original, y mide cada operación de TlapaleriaCLI en el mismo proceso:
+
+    listar, listar_pagina, buscar, escanear, stock_bajo, estadisticas,
+    venta, conteo, agregar, eliminar
+
+conteo concilia (sin aplicar) una sesión de ESCANEOS_CONTEO códigos leída
+de un archivo, así que cada repetición mide la lectura y la conciliación
+completas.
+
+Para cada operación reporta operaciones por segundo y percentiles de
+latencia. El resultado es un JSON con el commit, la versión de Python y
+SQLite, los parámetros de los datos y el pico de memoria (RSS) del proceso.
+Con la misma escala y semilla los resultados de distintos commits son
+comparables; --comparar señala las operaciones que empeoraron y termina
+con código 1 si alguna supera la tolerancia.
+
+Uso:
+    python3 benchmarks/rendimiento.py --escala pequena --salida base.json
+    python3 benchmarks/rendimiento.py --escala pequena --comparar base.json
+    python3 benchmarks/rendimiento.py --escala mediana -n 200 --solo buscar,venta
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generar_datos  # noqa: E402
+import salida  # noqa: E402
+from interfaz_cli import TlapaleriaCLI  # noqa: E402
+
+DIRECTORIO_DATOS_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+
+# Repeticiones medidas por operación (después del calentamiento)
+REPETICIONES_DEFAULT = 100
+CALENTAMIENTO = 3
+
+# Empeoramiento de p50 tolerado por --comparar (0.2 = 20% más lento)
+TOLERANCIA_DEFAULT = 0.2
+
+# Códigos escaneados por la sesión de conteo medida
+ESCANEOS_CONTEO = 100_000
+
+TERMINOS_BUSQUEDA = ['martillo', 'pintura blanca', 'tornillo', 'cable', 'truper', 'llave paso',
+                     'lija', 'codo', 'ferreteria', 'galvanizado', 'mag', 'des']
+
+
+def percentiles(muestras: List[float]) -> Dict[str, float]:
+    """Resume una lista de latencias en milisegundos"""
+    ordenadas = sorted(muestras)
+    n = len(ordenadas)
+
+    def p(fraccion):
+        return round(ordenadas[min(n - 1, int(n * fraccion))], 4)
+
+    total_s = sum(ordenadas) / 1000
+    return {
+        'n': n,
+        'ops_por_s': round(n / total_s, 1) if total_s > 0 else None,
+        'p50_ms': p(0.50),
+        'p90_ms': p(0.90),
+        'p99_ms': p(0.99),
+        'max_ms': round(ordenadas[-1], 4),
+        'promedio_ms': round(sum(ordenadas) / n, 4),
+    }
+
+
+def rss_pico_kib() -> int:
+    """Pico de memoria residente del proceso en KiB"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS lo reporta en bytes, Linux en KiB
+    return pico // 1024 if sys.platform == 'darwin' else pico
+
+
+def commit_actual() -> Optional[str]:
+    """Hash corto del commit de trabajo (con '+' si hay cambios sin confirmar)"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        sucio = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('+' if sucio else '')
+
+
+def preparar_datos(directorio: str, productos: int, ventas: int, semilla: int,
+                   regenerar: bool = False) -> Dict:
+    """
+    Devuelve la ruta y metadatos de una tienda generada, creándola si no existe
+
+    La base se guarda por tamaño y semilla y se reutiliza entre ejecuciones
+    mientras la versión del generador no cambie.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    db_path = os.path.join(directorio, f"tienda_{productos}_{ventas}_{semilla}.db")
+    meta = None if regenerar else generar_datos.leer_meta(db_path)
+    if meta is None or meta.get('version_generador') != generar_datos.VERSION_GENERADOR:
+        print(f"🏗️  Generando {productos:,} productos y {ventas:,} ventas en {db_path}",
+              file=sys.stderr)
+        meta = generar_datos.generar_tienda(db_path, productos, ventas, semilla=semilla,
+                                            progreso=True)
+        print(f"✅ Datos generados en {meta['segundos']} s", file=sys.stderr)
+    meta['db'] = db_path
+    return meta
+
+
+def copiar_base(origen: str, destino: str):
+    """Copia la base generada para trabajar sin modificar la original"""
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(destino + sufijo):
+            os.remove(destino + sufijo)
+    shutil.copyfile(origen, destino)
+
+
+def medir(operacion: Callable[[int], None], repeticiones: int) -> Dict:
+    """Ejecuta una operación con calentamiento y devuelve sus percentiles"""
+    for i in range(CALENTAMIENTO):
+        operacion(i)
+    muestras = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        operacion(CALENTAMIENTO + i)
+        muestras.append((time.perf_counter() - inicio) * 1000)
+    resultado = percentiles(muestras)
+    resultado['rss_pico_kib'] = rss_pico_kib()
+    return resultado
+
+
+def operaciones(cli: TlapaleriaCLI, meta: Dict, rng: random.Random,
+                ruta_escaneos: str) -> Dict[str, Callable[[int], None]]:
+    """Construye las operaciones a medir sobre una CLI ya conectada"""
+    productos = meta['productos']
+    conn = cli.conn
+
+    # Productos más vendidos primero, para que venta y escanear sigan la
+    # misma popularidad que el historial
+    populares = [fila[0] for fila in conn.execute(
+        "SELECT producto_id FROM resumen_productos_vendidos ORDER BY unidades DESC LIMIT 1000"
+    )] or list(range(1, productos + 1))
+    acumulados = generar_datos.pesos_zipf(len(populares), meta['zipf_s'])
+
+    def producto_popular() -> int:
+        return rng.choices(populares, cum_weights=acumulados)[0]
+
+    # Tokens de --after en posiciones al azar del listado
+    tokens = [salida.codificar_cursor(fila) for fila in conn.execute(
+        "SELECT nombre, id FROM productos WHERE id IN (%s)"
+        % ','.join(str(rng.randint(1, productos)) for _ in range(64))
+    )]
+
+    # Sesión de conteo con la misma popularidad que las ventas (con su propio
+    # generador para no alterar la secuencia de las demás operaciones)
+    escaneados = random.Random(meta['semilla']).choices(populares, cum_weights=acumulados,
+                                                        k=ESCANEOS_CONTEO)
+    with open(ruta_escaneos, 'w', encoding='utf-8') as escaneos:
+        escaneos.writelines(f"75{producto_id - 1:011d}\n" for producto_id in escaneados)
+
+    codigos_nuevos: List[str] = []
+
+    def agregar(i):
+        codigo = f"99{i:011d}"
+        cli.agregar_producto(f"Producto de prueba {i}", 10.0, 5, codigo_barras=codigo)
+        codigos_nuevos.append(codigo)
+
+    def eliminar(i):
+        codigo = codigos_nuevos.pop()
+        fila = conn.execute("SELECT id FROM productos WHERE codigo_barras = ?", (codigo,)).fetchone()
+        cli.eliminar_producto(fila[0])
+
+    return {
+        'listar': lambda i: cli.listar_productos(50),
+        'listar_pagina': lambda i: cli.listar_productos(50, tokens[i % len(tokens)]),
+        'buscar': lambda i: cli.buscar_producto(TERMINOS_BUSQUEDA[i % len(TERMINOS_BUSQUEDA)]),
+        'escanear': lambda i: cli.escanear(f"75{producto_popular() - 1:011d}"),
+        'stock_bajo': lambda i: cli.stock_bajo(50),
+        'estadisticas': lambda i: cli.estadisticas(),
+        'venta': lambda i: cli.registrar_venta(producto_popular(), 1),
+        'conteo': lambda i: cli.conteo_fisico(ruta_escaneos, simular=True),
+        # eliminar borra los productos que creó agregar, así que va después
+        'agregar': agregar,
+        'eliminar': eliminar,
+    }
+
+
+def ejecutar_suite(meta: Dict, db_trabajo: str, repeticiones: int,
+                   solo: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Mide cada operación sobre la copia de trabajo"""
+    rng = random.Random(meta['semilla'])
+    resultados = {}
+    with open(os.devnull, 'w') as nulo:
+        with contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+            cli = TlapaleriaCLI(db_trabajo)
+        try:
+            for nombre, operacion in operaciones(cli, meta, rng, db_trabajo + '.escaneos').items():
+                # eliminar necesita los productos que crea agregar
+                if solo and nombre not in solo and not (nombre == 'agregar' and 'eliminar' in solo):
+                    continue
+                with contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+                    resultados[nombre] = medir(operacion, repeticiones)
+                print(f"⏱️  {nombre:<14} p50 {resultados[nombre]['p50_ms']:>9.3f} ms  "
+                      f"p99 {resultados[nombre]['p99_ms']:>9.3f} ms  "
+                      f"{resultados[nombre]['ops_por_s']:>10} ops/s", file=sys.stderr)
+        finally:
+            with contextlib.redirect_stderr(nulo):
+                cli.close()
+            if os.path.exists(db_trabajo + '.escaneos'):
+                os.remove(db_trabajo + '.escaneos')
+    return resultados
+
+
+def comparar(actual: Dict, anterior: Dict, tolerancia: float) -> List[str]:
+    """
+    Compara p50 por operación contra un resultado anterior
+
+    Returns:
+        Lista de regresiones que superan la tolerancia
+    """
+    regresiones = []
+    for nombre, datos in actual['operaciones'].items():
+        previo = anterior.get('operaciones', {}).get(nombre)
+        if not previo or not previo.get('p50_ms'):
+            continue
+        cambio = datos['p50_ms'] / previo['p50_ms'] - 1
+        datos['cambio_p50'] = round(cambio, 3)
+        if cambio > tolerancia:
+            regresiones.append(f"{nombre}: p50 {previo['p50_ms']} ms -> {datos['p50_ms']} ms "
+                               f"(+{cambio:.0%})")
+    if anterior.get('datos', {}).get('productos') != actual['datos']['productos'] or \
+            anterior.get('datos', {}).get('ventas') != actual['datos']['ventas']:
+        print("⚠️  Los resultados comparados usan datos de distinto tamaño", file=sys.stderr)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(generar_datos.ESCALAS), default='pequena',
+                        help='Tamaño de la tienda sintética')
+    parser.add_argument('--productos', type=int, help='Reemplaza el número de productos de la escala')
+    parser.add_argument('--ventas', type=int, help='Reemplaza el número de ventas de la escala')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos y de las operaciones')
+    parser.add_argument('-n', '--repeticiones', type=int, default=REPETICIONES_DEFAULT,
+                        help='Repeticiones medidas por operación')
+    parser.add_argument('--solo', help='Operaciones a medir, separadas por comas')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    parser.add_argument('--regenerar', action='store_true', help='Genera los datos aunque existan')
+    parser.add_argument('--salida', help='Archivo donde guardar el JSON de resultados')
+    parser.add_argument('--comparar', metavar='JSON', help='Resultado anterior contra el cual comparar')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_DEFAULT,
+                        help='Empeoramiento de p50 tolerado por --comparar (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    productos, ventas = generar_datos.dimensiones(args.escala, args.productos, args.ventas)
+    meta = preparar_datos(args.datos, productos, ventas, args.semilla, args.regenerar)
+    db_trabajo = meta['db'][:-3] + '.trabajo.db'
+    copiar_base(meta['db'], db_trabajo)
+    solo = args.solo.split(',') if args.solo else None
+
+    inicio = time.perf_counter()
+    try:
+        operaciones_medidas = ejecutar_suite(meta, db_trabajo, args.repeticiones, solo)
+    finally:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(db_trabajo + sufijo):
+                os.remove(db_trabajo + sufijo)
+
+    resultado = {
+        'commit': commit_actual(),
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'entorno': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'datos': {llave: meta[llave] for llave in
+                  ('productos', 'ventas', 'dias', 'zipf_s', 'semilla', 'version_generador')},
+        'repeticiones': args.repeticiones,
+        'segundos': round(time.perf_counter() - inicio, 2),
+        'rss_pico_kib': rss_pico_kib(),
+        'operaciones': operaciones_medidas,
+    }
+
+    regresiones = []
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            regresiones = comparar(resultado, json.load(archivo), args.tolerancia)
+        resultado['regresiones'] = regresiones
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto + '\n')
+    print(texto)
+
+    for regresion in regresiones:
+        print(f"❌ {regresion}", file=sys.stderr)
+    sys.exit(1 if regresiones else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Escalamiento de los reportes paralelos (python3 tlapaleria_cli.py reporte)
+
+Para cada tipo de reporte mide el cálculo de referencia en un solo proceso y
+la versión paralela con 1, 2, 4, ... procesos hasta el número de CPUs.
+Comprueba que todas las versiones den el mismo resultado y reporta en JSON los
+segundos y la aceleración respecto a la referencia. Termina con código 1 si
+algún resultado difiere.
+
+Uso:
+    python3 benchmarks/generar_datos.py --escala grande --db /tmp/grande.db
+    python3 benchmarks/reportes_paralelos.py --db /tmp/grande.db
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import reportes  # noqa: E402
+from conexion_db import conectar  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='Base de datos a usar')
+    parser.add_argument('--tipos', default=','.join(reportes.TIPOS),
+                        help='Tipos de reporte separados por comas')
+    parser.add_argument('--max-procesos', type=int, default=os.cpu_count() or 1,
+                        help='Máximo de procesos a probar')
+    args = parser.parse_args()
+
+    conn = conectar(args.db, solo_lectura=True)
+    niveles = []
+    procesos = 1
+    while procesos < args.max_procesos:
+        niveles.append(procesos)
+        procesos *= 2
+    niveles.append(args.max_procesos)
+
+    # Todas las particiones se agregan en paralelo aunque la base sea pequeña
+    reportes.VENTAS_MINIMAS_PARALELO = 0
+
+    resultados = {}
+    fallos = []
+    for tipo in args.tipos.split(','):
+        inicio = time.perf_counter()
+        esperadas = reportes.referencia(conn, tipo)
+        referencia_s = time.perf_counter() - inicio
+        medidas = {'referencia_s': round(referencia_s, 3)}
+        for procesos in niveles:
+            resultado = reportes.generar(conn, args.db, tipo, procesos=procesos)
+            medidas[f"{procesos}_procesos"] = {
+                'segundos': resultado['segundos'],
+                'aceleracion': round(referencia_s / resultado['segundos'], 2)
+                if resultado['segundos'] else None,
+            }
+            fallos.extend(f"{tipo} con {procesos} procesos: {error}"
+                          for error in reportes.diferencias(resultado['filas'], esperadas)[:3])
+        resultados[tipo] = medidas
+    total_ventas = conn.execute("SELECT total_ventas FROM resumen_global").fetchone()[0]
+    conn.close()
+
+    print(json.dumps({
+        'cpus': os.cpu_count(),
+        'ventas': total_ventas,
+        'reportes': resultados,
+        'fallos': fallos,
+    }, indent=2, ensure_ascii=False))
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
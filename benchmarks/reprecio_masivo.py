@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Cambios de precio masivos (precios.py) contra cambiar producto por producto
+
+Sobre una copia de una tienda sintética de --productos productos mide:
+
+    reprecio_todos          reprecio de todo el catálogo (un UPDATE)
+    fila_por_fila_todos     el mismo cambio leyendo cada producto y con un
+                            UPDATE por producto, en una transacción
+    reprecio_categoria      reprecio de una categoría
+    transaccion_por_producto  una transacción por producto, como editar
+                            uno a uno (sobre --muestra productos, extrapolado)
+    venta_sin_programados   registrar una venta sin precios programados
+    venta_con_programados   registrar una venta con todo el catálogo programado a futuro
+    primera_venta_vencida   la venta que aplica todo el catálogo programado al vencer
+
+Comprueba que el historial tenga un renglón por cambio, que precio_en
+devuelva el precio anterior en una fecha pasada y que las estadísticas
+materializadas coincidan con el cálculo completo. Termina con código 1 si
+algo no coincide.
+
+Uso:
+    python3 benchmarks/reprecio_masivo.py --productos 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generar_datos  # noqa: E402
+import inventario  # noqa: E402
+import precios  # noqa: E402
+import resumenes  # noqa: E402
+from conexion_db import conectar, transaccion_escritura  # noqa: E402
+from inicializar_db import aplicar_migraciones  # noqa: E402
+from rendimiento import (DIRECTORIO_DATOS_DEFAULT, commit_actual, copiar_base,  # noqa: E402
+                         percentiles, preparar_datos)
+
+PRODUCTOS_DEFAULT = 100_000
+VENTAS_DEFAULT = 100_000
+MUESTRA_DEFAULT = 2_000
+VENTAS_MEDIDAS = 200
+
+
+def medir_ventas(conn, ids, rng, cantidad: int):
+    """Latencias en ms de registrar ventas de una pieza de productos al azar con stock"""
+    latencias = []
+    for _ in range(cantidad):
+        inicio = time.perf_counter()
+        try:
+            inventario.registrar_venta(conn, rng.choice(ids), 1)
+        except inventario.StockInsuficiente:
+            pass
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=PRODUCTOS_DEFAULT,
+                        help='Productos de la tienda sintética')
+    parser.add_argument('--ventas', type=int, default=VENTAS_DEFAULT,
+                        help='Ventas de la tienda sintética')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos y de las ventas')
+    parser.add_argument('--muestra', type=int, default=MUESTRA_DEFAULT,
+                        help='Productos editados con una transacción cada uno')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    args = parser.parse_args()
+
+    meta = preparar_datos(args.datos, args.productos, args.ventas, args.semilla)
+    db_trabajo = meta['db'][:-3] + '.reprecio.db'
+    rng = random.Random(args.semilla)
+    tiempos = {}
+    fallos = []
+
+    try:
+        copiar_base(meta['db'], db_trabajo)
+        conn = conectar(db_trabajo)
+        aplicar_migraciones(conn)
+        ids = [fila[0] for fila in conn.execute("SELECT id FROM productos")]
+        categoria = conn.execute("""
+            SELECT categoria FROM productos GROUP BY categoria ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()[0]
+        fecha_antes = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+        precio_antes = dict(conn.execute("SELECT id, precio FROM productos"))
+        time.sleep(1.1)
+        historial_antes = conn.execute("SELECT COUNT(*) FROM historial_precios").fetchone()[0]
+
+        datos = precios.reprecio(conn, precios.Regla('porcentaje', 5, redondeo=0.5), None)
+        tiempos['reprecio_todos'] = {'productos': datos['productos'],
+                                     'segundos': round(datos['segundos'], 3)}
+        historial = conn.execute("SELECT COUNT(*) FROM historial_precios").fetchone()[0]
+        if historial - historial_antes != datos['productos']:
+            fallos.append(f"historial: {historial - historial_antes} renglones para "
+                          f"{datos['productos']} cambios")
+        for producto_id in rng.sample(ids, 20):
+            if precios.precio_en(conn, producto_id, fecha_antes) != precio_antes[producto_id]:
+                fallos.append(f"precio_en({producto_id}) no devuelve el precio anterior")
+
+        # El mismo cambio a mano: leer, calcular y actualizar cada producto
+        inicio = time.perf_counter()
+        with transaccion_escritura(conn):
+            nuevos = [(round(round(precio * 1.05 / 0.5) * 0.5, 2), producto_id)
+                      for producto_id, precio in conn.execute("SELECT id, precio FROM productos")]
+            conn.executemany("""
+                UPDATE productos SET precio = ?, fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, nuevos)
+        tiempos['fila_por_fila_todos'] = {'productos': len(nuevos),
+                                          'segundos': round(time.perf_counter() - inicio, 3)}
+
+        datos = precios.reprecio(conn, precios.Regla('monto', 1, categoria), None)
+        tiempos['reprecio_categoria'] = {'categoria': categoria, 'productos': datos['productos'],
+                                         'segundos': round(datos['segundos'], 3)}
+
+        muestra = rng.sample(ids, min(args.muestra, len(ids)))
+        inicio = time.perf_counter()
+        for producto_id in muestra:
+            with transaccion_escritura(conn):
+                conn.execute("""
+                    UPDATE productos SET precio = precio + 1, fecha_actualizacion = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (producto_id,))
+        segundos = time.perf_counter() - inicio
+        tiempos['transaccion_por_producto'] = {
+            'productos': len(muestra), 'segundos': round(segundos, 3),
+            'segundos_catalogo_estimado': round(segundos / len(muestra) * len(ids), 1),
+        }
+
+        tiempos['venta_sin_programados'] = percentiles(
+            medir_ventas(conn, ids, rng, VENTAS_MEDIDAS))
+        vigencia = conn.execute("SELECT datetime(CURRENT_TIMESTAMP, '+3 seconds')").fetchone()[0]
+        programado = precios.reprecio(conn, precios.Regla('porcentaje', -5), vigencia)
+        tiempos['programar_todos'] = {'productos': programado['productos'],
+                                      'segundos': round(programado['segundos'], 3)}
+        tiempos['venta_con_programados'] = percentiles(
+            medir_ventas(conn, ids, rng, VENTAS_MEDIDAS))
+        while conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0] < vigencia:
+            time.sleep(0.2)
+        primera = medir_ventas(conn, ids, rng, 1)[0]
+        tiempos['primera_venta_vencida'] = {'productos': programado['productos'],
+                                            'ms': round(primera, 1)}
+        pendientes = conn.execute("SELECT COUNT(*) FROM precios_programados").fetchone()[0]
+        if pendientes:
+            fallos.append(f"{pendientes} precios programados sin aplicar después de vencer")
+
+        fallos.extend(resumenes.verificar(conn))
+        conn.close()
+    finally:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(db_trabajo + sufijo):
+                os.remove(db_trabajo + sufijo)
+
+    resultado = {
+        'commit': commit_actual(),
+        'datos': {llave: meta[llave] for llave in ('productos', 'ventas', 'semilla')},
+        'tiempos': tiempos,
+        'fallos': fallos,
+    }
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Respaldo en línea (respaldos.py) mientras otro proceso registra ventas
+
+Sobre una copia de la tienda sintética, un proceso escritor descuenta stock
+en transacciones cortas sin parar y mide cuánto tarda cada una. En cada fase
+se respalda mientras el escritor trabaja:
+
+    sin_respaldo        el escritor solo, como referencia
+    completo_pasos      respaldo completo de --paginas páginas por paso
+    incremental         respaldo incremental después de las ventas anteriores
+                        (en un solo paso, como lo hace respaldar con WAL)
+    completo_un_paso    respaldo completo copiado en un solo paso
+
+Reporta la velocidad de la copia, el tamaño de cada respaldo, los
+reinicios, y la latencia de las transacciones del escritor (la máxima es la
+peor pausa que vio una venta). Al final restaura el incremental (completo
+más incremental) y el último completo y los verifica; termina con código 1
+si alguna restauración falla.
+
+Uso:
+    python3 benchmarks/respaldo_en_linea.py --escala mediana
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generar_datos  # noqa: E402
+import respaldos  # noqa: E402
+from conexion_db import conectar, transaccion_escritura  # noqa: E402
+from inicializar_db import aplicar_migraciones  # noqa: E402
+from rendimiento import (DIRECTORIO_DATOS_DEFAULT, commit_actual, copiar_base,  # noqa: E402
+                         percentiles, preparar_datos)
+
+SEGUNDOS_REFERENCIA = 3.0
+PAUSA_ESCRITOR_S = 0.002
+
+
+def escritor(db_path, semilla, detener, resultados):
+    """Proceso que descuenta stock en transacciones cortas hasta que se le pide parar"""
+    rng = random.Random(semilla)
+    conn = conectar(db_path)
+    ids = [fila[0] for fila in conn.execute("SELECT id FROM productos")]
+    latencias = []
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        with transaccion_escritura(conn):
+            conn.execute("UPDATE productos SET stock_actual = MAX(stock_actual - 1, 0) WHERE id = ?",
+                         (rng.choice(ids),))
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        time.sleep(PAUSA_ESCRITOR_S)
+    conn.close()
+    resultados.put(latencias)
+
+
+def con_escritor(db_path, semilla, trabajo):
+    """Ejecuta trabajo() con el escritor activo; devuelve (resultado, latencias del escritor)"""
+    detener = multiprocessing.Event()
+    resultados = multiprocessing.Queue()
+    proceso = multiprocessing.Process(target=escritor, args=(db_path, semilla, detener, resultados))
+    proceso.start()
+    time.sleep(0.5)
+    try:
+        resultado = trabajo()
+    finally:
+        detener.set()
+        latencias = resultados.get()
+        proceso.join()
+    return resultado, latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(generar_datos.ESCALAS), default='pequena',
+                        help='Tamaño de la tienda sintética')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos y de las ventas')
+    parser.add_argument('--paginas', type=int, default=respaldos.PAGINAS_POR_PASO,
+                        help='Páginas por paso de la copia')
+    parser.add_argument('--nivel', type=int, default=respaldos.NIVEL_COMPRESION,
+                        help='Nivel de compresión gzip')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    args = parser.parse_args()
+
+    productos, ventas = generar_datos.dimensiones(args.escala, None, None)
+    meta = preparar_datos(args.datos, productos, ventas, args.semilla)
+    db_trabajo = meta['db'][:-3] + '.respaldo.db'
+    directorio = meta['db'][:-3] + '.respaldos'
+    destino = meta['db'][:-3] + '.restaurada.db'
+    fases = {}
+    mb = 1024 * 1024
+
+    try:
+        copiar_base(meta['db'], db_trabajo)
+        conn = conectar(db_trabajo)
+        aplicar_migraciones(conn)
+
+        _, latencias = con_escritor(db_trabajo, args.semilla,
+                                    lambda: time.sleep(SEGUNDOS_REFERENCIA))
+        fases['sin_respaldo'] = {'escritor_ms': percentiles(latencias)}
+
+        for fase, completo, paginas in (('completo_pasos', True, args.paginas),
+                                        ('incremental', False, -1),
+                                        ('completo_un_paso', True, -1)):
+            datos, latencias = con_escritor(
+                db_trabajo, args.semilla + len(fases),
+                lambda: respaldos.respaldar(conn, directorio, completo, paginas, args.nivel))
+            copia = datos['copia']
+            fases[fase] = {
+                'tipo': datos['tipo'],
+                'paginas_escritas': datos['paginas_escritas'],
+                'paginas': datos['paginas'],
+                'mb_comprimidos': round(datos['bytes'] / mb, 3),
+                'nombre': datos['nombre'],
+                'segundos': round(datos['segundos'], 3),
+                'copia_segundos': round(copia['segundos'], 3),
+                'copia_mb_por_s': round(datos['bytes_base'] / mb / copia['segundos'], 1),
+                'pasos': copia['pasos'],
+                'reinicios': copia['reinicios'],
+                'un_paso': copia['un_paso'],
+                'paso_max_ms': round(copia['paso_max_s'] * 1000, 2),
+                'escritor_ms': percentiles(latencias),
+            }
+        conn.close()
+
+        verificacion = {}
+        for fase in ('incremental', 'completo_un_paso'):
+            try:
+                restaurada = respaldos.restaurar(directorio, destino, fases[fase]['nombre'])
+                verificacion[fase] = {'ok': True, 'aplicados': len(restaurada['aplicados']),
+                                      'segundos': round(restaurada['segundos'], 3)}
+            except ValueError as e:
+                verificacion[fase] = {'ok': False, 'error': str(e)}
+            for sufijo in ('', '-wal', '-shm'):
+                if os.path.exists(destino + sufijo):
+                    os.remove(destino + sufijo)
+    finally:
+        for base in (db_trabajo, destino):
+            for sufijo in ('', '-wal', '-shm'):
+                if os.path.exists(base + sufijo):
+                    os.remove(base + sufijo)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    resultado = {
+        'commit': commit_actual(),
+        'datos': {llave: meta[llave] for llave in ('productos', 'ventas', 'semilla')},
+        'paginas_por_paso': args.paginas,
+        'nivel': args.nivel,
+        'fases': fases,
+        'restauracion': verificacion,
+    }
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    sys.exit(0 if all(v['ok'] for v in verificacion.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Consultas de todas las sucursales (sucursales.py) en serie contra en paralelo
+
+Copia la tienda sintética --sucursales veces y mide cada operación del
+Coordinador con un solo hilo (una sucursal tras otra) y con un hilo por
+sucursal:
+
+    existencias   un código de barras al azar
+    buscar        un término de búsqueda
+    stock_bajo    primera página de alertas combinada
+    estadisticas  totales de todas las sucursales
+    reporte       reporte de ventas por categoría del rango completo
+
+Para cada una reporta la sucursal más lenta, la suma de todas (lo que
+tardaría recorrerlas una por una) y las latencias en serie y en paralelo.
+Con pocos núcleos el paralelo no puede bajar de la suma en consultas que
+solo usan CPU. Termina con código 1 si los resultados en serie y en
+paralelo no coinciden o alguna sucursal falla.
+
+Uso:
+    python3 benchmarks/sucursales_paralelo.py --escala mediana --sucursales 4 --rondas 10
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generar_datos  # noqa: E402
+import sucursales  # noqa: E402
+from conexion_db import conectar  # noqa: E402
+from inicializar_db import aplicar_migraciones  # noqa: E402
+from rendimiento import (DIRECTORIO_DATOS_DEFAULT, commit_actual, copiar_base,  # noqa: E402
+                         percentiles, preparar_datos)
+
+SUCURSALES_DEFAULT = 4
+RONDAS_DEFAULT = 5
+TERMINOS = ('cemento', 'tubo', 'pinza', 'cinta', 'codo')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(generar_datos.ESCALAS), default='pequena',
+                        help='Tamaño de la tienda sintética')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos y de las consultas')
+    parser.add_argument('--sucursales', type=int, default=SUCURSALES_DEFAULT,
+                        help='Copias de la tienda, una por sucursal')
+    parser.add_argument('--rondas', type=int, default=RONDAS_DEFAULT, help='Rondas a medir')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    args = parser.parse_args()
+
+    productos, ventas = generar_datos.dimensiones(args.escala, None, None)
+    meta = preparar_datos(args.datos, productos, ventas, args.semilla)
+    rng = random.Random(args.semilla)
+    registradas = [sucursales.Sucursal(f"sucursal_{i}", f"{meta['db'][:-3]}.sucursal_{i}.db")
+                   for i in range(args.sucursales)]
+
+    try:
+        for sucursal in registradas:
+            copiar_base(meta['db'], sucursal.db)
+            # Las migraciones quedan fuera de la medición
+            conn = conectar(sucursal.db)
+            aplicar_migraciones(conn)
+            codigos = [fila[0] for fila in conn.execute(
+                "SELECT codigo_barras FROM productos WHERE codigo_barras IS NOT NULL")]
+            conn.close()
+
+        serie = sucursales.Coordinador(registradas, hilos=1)
+        paralelo = sucursales.Coordinador(registradas)
+        operaciones = {
+            'existencias': lambda c, codigo, _: c.existencias(codigo),
+            'buscar': lambda c, _, termino: c.buscar(termino),
+            'stock_bajo': lambda c, _, __: c.stock_bajo(),
+            'estadisticas': lambda c, _, __: c.estadisticas(),
+            'reporte': lambda c, _, __: c.reporte('categoria'),
+        }
+        tiempos = {nombre: {'mas_lenta': [], 'suma': [], 'serie': [], 'paralelo': []}
+                   for nombre in operaciones}
+        diferentes = 0
+        errores = 0
+        for _ in range(args.rondas):
+            codigo = rng.choice(codigos)
+            termino = rng.choice(TERMINOS)
+            for nombre, operacion in operaciones.items():
+                en_serie = operacion(serie, codigo, termino)
+                en_paralelo = operacion(paralelo, codigo, termino)
+                medidas = tiempos[nombre]
+                medidas['mas_lenta'].append(max(en_paralelo.segundos_por_sucursal.values()) * 1000)
+                medidas['suma'].append(sum(en_serie.segundos_por_sucursal.values()) * 1000)
+                medidas['serie'].append(en_serie.segundos * 1000)
+                medidas['paralelo'].append(en_paralelo.segundos * 1000)
+                diferentes += en_serie.datos != en_paralelo.datos
+                errores += len(en_serie.errores) + len(en_paralelo.errores)
+    finally:
+        for sucursal in registradas:
+            for sufijo in ('', '-wal', '-shm'):
+                if os.path.exists(sucursal.db + sufijo):
+                    os.remove(sucursal.db + sufijo)
+
+    resultado = {
+        'commit': commit_actual(),
+        'datos': {llave: meta[llave] for llave in ('productos', 'ventas', 'semilla')},
+        'sucursales': args.sucursales,
+        'nucleos': os.cpu_count(),
+        'latencias_ms': {nombre: {medida: percentiles(muestras)
+                                  for medida, muestras in medidas.items()}
+                         for nombre, medidas in tiempos.items()},
+        'resultados_diferentes': diferentes,
+        'errores': errores,
+    }
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    sys.exit(1 if diferentes or errores else 0)
+
+
+if __name__ == "__main__":
+    main()
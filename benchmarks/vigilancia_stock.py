@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Lista de alertas de stock bajo (alertas_stock.py) contra recorrer el catálogo
+
+Sobre una copia de la tienda sintética mide:
+
+    pagina_lista       primera página de stock-bajo desde alertas_stock
+    pagina_recorrido   la misma página evaluando el umbral de cada producto
+    completa_lista     todas las alertas desde alertas_stock
+    completa_recorrido todas las alertas evaluando el umbral de cada producto
+    eventos            vigilar: leer los eventos nuevos después de un cambio
+    escritura          --cambios cambios de stock con los triggers de la lista
+    escritura_sin      los mismos cambios en otra copia sin esos triggers
+
+Entre rondas aplica cambios de stock al azar y de vez en cuando cambia el
+umbral de una categoría, y comprueba que la lista, el conteo de
+estadisticas y el recorrido completo coincidan. Termina con código 1 si
+alguno no coincide.
+
+Uso:
+    python3 benchmarks/vigilancia_stock.py --escala mediana --rondas 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import alertas_stock  # noqa: E402
+import generar_datos  # noqa: E402
+from conexion_db import conectar, transaccion_escritura  # noqa: E402
+from inicializar_db import aplicar_migraciones  # noqa: E402
+from rendimiento import (DIRECTORIO_DATOS_DEFAULT, commit_actual, copiar_base,  # noqa: E402
+                         percentiles, preparar_datos)
+
+RONDAS_DEFAULT = 100
+CAMBIOS_DEFAULT = 200
+
+COLUMNAS = ('id', 'nombre', 'stock_actual', 'stock_minimo', 'categoria')
+TAMANO_PAGINA = 50
+
+# Lo mismo que alertas_stock, evaluando el umbral de todo el catálogo
+SQL_RECORRIDO = """
+    SELECT p.id, p.nombre, p.stock_actual,
+           COALESCE(u.stock_minimo, p.stock_minimo) AS umbral, p.categoria
+    FROM productos p LEFT JOIN umbrales_categoria u ON u.categoria = p.categoria
+    WHERE p.stock_actual <= COALESCE(u.stock_minimo, p.stock_minimo)
+    ORDER BY p.stock_actual, p.id
+    LIMIT ?
+"""
+
+TRIGGERS_LISTA = ('alertas_productos_ai', 'alertas_productos_au_entra',
+                  'alertas_productos_au_sale', 'alertas_productos_ad')
+
+
+def cambios_stock(conn, ids, cambios: int, rng: random.Random) -> float:
+    """Aplica cambios chicos de stock, como ventas y surtidos, en una transacción; devuelve los segundos"""
+    parametros = [(rng.randint(-3, 3) or 1, rng.choice(ids)) for _ in range(cambios)]
+    inicio = time.perf_counter()
+    with transaccion_escritura(conn):
+        conn.executemany("UPDATE productos SET stock_actual = MAX(stock_actual + ?, 0) WHERE id = ?",
+                         parametros)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(generar_datos.ESCALAS), default='pequena',
+                        help='Tamaño de la tienda sintética')
+    parser.add_argument('--semilla', type=int, default=generar_datos.SEMILLA_DEFAULT,
+                        help='Semilla de los datos y de los cambios')
+    parser.add_argument('--rondas', type=int, default=RONDAS_DEFAULT, help='Rondas a medir')
+    parser.add_argument('--cambios', type=int, default=CAMBIOS_DEFAULT,
+                        help='Cambios de stock por ronda')
+    parser.add_argument('--datos', default=DIRECTORIO_DATOS_DEFAULT,
+                        help='Directorio donde se guardan las tiendas generadas')
+    args = parser.parse_args()
+
+    productos, ventas = generar_datos.dimensiones(args.escala, None, None)
+    meta = preparar_datos(args.datos, productos, ventas, args.semilla)
+    db_trabajo = meta['db'][:-3] + '.alertas.db'
+    db_sin = meta['db'][:-3] + '.sin_alertas.db'
+    rng = random.Random(args.semilla)
+    rng_sin = random.Random(args.semilla)
+
+    try:
+        copiar_base(meta['db'], db_trabajo)
+        copiar_base(meta['db'], db_sin)
+        conn = conectar(db_trabajo)
+        aplicar_migraciones(conn)
+        sin = conectar(db_sin)
+        aplicar_migraciones(sin)
+        for trigger in TRIGGERS_LISTA:
+            sin.execute(f"DROP TRIGGER {trigger}")
+        sin.commit()
+
+        ids = [fila[0] for fila in conn.execute("SELECT id FROM productos")]
+        categorias = [fila[0] for fila in conn.execute(
+            "SELECT DISTINCT categoria FROM productos WHERE categoria IS NOT NULL")]
+        ultimo = alertas_stock.ultimo_evento(conn)
+
+        tiempos = {nombre: [] for nombre in ('pagina_lista', 'pagina_recorrido', 'completa_lista',
+                                             'completa_recorrido', 'eventos', 'escritura',
+                                             'escritura_sin')}
+        diferentes = 0
+        eventos = 0
+        for ronda in range(args.rondas):
+            tiempos['escritura'].append(cambios_stock(conn, ids, args.cambios, rng) * 1000)
+            tiempos['escritura_sin'].append(cambios_stock(sin, ids, args.cambios, rng_sin) * 1000)
+            if ronda % 10 == 9:
+                with transaccion_escritura(conn):
+                    alertas_stock.fijar_umbral(conn, rng.choice(categorias),
+                                               rng.choice((None, 5, 15, 25)))
+
+            inicio = time.perf_counter()
+            nuevos = alertas_stock.eventos_desde(conn, ultimo)
+            tiempos['eventos'].append((time.perf_counter() - inicio) * 1000)
+            if nuevos:
+                ultimo = nuevos[-1].id
+            eventos += len(nuevos)
+
+            for modo, limite in (('pagina', TAMANO_PAGINA), ('completa', None)):
+                inicio = time.perf_counter()
+                lista = alertas_stock.consultar(conn, limite, None, COLUMNAS).fetchall()
+                tiempos[f"{modo}_lista"].append((time.perf_counter() - inicio) * 1000)
+                inicio = time.perf_counter()
+                recorrido = conn.execute(SQL_RECORRIDO,
+                                         (limite + 1 if limite else -1,)).fetchall()
+                tiempos[f"{modo}_recorrido"].append((time.perf_counter() - inicio) * 1000)
+                diferentes += lista != recorrido
+
+            conteo = conn.execute(
+                "SELECT productos_stock_bajo FROM resumen_global WHERE id = 1").fetchone()[0]
+            diferentes += conteo != len(recorrido)
+
+        alertas = len(lista)
+        conn.close()
+        sin.close()
+    finally:
+        for base in (db_trabajo, db_sin):
+            for sufijo in ('', '-wal', '-shm'):
+                if os.path.exists(base + sufijo):
+                    os.remove(base + sufijo)
+
+    resultado = {
+        'commit': commit_actual(),
+        'datos': {llave: meta[llave] for llave in ('productos', 'ventas', 'semilla')},
+        'alertas_al_final': alertas,
+        'eventos': eventos,
+        'cambios_por_ronda': args.cambios,
+        'latencias_ms': {nombre: percentiles(muestras) for nombre, muestras in tiempos.items()},
+        'rondas_diferentes': diferentes,
+    }
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    sys.exit(1 if diferentes else 0)
+
+
+if __name__ == "__main__":
+    main()
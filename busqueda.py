@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Índice de búsqueda de texto completo (FTS5) para productos
+
+El índice productos_fts es una tabla FTS5 de contenido externo sobre
+productos: no duplica los datos, solo los tokens. Unos triggers sobre
+productos lo mantienen sincronizado, incluso con las escrituras del backend
+de Node. El tokenizador unicode61 con remove_diacritics ignora acentos
+("desármador" encuentra "Desarmador") y cada palabra buscada se trata como
+prefijo ("mart" encuentra "Martillo").
+
+Si el SQLite de Python no incluye FTS5 se usa la búsqueda con LIKE. Con
+FTS5, LIKE (que recorre la tabla completa) solo se intenta cuando el índice
+no puede resolver el término: fragmentos de un código de barras ("0629") o
+palabras más cortas que el índice de prefijos.
+"""
+
+import re
+import sqlite3
+from typing import List, Optional, Tuple
+
+COLUMNAS_RESULTADO = """
+    p.id, p.nombre, p.descripcion, p.codigo_barras, p.precio,
+    p.stock_actual, p.stock_minimo, p.categoria, p.ubicacion, p.proveedor
+"""
+
+# Largo mínimo de palabra del índice de prefijos (prefix='2 3')
+LARGO_MINIMO_PREFIJO = 2
+
+# Pesos de bm25 en el orden de las columnas del índice
+PESOS_BM25 = (10.0, 2.0, 3.0, 1.0, 5.0)
+
+# remove_diacritics=2 también pliega acentos en letras con varios diacríticos,
+# pero solo existe desde SQLite 3.27
+_QUITAR_ACENTOS = 2 if sqlite3.sqlite_version_info >= (3, 27, 0) else 1
+
+SQL_CREAR_INDICE = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+        nombre, descripcion, categoria, proveedor, codigo_barras,
+        content='productos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics {_QUITAR_ACENTOS}',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+        INSERT INTO productos_fts (rowid, nombre, descripcion, categoria, proveedor, codigo_barras)
+        VALUES (new.id, new.nombre, new.descripcion, new.categoria, new.proveedor, new.codigo_barras);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+        INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion, categoria, proveedor, codigo_barras)
+        VALUES ('delete', old.id, old.nombre, old.descripcion, old.categoria, old.proveedor, old.codigo_barras);
+    END
+    """,
+    # Solo se reindexa cuando cambia una columna indexada; las
+    # actualizaciones de stock no tocan el índice
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE OF
+        nombre, descripcion, categoria, proveedor, codigo_barras ON productos
+    BEGIN
+        INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion, categoria, proveedor, codigo_barras)
+        VALUES ('delete', old.id, old.nombre, old.descripcion, old.categoria, old.proveedor, old.codigo_barras);
+        INSERT INTO productos_fts (rowid, nombre, descripcion, categoria, proveedor, codigo_barras)
+        VALUES (new.id, new.nombre, new.descripcion, new.categoria, new.proveedor, new.codigo_barras);
+    END
+    """,
+]
+
+
+def fts5_disponible(conn: sqlite3.Connection) -> bool:
+    """Indica si el SQLite enlazado fue compilado con FTS5"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._prueba_fts5 USING fts5(x)")
+        conn.execute("DROP TABLE temp._prueba_fts5")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def indice_existe(conn: sqlite3.Connection) -> bool:
+    """Indica si la base de datos ya tiene el índice productos_fts"""
+    fila = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_fts'"
+    ).fetchone()
+    return fila is not None
+
+
+def crear_indice(conn: sqlite3.Connection) -> bool:
+    """
+    Crea el índice y sus triggers dentro de la transacción actual
+
+    Returns:
+        True si se creó (o ya existía), False si FTS5 no está disponible
+    """
+    if indice_existe(conn):
+        return True
+    if not fts5_disponible(conn):
+        return False
+    for sql in SQL_CREAR_INDICE:
+        conn.execute(sql)
+    conn.execute("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+    return True
+
+
+def asegurar_indice(conn: sqlite3.Connection) -> bool:
+    """
+    Crea el índice y sus triggers si faltan, llenándolo con los productos actuales
+
+    Returns:
+        True si la búsqueda puede usar FTS5, False si hay que usar LIKE
+    """
+    if indice_existe(conn):
+        return True
+    with conn:
+        return crear_indice(conn)
+
+
+def reconstruir_indice(conn: sqlite3.Connection) -> bool:
+    """
+    Vuelve a generar el índice completo a partir de productos
+
+    Returns:
+        True si se reconstruyó, False si FTS5 no está disponible
+    """
+    if not asegurar_indice(conn):
+        return False
+    with conn:
+        conn.execute("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO productos_fts (productos_fts) VALUES ('optimize')")
+    return True
+
+
+def consulta_fts(termino: str) -> Optional[str]:
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura
+
+    Cada palabra se entrecomilla (para que los operadores de FTS5 no se
+    interpreten) y se busca como prefijo; todas las palabras deben aparecer.
+    """
+    palabras = re.findall(r"\w+", termino, flags=re.UNICODE)
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+
+def requiere_subcadena(termino: str) -> bool:
+    """
+    Indica si el término puede estar a media palabra, donde el índice no llega
+
+    Un término solo de dígitos puede ser un fragmento de código de barras
+    (el índice guarda el código como un solo token) y una palabra más corta
+    que el índice de prefijos casi no filtra.
+    """
+    palabras = re.findall(r"\w+", termino, flags=re.UNICODE)
+    return (all(palabra.isdigit() for palabra in palabras)
+            or any(len(palabra) < LARGO_MINIMO_PREFIJO for palabra in palabras))
+
+
+def _hay_coincidencias(conn: sqlite3.Connection, consulta: str) -> bool:
+    """Indica si la consulta FTS tiene al menos un resultado"""
+    fila = conn.execute(
+        "SELECT 1 FROM productos_fts WHERE productos_fts MATCH ? LIMIT 1", (consulta,)
+    ).fetchone()
+    return fila is not None
+
+
+def buscar(conn: sqlite3.Connection, termino: str, limite: int = 20,
+           desplazamiento: int = 0, usar_fts: bool = True) -> List[Tuple]:
+    """
+    Busca productos ordenados por relevancia
+
+    Args:
+        conn: Conexión abierta
+        termino: Texto a buscar
+        limite: Resultados por página
+        desplazamiento: Resultados a omitir (página * limite)
+        usar_fts: False para forzar la búsqueda con LIKE (por subcadena)
+
+    Returns:
+        Filas (id, nombre, descripcion, codigo_barras, precio, stock_actual,
+        stock_minimo, categoria, ubicacion, proveedor)
+    """
+    consulta = consulta_fts(termino) if usar_fts else None
+    if consulta is not None:
+        pesos = ", ".join(str(p) for p in PESOS_BM25)
+        filas = conn.execute(f"""
+            SELECT {COLUMNAS_RESULTADO}
+            FROM productos_fts
+            JOIN productos p ON p.id = productos_fts.rowid
+            WHERE productos_fts MATCH ?
+            ORDER BY bm25(productos_fts, {pesos}), p.id
+            LIMIT ? OFFSET ?
+        """, (consulta, limite, desplazamiento)).fetchall()
+        if filas or (desplazamiento and _hay_coincidencias(conn, consulta)):
+            return filas
+        # Sin coincidencias por palabra, LIKE solo ayuda con lo que el índice
+        # no resuelve (parte de un código de barras); para el resto sería
+        # recorrer la tabla para no encontrar nada
+        if not requiere_subcadena(termino):
+            return filas
+
+    termino_busqueda = f"%{termino}%"
+    return conn.execute(f"""
+        SELECT {COLUMNAS_RESULTADO}
+        FROM productos p
+        WHERE p.nombre LIKE ? OR p.codigo_barras LIKE ? OR p.descripcion LIKE ?
+        ORDER BY p.nombre, p.id
+        LIMIT ? OFFSET ?
+    """, (termino_busqueda, termino_busqueda, termino_busqueda,
+          limite, desplazamiento)).fetchall()
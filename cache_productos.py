@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Caché de lectura del catálogo para sesiones largas (REPL, servidor, uso como biblioteca)
+
+listar y escanear vuelven a leer las mismas filas de productos una y otra
+vez, y el catálogo cambia muy poco comparado con lo que se lee.
+La caché carga todo el catálogo una vez (un registro compacto con __slots__
+por producto, un diccionario por id y un índice por código de barras) y
+antes de cada lectura comprueba si hubo cambios:
+
+- PRAGMA data_version cambia cuando otra conexión (otra CLI, el servicio o
+  el backend de Node) confirma una escritura; total_changes cambia cuando
+  escribe la propia conexión.
+- Si hubo cambios, solo se vuelven a leer los productos con
+  fecha_actualizacion igual o posterior a la más reciente ya leída (índice
+  idx_productos_actualizacion). Como CURRENT_TIMESTAMP tiene resolución de
+  un segundo, se compara con >= para no perder otro cambio en ese mismo
+  segundo; cuando ese segundo quedó más de MARGEN_ESCRITURA_S atrás ya no
+  puede llegar otro cambio con esa fecha y se compara con >. Un trigger
+  pone la fecha en las actualizaciones que no la cambian (por ejemplo las
+  ventas del backend).
+- Las bajas no dejan fila que leer: si el total de productos de
+  resumen_global no coincide con la caché, se comparan los ids.
+
+Dentro de una transacción abierta la caché no se usa (podría guardar
+cambios que luego se deshacen); quien la llama lee de la base.
+"""
+
+import bisect
+import sqlite3
+import sys
+import time
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import inventario
+import salida
+
+# Migración 9 de inicializar_db
+SQL_CREAR_SEGUIMIENTO = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_productos_actualizacion
+    ON productos (fecha_actualizacion)
+    """,
+    # Solo cuando la fecha quedó igual y no es la de este segundo: los
+    # caminos de la CLI ya la ponen y no pagan un segundo UPDATE
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fecha_actualizacion AFTER UPDATE ON productos
+    WHEN new.fecha_actualizacion IS old.fecha_actualizacion
+     AND old.fecha_actualizacion IS NOT CURRENT_TIMESTAMP
+    BEGIN
+        UPDATE productos SET fecha_actualizacion = CURRENT_TIMESTAMP WHERE id = new.id;
+    END
+    """,
+]
+
+COLUMNAS_CACHE = inventario.COLUMNAS_PRODUCTO + ('fecha_actualizacion',)
+
+_SELECT_CACHE = f"SELECT {', '.join(COLUMNAS_CACHE)} FROM productos"
+
+# Segundos que puede tardar en confirmarse una escritura de productos
+# después de fecharse; pasado ese margen su segundo ya está completo
+MARGEN_ESCRITURA_S = 5
+
+# Columnas con pocos valores distintos: se comparte una sola cadena por valor
+_COLUMNAS_REPETIDAS = ('categoria', 'ubicacion', 'proveedor')
+
+
+class ProductoEnCache:
+    """Fila de productos en memoria; __slots__ evita un diccionario por producto"""
+    __slots__ = COLUMNAS_CACHE
+
+    def __init__(self, fila: Sequence):
+        for columna, valor in zip(COLUMNAS_CACHE, fila):
+            if columna in _COLUMNAS_REPETIDAS and valor is not None:
+                valor = sys.intern(valor)
+            setattr(self, columna, valor)
+
+    def producto(self) -> inventario.Producto:
+        return inventario.Producto(*(getattr(self, c) for c in inventario.COLUMNAS_PRODUCTO))
+
+
+class FilasEnMemoria:
+    """Lo mínimo de un cursor que necesita salida.emitir (fetchmany)"""
+
+    def __init__(self, filas: Iterable[Tuple]):
+        self._filas = iter(filas)
+
+    def fetchmany(self, cantidad: int) -> List[Tuple]:
+        return [fila for _, fila in zip(range(cantidad), self._filas)]
+
+    def fetchall(self) -> List[Tuple]:
+        return list(self._filas)
+
+
+class CacheProductos:
+    """
+    Catálogo completo en memoria, al día con la base antes de cada lectura
+
+    Uso:
+        cache = CacheProductos(conn)
+        producto = cache.por_codigo("7501234567890")
+        cursor = cache.consultar_productos(50, None, columnas)
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self._productos: Dict[int, ProductoEnCache] = {}
+        self._por_codigo: Dict[str, int] = {}
+        self._marca: Optional[str] = None
+        # True si ya no pueden llegar cambios con fecha igual a _marca
+        self._marca_cerrada = False
+        self._data_version = None
+        self._cambios = None
+        # Órdenes para paginar; se reconstruyen al leerlos si quedaron viejos
+        self._orden_nombre: Optional[List[Tuple[str, int]]] = None
+        self.estadisticas = {
+            'lecturas': 0, 'aciertos': 0, 'refrescos': 0, 'filas_releidas': 0,
+            'bajas': 0, 'cargas': 0, 'segundos_carga': 0.0, 'segundos_refresco': 0.0,
+        }
+        self.cargar()
+
+    # --- Carga y refresco ---
+
+    def _version(self) -> Tuple[int, int]:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0], self.conn.total_changes
+
+    @staticmethod
+    def _limite_cerrado() -> str:
+        # Mismo formato que CURRENT_TIMESTAMP (UTC); se calcula antes de leer
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - MARGEN_ESCRITURA_S))
+
+    def cargar(self):
+        """Lee el catálogo completo (también sirve para descartar todo y volver a empezar)"""
+        inicio = time.perf_counter()
+        self._data_version, self._cambios = self._version()
+        limite = self._limite_cerrado()
+        self._productos = {}
+        self._por_codigo = {}
+        self._marca = None
+        self._guardar(self.conn.execute(_SELECT_CACHE))
+        self._marca_cerrada = self._marca is not None and self._marca < limite
+        self._orden_nombre = None
+        self.estadisticas['cargas'] += 1
+        self.estadisticas['segundos_carga'] += time.perf_counter() - inicio
+
+    def _guardar(self, filas: Iterable[Sequence]) -> int:
+        """Reemplaza los productos de las filas; devuelve cuántas filas leyó"""
+        leidas = 0
+        posicion_fecha = len(COLUMNAS_CACHE) - 1
+        for fila in filas:
+            leidas += 1
+            producto = ProductoEnCache(fila)
+            anterior = self._productos.get(producto.id)
+            if anterior is not None:
+                if anterior.codigo_barras is not None:
+                    self._por_codigo.pop(anterior.codigo_barras, None)
+                if anterior.nombre != producto.nombre:
+                    self._orden_nombre = None
+            else:
+                self._orden_nombre = None
+            self._productos[producto.id] = producto
+            if producto.codigo_barras is not None:
+                self._por_codigo[producto.codigo_barras] = producto.id
+            fecha = fila[posicion_fecha]
+            if fecha is not None and (self._marca is None or fecha > self._marca):
+                self._marca = fecha
+        return leidas
+
+    def _quitar_bajas(self):
+        existentes = {fila[0] for fila in self.conn.execute("SELECT id FROM productos")}
+        for producto_id in [i for i in self._productos if i not in existentes]:
+            producto = self._productos.pop(producto_id)
+            if producto.codigo_barras is not None:
+                self._por_codigo.pop(producto.codigo_barras, None)
+            self.estadisticas['bajas'] += 1
+        self._orden_nombre = None
+
+    def vigente(self) -> bool:
+        """
+        Pone la caché al día si la base cambió
+
+        Returns:
+            False si la conexión tiene una transacción abierta: en ese caso
+            hay que leer de la base
+        """
+        if self.conn.in_transaction:
+            return False
+        self.estadisticas['lecturas'] += 1
+        version = self._version()
+        if version == (self._data_version, self._cambios):
+            self.estadisticas['aciertos'] += 1
+            return True
+
+        inicio = time.perf_counter()
+        limite = self._limite_cerrado()
+        if self._marca is None:
+            filas = self.conn.execute(_SELECT_CACHE)
+        else:
+            operador = '>' if self._marca_cerrada else '>='
+            filas = self.conn.execute(f"{_SELECT_CACHE} WHERE fecha_actualizacion {operador} ?",
+                                      (self._marca,))
+        self.estadisticas['filas_releidas'] += self._guardar(filas)
+        self._marca_cerrada = self._marca is not None and self._marca < limite
+        total = self.conn.execute("SELECT total_productos FROM resumen_global WHERE id = 1").fetchone()
+        if total is not None and total[0] != len(self._productos):
+            self._quitar_bajas()
+        # Leer no cambia total_changes: la versión de antes de leer sigue valiendo
+        self._data_version, self._cambios = version
+        self.estadisticas['refrescos'] += 1
+        self.estadisticas['segundos_refresco'] += time.perf_counter() - inicio
+        return True
+
+    # --- Lecturas (llamar después de vigente()) ---
+
+    def producto(self, producto_id: int) -> Optional[ProductoEnCache]:
+        """Producto por ID, o None si no existe"""
+        return self._productos.get(producto_id)
+
+    def por_codigo(self, codigo: str) -> Optional[ProductoEnCache]:
+        """Producto por código de barras exacto, o None si no existe"""
+        producto_id = self._por_codigo.get(codigo)
+        return self._productos.get(producto_id) if producto_id is not None else None
+
+    def consultar_productos(self, limite: int, despues: Optional[str] = None,
+                            columnas: Sequence[str] = inventario.COLUMNAS_PRODUCTO) -> FilasEnMemoria:
+        """
+        Igual que inventario.consultar_productos, desde memoria
+
+        Raises:
+            ValueError: Si el token no es válido
+        """
+        if self._orden_nombre is None:
+            self._orden_nombre = sorted((p.nombre, p.id) for p in self._productos.values())
+        return self._pagina(self._orden_nombre, limite, despues, columnas)
+
+    def _pagina(self, orden: List[Tuple], limite: Optional[int], despues: Optional[str],
+                columnas: Sequence[str]) -> FilasEnMemoria:
+        inicio = 0
+        if despues:
+            inicio = bisect.bisect_right(orden, tuple(salida.decodificar_cursor(despues, 2)))
+        fin = inicio + limite + 1 if limite is not None else len(orden)
+        valores = attrgetter(*columnas)
+        return FilasEnMemoria(valores(self._productos[clave[1]]) for clave in orden[inicio:fin])
+
+    # --- Estado ---
+
+    def bytes_por_producto(self) -> float:
+        """
+        Memoria aproximada por producto: el registro, sus valores no
+        compartidos y su parte de los diccionarios e índices
+        """
+        if not self._productos:
+            return 0.0
+        compartidos = set()
+        total = sys.getsizeof(self._productos) + sys.getsizeof(self._por_codigo)
+        for producto in self._productos.values():
+            total += sys.getsizeof(producto)
+            for columna in COLUMNAS_CACHE:
+                valor = getattr(producto, columna)
+                if valor is None or (isinstance(valor, int) and -5 <= valor <= 256):
+                    continue
+                if columna in _COLUMNAS_REPETIDAS:
+                    if id(valor) in compartidos:
+                        continue
+                    compartidos.add(id(valor))
+                total += sys.getsizeof(valor)
+        if self._orden_nombre:
+            total += sys.getsizeof(self._orden_nombre) + sum(sys.getsizeof(clave)
+                                                             for clave in self._orden_nombre)
+        return total / len(self._productos)
+
+    def resumen(self) -> Dict:
+        """Productos, memoria, tasa de aciertos y tiempos de carga y refresco"""
+        datos = dict(self.estadisticas)
+        datos['productos'] = len(self._productos)
+        datos['codigos'] = len(self._por_codigo)
+        datos['bytes_por_producto'] = round(self.bytes_por_producto(), 1)
+        datos['tasa_aciertos'] = (round(datos['aciertos'] / datos['lecturas'], 4)
+                                  if datos['lecturas'] else None)
+        datos['segundos_carga'] = round(datos['segundos_carga'], 4)
+        datos['segundos_refresco'] = round(datos['segundos_refresco'], 4)
+        return datos
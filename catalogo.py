@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Importación y exportación masiva del catálogo de productos (CSV y JSONL)
+
+Los archivos se procesan como flujos: se leen fila por fila con generadores
+y se escriben en lotes con executemany, una transacción por lote, así que la
+memoria usada depende del tamaño del lote y no del archivo. Las filas
+inválidas se reportan sin detener la importación.
+
+La llave de la importación es codigo_barras: si el código ya existe se
+actualizan solo las columnas presentes en el archivo (por ejemplo, una lista
+de precios con codigo_barras y precio), si no existe se crea el producto.
+"""
+
+import csv
+import io
+import json
+import sqlite3
+import sys
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from conexion_db import transaccion_escritura
+
+TAMANO_LOTE_DEFAULT = 1000
+
+# Nombre aceptado en el archivo -> columna de productos
+ALIAS_COLUMNAS = {
+    'nombre': 'nombre',
+    'descripcion': 'descripcion',
+    'codigo_barras': 'codigo_barras',
+    'codigo': 'codigo_barras',
+    'precio': 'precio',
+    'stock_actual': 'stock_actual',
+    'stock': 'stock_actual',
+    'stock_minimo': 'stock_minimo',
+    'categoria': 'categoria',
+    'ubicacion': 'ubicacion',
+    'proveedor': 'proveedor',
+}
+
+COLUMNAS_EXPORTACION = (
+    'id', 'nombre', 'descripcion', 'codigo_barras', 'precio', 'stock_actual',
+    'stock_minimo', 'categoria', 'ubicacion', 'proveedor', 'fecha_actualizacion',
+)
+
+_CONVERSORES = {
+    'precio': float,
+    'stock_actual': int,
+    'stock_minimo': int,
+}
+
+
+def formato_de(ruta: str, formato: Optional[str] = None) -> str:
+    """Determina el formato ('csv' o 'jsonl') por parámetro o por extensión"""
+    if formato:
+        return formato
+    return 'jsonl' if ruta.lower().endswith(('.jsonl', '.json')) else 'csv'
+
+
+def leer_filas(ruta: str, formato: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+    """
+    Lee un archivo de productos fila por fila
+
+    Yields:
+        Tuplas (número de línea, diccionario con los valores de la fila)
+    """
+    if formato_de(ruta, formato) == 'jsonl':
+        with open(ruta, encoding='utf-8') as archivo:
+            for numero, linea in enumerate(archivo, 1):
+                if not linea.strip():
+                    continue
+                try:
+                    yield numero, json.loads(linea)
+                except json.JSONDecodeError as e:
+                    yield numero, {'_error': f"JSON inválido: {e.msg}"}
+        return
+
+    with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+        # La línea 1 es el encabezado
+        for numero, fila in enumerate(csv.DictReader(archivo), 2):
+            yield numero, fila
+
+
+def normalizar_fila(fila: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Valida una fila y la convierte a columnas de productos
+
+    Returns:
+        (valores, None) si la fila es válida, o (None, mensaje de error)
+    """
+    if not isinstance(fila, dict):
+        return None, "la fila debe ser un objeto"
+    if '_error' in fila:
+        return None, fila['_error']
+
+    valores = {}
+    for llave, valor in fila.items():
+        columna = ALIAS_COLUMNAS.get((llave or '').strip().lower())
+        if columna is None:
+            continue
+        if isinstance(valor, str):
+            valor = valor.strip()
+        # Una celda vacía no modifica el valor actual (ni cambia el default
+        # al crear el producto)
+        if valor is None or valor == '':
+            continue
+        if columna in _CONVERSORES:
+            try:
+                valor = _CONVERSORES[columna](valor)
+            except (TypeError, ValueError):
+                return None, f"{columna} inválido: {valor!r}"
+        valores[columna] = valor
+
+    if valores.get('precio') is not None and valores['precio'] < 0:
+        return None, f"precio negativo: {valores['precio']}"
+    if valores.get('stock_actual') is not None and valores['stock_actual'] < 0:
+        return None, f"stock negativo: {valores['stock_actual']}"
+    if valores.get('codigo_barras') is None:
+        # Sin código de barras no hay llave: solo puede ser un producto nuevo
+        if not valores.get('nombre') or valores.get('precio') is None:
+            return None, "sin codigo_barras, nombre y precio son obligatorios"
+    return valores, None
+
+
+def _lotes(iterable: Iterable, tamano: int) -> Iterator[List]:
+    """Agrupa un iterable en listas de hasta 'tamano' elementos"""
+    iterador = iter(iterable)
+    while True:
+        lote = list(islice(iterador, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def _escribir_lote(conn: sqlite3.Connection, lote: List[Tuple[int, Dict]],
+                   errores: List[Tuple[int, str]]) -> Tuple[int, int]:
+    """
+    Aplica un lote de filas válidas en la transacción actual
+
+    Las filas se agrupan por el conjunto de columnas que traen, para que cada
+    grupo sea un solo executemany.
+
+    Returns:
+        (productos creados, productos actualizados)
+    """
+    codigos = [v['codigo_barras'] for _, v in lote if v.get('codigo_barras')]
+    existentes = set()
+    for inicio in range(0, len(codigos), 500):
+        parte = codigos[inicio:inicio + 500]
+        marcas = ','.join('?' * len(parte))
+        existentes.update(fila[0] for fila in conn.execute(
+            f"SELECT codigo_barras FROM productos WHERE codigo_barras IN ({marcas})", parte
+        ))
+
+    # Se agrupa por (existe, columnas presentes) para que cada grupo sea un
+    # solo executemany: INSERT para los nuevos, UPDATE por código para los
+    # existentes (un INSERT ... ON CONFLICT fallaría por NOT NULL de nombre
+    # antes de llegar al conflicto cuando el archivo solo trae precios)
+    grupos: Dict[Tuple[bool, Tuple[str, ...]], List[Dict]] = {}
+    for numero, valores in lote:
+        existe = valores.get('codigo_barras') in existentes
+        if not existe and (not valores.get('nombre') or valores.get('precio') is None):
+            errores.append((numero, f"código {valores.get('codigo_barras')} no existe "
+                                    f"y faltan nombre o precio para crearlo"))
+            continue
+        grupos.setdefault((existe, tuple(sorted(valores))), []).append(valores)
+
+    creados = actualizados = 0
+    for (existe, columnas), filas in grupos.items():
+        if existe:
+            cambios = [c for c in columnas if c != 'codigo_barras']
+            asignaciones = ''.join(f"{c} = ?, " for c in cambios)
+            conn.executemany(f"""
+                UPDATE productos
+                SET {asignaciones}fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE codigo_barras = ?
+            """, [tuple(v[c] for c in cambios) + (v['codigo_barras'],) for v in filas])
+            actualizados += len(filas)
+        else:
+            conn.executemany(f"""
+                INSERT INTO productos ({', '.join(columnas)})
+                VALUES ({', '.join('?' * len(columnas))})
+            """, [tuple(v[c] for c in columnas) for v in filas])
+            creados += len(filas)
+    return creados, actualizados
+
+
+def importar(conn: sqlite3.Connection, ruta: str, formato: Optional[str] = None,
+             tamano_lote: int = TAMANO_LOTE_DEFAULT,
+             progreso: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Importa productos desde un archivo CSV o JSONL con upsert por codigo_barras
+
+    Args:
+        conn: Conexión abierta
+        ruta: Archivo a importar
+        formato: 'csv' o 'jsonl' (por defecto según la extensión)
+        tamano_lote: Filas por transacción
+        progreso: Función llamada con el resumen parcial después de cada lote
+
+    Returns:
+        Resumen con filas leídas, creados, actualizados, errores [(línea, mensaje)],
+        segundos y filas_por_segundo
+    """
+    resumen = {'filas': 0, 'creados': 0, 'actualizados': 0, 'errores': [],
+               'segundos': 0.0, 'filas_por_segundo': 0.0}
+    inicio = time.perf_counter()
+
+    for lote in _lotes(leer_filas(ruta, formato), max(1, tamano_lote)):
+        validas = []
+        for numero, fila in lote:
+            valores, error = normalizar_fila(fila)
+            if error:
+                resumen['errores'].append((numero, error))
+            else:
+                validas.append((numero, valores))
+        resumen['filas'] += len(lote)
+
+        if validas:
+            # Si se repite un código dentro del lote, gana la última fila
+            por_codigo: Dict[str, Tuple[int, Dict]] = {}
+            sin_codigo = []
+            for numero, valores in validas:
+                if valores.get('codigo_barras'):
+                    por_codigo[valores['codigo_barras']] = (numero, valores)
+                else:
+                    sin_codigo.append((numero, valores))
+            with transaccion_escritura(conn):
+                creados, actualizados = _escribir_lote(
+                    conn, list(por_codigo.values()) + sin_codigo, resumen['errores']
+                )
+            resumen['creados'] += creados
+            resumen['actualizados'] += actualizados
+
+        resumen['segundos'] = time.perf_counter() - inicio
+        if resumen['segundos'] > 0:
+            resumen['filas_por_segundo'] = resumen['filas'] / resumen['segundos']
+        if progreso:
+            progreso(resumen)
+
+    resumen['errores'].sort()
+    return resumen
+
+
+def exportar(conn: sqlite3.Connection, destino: str, formato: Optional[str] = None,
+             tamano_lote: int = TAMANO_LOTE_DEFAULT,
+             progreso: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Exporta el catálogo completo leyendo con fetchmany (sin cargarlo en memoria)
+
+    Args:
+        conn: Conexión abierta
+        destino: Archivo de salida, o '-' para la salida estándar
+        formato: 'csv' o 'jsonl' (por defecto según la extensión)
+        tamano_lote: Filas leídas por cada fetchmany
+        progreso: Función llamada con el resumen parcial después de cada lote
+
+    Returns:
+        Resumen con filas, segundos y filas_por_segundo
+    """
+    formato = formato_de(destino, formato)
+    resumen = {'filas': 0, 'segundos': 0.0, 'filas_por_segundo': 0.0}
+    inicio = time.perf_counter()
+
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(COLUMNAS_EXPORTACION)} FROM productos ORDER BY id")
+
+    if destino == '-':
+        archivo = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='',
+                                   write_through=True)
+    else:
+        archivo = open(destino, 'w', newline='', encoding='utf-8')
+    try:
+        escritor = None
+        if formato == 'csv':
+            escritor = csv.writer(archivo)
+            escritor.writerow(COLUMNAS_EXPORTACION)
+        while True:
+            filas = cursor.fetchmany(max(1, tamano_lote))
+            if not filas:
+                break
+            if escritor is not None:
+                escritor.writerows(filas)
+            else:
+                archivo.writelines(
+                    json.dumps(dict(zip(COLUMNAS_EXPORTACION, fila)), ensure_ascii=False) + '\n'
+                    for fila in filas
+                )
+            resumen['filas'] += len(filas)
+            resumen['segundos'] = time.perf_counter() - inicio
+            if resumen['segundos'] > 0:
+                resumen['filas_por_segundo'] = resumen['filas'] / resumen['segundos']
+            if progreso:
+                progreso(resumen)
+    finally:
+        if destino == '-':
+            archivo.flush()
+            archivo.detach()
+        else:
+            archivo.close()
+        cursor.close()
+    return resumen
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Cola de escrituras agrupadas (group commit) para cambios de stock y ventas
+
+Durante un conteo de inventario llegan miles de correcciones de stock por
+minuto. Escribir cada una en su propia transacción paga por operación el
+bloqueo de escritura, los triggers y las páginas del WAL. Con esta cola las
+operaciones se acumulan y se aplican juntas en una sola transacción cada
+'intervalo_ms' milisegundos o cada 'max_operaciones' operaciones, lo que
+ocurra primero.
+
+Dentro de un lote las operaciones se aplican en orden sobre el stock leído
+una sola vez, y cada producto recibe un solo UPDATE con el resultado final:
+el último stock fijado gana y las ventas posteriores lo descuentan. Cada
+venta conserva su fila en ventas y se rechaza si no alcanza el stock, igual
+que inventario.registrar_venta.
+
+Confirmación durable: antes de aplicar un lote se agrega al diario (un
+archivo JSON por línea) y se hace fsync. La transacción guarda el número del
+último registro aplicado (tabla cola_escrituras_estado), así que al abrir la
+cola se vuelven a aplicar los registros del diario que no alcanzaron a
+confirmarse en SQLite. El Future de cada operación se resuelve cuando su lote
+está en el diario y en la base; una operación confirmada no se pierde aunque
+el proceso o el equipo se caigan. El diario se vacía solo después de un
+checkpoint completo del WAL, que deja los lotes sincronizados en la base.
+Un lote que no se aplicó se anula en el diario; si tampoco se puede anular,
+su Future lo avisa con un OSError.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import inventario
+import perfilado
+import precios
+from conexion_db import conectar, transaccion_escritura
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+INTERVALO_MS_DEFAULT = 20
+MAX_OPERACIONES_DEFAULT = 1000
+
+# Tamaño del diario a partir del cual se intenta un checkpoint para vaciarlo
+DIARIO_MAX_BYTES = 4 * 1024 * 1024
+
+# Migración 6 de inicializar_db
+SQL_CREAR_ESTADO = [
+    """
+    CREATE TABLE IF NOT EXISTS cola_escrituras_estado (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        ultimo_registro INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT OR IGNORE INTO cola_escrituras_estado (id, ultimo_registro) VALUES (1, 0)",
+]
+
+# Operación: (registro, tipo, producto_id, valor, usuario_id); tipo 'stock' fija
+# el stock en valor y tipo 'venta' vende valor unidades
+Operacion = Tuple[int, str, int, int, int]
+
+
+def ruta_diario_default(db_path: str) -> str:
+    """Diario junto a la base principal"""
+    return os.path.splitext(db_path)[0] + '_escrituras.diario'
+
+
+def leer_diario(ruta: str) -> List[Operacion]:
+    """
+    Operaciones registradas en el diario, sin las de lotes anulados
+
+    Una última línea incompleta (caída a mitad de la escritura) se ignora:
+    su lote nunca se confirmó.
+    """
+    if not os.path.exists(ruta):
+        return []
+    operaciones = []
+    anulados = []
+    with open(ruta, encoding='utf-8') as diario:
+        for linea in diario:
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                continue
+            if 'anulado' in registro:
+                anulados.append(tuple(registro['anulado']))
+            else:
+                operaciones.append((registro['n'], registro['op'], registro['producto_id'],
+                                    registro['valor'], registro.get('usuario_id', 1)))
+    return [op for op in operaciones
+            if not any(desde <= op[0] <= hasta for desde, hasta in anulados)]
+
+
+def descartar_linea_incompleta(ruta: str) -> int:
+    """
+    Corta del final del diario una línea sin terminar
+
+    Después de una caída a mitad de una escritura, el siguiente registro se
+    pegaría a esa línea y tampoco se podría leer al recuperar.
+
+    Returns:
+        Bytes descartados
+    """
+    if not os.path.exists(ruta):
+        return 0
+    with open(ruta, 'rb+') as diario:
+        fin = diario.seek(0, os.SEEK_END)
+        corte = fin
+        while corte > 0:
+            inicio = max(0, corte - 4096)
+            diario.seek(inicio)
+            salto = diario.read(corte - inicio).rfind(b'\n')
+            if salto >= 0:
+                corte = inicio + salto + 1
+                break
+            corte = inicio
+        if corte < fin:
+            diario.truncate(corte)
+            diario.flush()
+            os.fsync(diario.fileno())
+    return fin - corte
+
+
+def aplicar_lote(conn: sqlite3.Connection, operaciones: List[Operacion]) -> List:
+    """
+    Aplica un lote en una sola transacción de escritura
+
+    Returns:
+        Un resultado por operación: inventario.Producto (stock), inventario.Venta
+        (venta) o la excepción ErrorInventario que la rechazó
+    """
+    resultados: List = []
+    with transaccion_escritura(conn):
+        precios.al_dia(conn)
+        ids = sorted({op[2] for op in operaciones})
+        productos: Dict[int, list] = {
+            fila[0]: list(fila) for fila in conn.execute(
+                f"SELECT {', '.join(inventario.COLUMNAS_PRODUCTO)} FROM productos "
+                "WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+            )
+        }
+        posicion_stock = inventario.COLUMNAS_PRODUCTO.index('stock_actual')
+        modificados = set()
+        for _registro, tipo, producto_id, valor, usuario_id in operaciones:
+            producto = productos.get(producto_id)
+            if producto is None:
+                resultados.append(inventario.ProductoNoEncontrado(producto_id))
+            elif tipo == 'stock':
+                producto[posicion_stock] = valor
+                modificados.add(producto_id)
+                resultados.append(inventario.Producto(*producto))
+            elif producto[posicion_stock] < valor:
+                resultados.append(inventario.StockInsuficiente(
+                    producto_id, producto[posicion_stock], valor))
+            else:
+                producto[posicion_stock] -= valor
+                modificados.add(producto_id)
+                p = inventario.Producto(*producto)
+                total = p.precio * valor
+                venta_id = conn.execute("""
+                    INSERT INTO ventas (producto_id, usuario_id, cantidad, precio_unitario, total)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (producto_id, usuario_id, valor, p.precio, total)).lastrowid
+                resultados.append(inventario.Venta(venta_id, producto_id, p.nombre, valor,
+                                                   p.precio, total, p.stock_actual))
+
+        # Un solo UPDATE por producto con el stock final del lote
+        conn.executemany("""
+            UPDATE productos
+            SET stock_actual = ?, fecha_actualizacion = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, [(productos[i][posicion_stock], i) for i in sorted(modificados)])
+        conn.execute("UPDATE cola_escrituras_estado SET ultimo_registro = ? WHERE id = 1",
+                     (operaciones[-1][0],))
+    return resultados
+
+
+class ColaEscrituras:
+    """
+    Hilo con su propia conexión que agrupa cambios de stock y ventas
+
+    Uso:
+        cola = ColaEscrituras("backend/tlapaleria.db")
+        futuros = [cola.fijar_stock(producto_id, stock) for producto_id, stock in conteo]
+        productos = [f.result() for f in futuros]
+        cola.cerrar()
+    """
+
+    def __init__(self, db_path: str, diario: Optional[str] = None,
+                 intervalo_ms: int = INTERVALO_MS_DEFAULT,
+                 max_operaciones: int = MAX_OPERACIONES_DEFAULT,
+                 busy_timeout_ms: Optional[int] = None):
+        """
+        Abre la conexión, recupera el diario pendiente e inicia el hilo
+
+        Args:
+            db_path: Ruta al archivo de base de datos SQLite (ya migrada)
+            diario: Archivo del diario (por defecto junto a la base)
+            intervalo_ms: Espera máxima desde la primera operación de un lote
+            max_operaciones: Operaciones que cierran un lote antes del intervalo
+            busy_timeout_ms: Espera máxima por bloqueos de otros procesos
+
+        Raises:
+            sqlite3.Error: Si no se puede abrir la base o aplicar el diario
+        """
+        self.intervalo = max(0, intervalo_ms) / 1000
+        self.max_operaciones = max(1, max_operaciones)
+        self.ruta_diario = diario or ruta_diario_default(db_path)
+        self._cola: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._cerrada = False
+        self.estadisticas = {'lotes': 0, 'operaciones': 0, 'updates': 0, 'recuperadas': 0,
+                             'segundos_aplicando': 0.0}
+
+        # La conexión se abre dentro del hilo, que es su único dueño
+        self._lista = threading.Event()
+        self._error_apertura: Optional[BaseException] = None
+        self._hilo = threading.Thread(target=self._trabajar, args=(db_path, busy_timeout_ms),
+                                      name='cola-escrituras', daemon=True)
+        self._hilo.start()
+        self._lista.wait()
+        if self._error_apertura is not None:
+            self._hilo.join()
+            raise self._error_apertura
+
+    def _recuperar(self) -> int:
+        """Aplica lo que quedó en el diario sin confirmar; devuelve el último registro"""
+        aplicado = self._conn.execute(
+            "SELECT ultimo_registro FROM cola_escrituras_estado WHERE id = 1"
+        ).fetchone()[0]
+        operaciones = leer_diario(self.ruta_diario)
+        pendientes = [op for op in operaciones if op[0] > aplicado]
+        if pendientes:
+            aplicar_lote(self._conn, pendientes)
+            self.estadisticas['recuperadas'] = len(pendientes)
+        self._vaciar_diario(forzar=True)
+        return max([aplicado] + [op[0] for op in operaciones])
+
+    def _encolar(self, tipo: str, producto_id: int, valor: int, usuario_id: int) -> "Future":
+        # inicializar_db importa este módulo en cada comando de la CLI;
+        # concurrent.futures (y logging) solo se carga cuando hay una cola
+        from concurrent.futures import Future
+        if self._cerrada:
+            raise RuntimeError("La cola de escrituras está cerrada")
+        futuro: Future = Future()
+        self._cola.put((futuro, tipo, int(producto_id), int(valor), int(usuario_id)))
+        return futuro
+
+    def fijar_stock(self, producto_id: int, stock: int) -> "Future":
+        """Encola un stock absoluto; el Future da el inventario.Producto resultante"""
+        return self._encolar('stock', producto_id, stock, 0)
+
+    def vender(self, producto_id: int, cantidad: int, usuario_id: int = 1) -> "Future":
+        """Encola una venta; el Future da la inventario.Venta o su ErrorInventario"""
+        if cantidad <= 0:
+            raise inventario.CantidadInvalida(producto_id, cantidad)
+        return self._encolar('venta', producto_id, cantidad, usuario_id)
+
+    def _trabajar(self, db_path: str, busy_timeout_ms: Optional[int]):
+        try:
+            self._conn = conectar(db_path, busy_timeout_ms)
+            try:
+                self._registro = self._recuperar()
+                descartar_linea_incompleta(self.ruta_diario)
+                # Sin búfer de Python: una escritura que falla no debe quedar
+                # pendiente para salir pegada a la siguiente
+                self._diario = open(self.ruta_diario, 'ab', buffering=0)
+                self._linea_abierta = False
+            except BaseException:
+                self._conn.close()
+                raise
+        except BaseException as e:
+            self._error_apertura = e
+            return
+        finally:
+            self._lista.set()
+
+        terminar = False
+        try:
+            while not terminar:
+                primero = self._cola.get()
+                if primero is None:
+                    break
+                lote = [primero]
+                limite = time.monotonic() + self.intervalo
+                while len(lote) < self.max_operaciones:
+                    restante = limite - time.monotonic()
+                    try:
+                        siguiente = (self._cola.get(timeout=restante) if restante > 0
+                                     else self._cola.get_nowait())
+                    except queue.Empty:
+                        break
+                    if siguiente is None:
+                        terminar = True
+                        break
+                    lote.append(siguiente)
+                self._procesar(lote)
+        finally:
+            self._vaciar_diario(forzar=True)
+            self._diario.close()
+            self._conn.close()
+
+    def _procesar(self, lote: List[Tuple]):
+        """Escribe el lote en el diario, lo aplica y resuelve los Future"""
+        activos = [item for item in lote if item[0].set_running_or_notify_cancel()]
+        if not activos:
+            return
+        futuros = [item[0] for item in activos]
+        operaciones = []
+        for _futuro, tipo, producto_id, valor, usuario_id in activos:
+            self._registro += 1
+            operaciones.append((self._registro, tipo, producto_id, valor, usuario_id))
+
+        inicio = time.perf_counter()
+        escrito = False
+        try:
+            self._escribir_diario(
+                {'n': n, 'op': tipo, 'producto_id': p, 'valor': v, 'usuario_id': u}
+                for n, tipo, p, v, u in operaciones
+            )
+            escrito = True
+            with perfilado.comando('lote_escrituras'):
+                resultados = aplicar_lote(self._conn, operaciones)
+        except (sqlite3.Error, OSError) as e:
+            # El lote no se aplicó. Si falló el diario, _escribir_diario ya
+            # quitó lo que alcanzó a escribir; si no pudo, o si el lote está
+            # completo en el diario, se anula para que no se repita al recuperar
+            error = e
+            if escrito or self._linea_abierta:
+                error = self._anular(operaciones, e)
+            for futuro in futuros:
+                futuro.set_exception(error)
+            return
+
+        self.estadisticas['lotes'] += 1
+        self.estadisticas['operaciones'] += len(operaciones)
+        self.estadisticas['updates'] += len({op[2] for op, r in zip(operaciones, resultados)
+                                             if not isinstance(r, Exception)})
+        self.estadisticas['segundos_aplicando'] += time.perf_counter() - inicio
+        for futuro, resultado in zip(futuros, resultados):
+            if isinstance(resultado, Exception):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+        self._vaciar_diario()
+
+    def _anular(self, operaciones: List[Operacion], error: Exception) -> Exception:
+        """
+        Marca en el diario un lote que no se aplicó
+
+        Returns:
+            El error con que se resuelven los Future del lote: el original, o
+            un OSError que avisa que el lote quedó en el diario sin anular
+        """
+        desde, hasta = operaciones[0][0], operaciones[-1][0]
+        try:
+            self._escribir_diario([{'anulado': [desde, hasta]}])
+        except OSError as e:
+            # Al recuperar se aplican los registros posteriores al último
+            # lote confirmado: si la cola confirma otro lote, este ya no se repite
+            aviso = OSError(f"El lote {desde}-{hasta} no se aplicó ({error}) y no se pudo "
+                            f"anular en {self.ruta_diario} ({e}); si no se confirma otro "
+                            f"lote antes de cerrar, se aplicará al recuperar el diario")
+            print(f"❌ {aviso}", file=sys.stderr)
+            return aviso
+        return error
+
+    def _escribir_diario(self, registros):
+        """
+        Agrega registros al diario y hace fsync
+
+        Si la escritura falla, quita lo que alcanzó a escribir; si ni eso se
+        puede, el siguiente registro empieza con un salto de línea para no
+        pegarse a la línea incompleta.
+
+        Raises:
+            OSError: Si no se pudo escribir o sincronizar el diario
+        """
+        texto = ''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in registros)
+        if self._linea_abierta:
+            texto = '\n' + texto
+        datos = memoryview(texto.encode('utf-8'))
+        descriptor = self._diario.fileno()
+        tamano = os.fstat(descriptor).st_size
+        try:
+            while datos:
+                datos = datos[self._diario.write(datos):]
+            os.fsync(descriptor)
+        except OSError:
+            try:
+                os.ftruncate(descriptor, tamano)
+            except OSError:
+                self._linea_abierta = True
+            raise
+        self._linea_abierta = False
+
+    def _vaciar_diario(self, forzar: bool = False):
+        """
+        Vacía el diario cuando todo lo aplicado ya está sincronizado en la base
+
+        Con synchronous=NORMAL una transacción confirmada en el WAL todavía
+        puede perderse en un corte de energía; después de un checkpoint
+        completo ya está en el archivo de la base.
+        """
+        if not os.path.exists(self.ruta_diario):
+            return
+        if not forzar and os.path.getsize(self.ruta_diario) < DIARIO_MAX_BYTES:
+            return
+        ocupado, paginas, copiadas = self._conn.execute(
+            "PRAGMA wal_checkpoint(FULL)").fetchone()
+        if ocupado or (paginas >= 0 and copiadas < paginas):
+            # Hay lectores en un snapshot anterior: se intenta en el siguiente lote
+            return
+        with open(self.ruta_diario, 'r+', encoding='utf-8') as diario:
+            diario.truncate(0)
+            diario.flush()
+            os.fsync(diario.fileno())
+
+    def pendientes(self) -> int:
+        """Operaciones en espera de su lote (aproximado)"""
+        return self._cola.qsize()
+
+    def cerrar(self):
+        """Aplica lo pendiente, vacía el diario y cierra la conexión"""
+        if self._cerrada:
+            return
+        self._cerrada = True
+        self._cola.put(None)
+        self._hilo.join()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Perfil de conexión a SQLite compartido por la CLI y sus herramientas
+
+La base de datos la usan al mismo tiempo la CLI (uno o varios procesos) y el
+backend de Node. Para que no aparezcan errores "database is locked":
+
+- WAL permite que las lecturas continúen mientras alguien escribe.
+- busy_timeout hace que SQLite espere el bloqueo en lugar de fallar de inmediato.
+- Las escrituras empiezan con BEGIN IMMEDIATE: toman el bloqueo de escritura
+  antes de leer, así la verificación de stock y el descuento son atómicos, y
+  si el bloqueo no se obtiene se reintenta con espera exponencial.
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# Espera máxima por el bloqueo de escritura antes de reintentar
+BUSY_TIMEOUT_MS_DEFAULT = int(os.environ.get("TLAPALERIA_BUSY_TIMEOUT_MS", "5000"))
+
+# Reintentos de BEGIN IMMEDIATE después de agotar busy_timeout
+REINTENTOS_ESCRITURA = 5
+ESPERA_INICIAL_S = 0.05
+
+PERFIL_DEFAULT: Dict[str, object] = {
+    'journal_mode': 'WAL',
+    # Con WAL, NORMAL no pierde integridad ante una caída del proceso; solo
+    # las últimas transacciones ante un corte de energía
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negativo: tamaño en KiB (64 MiB)
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Sentencias compiladas que sqlite3 mantiene en caché por conexión
+SENTENCIAS_EN_CACHE = 256
+
+
+def conectar(db_path: str, busy_timeout_ms: Optional[int] = None,
+             perfil: Optional[Dict[str, object]] = None,
+             solo_lectura: bool = False) -> sqlite3.Connection:
+    """
+    Abre una conexión con el perfil de PRAGMAs de la aplicación
+
+    Args:
+        db_path: Ruta al archivo de base de datos SQLite
+        busy_timeout_ms: Espera máxima por bloqueos (por defecto
+                         TLAPALERIA_BUSY_TIMEOUT_MS o 5000)
+        perfil: PRAGMAs que reemplazan a los de PERFIL_DEFAULT
+        solo_lectura: Abre el archivo en modo de solo lectura
+
+    Returns:
+        Conexión configurada (medida por perfilado.py si el perfilado está activo)
+    """
+    if busy_timeout_ms is None:
+        busy_timeout_ms = BUSY_TIMEOUT_MS_DEFAULT
+    ajustes = dict(PERFIL_DEFAULT)
+    ajustes.update(perfil or {})
+    # Solo hay perfilador activo si alguien importó perfilado para activarlo;
+    # así los comandos sin --profile no cargan el módulo
+    perfilado = sys.modules.get('perfilado')
+    fabrica = perfilado.fabrica_conexion() if perfilado is not None else sqlite3.Connection
+
+    if solo_lectura:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True,
+                               timeout=busy_timeout_ms / 1000,
+                               cached_statements=SENTENCIAS_EN_CACHE, factory=fabrica)
+        ajustes.pop('journal_mode', None)
+    else:
+        conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000,
+                               cached_statements=SENTENCIAS_EN_CACHE, factory=fabrica)
+
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    for pragma, valor in ajustes.items():
+        try:
+            conn.execute(f"PRAGMA {pragma} = {valor}")
+        except sqlite3.OperationalError:
+            # journal_mode no puede cambiarse mientras otra conexión tiene
+            # una transacción abierta; el modo WAL queda guardado en el
+            # archivo, así que basta con que lo active una conexión
+            if pragma != 'journal_mode':
+                raise
+    return conn
+
+
+def es_bloqueo(error: sqlite3.Error) -> bool:
+    """Indica si el error se debe a que otra conexión tiene el bloqueo"""
+    mensaje = str(error).lower()
+    return 'locked' in mensaje or 'busy' in mensaje
+
+
+def iniciar_escritura(conn: sqlite3.Connection,
+                      reintentos: int = REINTENTOS_ESCRITURA,
+                      espera_inicial: float = ESPERA_INICIAL_S):
+    """
+    Ejecuta BEGIN IMMEDIATE reintentando con espera exponencial y aleatoria
+
+    Raises:
+        sqlite3.OperationalError: Si el bloqueo no se obtuvo tras los reintentos
+    """
+    intento = 0
+    while True:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if not es_bloqueo(e) or intento >= reintentos:
+                raise
+            time.sleep(espera_inicial * (2 ** intento) * (0.5 + random.random()))
+            intento += 1
+
+
+@contextmanager
+def transaccion_escritura(conn: sqlite3.Connection,
+                          reintentos: int = REINTENTOS_ESCRITURA) -> Iterator[sqlite3.Connection]:
+    """
+    Transacción de escritura: BEGIN IMMEDIATE con reintentos, COMMIT al salir
+    y ROLLBACK si ocurre una excepción
+
+    Uso:
+        with transaccion_escritura(conn):
+            conn.execute("UPDATE ...")
+    """
+    iniciar_escritura(conn, reintentos)
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
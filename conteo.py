@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Conteo físico de inventario: escaneos en flujo y conciliación en un solo paso
+
+Un conteo recibe los códigos de barras escaneados (uno por línea, o
+"CODIGO,CANTIDAD" para cajas contadas a mano) desde un archivo o la entrada
+estándar. Los escaneos se acumulan en un Counter por código conforme se
+leen, así que la memoria depende de los productos distintos contados y no
+del número de escaneos.
+
+La conciliación es un solo paso sobre conjuntos: los códigos acumulados se
+cargan a una tabla temporal, se resuelven a productos con un JOIN y se
+comparan contra productos.stock_actual. La diferencia de cada producto es
+contado - sistema; su valor a precio de venta da la merma (faltantes) y el
+sobrante del conteo.
+
+Al aplicar, la conciliación se repite dentro de la misma transacción que
+ajusta el stock (BEGIN IMMEDIATE): una venta hecha durante el conteo no se
+pierde ni se cuenta dos veces entre la comparación y el ajuste. Cada conteo
+aplicado queda en la tabla conteos y cada ajuste en conteo_ajustes con el
+stock anterior y el contado.
+
+Alcance:
+    contados   Solo los productos escaneados (predeterminado)
+    completo   Todo el catálogo: lo no escaneado se cuenta como 0
+    categoria / ubicacion
+               Un área: sus productos no escaneados se cuentan como 0, y los
+               escaneados de otras áreas se ajustan igual
+"""
+
+import sqlite3
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from conexion_db import transaccion_escritura
+
+# Filas por executemany al cargar los códigos a la tabla temporal
+TAMANO_LOTE_CODIGOS = 5000
+
+# Migración 7 de inicializar_db
+SQL_CREAR_AUDITORIA = [
+    """
+    CREATE TABLE IF NOT EXISTS conteos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
+        usuario_id INTEGER NOT NULL,
+        origen TEXT,
+        alcance TEXT NOT NULL,
+        escaneos INTEGER NOT NULL,
+        productos_contados INTEGER NOT NULL,
+        ajustes INTEGER NOT NULL,
+        unidades_faltantes INTEGER NOT NULL,
+        unidades_sobrantes INTEGER NOT NULL,
+        valor_merma REAL NOT NULL,
+        valor_sobrante REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS conteo_ajustes (
+        conteo_id INTEGER NOT NULL REFERENCES conteos(id),
+        producto_id INTEGER NOT NULL,
+        stock_sistema INTEGER NOT NULL,
+        stock_contado INTEGER NOT NULL,
+        precio_unitario REAL NOT NULL,
+        PRIMARY KEY (conteo_id, producto_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_conteo_ajustes_producto ON conteo_ajustes(producto_id)",
+]
+
+
+class Diferencia(NamedTuple):
+    """Producto cuyo conteo no coincide con el sistema"""
+    producto_id: int
+    nombre: str
+    codigo_barras: Optional[str]
+    stock_sistema: int
+    stock_contado: int
+    diferencia: int
+    precio: float
+    valor: float
+
+
+class Escaneos(NamedTuple):
+    """Escaneos acumulados por código de barras"""
+    cantidades: Counter
+    escaneos: int
+    invalidas: List[Tuple[int, str]]
+
+
+def contar_escaneos(lineas: Iterable[str]) -> Escaneos:
+    """
+    Acumula escaneos línea por línea
+
+    Cada línea es un código de barras (una unidad) o "CODIGO,CANTIDAD" (también
+    con tabulador). Se ignoran las líneas vacías y las que empiezan con '#'.
+
+    Returns:
+        Escaneos con el Counter por código, el total de unidades escaneadas
+        y las líneas inválidas como (número, texto)
+    """
+    cantidades: Counter = Counter()
+    invalidas = []
+    for numero, linea in enumerate(lineas, 1):
+        linea = linea.strip()
+        if not linea or linea[0] == '#':
+            continue
+        if ',' not in linea and '\t' not in linea:
+            cantidades[linea] += 1
+            continue
+        codigo, _, cantidad = linea.replace('\t', ',').partition(',')
+        try:
+            cantidad = int(cantidad)
+        except ValueError:
+            invalidas.append((numero, linea))
+            continue
+        if not codigo.strip() or cantidad < 0:
+            invalidas.append((numero, linea))
+            continue
+        cantidades[codigo.strip()] += cantidad
+    return Escaneos(cantidades, sum(cantidades.values()), invalidas)
+
+
+def _filtro_alcance(alcance: str, valor: Optional[str]) -> Tuple[str, List]:
+    """Condición sobre productos p que define qué productos entran al conteo"""
+    contado = "p.id IN (SELECT producto_id FROM temp.conteo_contado)"
+    if alcance == 'contados':
+        return contado, []
+    if alcance == 'completo':
+        return "1", []
+    if alcance == 'categoria':
+        return f"(p.categoria = ? OR {contado})", [valor]
+    if alcance == 'ubicacion':
+        # Prefijo: 'Pasillo B' incluye 'Pasillo B10'
+        return f"(p.ubicacion LIKE ? || '%' OR {contado})", [valor]
+    raise ValueError(f"Alcance desconocido: {alcance}")
+
+
+def _limpiar(conn: sqlite3.Connection):
+    for tabla in ('conteo_codigos', 'conteo_contado', 'conteo_diferencias'):
+        conn.execute(f"DROP TABLE IF EXISTS temp.{tabla}")
+
+
+def _cargar_escaneos(conn: sqlite3.Connection, cantidades: Counter):
+    """Carga los códigos a tablas temporales y los resuelve a productos con un JOIN"""
+    conn.execute("CREATE TEMP TABLE conteo_codigos (codigo TEXT PRIMARY KEY, cantidad INTEGER NOT NULL)")
+    elementos = iter(cantidades.items())
+    while True:
+        lote = [par for _, par in zip(range(TAMANO_LOTE_CODIGOS), elementos)]
+        if not lote:
+            break
+        conn.executemany("INSERT INTO temp.conteo_codigos (codigo, cantidad) VALUES (?, ?)", lote)
+    conn.execute("""
+        CREATE TEMP TABLE conteo_contado AS
+        SELECT p.id AS producto_id, SUM(c.cantidad) AS contado
+        FROM temp.conteo_codigos c
+        JOIN productos p ON p.codigo_barras = c.codigo
+        GROUP BY p.id
+    """)
+
+
+def _conciliar(conn: sqlite3.Connection, escaneos: Escaneos, alcance: str,
+               valor_alcance: Optional[str]) -> Dict:
+    """Compara lo contado con productos en un solo paso (tablas temporales ya cargadas)"""
+    condicion, parametros = _filtro_alcance(alcance, valor_alcance)
+    conn.execute(f"""
+        CREATE TEMP TABLE conteo_diferencias AS
+        SELECT p.id AS producto_id, p.nombre, p.codigo_barras,
+               p.stock_actual AS stock_sistema,
+               COALESCE(c.contado, 0) AS stock_contado,
+               p.precio
+        FROM productos p
+        LEFT JOIN temp.conteo_contado c ON c.producto_id = p.id
+        WHERE {condicion}
+    """, parametros)
+    # Para el UPDATE por producto al aplicar
+    conn.execute("CREATE UNIQUE INDEX temp.idx_conteo_diferencias ON conteo_diferencias(producto_id)")
+
+    (productos, ajustes, faltantes, sobrantes, merma, sobrante) = conn.execute("""
+        SELECT COUNT(*),
+               COALESCE(SUM(stock_contado != stock_sistema), 0),
+               COALESCE(SUM(MAX(stock_sistema - stock_contado, 0)), 0),
+               COALESCE(SUM(MAX(stock_contado - stock_sistema, 0)), 0),
+               COALESCE(SUM(MAX(stock_sistema - stock_contado, 0) * precio), 0),
+               COALESCE(SUM(MAX(stock_contado - stock_sistema, 0) * precio), 0)
+        FROM temp.conteo_diferencias
+    """).fetchone()
+
+    diferencias = [Diferencia(*fila) for fila in conn.execute("""
+        SELECT producto_id, nombre, codigo_barras, stock_sistema, stock_contado,
+               stock_contado - stock_sistema AS diferencia, precio,
+               ROUND((stock_contado - stock_sistema) * precio, 2) AS valor
+        FROM temp.conteo_diferencias
+        WHERE stock_contado != stock_sistema
+        ORDER BY ABS((stock_contado - stock_sistema) * precio) DESC, producto_id
+    """)]
+
+    desconocidos = conn.execute("""
+        SELECT c.codigo, c.cantidad
+        FROM temp.conteo_codigos c
+        WHERE NOT EXISTS (SELECT 1 FROM productos p WHERE p.codigo_barras = c.codigo)
+        ORDER BY c.cantidad DESC, c.codigo
+    """).fetchall()
+
+    return {
+        'alcance': alcance if valor_alcance is None else f"{alcance}:{valor_alcance}",
+        'escaneos': escaneos.escaneos,
+        'codigos': len(escaneos.cantidades),
+        'lineas_invalidas': escaneos.invalidas,
+        'desconocidos': desconocidos,
+        'productos': productos,
+        'ajustes': ajustes,
+        'unidades_faltantes': faltantes,
+        'unidades_sobrantes': sobrantes,
+        'valor_merma': round(merma, 2),
+        'valor_sobrante': round(sobrante, 2),
+        'diferencias': diferencias,
+        'conteo_id': None,
+    }
+
+
+def conciliar(conn: sqlite3.Connection, escaneos: Escaneos, alcance: str = 'contados',
+              valor_alcance: Optional[str] = None) -> Dict:
+    """
+    Calcula las diferencias del conteo sin modificar el inventario
+
+    Args:
+        escaneos: Resultado de contar_escaneos
+        alcance: 'contados', 'completo', 'categoria' o 'ubicacion'
+        valor_alcance: Categoría o prefijo de ubicación del área contada
+
+    Returns:
+        Resumen con totales, 'diferencias' (lista de Diferencia, las de mayor
+        valor primero) y 'desconocidos' (códigos sin producto)
+
+    Raises:
+        ValueError: Si el alcance no es válido
+    """
+    inicio = time.perf_counter()
+    _filtro_alcance(alcance, valor_alcance)
+    _limpiar(conn)
+    # Una transacción de lectura: todas las consultas ven el mismo stock
+    conn.execute("BEGIN")
+    try:
+        _cargar_escaneos(conn, escaneos.cantidades)
+        resumen = _conciliar(conn, escaneos, alcance, valor_alcance)
+    finally:
+        conn.rollback()
+        _limpiar(conn)
+    resumen['segundos'] = time.perf_counter() - inicio
+    return resumen
+
+
+def aplicar(conn: sqlite3.Connection, escaneos: Escaneos, alcance: str = 'contados',
+            valor_alcance: Optional[str] = None, usuario_id: int = 1,
+            origen: Optional[str] = None) -> Dict:
+    """
+    Concilia y ajusta el stock de todas las diferencias en una transacción
+
+    Registra el conteo en conteos y cada ajuste en conteo_ajustes. Los
+    argumentos y el resumen son los de conciliar; el resumen agrega
+    'conteo_id'.
+
+    Raises:
+        ValueError: Si el alcance no es válido
+    """
+    inicio = time.perf_counter()
+    _filtro_alcance(alcance, valor_alcance)
+    _limpiar(conn)
+    try:
+        with transaccion_escritura(conn):
+            _cargar_escaneos(conn, escaneos.cantidades)
+            resumen = _conciliar(conn, escaneos, alcance, valor_alcance)
+            resumen['conteo_id'] = conn.execute("""
+                INSERT INTO conteos
+                (usuario_id, origen, alcance, escaneos, productos_contados, ajustes,
+                 unidades_faltantes, unidades_sobrantes, valor_merma, valor_sobrante)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (usuario_id, origen, resumen['alcance'], resumen['escaneos'], resumen['productos'],
+                  resumen['ajustes'], resumen['unidades_faltantes'], resumen['unidades_sobrantes'],
+                  resumen['valor_merma'], resumen['valor_sobrante'])).lastrowid
+            conn.execute("""
+                INSERT INTO conteo_ajustes
+                (conteo_id, producto_id, stock_sistema, stock_contado, precio_unitario)
+                SELECT ?, producto_id, stock_sistema, stock_contado, precio
+                FROM temp.conteo_diferencias
+                WHERE stock_contado != stock_sistema
+            """, (resumen['conteo_id'],))
+            conn.execute("""
+                UPDATE productos
+                SET stock_actual = (SELECT d.stock_contado FROM temp.conteo_diferencias d
+                                    WHERE d.producto_id = productos.id),
+                    fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE id IN (SELECT producto_id FROM temp.conteo_diferencias
+                             WHERE stock_contado != stock_sistema)
+            """)
+    finally:
+        _limpiar(conn)
+    resumen['segundos'] = time.perf_counter() - inicio
+    return resumen
@@ -5,25 +5,41 @@ Autor: Iyari Cancino Gomez
 Cliente: Jesús Morán
 """
 
+import argparse
+import importlib
 import sqlite3
 import os
+import sys
+from typing import Callable, List, Tuple, Union
 
+from conexion_db import conectar, iniciar_escritura
 
-def inicializar_base_datos():
-    """Crea la base de datos y las tablas necesarias"""
-    
-    # Crear directorio backend si no existe
-    os.makedirs('backend', exist_ok=True)
-    
-    db_path = 'backend/tlapaleria.db'
-    
-    print("🔧 Inicializando base de datos...")
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Crear tabla de productos
-    cursor.execute('''
+
+def _paso(modulo: str, nombre: str) -> Callable[[sqlite3.Connection], None]:
+    """
+    Paso de migración definido en otro módulo, que se importa al aplicarlo
+
+    El valor es una función que recibe la conexión o una lista de sentencias
+    SQL. Con el esquema al día ningún módulo se importa, así abrir la base no
+    carga búsqueda, resúmenes, archivo, etc. en cada comando.
+    """
+    def aplicar(conn: sqlite3.Connection):
+        valor = getattr(importlib.import_module(modulo), nombre)
+        if callable(valor):
+            valor(conn)
+        else:
+            for sql in valor:
+                conn.execute(sql)
+    return aplicar
+
+
+# Migraciones del esquema, en orden. Cada una se aplica una sola vez y el
+# número de la última aplicada se guarda en PRAGMA user_version. Todas usan
+# IF NOT EXISTS para convivir con las tablas que crea el backend de Node.
+# Nunca se modifica una migración ya publicada: se agrega una nueva.
+MIGRACIONES: List[Tuple[int, str, List[Union[str, Callable]]]] = [
+    (1, "Tablas base", [
+        """
         CREATE TABLE IF NOT EXISTS productos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             nombre TEXT NOT NULL,
@@ -38,10 +54,8 @@ def inicializar_base_datos():
             fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
             fecha_actualizacion DATETIME DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
-    
-    # Crear tabla de ventas
-    cursor.execute('''
+        """,
+        """
         CREATE TABLE IF NOT EXISTS ventas (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             producto_id INTEGER NOT NULL,
@@ -52,10 +66,9 @@ def inicializar_base_datos():
             fecha_venta DATETIME DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (producto_id) REFERENCES productos(id)
         )
-    ''')
-    
-    # Crear tabla de usuarios (para compatibilidad)
-    cursor.execute('''
+        """,
+        # Tabla de usuarios (para compatibilidad)
+        """
         CREATE TABLE IF NOT EXISTS usuarios (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             google_id TEXT UNIQUE,
@@ -65,9 +78,172 @@ def inicializar_base_datos():
             rol TEXT DEFAULT 'trabajador',
             fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
+        """,
+    ]),
+    (2, "Índices de consulta", [
+        # Ventas por producto (eliminar, producto más vendido, reportes por
+        # producto y rango de fechas); incluye cantidad y total para no leer la tabla
+        """
+        CREATE INDEX IF NOT EXISTS idx_ventas_producto_fecha
+        ON ventas (producto_id, fecha_venta, cantidad, total)
+        """,
+        # Reportes por rango de fechas
+        """
+        CREATE INDEX IF NOT EXISTS idx_ventas_fecha
+        ON ventas (fecha_venta, producto_id, cantidad, total)
+        """,
+        # listar ordena por nombre
+        "CREATE INDEX IF NOT EXISTS idx_productos_nombre ON productos (nombre)",
+        # Índice parcial: solo contiene los productos en alerta de stock bajo
+        """
+        CREATE INDEX IF NOT EXISTS idx_productos_stock_bajo
+        ON productos (stock_actual)
+        WHERE stock_actual <= stock_minimo
+        """,
+    ]),
+    (3, "Índice de búsqueda de texto completo", [_paso("busqueda", "crear_indice")]),
+    (4, "Estadísticas materializadas", [_paso("resumenes", "crear_resumenes")]),
+    (5, "Acumulados mensuales de ventas archivadas", [_paso("archivo", "crear_acumulados")]),
+    (6, "Estado de la cola de escrituras agrupadas", [_paso("cola_escrituras", "SQL_CREAR_ESTADO")]),
+    (7, "Auditoría de conteos físicos", [_paso("conteo", "SQL_CREAR_AUDITORIA")]),
+    (8, "Libro de movimientos de stock", [_paso("movimientos", "SQL_CREAR_LIBRO")]),
+    (9, "Seguimiento de productos modificados", [_paso("cache_productos", "SQL_CREAR_SEGUIMIENTO")]),
+    (10, "Lista de alertas de stock bajo",
+     [_paso("alertas_stock", "crear_alertas"), _paso("resumenes", "separar_stock_bajo")]),
+    (11, "Historial y programación de precios", [_paso("precios", "SQL_CREAR_PRECIOS")]),
+]
+
+
+def version_esquema(conn: sqlite3.Connection) -> int:
+    """Devuelve la versión del esquema guardada en PRAGMA user_version"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def aplicar_migraciones(conn: sqlite3.Connection) -> int:
+    """
+    Aplica las migraciones pendientes, cada una en su propia transacción
+
+    Es seguro llamarla en cada inicio: si el esquema está al día solo lee
+    PRAGMA user_version. Si dos procesos inician a la vez, BEGIN IMMEDIATE
+    hace que el segundo espere y vuelva a leer la versión.
+
+    Returns:
+        Número de migraciones aplicadas
+    """
+    ultima = MIGRACIONES[-1][0]
+    if version_esquema(conn) >= ultima:
+        return 0
+
+    aplicadas = 0
+    for version, _descripcion, pasos in MIGRACIONES:
+        iniciar_escritura(conn)
+        try:
+            if version_esquema(conn) >= version:
+                conn.rollback()
+                continue
+            for paso in pasos:
+                if callable(paso):
+                    paso(conn)
+                else:
+                    conn.execute(paso)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            aplicadas += 1
+        except BaseException:
+            conn.rollback()
+            raise
+    return aplicadas
+
+
+# Consultas críticas y el índice que deben usar. verificar_planes() falla si
+# alguna vuelve a recorrer la tabla completa.
+PLANES_ESPERADOS = [
+    ("listar ordena por nombre",
+     "SELECT id, nombre FROM productos ORDER BY nombre, id LIMIT 50",
+     "idx_productos_nombre"),
+    ("listar página siguiente (--after)",
+     """SELECT id, nombre FROM productos
+        WHERE (nombre, id) > ('Martillo', 1) ORDER BY nombre, id LIMIT 50""",
+     "idx_productos_nombre"),
+    ("stock-bajo",
+     """SELECT a.producto_id, p.nombre, a.stock_actual, a.umbral
+        FROM alertas_stock a CROSS JOIN productos p ON p.id = a.producto_id
+        ORDER BY a.stock_actual, a.producto_id""",
+     "idx_alertas_stock_orden"),
+    ("stock-bajo página siguiente (--after)",
+     """SELECT a.producto_id, p.nombre, a.stock_actual, a.umbral
+        FROM alertas_stock a CROSS JOIN productos p ON p.id = a.producto_id
+        WHERE (a.stock_actual, a.producto_id) > (3, 10)
+        ORDER BY a.stock_actual, a.producto_id""",
+     "idx_alertas_stock_orden"),
+    # Alertas del backend de Node (sin umbrales por categoría)
+    ("stock bajo por stock_minimo",
+     "SELECT COUNT(*) FROM productos WHERE stock_actual <= stock_minimo",
+     "idx_productos_stock_bajo"),
+    ("ventas de un producto",
+     "SELECT COUNT(*) FROM ventas WHERE producto_id = 1",
+     "idx_ventas_producto_fecha"),
+    ("ventas de un producto en un rango de fechas",
+     """SELECT SUM(cantidad) FROM ventas
+        WHERE producto_id = 1 AND fecha_venta >= '2024-01-01' AND fecha_venta < '2024-02-01'""",
+     "idx_ventas_producto_fecha"),
+    ("ventas en un rango de fechas",
+     """SELECT SUM(total) FROM ventas
+        WHERE fecha_venta >= '2024-01-01' AND fecha_venta < '2024-02-01'""",
+     "idx_ventas_fecha"),
+    ("producto más vendido",
+     """SELECT producto_id, SUM(cantidad) AS total_vendido FROM ventas
+        GROUP BY producto_id ORDER BY total_vendido DESC LIMIT 1""",
+     "idx_ventas_producto_fecha"),
+    ("precios programados vencidos",
+     "SELECT 1 FROM precios_programados WHERE vigente_desde <= '2024-01-01 00:00:00' LIMIT 1",
+     "idx_precios_programados_vigencia"),
+    ("historial de precios de un producto",
+     """SELECT precio FROM historial_precios WHERE producto_id = 1 AND fecha <= '2024-01-01'
+        ORDER BY fecha DESC, id DESC LIMIT 1""",
+     "idx_historial_precios_producto"),
+    ("refresco de la caché de productos",
+     "SELECT id, nombre FROM productos WHERE fecha_actualizacion >= '2024-01-01 00:00:00'",
+     "idx_productos_actualizacion"),
+]
+
+
+def plan_consulta(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """Devuelve las líneas de EXPLAIN QUERY PLAN de una consulta"""
+    return [fila[-1] for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def verificar_planes(conn: sqlite3.Connection) -> List[str]:
+    """
+    Comprueba que las consultas críticas usan sus índices
+
+    Returns:
+        Lista de fallos (vacía si todos los planes son correctos)
+    """
+    fallos = []
+    for descripcion, sql, indice in PLANES_ESPERADOS:
+        plan = plan_consulta(conn, sql)
+        if not any(indice in paso for paso in plan):
+            fallos.append(f"{descripcion}: se esperaba {indice}, plan: {' | '.join(plan)}")
+    return fallos
+
+
+def inicializar_base_datos():
+    """Crea la base de datos y las tablas necesarias"""
     
-    conn.commit()
+    # Crear directorio backend si no existe
+    os.makedirs('backend', exist_ok=True)
+    
+    db_path = 'backend/tlapaleria.db'
+    
+    print("🔧 Inicializando base de datos...")
+    
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    
+    aplicados = aplicar_migraciones(conn)
+    if aplicados:
+        print(f"🧱 Migraciones aplicadas: {aplicados} (versión {version_esquema(conn)})")
     
     # Verificar si ya hay productos
     cursor.execute('SELECT COUNT(*) FROM productos')
@@ -119,5 +295,30 @@ def inicializar_base_datos():
     print("   python3 tlapaleria_cli.py estadisticas")
 
 
+def main():
+    """Inicializa la base de datos o verifica los planes de consulta"""
+    parser = argparse.ArgumentParser(description="Inicializa la base de datos de la tlapalería")
+    parser.add_argument('--verificar-planes', metavar='DB',
+                        help='Aplica las migraciones a DB y verifica que las consultas usen índices')
+    args = parser.parse_args()
+
+    if not args.verificar_planes:
+        inicializar_base_datos()
+        return
+
+    conn = sqlite3.connect(args.verificar_planes)
+    try:
+        aplicar_migraciones(conn)
+        fallos = verificar_planes(conn)
+    finally:
+        conn.close()
+
+    for fallo in fallos:
+        print(f"❌ {fallo}")
+    if fallos:
+        sys.exit(1)
+    print(f"✅ {len(PLANES_ESPERADOS)} consultas usan sus índices")
+
+
 if __name__ == "__main__":
-    inicializar_base_datos()
+    main()
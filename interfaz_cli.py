@@ -0,0 +1,2490 @@
+#!/usr/bin/env python3
+"""
+Tlapalería CLI - Herramienta de línea de comandos para gestionar la tlapalería
+Autor: Iyari Cancino Gomez
+Cliente: Jesús Morán
+Versión: 1.0.0
+
+Implementación de la CLI: la clase TlapaleriaCLI, el registro de
+subcomandos (COMANDOS) y el parser. El punto de entrada es tlapaleria_cli.py.
+"""
+
+import sqlite3
+import sys
+import os
+import csv
+import json
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime
+from typing import (TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, NamedTuple,
+                    Tuple, Optional)
+import argparse
+
+# Solo lo que usan venta y escanear se importa aquí; los módulos de cada
+# subcomando (catálogo, reportes, sucursales, perfilado...) se importan en su
+# manejador, igual que pronostico, respaldos y servicio
+import inventario
+import salida
+from conexion_db import conectar, iniciar_escritura, transaccion_escritura
+from inicializar_db import aplicar_migraciones
+
+if TYPE_CHECKING:
+    import cache_productos
+    import perfilado
+    import precios
+    import sucursales
+
+
+DB_PATH_DEFAULT = os.environ.get("TLAPALERIA_DB", "backend/tlapaleria.db")
+SOCKET_PATH_DEFAULT = os.environ.get("TLAPALERIA_SOCKET", "/tmp/tlapaleria.sock")
+SOCKET_SERVICIO_DEFAULT = os.environ.get("TLAPALERIA_SERVICIO_SOCKET", "/tmp/tlapaleria_servicio.sock")
+
+# Productos escaneados recientemente que se conservan en memoria
+TAMANO_CACHE_ESCANEO = 1024
+
+
+def leer_tickets(ruta: str) -> Iterator[Dict]:
+    """
+    Lee tickets de venta desde un archivo CSV o JSONL sin cargarlo completo
+
+    CSV: columnas ticket, producto_id, cantidad y opcionalmente usuario_id.
+    Las filas consecutivas con el mismo ticket forman un solo ticket.
+    JSONL: un objeto por línea con "lineas" (lista de objetos con
+    producto_id y cantidad), y opcionalmente "ticket" y "usuario_id".
+
+    Una fila inválida (JSON roto, un valor que no es entero, una celda
+    vacía) no detiene la lectura: su ticket se entrega con 'error' para que
+    registrar_venta_lote lo rechace completo. El archivo se abre, y en CSV se
+    revisa el encabezado, al llamar la función y no al iterar.
+
+    Args:
+        ruta: Ruta al archivo .csv o .jsonl
+
+    Yields:
+        Diccionarios con las llaves ticket, usuario_id, lineas y linea (número
+        de línea en el archivo), más error si el ticket es inválido
+
+    Raises:
+        OSError: Si el archivo no se puede abrir
+        ValueError: Si al CSV le faltan las columnas producto_id o cantidad
+    """
+    import catalogo
+    # Bytes que no son UTF-8 dejan un valor inválido en su fila en lugar de
+    # interrumpir la lectura a la mitad del archivo
+    if catalogo.formato_de(ruta) == 'jsonl':
+        return _tickets_jsonl(open(ruta, encoding='utf-8', errors='replace'))
+
+    archivo = open(ruta, newline='', encoding='utf-8-sig', errors='replace')
+    lector = csv.DictReader(archivo)
+    faltan = [columna for columna in ('producto_id', 'cantidad')
+              if columna not in (lector.fieldnames or [])]
+    if faltan:
+        archivo.close()
+        raise ValueError(f"faltan columnas en {ruta}: {', '.join(faltan)}")
+    return _tickets_csv(archivo, lector)
+
+
+def _entero(valor, campo: str) -> int:
+    """Convierte un valor del archivo de tickets a entero o lanza ValueError con el campo"""
+    if valor is None or valor == '':
+        raise ValueError(f"falta {campo}")
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo} inválido: {valor!r}") from None
+
+
+def _tickets_jsonl(archivo) -> Iterator[Dict]:
+    """Tickets de un archivo JSONL ya abierto, uno por línea"""
+    with archivo:
+        for numero, linea in enumerate(archivo, 1):
+            if not linea.strip():
+                continue
+            ticket = {'ticket': numero, 'usuario_id': None, 'lineas': [], 'linea': numero}
+            try:
+                datos = json.loads(linea)
+            except json.JSONDecodeError as e:
+                ticket['error'] = f"JSON inválido: {e.msg}"
+                yield ticket
+                continue
+            if not isinstance(datos, dict) or not isinstance(datos.get('lineas'), list):
+                ticket['error'] = 'se esperaba un objeto con "lineas" (lista)'
+                yield ticket
+                continue
+            ticket['ticket'] = datos.get('ticket', numero)
+            try:
+                if datos.get('usuario_id') is not None:
+                    ticket['usuario_id'] = _entero(datos['usuario_id'], 'usuario_id')
+                for linea_ticket in datos['lineas']:
+                    if not isinstance(linea_ticket, dict):
+                        raise ValueError("cada línea debe ser un objeto con producto_id y cantidad")
+                    ticket['lineas'].append((_entero(linea_ticket.get('producto_id'), 'producto_id'),
+                                             _entero(linea_ticket.get('cantidad'), 'cantidad')))
+            except ValueError as e:
+                ticket['error'] = str(e)
+            yield ticket
+
+
+def _tickets_csv(archivo, lector: csv.DictReader) -> Iterator[Dict]:
+    """Tickets de un CSV ya abierto, agrupando las filas consecutivas del mismo ticket"""
+    with archivo:
+        actual = None
+        # La línea 1 es el encabezado
+        for numero, fila in enumerate(lector, 2):
+            ticket = fila.get('ticket') or ''
+            if actual is None or actual['ticket'] != ticket:
+                if actual is not None:
+                    yield actual
+                actual = {'ticket': ticket, 'usuario_id': None, 'lineas': [], 'linea': numero}
+            if 'error' in actual:
+                # El ticket ya se rechaza por su primera fila inválida
+                continue
+            try:
+                usuario = fila.get('usuario_id')
+                if usuario and actual['usuario_id'] is None:
+                    actual['usuario_id'] = _entero(usuario, 'usuario_id')
+                actual['lineas'].append((_entero(fila.get('producto_id'), 'producto_id'),
+                                         _entero(fila.get('cantidad'), 'cantidad')))
+            except ValueError as e:
+                actual['error'] = str(e)
+                actual['linea'] = numero
+        if actual is not None:
+            yield actual
+
+
+def parsear_linea_venta(texto: str) -> Tuple[int, int]:
+    """Convierte 'ID:CANTIDAD' (o solo 'ID') en una tupla (producto_id, cantidad)"""
+    producto, _, cantidad = texto.partition(':')
+    try:
+        return int(producto), int(cantidad or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Línea inválida '{texto}', use ID:CANTIDAD")
+
+
+def parsear_limite(texto: str) -> int:
+    """Tamaño de página de --limit: un entero mayor que cero"""
+    try:
+        limite = int(texto)
+    except ValueError:
+        limite = 0
+    if limite < 1:
+        raise argparse.ArgumentTypeError(f"debe ser un entero mayor que cero: '{texto}'")
+    return limite
+
+
+class TlapaleriaCLI:
+    """Clase principal para la interfaz de línea de comandos de la tlapalería"""
+    
+    def __init__(self, db_path: str = DB_PATH_DEFAULT, busy_timeout_ms: Optional[int] = None,
+                 cache: bool = False, silencioso: bool = False):
+        """
+        Prepara la conexión a la base de datos; se abre la primera vez que se usa
+        
+        Args:
+            db_path: Ruta al archivo de base de datos SQLite
+            busy_timeout_ms: Espera máxima por bloqueos de otros procesos
+            cache: Sirve listar y escanear desde la caché del
+                   catálogo (cache_productos.py); conviene en sesiones largas,
+                   donde la carga inicial se paga una sola vez
+            silencioso: Omite los avisos de conexión, progreso y tiempos
+        """
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.silencioso = silencioso
+        self._conn: Optional[sqlite3.Connection] = None
+        self._cursor: Optional[sqlite3.Cursor] = None
+        self._fts = None
+        self.usar_cache = cache
+        self._cache: Optional["cache_productos.CacheProductos"] = None
+        # codigo_barras -> (id, nombre, precio, stock_actual, stock_minimo)
+        self._cache_escaneo: "OrderedDict[str, Tuple]" = OrderedDict()
+        self._codigo_por_id: Dict[int, str] = {}
+        self._data_version = None
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Conexión a la base de datos, abierta (y migrada) al primer uso"""
+        if self._conn is None:
+            self._connect()
+        return self._conn
+    
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        """Cursor compartido de la conexión"""
+        if self._cursor is None:
+            self._cursor = self.conn.cursor()
+        return self._cursor
+    
+    @property
+    def conectado(self) -> bool:
+        """True si la conexión ya se abrió"""
+        return self._conn is not None
+    
+    def _connect(self):
+        """Establece conexión con la base de datos y aplica los precios vencidos"""
+        try:
+            conn = conectar(self.db_path, self.busy_timeout_ms)
+            aplicar_migraciones(conn)
+        except sqlite3.Error as e:
+            print(f"❌ Error al conectar con la base de datos: {e}")
+            sys.exit(1)
+        self._conn = conn
+        # Los avisos de conexión van a stderr para no mezclarse con
+        # salidas que se redirigen (por ejemplo exportar -)
+        self._aviso(f"✅ Conectado a la base de datos: {self.db_path}")
+        # Los precios programados vencidos entran en vigor antes de leer o vender
+        self.precios_al_dia()
+    
+    def _aviso(self, *partes, **kwargs):
+        """Imprime un aviso en stderr, salvo en modo silencioso"""
+        if not self.silencioso:
+            print(*partes, file=sys.stderr, **kwargs)
+    
+    def cache_vigente(self) -> Optional["cache_productos.CacheProductos"]:
+        """
+        Caché del catálogo al día con la base, cargándola la primera vez
+
+        Returns:
+            La caché, o None si está desactivada o hay una transacción abierta
+        """
+        if not self.usar_cache:
+            return None
+        if self._cache is None:
+            import cache_productos
+            self._cache = cache_productos.CacheProductos(self.conn)
+        return self._cache if self._cache.vigente() else None
+    
+    def precios_al_dia(self):
+        """Aplica los precios programados que ya entraron en vigor (ver precios.py)"""
+        import precios
+        try:
+            aplicados = precios.al_dia(self.conn)
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudieron aplicar los precios programados: {e}", file=sys.stderr)
+            return
+        if aplicados:
+            print(f"🏷️  {aplicados} precios programados entraron en vigor", file=sys.stderr)
+    
+    def close(self):
+        """Cierra la conexión a la base de datos, si se llegó a abrir"""
+        if self._conn:
+            self._conn.close()
+            self._aviso("🔒 Conexión cerrada")
+    
+    def listar_productos(self, limit: int = 50, despues: Optional[str] = None,
+                         formato: str = 'tabla'):
+        """
+        Lista los productos del inventario ordenados por nombre, por páginas
+        
+        Args:
+            limit: Número máximo de productos a mostrar
+            despues: Token de página (--after) devuelto por el listado anterior
+            formato: 'tabla', 'json', 'csv' o 'tsv'
+        """
+        columnas = ('id', 'nombre', 'codigo_barras', 'precio', 'stock_actual',
+                    'stock_minimo', 'categoria', 'ubicacion')
+        try:
+            cache = self.cache_vigente()
+            if cache is not None:
+                cursor = cache.consultar_productos(limit, despues, columnas)
+            else:
+                cursor = inventario.consultar_productos(self.conn, limit, despues, columnas)
+            
+            def renglon(producto):
+                id_prod, nombre, codigo, precio, stock, stock_min, cat, ubic = producto
+                # Alerta visual si está en la lista de stock bajo
+                alerta = "⚠️ " if inventario.en_alerta(self.conn, id_prod) else "   "
+                return (f"{alerta}{id_prod:<5} {nombre[:28]:<30} {codigo or 'N/A':<15} ${precio:<9.2f} "
+                        f"{stock:<8} {stock_min:<6} {cat or 'N/A':<15} {ubic or 'N/A':<15}")
+            
+            def pie(total, siguiente):
+                texto = "-" * 120 + f"\n📦 Mostrando {total} productos\n"
+                if siguiente:
+                    texto += f"➡️  Siguiente página: --after {siguiente}\n"
+                return texto
+            
+            salida.emitir(
+                cursor, columnas, formato,
+                clave_orden=lambda producto: (producto[1], producto[0]),
+                limite=limit,
+                encabezado=("\n📦 INVENTARIO DE PRODUCTOS\n\n" + "-" * 120 + "\n"
+                            + f"{'ID':<5} {'Nombre':<30} {'Código':<15} {'Precio':<10} {'Stock':<8} "
+                              f"{'Min':<6} {'Categoría':<15} {'Ubicación':<15}\n"
+                            + "-" * 120 + "\n"),
+                renglon=renglon,
+                pie=pie,
+                vacio="📦 No hay productos en el inventario",
+            )
+            
+        except ValueError as e:
+            print(f"❌ {e}")
+        except sqlite3.Error as e:
+            print(f"❌ Error al listar productos: {e}")
+    
+    def buscar_producto(self, termino: str, limit: int = 20, pagina: int = 1,
+                        subcadena: bool = False):
+        """
+        Busca productos por nombre, descripción, categoría, proveedor o código de barras
+
+        Usa el índice de texto completo (FTS5) ordenado por relevancia; si el
+        SQLite disponible no tiene FTS5 usa la búsqueda con LIKE.
+        
+        Args:
+            termino: Término de búsqueda
+            limit: Resultados por página
+            pagina: Número de página (desde 1)
+            subcadena: Busca el texto en cualquier parte con LIKE (recorre la tabla)
+        """
+        import busqueda
+        try:
+            if self._fts is None and not subcadena:
+                self._fts = busqueda.asegurar_indice(self.conn)
+            usar_fts = bool(self._fts) and not subcadena
+            productos = inventario.buscar(self.conn, termino, limit, pagina, usar_fts)
+            
+            if not productos:
+                print(f"🔍 No se encontraron productos con '{termino}'")
+                return
+            
+            print(f"\n🔍 RESULTADOS DE BÚSQUEDA: '{termino}' "
+                  f"(página {pagina}, {len(productos)} encontrados)\n")
+            
+            for producto in productos:
+                alerta = ("⚠️  STOCK BAJO" if inventario.en_alerta(self.conn, producto.id)
+                          else "✅ Stock OK")
+                
+                print("-" * 80)
+                print(f"ID: {producto.id}")
+                print(f"Nombre: {producto.nombre}")
+                print(f"Descripción: {producto.descripcion or 'Sin descripción'}")
+                print(f"Código de barras: {producto.codigo_barras or 'N/A'}")
+                print(f"Precio: ${producto.precio:.2f}")
+                print(f"Stock actual: {producto.stock_actual} | "
+                      f"Stock mínimo: {producto.stock_minimo} | {alerta}")
+                print(f"Categoría: {producto.categoria or 'N/A'}")
+                print(f"Ubicación: {producto.ubicacion or 'N/A'}")
+                print(f"Proveedor: {producto.proveedor or 'N/A'}")
+            
+            print("-" * 80)
+            
+        except sqlite3.Error as e:
+            print(f"❌ Error al buscar productos: {e}")
+    
+    def reindexar(self):
+        """Reconstruye el índice de búsqueda de texto completo"""
+        import busqueda
+        try:
+            inicio = time.perf_counter()
+            if busqueda.reconstruir_indice(self.conn):
+                self._fts = True
+                print(f"✅ Índice de búsqueda reconstruido en {time.perf_counter() - inicio:.2f}s")
+            else:
+                print("⚠️  Este SQLite no incluye FTS5; la búsqueda usará LIKE")
+        except sqlite3.Error as e:
+            print(f"❌ Error al reconstruir el índice de búsqueda: {e}")
+    
+    def agregar_producto(self, nombre: str, precio: float, stock: int = 0,
+                        codigo_barras: Optional[str] = None,
+                        descripcion: Optional[str] = None,
+                        stock_minimo: int = 10,
+                        categoria: Optional[str] = None,
+                        ubicacion: Optional[str] = None,
+                        proveedor: Optional[str] = None):
+        """
+        Agrega un nuevo producto al inventario
+        
+        Args:
+            nombre: Nombre del producto
+            precio: Precio del producto
+            stock: Stock inicial
+            codigo_barras: Código de barras del producto
+            descripcion: Descripción del producto
+            stock_minimo: Stock mínimo antes de alertar
+            categoria: Categoría del producto
+            ubicacion: Ubicación en la tienda
+            proveedor: Nombre del proveedor
+        """
+        try:
+            producto = inventario.agregar_producto(
+                self.conn, nombre, precio, stock, codigo_barras, descripcion,
+                stock_minimo, categoria, ubicacion, proveedor
+            )
+            
+            print(f"✅ Producto agregado exitosamente con ID: {producto.id}")
+            print(f"   Nombre: {producto.nombre}")
+            print(f"   Precio: ${producto.precio:.2f}")
+            print(f"   Stock inicial: {producto.stock_actual}")
+            
+        except inventario.CodigoDuplicado as e:
+            print(f"❌ Error: {e}")
+        except sqlite3.Error as e:
+            print(f"❌ Error al agregar producto: {e}")
+    
+    def importar_catalogo(self, ruta: str, formato: Optional[str] = None,
+                          tamano_lote: Optional[int] = None) -> Optional[Dict]:
+        """
+        Importa productos desde CSV o JSONL (upsert por código de barras)
+        
+        Args:
+            ruta: Archivo a importar
+            formato: 'csv' o 'jsonl' (por defecto según la extensión)
+            tamano_lote: Filas por transacción (por defecto catalogo.TAMANO_LOTE_DEFAULT)
+        
+        Returns:
+            Resumen de la importación, o None si falló
+        """
+        import catalogo
+        tamano_lote = tamano_lote or catalogo.TAMANO_LOTE_DEFAULT
+        
+        def progreso(resumen):
+            self._aviso(f"\r⏳ {resumen['filas']} filas "
+                        f"({resumen['filas_por_segundo']:.0f} filas/s)", end='')
+        
+        try:
+            resumen = catalogo.importar(self.conn, ruta, formato, tamano_lote, progreso)
+        except (OSError, sqlite3.Error) as e:
+            print(f"\n❌ Error al importar catálogo: {e}")
+            return None
+        
+        self._cache_escaneo.clear()
+        self._codigo_por_id.clear()
+        self._aviso()
+        print(f"✅ Importación terminada: {resumen['filas']} filas en {resumen['segundos']:.2f}s "
+              f"({resumen['filas_por_segundo']:.0f} filas/s)")
+        print(f"   Creados: {resumen['creados']} | Actualizados: {resumen['actualizados']} "
+              f"| Con errores: {len(resumen['errores'])}")
+        for numero, error in resumen['errores'][:20]:
+            print(f"   ⚠️  Línea {numero}: {error}")
+        if len(resumen['errores']) > 20:
+            print(f"   ... y {len(resumen['errores']) - 20} errores más")
+        return resumen
+    
+    def exportar_catalogo(self, destino: str, formato: Optional[str] = None,
+                          tamano_lote: Optional[int] = None) -> Optional[Dict]:
+        """
+        Exporta el catálogo completo a CSV o JSONL
+        
+        Args:
+            destino: Archivo de salida, o '-' para la salida estándar
+            formato: 'csv' o 'jsonl' (por defecto según la extensión)
+            tamano_lote: Filas leídas por lote (por defecto catalogo.TAMANO_LOTE_DEFAULT)
+        
+        Returns:
+            Resumen de la exportación, o None si falló
+        """
+        import catalogo
+        tamano_lote = tamano_lote or catalogo.TAMANO_LOTE_DEFAULT
+        try:
+            resumen = catalogo.exportar(self.conn, destino, formato, tamano_lote)
+        except (OSError, sqlite3.Error) as e:
+            print(f"❌ Error al exportar catálogo: {e}", file=sys.stderr)
+            return None
+        
+        self._aviso(f"✅ {resumen['filas']} productos exportados en {resumen['segundos']:.2f}s "
+                    f"({resumen['filas_por_segundo']:.0f} filas/s)")
+        return resumen
+    
+    def actualizar_stock(self, producto_id: int, nuevo_stock: int):
+        """
+        Actualiza el stock de un producto
+        
+        Args:
+            producto_id: ID del producto
+            nuevo_stock: Nuevo valor de stock
+        """
+        try:
+            producto = inventario.actualizar_stock(self.conn, producto_id, nuevo_stock)
+            self._olvidar_producto(producto_id)
+            
+            print(f"✅ Stock actualizado para '{producto.nombre}'")
+            print(f"   Nuevo stock: {producto.stock_actual}")
+            
+        except inventario.ProductoNoEncontrado as e:
+            print(f"❌ {e}")
+        except sqlite3.Error as e:
+            print(f"❌ Error al actualizar stock: {e}")
+    
+    def stock_bajo(self, limit: Optional[int] = None, despues: Optional[str] = None,
+                   formato: str = 'tabla'):
+        """
+        Muestra productos con stock bajo (stock actual <= umbral de su
+        categoría o, si no tiene, su stock mínimo)
+        
+        Args:
+            limit: Productos por página (None muestra todos)
+            despues: Token de página (--after) devuelto por el listado anterior
+            formato: 'tabla', 'json', 'csv' o 'tsv'
+        """
+        columnas = ('id', 'nombre', 'codigo_barras', 'stock_actual', 'stock_minimo',
+                    'categoria', 'proveedor')
+        try:
+            cursor = inventario.consultar_stock_bajo(self.conn, limit, despues, columnas)
+            
+            def renglon(producto):
+                id_prod, nombre, codigo, stock, stock_min, cat, prov = producto
+                return (f"{id_prod:<5} {nombre[:28]:<30} {codigo or 'N/A':<15} {stock:<8} "
+                        f"{stock_min:<8} {cat or 'N/A':<15} {prov or 'N/A':<15}")
+            
+            def pie(total, siguiente):
+                texto = "-" * 100 + f"\n⚠️  {total} productos con stock bajo\n"
+                if siguiente:
+                    texto += f"➡️  Siguiente página: --after {siguiente}\n"
+                return texto
+            
+            salida.emitir(
+                cursor, columnas, formato,
+                clave_orden=lambda producto: (producto[3], producto[0]),
+                limite=limit,
+                encabezado=("\n⚠️  ALERTA: PRODUCTOS CON STOCK BAJO\n\n" + "-" * 100 + "\n"
+                            + f"{'ID':<5} {'Nombre':<30} {'Código':<15} {'Stock':<8} {'Mínimo':<8} "
+                              f"{'Categoría':<15} {'Proveedor':<15}\n"
+                            + "-" * 100 + "\n"),
+                renglon=renglon,
+                pie=pie,
+                vacio="✅ Todos los productos tienen stock suficiente",
+            )
+            
+        except ValueError as e:
+            print(f"❌ {e}")
+        except sqlite3.Error as e:
+            print(f"❌ Error al consultar stock bajo: {e}")
+    
+    def reabastecer(self, dias_historia: Optional[int] = None, tiempo_entrega: Optional[int] = None,
+                    dias_cobertura: Optional[int] = None, proveedor: Optional[str] = None,
+                    limit: Optional[int] = None, todos: bool = False, formato: str = 'tabla'):
+        """
+        Muestra la lista de compra sugerida según el pronóstico de demanda
+        
+        Args:
+            dias_historia: Días de ventas a analizar
+            tiempo_entrega: Días entre el pedido y la recepción
+            dias_cobertura: Días de venta que debe cubrir cada pedido
+            proveedor: Solo productos de este proveedor
+            limit: Número máximo de productos a mostrar
+            todos: Incluye los productos que no necesitan pedido
+            formato: 'tabla', 'json', 'csv' o 'tsv'
+        """
+        # NumPy (opcional) tarda en importarse: solo se carga para este comando
+        import pronostico
+        
+        parametros = {
+            'dias_historia': dias_historia or pronostico.DIAS_HISTORIA_DEFAULT,
+            'tiempo_entrega': tiempo_entrega or pronostico.TIEMPO_ENTREGA_DEFAULT,
+            'dias_cobertura': dias_cobertura or pronostico.DIAS_COBERTURA_DEFAULT,
+        }
+        try:
+            resultado = pronostico.calcular(self.conn, todos=todos, **parametros)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        except sqlite3.Error as e:
+            print(f"❌ Error al calcular el pronóstico: {e}")
+            return
+        
+        sugerencias = resultado['sugerencias']
+        if proveedor:
+            sugerencias = [s for s in sugerencias
+                           if (s['proveedor'] or '').lower() == proveedor.lower()]
+        if limit:
+            sugerencias = sugerencias[:limit]
+        
+        if formato == 'json':
+            json.dump({'parametros': parametros, 'motor': resultado['motor'],
+                       'productos_analizados': resultado['productos'],
+                       'sugerencias': sugerencias}, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+            return
+        if formato in ('csv', 'tsv'):
+            columnas = list(sugerencias[0]) if sugerencias else []
+            escritor = csv.DictWriter(sys.stdout, columnas, lineterminator='\n',
+                                      delimiter='\t' if formato == 'tsv' else ',')
+            escritor.writeheader()
+            escritor.writerows(sugerencias)
+            return
+        
+        pedidos = [s for s in sugerencias if s['cantidad_sugerida'] > 0 or todos]
+        if not pedidos:
+            print("✅ Ningún producto necesita reabastecerse")
+            return
+        
+        print("\n🚚 LISTA DE COMPRA SUGERIDA\n")
+        por_proveedor: Dict[str, List[Dict]] = {}
+        for s in pedidos:
+            por_proveedor.setdefault(s['proveedor'] or 'Sin proveedor', []).append(s)
+        
+        for nombre_proveedor in sorted(por_proveedor):
+            filas = por_proveedor[nombre_proveedor]
+            print(f"🏭 {nombre_proveedor}")
+            print("-" * 100)
+            print(f"{'ID':<6} {'Nombre':<32} {'Stock':<7} {'Reorden':<8} {'Demanda/día':<12} "
+                  f"{'Días rest.':<11} {'Pedir':<7} {'Costo':<10}")
+            print("-" * 100)
+            for s in filas:
+                dias = f"{s['dias_restantes']:.1f}" if s['dias_restantes'] is not None else '∞'
+                print(f"{s['id']:<6} {s['nombre'][:30]:<32} {s['stock_actual']:<7} "
+                      f"{s['punto_reorden']:<8} {s['demanda_diaria']:<12.2f} {dias:<11} "
+                      f"{s['cantidad_sugerida']:<7} ${s['costo_estimado']:<9.2f}")
+            total = sum(s['costo_estimado'] for s in filas)
+            print("-" * 100)
+            print(f"💵 Subtotal {nombre_proveedor}: ${total:.2f}\n")
+        
+        total = sum(s['costo_estimado'] for s in pedidos)
+        print(f"📦 {len(pedidos)} productos a pedir | 💰 Costo estimado: ${total:.2f}")
+        print(f"📈 Historial: {parametros['dias_historia']} días | Entrega: "
+              f"{parametros['tiempo_entrega']} días | Cobertura: {parametros['dias_cobertura']} días | "
+              f"{resultado['productos']} productos analizados en {resultado['segundos']:.2f} s "
+              f"({resultado['motor']})\n")
+    
+    def reporte(self, tipo: str, desde: Optional[str] = None, hasta: Optional[str] = None,
+                top: Optional[int] = None, procesos: Optional[int] = None,
+                formato: str = 'tabla', verificar: bool = False) -> bool:
+        """
+        Muestra un reporte de ventas agregado en paralelo por rangos de fechas
+        
+        Args:
+            tipo: 'dia', 'categoria', 'proveedor', 'usuario' o 'productos'
+            desde: Primer día incluido (AAAA-MM-DD)
+            hasta: Último día incluido (AAAA-MM-DD)
+            top: Productos a mostrar en el reporte 'productos' (por defecto reportes.TOP_DEFAULT)
+            procesos: Procesos en paralelo (por defecto uno por CPU)
+            formato: 'tabla', 'json', 'csv' o 'tsv'
+            verificar: Compara el resultado con el cálculo en un solo proceso
+        
+        Returns:
+            False si hubo un error o la verificación encontró diferencias
+        """
+        import reportes
+        if top is None:
+            top = reportes.TOP_DEFAULT
+        try:
+            resultado = reportes.generar(self.conn, self.db_path, tipo, desde, hasta, top, procesos)
+            errores = []
+            if verificar:
+                errores = reportes.diferencias(
+                    resultado['filas'], reportes.referencia(self.conn, tipo, desde, hasta, top)
+                )
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        except sqlite3.Error as e:
+            print(f"❌ Error al generar el reporte: {e}")
+            return False
+        
+        filas = resultado['filas']
+        columnas = ['clave', 'nombre', 'ventas', 'unidades', 'monto'] if tipo == 'productos' \
+            else ['clave', 'ventas', 'unidades', 'monto']
+        
+        if formato == 'json':
+            json.dump({'tipo': tipo, 'desde': desde, 'hasta': hasta,
+                       'procesos': resultado['procesos'], 'rangos': resultado['rangos'],
+                       'filas': filas}, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        elif formato in ('csv', 'tsv'):
+            escritor = csv.DictWriter(sys.stdout, columnas, lineterminator='\n',
+                                      delimiter='\t' if formato == 'tsv' else ',')
+            escritor.writeheader()
+            escritor.writerows(filas)
+        elif not filas:
+            print("📭 No hay ventas en el periodo indicado")
+        else:
+            titulos = {'dia': 'Fecha', 'categoria': 'Categoría', 'proveedor': 'Proveedor',
+                       'usuario': 'Usuario', 'productos': 'ID'}
+            ancho_clave = 8 if tipo == 'productos' else 28
+            ancho = ancho_clave + 52 + (33 if tipo == 'productos' else 0)
+            print(f"\n📈 REPORTE DE VENTAS POR {tipo.upper()}\n")
+            print("-" * ancho)
+            nombre = f" {'Nombre':<32}" if tipo == 'productos' else ''
+            print(f"{titulos[tipo]:<{ancho_clave}}{nombre} {'Ventas':>10} {'Unidades':>12} "
+                  f"{'Monto':>16}")
+            print("-" * ancho)
+            for fila in filas:
+                nombre = f" {fila['nombre'][:30]:<32}" if tipo == 'productos' else ''
+                print(f"{str(fila['clave'])[:ancho_clave - 1]:<{ancho_clave}}{nombre} {fila['ventas']:>10} "
+                      f"{fila['unidades']:>12} {'$' + format(fila['monto'], ',.2f'):>16}")
+            print("-" * ancho)
+            print(f"💵 Total: {sum(f['ventas'] for f in filas)} ventas, "
+                  f"${sum(f['monto'] for f in filas):,.2f} | {len(resultado['rangos'])} rangos en "
+                  f"{resultado['procesos']} procesos, {resultado['segundos']:.2f} s\n")
+        
+        for error in errores[:10]:
+            print(f"❌ Diferencia con el cálculo en un solo proceso: {error}", file=sys.stderr)
+        if verificar and not errores:
+            print("✅ El resultado coincide con el cálculo en un solo proceso", file=sys.stderr)
+        return not errores
+    
+    def registrar_venta(self, producto_id: int, cantidad: int, usuario_id: int = 1):
+        """
+        Registra una venta y actualiza el inventario
+        
+        Args:
+            producto_id: ID del producto vendido
+            cantidad: Cantidad vendida
+            usuario_id: ID del usuario que realiza la venta (por defecto 1)
+        """
+        try:
+            venta = inventario.registrar_venta(self.conn, producto_id, cantidad, usuario_id)
+            self._olvidar_producto(producto_id)
+            
+            print(f"✅ Venta registrada exitosamente")
+            print(f"   Producto: {venta.nombre}")
+            print(f"   Cantidad: {venta.cantidad}")
+            print(f"   Precio unitario: ${venta.precio_unitario:.2f}")
+            print(f"   Total: ${venta.total:.2f}")
+            print(f"   Stock restante: {venta.stock_restante}")
+            
+        except inventario.ErrorInventario as e:
+            print(f"❌ {e}")
+        except sqlite3.Error as e:
+            print(f"❌ Error al registrar venta: {e}")
+    
+    def _vender_ticket(self, lineas: List[Tuple[int, int]], usuario_id: int):
+        """
+        Valida y escribe un ticket completo dentro de la transacción actual
+
+        La verificación de stock se hace con una sola consulta sobre todas las
+        líneas, las ventas se insertan con executemany y el stock se descuenta
+        con un solo UPDATE.
+
+        Returns:
+            Tupla (total del ticket, None) o (None, mensaje de error)
+        """
+        if not lineas:
+            return None, "Ticket sin líneas"
+
+        solicitado: Dict[int, int] = {}
+        for producto_id, cantidad in lineas:
+            if cantidad <= 0:
+                return None, f"Cantidad inválida para producto {producto_id}: {cantidad}"
+            solicitado[producto_id] = solicitado.get(producto_id, 0) + cantidad
+
+        self.cursor.execute("DELETE FROM temp.venta_lote")
+        self.cursor.executemany(
+            "INSERT INTO temp.venta_lote (producto_id, cantidad) VALUES (?, ?)",
+            solicitado.items()
+        )
+        self.cursor.execute("""
+            SELECT l.producto_id, p.precio, p.stock_actual, l.cantidad
+            FROM temp.venta_lote l
+            LEFT JOIN productos p ON p.id = l.producto_id
+        """)
+        precio_de = {}
+        for producto_id, precio, stock_actual, cantidad in self.cursor.fetchall():
+            if precio is None:
+                return None, f"No se encontró producto con ID: {producto_id}"
+            if stock_actual < cantidad:
+                return None, (f"Stock insuficiente para producto {producto_id}. "
+                              f"Disponible: {stock_actual}, Solicitado: {cantidad}")
+            precio_de[producto_id] = precio
+
+        self.cursor.executemany("""
+            INSERT INTO ventas (producto_id, usuario_id, cantidad, precio_unitario, total)
+            VALUES (?, ?, ?, ?, ?)
+        """, [
+            (producto_id, usuario_id, cantidad, precio_de[producto_id],
+             precio_de[producto_id] * cantidad)
+            for producto_id, cantidad in lineas
+        ])
+        self.cursor.execute("""
+            UPDATE productos
+            SET stock_actual = stock_actual - (
+                    SELECT cantidad FROM temp.venta_lote WHERE producto_id = productos.id
+                ),
+                fecha_actualizacion = CURRENT_TIMESTAMP
+            WHERE id IN (SELECT producto_id FROM temp.venta_lote)
+        """)
+        return sum(precio_de[p] * c for p, c in lineas), None
+
+    def registrar_venta_lote(self, tickets: Iterable[Dict], usuario_id: int = 1,
+                             tickets_por_commit: int = 1) -> Dict:
+        """
+        Registra varios tickets de venta, cada uno con varias líneas
+
+        Cada ticket se aplica completo o no se aplica (savepoint por ticket);
+        un ticket rechazado no afecta a los demás del mismo grupo. Los precios
+        programados que vencieron se aplican al abrir la transacción de cada
+        grupo, igual que en una venta suelta.
+
+        Args:
+            tickets: Iterable de diccionarios con 'lineas' [(producto_id, cantidad)],
+                     y opcionalmente 'ticket' y 'usuario_id'; los que traen
+                     'error' (de leer_tickets) se rechazan sin tocar la base
+            usuario_id: Usuario por defecto para tickets que no lo indican
+            tickets_por_commit: Cantidad de tickets agrupados en cada commit
+
+        Returns:
+            Resumen con tickets aplicados y rechazados, líneas, monto y ventas/segundo;
+            'fallo' trae el mensaje si el lote se interrumpió
+        """
+        import precios
+        resumen = {'tickets': 0, 'rechazados': 0, 'lineas': 0, 'monto': 0.0,
+                   'errores': [], 'fallo': None, 'segundos': 0.0, 'ventas_por_segundo': 0.0}
+        tickets_por_commit = max(1, tickets_por_commit)
+        pendientes = 0
+        # Totales ya confirmados, para descontar el grupo pendiente si se revierte
+        confirmado = (0, 0, 0.0)
+        inicio = time.perf_counter()
+
+        try:
+            self.cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS venta_lote (
+                    producto_id INTEGER PRIMARY KEY,
+                    cantidad INTEGER NOT NULL
+                )
+            """)
+            for numero, ticket in enumerate(tickets, 1):
+                identificador = ticket.get('ticket', numero)
+                if ticket.get('error'):
+                    resumen['rechazados'] += 1
+                    resumen['errores'].append(
+                        (identificador, f"línea {ticket['linea']}: {ticket['error']}"))
+                    continue
+                lineas = list(ticket['lineas'])
+                if not self.conn.in_transaction:
+                    iniciar_escritura(self.conn)
+                    precios.al_dia(self.conn)
+                self.cursor.execute("SAVEPOINT ticket")
+                total, error = self._vender_ticket(
+                    lineas, ticket.get('usuario_id') or usuario_id
+                )
+                if error:
+                    self.cursor.execute("ROLLBACK TO ticket")
+                    resumen['rechazados'] += 1
+                    resumen['errores'].append((identificador, error))
+                else:
+                    resumen['tickets'] += 1
+                    resumen['lineas'] += len(lineas)
+                    resumen['monto'] += total
+                    for producto_id, _ in lineas:
+                        self._olvidar_producto(producto_id)
+                self.cursor.execute("RELEASE ticket")
+
+                pendientes += 1
+                if pendientes >= tickets_por_commit:
+                    self.conn.commit()
+                    confirmado = (resumen['tickets'], resumen['lineas'], resumen['monto'])
+                    pendientes = 0
+            self.conn.commit()
+        except OSError as e:
+            # El archivo falla al leer el siguiente ticket, entre tickets: los
+            # del grupo pendiente ya están completos y se confirman
+            self.conn.commit()
+            resumen['fallo'] = f"Error al leer tickets: {e}"
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            descartados = resumen['tickets'] - confirmado[0]
+            resumen['tickets'], resumen['lineas'], resumen['monto'] = confirmado
+            resumen['fallo'] = (f"Error al registrar ventas en lote: {e} "
+                                f"({descartados} tickets sin confirmar se revirtieron)")
+        except BaseException:
+            # Cualquier otro error (un ticket mal formado, Ctrl+C) no deja
+            # abiertos BEGIN IMMEDIATE ni el savepoint del ticket
+            self.conn.rollback()
+            raise
+
+        resumen['segundos'] = time.perf_counter() - inicio
+        if resumen['segundos'] > 0:
+            resumen['ventas_por_segundo'] = resumen['lineas'] / resumen['segundos']
+
+        for identificador, error in resumen['errores']:
+            print(f"❌ Ticket {identificador} rechazado: {error}")
+        if resumen['fallo']:
+            print(f"❌ {resumen['fallo']}")
+        print(f"✅ Tickets registrados: {resumen['tickets']} "
+              f"({resumen['lineas']} líneas, ${resumen['monto']:.2f})")
+        if resumen['rechazados']:
+            print(f"⚠️  Tickets rechazados: {resumen['rechazados']}")
+        print(f"⏱️  {resumen['segundos']:.3f}s - "
+              f"{resumen['ventas_por_segundo']:.0f} ventas/segundo")
+        return resumen
+
+    def _olvidar_producto(self, producto_id: int):
+        """Quita un producto de la caché de escaneo tras modificarlo esta conexión"""
+        codigo = self._codigo_por_id.pop(producto_id, None)
+        if codigo is not None:
+            self._cache_escaneo.pop(codigo, None)
+
+    def producto_por_codigo(self, codigo: str) -> Optional[Tuple]:
+        """
+        Obtiene un producto por su código de barras exacto
+
+        Usa el índice UNIQUE de codigo_barras y una caché LRU de los últimos
+        productos escaneados. La caché se vacía cuando PRAGMA data_version
+        indica que otra conexión (otra CLI o el backend) hizo cambios; los
+        cambios de esta conexión invalidan solo los productos modificados.
+
+        Args:
+            codigo: Código de barras completo (por ejemplo EAN-13)
+
+        Returns:
+            Tupla (id, nombre, precio, stock_actual, stock_minimo) o None
+        """
+        cache = self.cache_vigente()
+        if cache is not None:
+            producto = cache.por_codigo(codigo)
+            if producto is None:
+                return None
+            return (producto.id, producto.nombre, producto.precio, producto.stock_actual,
+                    producto.stock_minimo)
+
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._cache_escaneo.clear()
+            self._codigo_por_id.clear()
+
+        producto = self._cache_escaneo.get(codigo)
+        if producto is not None:
+            self._cache_escaneo.move_to_end(codigo)
+            return producto
+
+        producto = self.conn.execute("""
+            SELECT id, nombre, precio, stock_actual, stock_minimo
+            FROM productos
+            WHERE codigo_barras = ?
+        """, (codigo,)).fetchone()
+        if producto is None:
+            return None
+
+        self._cache_escaneo[codigo] = producto
+        self._codigo_por_id[producto[0]] = codigo
+        if len(self._cache_escaneo) > TAMANO_CACHE_ESCANEO:
+            _, (id_expulsado, *_) = self._cache_escaneo.popitem(last=False)
+            self._codigo_por_id.pop(id_expulsado, None)
+        return producto
+
+    def escanear(self, codigo: str, vender: int = 0, usuario_id: int = 1):
+        """
+        Muestra un producto por código de barras y opcionalmente lo vende
+
+        Args:
+            codigo: Código de barras completo
+            vender: Cantidad a vender (0 solo consulta)
+            usuario_id: ID del usuario que realiza la venta
+        """
+        try:
+            producto = self.producto_por_codigo(codigo)
+        except sqlite3.Error as e:
+            print(f"❌ Error al escanear producto: {e}")
+            return
+
+        if producto is None:
+            print(f"❌ No se encontró producto con código: {codigo}")
+            return
+
+        id_prod, nombre, precio, stock, _ = producto
+        if vender > 0:
+            self.registrar_venta(id_prod, vender, usuario_id)
+            return
+
+        try:
+            bajo = inventario.en_alerta(self.conn, id_prod)
+        except sqlite3.Error as e:
+            print(f"❌ Error al escanear producto: {e}")
+            return
+        alerta = "⚠️  STOCK BAJO" if bajo else "✅ Stock OK"
+        print(f"📟 [{id_prod}] {nombre} - ${precio:.2f} | Stock: {stock} | {alerta}")
+
+    def estadisticas(self):
+        """
+        Muestra estadísticas generales del sistema
+
+        Los valores se leen de las tablas de resumen que mantienen los
+        triggers (ver resumenes.py), sin recorrer productos ni ventas.
+        """
+        try:
+            datos = inventario.estadisticas(self.conn)
+            mas_vendido = datos.mas_vendido
+            
+            print("\n" + "=" * 60)
+            print("📊 ESTADÍSTICAS DEL SISTEMA")
+            print("=" * 60)
+            print(f"📦 Total de productos: {datos.total_productos}")
+            print(f"💰 Valor total del inventario: ${datos.valor_inventario:.2f}")
+            print(f"⚠️  Productos con stock bajo: {datos.productos_stock_bajo}")
+            print(f"🛒 Total de ventas realizadas: {datos.total_ventas}")
+            print(f"💵 Monto total de ventas: ${datos.monto_ventas:.2f}")
+            print(f"📅 Ventas de hoy: {datos.ventas_hoy} (${datos.monto_hoy:.2f})")
+            
+            if mas_vendido:
+                print(f"🏆 Producto más vendido: {mas_vendido[0]} ({mas_vendido[1]} unidades)")
+            
+            print("=" * 60 + "\n")
+            
+        except sqlite3.Error as e:
+            print(f"❌ Error al obtener estadísticas: {e}")
+    
+    def recalcular(self, solo_verificar: bool = False) -> bool:
+        """
+        Reconstruye las estadísticas materializadas y las compara con el cálculo completo
+        
+        Args:
+            solo_verificar: Solo compara, sin reconstruir
+        
+        Returns:
+            True si los resúmenes quedaron consistentes
+        """
+        import resumenes
+        try:
+            if not solo_verificar:
+                inicio = time.perf_counter()
+                with transaccion_escritura(self.conn):
+                    resumenes.recalcular(self.conn)
+                print(f"✅ Estadísticas recalculadas en {time.perf_counter() - inicio:.2f}s")
+            
+            diferencias = resumenes.verificar(self.conn)
+            if diferencias:
+                print("⚠️  Las estadísticas no coinciden con el cálculo completo:")
+                for diferencia in diferencias:
+                    print(f"   - {diferencia}")
+                return False
+            print("✅ Las estadísticas coinciden con el cálculo completo")
+            return True
+            
+        except sqlite3.Error as e:
+            print(f"❌ Error al recalcular estadísticas: {e}")
+            return False
+    
+    def archivar(self, antes_de: Optional[str] = None, meses: int = 12,
+                 ruta: Optional[str] = None, compactar: bool = True) -> bool:
+        """
+        Mueve las ventas antiguas al archivo histórico y compacta la base
+        
+        Args:
+            antes_de: Archiva lo anterior al mes de esta fecha (AAAA-MM-DD)
+            meses: Si no se da antes_de, meses completos que se conservan
+            ruta: Archivo de ventas históricas (por defecto junto a la base)
+            compactar: Devuelve el espacio libre al sistema de archivos
+        
+        Returns:
+            False si hubo un error
+        """
+        import archivo
+        try:
+            corte = antes_de or archivo.corte_por_meses(self.conn, meses)
+            ruta = ruta or archivo.ruta_registrada(self.conn) or archivo.ruta_default(self.db_path)
+            self._aviso(f"📦 Archivando ventas anteriores a {archivo.normalizar_corte(corte)} en {ruta}")
+            
+            def progreso(mes, filas):
+                self._aviso(f"   {mes[:7]}: {filas} ventas")
+            
+            datos = archivo.archivar(self.conn, corte, ruta, compactar, progreso)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        except sqlite3.Error as e:
+            print(f"❌ Error al archivar ventas: {e}")
+            return False
+        
+        mb = 1024 * 1024
+        print(f"✅ {datos['filas']} ventas de {datos['meses']} meses archivadas "
+              f"en {datos['segundos']:.2f}s")
+        print(f"💾 Base principal: {datos['bytes_antes'] / mb:.1f} MB -> "
+              f"{datos['bytes_despues'] / mb:.1f} MB "
+              f"({datos['bytes_recuperados'] / mb:.1f} MB recuperados)")
+        if not compactar:
+            print(f"⚠️  {datos['bytes_libres_sin_compactar'] / mb:.1f} MB libres sin devolver "
+                  f"(ejecute sin --sin-compactar para recuperarlos)")
+        print(f"🗄️  Archivo histórico: {datos['bytes_archivo'] / mb:.1f} MB")
+        return True
+
+    def conteo_fisico(self, ruta: str = '-', alcance: str = 'contados',
+                      valor_alcance: Optional[str] = None, simular: bool = False,
+                      usuario_id: int = 1, limit: Optional[int] = 20,
+                      formato: str = 'tabla') -> bool:
+        """
+        Concilia un conteo físico contra el sistema y ajusta el stock
+
+        Args:
+            ruta: Archivo con un código de barras por línea, o '-' para stdin
+            alcance: 'contados', 'completo', 'categoria' o 'ubicacion'
+            valor_alcance: Categoría o prefijo de ubicación del área contada
+            simular: Solo muestra las diferencias, sin ajustar
+            usuario_id: Usuario que hizo el conteo
+            limit: Diferencias a mostrar en la tabla (None: todas)
+            formato: 'tabla', 'json', 'csv' o 'tsv'
+
+        Returns:
+            False si hubo un error
+        """
+        import conteo
+        inicio = time.perf_counter()
+        try:
+            if ruta == '-':
+                if sys.stdin.isatty():
+                    self._aviso("📟 Escanee los productos; termine con Ctrl+D")
+                escaneos = conteo.contar_escaneos(sys.stdin)
+            else:
+                with open(ruta, encoding='utf-8') as archivo_escaneos:
+                    escaneos = conteo.contar_escaneos(archivo_escaneos)
+            lectura = time.perf_counter() - inicio
+
+            if simular:
+                resumen = conteo.conciliar(self.conn, escaneos, alcance, valor_alcance)
+            else:
+                resumen = conteo.aplicar(self.conn, escaneos, alcance, valor_alcance,
+                                         usuario_id, None if ruta == '-' else ruta)
+                self._cache_escaneo.clear()
+                self._codigo_por_id.clear()
+        except OSError as e:
+            print(f"❌ Error al leer los escaneos: {e}")
+            return False
+        except sqlite3.Error as e:
+            print(f"❌ Error al conciliar el conteo: {e}")
+            return False
+
+        diferencias = resumen['diferencias']
+        columnas = list(conteo.Diferencia._fields)
+        if formato == 'json':
+            datos = {llave: valor for llave, valor in resumen.items() if llave != 'diferencias'}
+            datos['diferencias'] = [d._asdict() for d in diferencias]
+            json.dump(datos, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+            return True
+        if formato in ('csv', 'tsv'):
+            escritor = csv.writer(sys.stdout, delimiter='\t' if formato == 'tsv' else ',',
+                                  lineterminator='\n')
+            escritor.writerow(columnas)
+            escritor.writerows(diferencias)
+            return True
+
+        for numero, linea in resumen['lineas_invalidas'][:20]:
+            print(f"⚠️  Línea {numero} inválida: {linea}")
+        for codigo, cantidad in resumen['desconocidos'][:20]:
+            print(f"⚠️  Código sin producto: {codigo} ({cantidad} escaneos)")
+        if len(resumen['desconocidos']) > 20:
+            print(f"   ... y {len(resumen['desconocidos']) - 20} códigos más")
+
+        if diferencias:
+            print("\n📋 DIFERENCIAS DEL CONTEO\n")
+            print("-" * 96)
+            print(f"{'ID':<6} {'Nombre':<32} {'Código':<15} {'Sistema':<9} {'Contado':<9} "
+                  f"{'Dif.':<7} {'Valor':<12}")
+            print("-" * 96)
+            for d in diferencias[:limit] if limit else diferencias:
+                print(f"{d.producto_id:<6} {d.nombre[:30]:<32} {d.codigo_barras or '':<15} "
+                      f"{d.stock_sistema:<9} {d.stock_contado:<9} {d.diferencia:<+7} "
+                      f"${d.valor:<11.2f}")
+            print("-" * 96)
+            if limit and len(diferencias) > limit:
+                print(f"   ... y {len(diferencias) - limit} diferencias más")
+        else:
+            print("✅ El conteo coincide con el sistema")
+
+        print(f"📟 {resumen['escaneos']} unidades escaneadas, {resumen['codigos']} códigos, "
+              f"{resumen['productos']} productos conciliados ({resumen['alcance']})")
+        print(f"📉 Faltantes: {resumen['unidades_faltantes']} unidades "
+              f"(merma ${resumen['valor_merma']:.2f}) | 📈 Sobrantes: "
+              f"{resumen['unidades_sobrantes']} unidades (${resumen['valor_sobrante']:.2f})")
+        if simular:
+            print(f"🔎 Simulación: {resumen['ajustes']} ajustes pendientes, no se modificó el stock")
+        else:
+            print(f"✅ Conteo #{resumen['conteo_id']}: {resumen['ajustes']} productos ajustados")
+        print(f"⏱️  Lectura {lectura:.2f}s | Conciliación {resumen['segundos']:.2f}s")
+        return True
+
+    def movimientos_producto(self, producto_id: int, fecha: Optional[str] = None,
+                             limit: int = 20, formato: str = 'tabla') -> bool:
+        """
+        Muestra los últimos movimientos de stock de un producto, o su stock en una fecha
+
+        Args:
+            producto_id: ID del producto
+            fecha: AAAA-MM-DD (al final del día) o AAAA-MM-DD HH:MM:SS
+            limit: Movimientos a mostrar
+            formato: 'tabla', 'json', 'csv' o 'tsv'
+
+        Returns:
+            False si hubo un error
+        """
+        import movimientos
+        try:
+            if fecha:
+                stock = movimientos.stock_en(self.conn, producto_id, fecha)
+            else:
+                historial = movimientos.historial(self.conn, producto_id, limit)
+        except sqlite3.Error as e:
+            print(f"❌ Error al consultar movimientos: {e}")
+            return False
+
+        if fecha:
+            if formato == 'json':
+                json.dump({'producto_id': producto_id, 'fecha': movimientos.normalizar_fecha(fecha),
+                           'stock': stock}, sys.stdout)
+                print()
+            elif stock is None:
+                print(f"⚠️  No hay historia del producto {producto_id} en {fecha}")
+            else:
+                print(f"📦 Stock del producto {producto_id} en {movimientos.normalizar_fecha(fecha)}: "
+                      f"{stock}")
+            return True
+
+        if formato == 'json':
+            json.dump({'filas': [m._asdict() for m in historial]}, sys.stdout, ensure_ascii=False)
+            print()
+            return True
+        if formato in ('csv', 'tsv'):
+            escritor = csv.writer(sys.stdout, delimiter='\t' if formato == 'tsv' else ',',
+                                  lineterminator='\n')
+            escritor.writerow(movimientos.Movimiento._fields)
+            escritor.writerows(historial)
+            return True
+
+        if not historial:
+            print(f"📦 El producto {producto_id} no tiene movimientos")
+            return True
+        print(f"\n📒 MOVIMIENTOS DE STOCK DEL PRODUCTO {producto_id}\n")
+        print("-" * 50)
+        print(f"{'Fecha':<21} {'Cambio':<10} {'Stock':<10}")
+        print("-" * 50)
+        for m in historial:
+            print(f"{m.fecha:<21} {m.cambio:<+10} {m.stock:<10}")
+        print("-" * 50)
+        return True
+
+    def verificar_stock(self, instantanea: bool = False) -> bool:
+        """
+        Compara el stock de todo el catálogo con el libro de movimientos
+
+        Args:
+            instantanea: Si todo coincide, guarda una instantánea del stock
+                         de los productos con movimientos nuevos
+
+        Returns:
+            True si el stock coincide con el libro
+        """
+        import movimientos
+        try:
+            inicio = time.perf_counter()
+            discrepancias = movimientos.verificar(self.conn)
+            segundos = time.perf_counter() - inicio
+            if discrepancias:
+                print(f"⚠️  {len(discrepancias)} productos no coinciden con el libro de movimientos:")
+                for d in discrepancias[:20]:
+                    print(f"   - [{d.producto_id}] {d.nombre or '(eliminado)'}: "
+                          f"stock {d.stock_actual if d.stock_actual is not None else '-'}, "
+                          f"libro {d.stock_libro}")
+                if len(discrepancias) > 20:
+                    print(f"   ... y {len(discrepancias) - 20} más")
+                return False
+            print(f"✅ El stock coincide con el libro de movimientos ({segundos:.2f}s)")
+
+            if instantanea:
+                with transaccion_escritura(self.conn):
+                    creadas = movimientos.tomar_instantanea(self.conn)
+                print(f"📸 Instantánea de {creadas} productos con movimientos nuevos")
+            return True
+
+        except sqlite3.Error as e:
+            print(f"❌ Error al verificar el stock: {e}")
+            return False
+
+    def estado_cache(self, formato: str = 'tabla') -> bool:
+        """
+        Muestra la memoria por producto y la tasa de aciertos de la caché del catálogo
+
+        En un comando suelto la caché se carga solo para medirla; en el REPL
+        y el servidor muestra lo acumulado en la sesión.
+
+        Args:
+            formato: 'tabla' o 'json'
+
+        Returns:
+            False si hubo un error
+        """
+        try:
+            self.usar_cache = True
+            if self.cache_vigente() is None:
+                print("⚠️  Hay una transacción abierta; la caché no está en uso")
+                return False
+            datos = self._cache.resumen()
+        except sqlite3.Error as e:
+            print(f"❌ Error al cargar la caché de productos: {e}")
+            return False
+
+        if formato == 'json':
+            json.dump(datos, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+            return True
+        tasa = f"{datos['tasa_aciertos']:.1%}" if datos['tasa_aciertos'] is not None else 'N/A'
+        print(f"🗃️  Caché del catálogo: {datos['productos']} productos "
+              f"({datos['codigos']} con código de barras)")
+        print(f"   Memoria: {datos['bytes_por_producto']:.0f} bytes por producto "
+              f"(~{datos['bytes_por_producto'] * datos['productos'] / 1024 / 1024:.1f} MB)")
+        print(f"   Lecturas: {datos['lecturas']} | Aciertos: {datos['aciertos']} ({tasa})")
+        print(f"   Refrescos: {datos['refrescos']} ({datos['filas_releidas']} filas releídas, "
+              f"{datos['bajas']} bajas, {datos['segundos_refresco']:.3f}s)")
+        print(f"   Carga completa: {datos['segundos_carga']:.3f}s")
+        return True
+
+    def vigilar(self, umbrales: Optional[List[Tuple[str, Optional[int]]]] = None,
+                desde: Optional[int] = None,
+                intervalo: Optional[float] = None,
+                duracion: Optional[float] = None) -> bool:
+        """
+        Emite como líneas JSON las alertas de stock bajo que aparecen o se resuelven
+
+        Empieza con las alertas activas (tipo 'activa') salvo que se indique
+        desde qué evento continuar. Los mensajes van a stderr para que
+        stdout solo tenga JSON.
+
+        Args:
+            umbrales: (categoría, mínimo) a guardar antes de vigilar; mínimo
+                      None quita el umbral de la categoría
+            desde: Id del último evento ya procesado
+            intervalo: Segundos entre revisiones (por defecto alertas_stock.INTERVALO_DEFAULT_S)
+            duracion: Segundos a vigilar (None: hasta Ctrl+C)
+
+        Returns:
+            False si hubo un error
+        """
+        import alertas_stock
+        if intervalo is None:
+            intervalo = alertas_stock.INTERVALO_DEFAULT_S
+        try:
+            if umbrales:
+                with transaccion_escritura(self.conn):
+                    for categoria, minimo in umbrales:
+                        alertas_stock.fijar_umbral(self.conn, categoria, minimo)
+            vigentes = alertas_stock.umbrales(self.conn)
+            texto = ', '.join(f"{c}={m}" for c, m in vigentes.items()) or 'stock mínimo de cada producto'
+            self._aviso(f"👀 Vigilando alertas de stock (umbrales: {texto})")
+            alertas_stock.emitir_json(alertas_stock.vigilar(self.conn, desde, intervalo, duracion))
+            return True
+        except KeyboardInterrupt:
+            return True
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return False
+        except sqlite3.Error as e:
+            print(f"❌ Error al vigilar las alertas de stock: {e}", file=sys.stderr)
+            return False
+
+    def respaldar(self, directorio: Optional[str] = None, completo: bool = False,
+                  paginas: Optional[int] = None, nivel: Optional[int] = None,
+                  verificar: bool = False) -> bool:
+        """
+        Respalda la base en línea, sin detener las ventas
+
+        Args:
+            directorio: Directorio de respaldos (por defecto <base>_respaldos)
+            completo: Respaldo completo aunque haya uno anterior
+            paginas: Páginas por paso de la copia (por defecto un paso con
+                     WAL y respaldos.PAGINAS_POR_PASO sin WAL)
+            nivel: Nivel de compresión gzip (1-9, por defecto respaldos.NIVEL_COMPRESION)
+            verificar: Restaura el respaldo en un temporal y comprueba su integridad
+
+        Returns:
+            False si hubo un error
+        """
+        # gzip y hashlib solo se cargan en los comandos que respaldan
+        import respaldos
+        if nivel is None:
+            nivel = respaldos.NIVEL_COMPRESION
+        directorio = directorio or respaldos.directorio_default(self.db_path)
+        try:
+            datos = respaldos.respaldar(self.conn, directorio, completo, paginas, nivel)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        except (sqlite3.Error, OSError) as e:
+            print(f"❌ Error al respaldar la base de datos: {e}")
+            return False
+
+        mb = 1024 * 1024
+        copia = datos['copia']
+        print(f"✅ Respaldo {datos['tipo']} {datos['nombre']}: {datos['paginas_escritas']:,} de "
+              f"{datos['paginas']:,} páginas en {datos['segundos']:.2f}s")
+        print(f"💾 {datos['bytes_base'] / mb:.1f} MB -> {datos['bytes'] / mb:.2f} MB comprimidos "
+              f"en {os.path.join(directorio, datos['archivo'])}")
+        velocidad = datos['bytes_base'] / mb / copia['segundos'] if copia['segundos'] else 0
+        pasos = (f"{copia['pasos']} pasos de {copia['paginas_por_paso']} páginas"
+                 if copia['paginas_por_paso'] > 0 else "un paso")
+        print(f"🚀 Copia en línea: {velocidad:,.0f} MB/s en {pasos}; "
+              f"paso más largo {copia['paso_max_s'] * 1000:.1f} ms")
+        if copia['reinicios']:
+            detalle = ', lo que faltaba se copió en un solo paso' if copia['un_paso'] else ''
+            print(f"⚠️  La copia se reinició {copia['reinicios']} veces por escrituras de otras "
+                  f"conexiones{detalle}")
+
+        if verificar:
+            try:
+                comprobado = respaldos.verificar(directorio, datos['nombre'])
+            except (ValueError, sqlite3.Error) as e:
+                print(f"❌ El respaldo no pasó la verificación: {e}")
+                return False
+            print(f"🔍 Restauración de prueba idéntica e íntegra ({len(comprobado['aplicados'])} "
+                  f"respaldos aplicados, {comprobado['segundos']:.2f}s)")
+        return True
+
+    def reprecio(self, regla: "precios.Regla", vigente_desde: Optional[str] = None,
+                 simular: bool = False, limit: int = 20) -> bool:
+        """
+        Cambia el precio de todos los productos que cumplen la regla
+
+        Args:
+            regla: Tipo y valor del cambio, filtros y redondeo
+            vigente_desde: AAAA-MM-DD o AAAA-MM-DD HH:MM (UTC); si es futura
+                           la regla queda programada
+            simular: Solo muestra lo que cambiaría
+            limit: Cambios de ejemplo a mostrar al simular
+
+        Returns:
+            False si la regla no es válida o hubo un error
+        """
+        import precios
+        try:
+            vigencia = precios.normalizar_vigencia(vigente_desde) if vigente_desde else None
+            if simular:
+                datos = precios.simular(self.conn, regla, limit)
+            else:
+                datos = precios.reprecio(self.conn, regla, vigencia)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        except sqlite3.Error as e:
+            print(f"❌ Error al cambiar precios: {e}")
+            return False
+
+        if not simular:
+            if datos['programada']:
+                print(f"🗓️  Regla {datos['regla_id']}: {datos['productos']} precios programados "
+                      f"desde {datos['vigente_desde']} UTC")
+            else:
+                print(f"✅ Regla {datos['regla_id']}: {datos['productos']} precios actualizados "
+                      f"en {datos['segundos']:.2f}s")
+            return True
+
+        print(f"\n🔎 SIMULACIÓN: {datos['productos']} productos cambiarían de precio\n")
+        if datos['muestra']:
+            print(f"{'ID':<7} {'Nombre':<32} {'Precio':>10} {'Nuevo':>10} {'Cambio':>9}")
+            print("-" * 72)
+            for id_prod, nombre, precio, nuevo in datos['muestra']:
+                cambio = (nuevo - precio) / precio * 100 if precio else 0
+                print(f"{id_prod:<7} {nombre[:30]:<32} {precio:>10.2f} {nuevo:>10.2f} {cambio:>+8.1f}%")
+            print("-" * 72)
+        print(f"💰 Valor del inventario: ${datos['valor_antes']:,.2f} -> ${datos['valor_despues']:,.2f}")
+        return True
+
+    def precios_programados(self, cancelar: Optional[int] = None) -> bool:
+        """
+        Muestra las reglas con precios pendientes, o cancela una
+
+        Returns:
+            False si hubo un error o la regla no tenía precios pendientes
+        """
+        import precios
+        try:
+            if cancelar is not None:
+                with transaccion_escritura(self.conn):
+                    quitados = precios.cancelar(self.conn, cancelar)
+                if not quitados:
+                    print(f"❌ La regla {cancelar} no tiene precios pendientes")
+                    return False
+                print(f"✅ {quitados} precios programados de la regla {cancelar} cancelados")
+                return True
+            pendientes = precios.programadas(self.conn)
+        except sqlite3.Error as e:
+            print(f"❌ Error al consultar los precios programados: {e}")
+            return False
+
+        if not pendientes:
+            print("📭 No hay precios programados")
+            return True
+        print("\n🗓️  PRECIOS PROGRAMADOS\n")
+        print(f"{'Regla':<7} {'Vigente desde (UTC)':<21} {'Productos':>10}  {'Descripción'}")
+        print("-" * 70)
+        for p in pendientes:
+            print(f"{p.regla_id if p.regla_id is not None else '-':<7} {p.vigente_desde:<21} "
+                  f"{p.productos:>10}  {p.descripcion or ''}")
+        print("-" * 70)
+        return True
+
+    def historial_precios(self, producto_id: int, fecha: Optional[str] = None,
+                          limit: int = 20, formato: str = 'tabla') -> bool:
+        """
+        Muestra los cambios de precio de un producto, o su precio en una fecha
+
+        Args:
+            producto_id: ID del producto
+            fecha: AAAA-MM-DD (al final del día) o AAAA-MM-DD HH:MM:SS, también futura
+            limit: Cambios a mostrar
+            formato: 'tabla' o 'json'
+
+        Returns:
+            False si hubo un error
+        """
+        import movimientos
+        import precios
+        try:
+            if fecha:
+                fecha = movimientos.normalizar_fecha(fecha)
+                precio = precios.precio_en(self.conn, producto_id, fecha)
+            else:
+                cambios = precios.historial(self.conn, producto_id, limit)
+        except sqlite3.Error as e:
+            print(f"❌ Error al consultar el historial de precios: {e}")
+            return False
+
+        if fecha:
+            if formato == 'json':
+                json.dump({'producto_id': producto_id, 'fecha': fecha, 'precio': precio}, sys.stdout)
+                print()
+            elif precio is None:
+                print(f"⚠️  El producto {producto_id} no existía en {fecha}")
+            else:
+                print(f"🏷️  Precio del producto {producto_id} en {fecha}: ${precio:.2f}")
+            return True
+
+        if formato == 'json':
+            json.dump({'filas': [c._asdict() for c in cambios]}, sys.stdout, ensure_ascii=False)
+            print()
+            return True
+        if not cambios:
+            print(f"🏷️  El producto {producto_id} no tiene cambios de precio registrados")
+            return True
+        print(f"\n🏷️  HISTORIAL DE PRECIOS DEL PRODUCTO {producto_id}\n")
+        print(f"{'Fecha':<21} {'Anterior':>10} {'Precio':>10}  {'Regla'}")
+        print("-" * 70)
+        for c in cambios:
+            anterior = f"{c.precio_anterior:.2f}" if c.precio_anterior is not None else 'alta'
+            regla = f"{c.regla_id}: {c.regla}" if c.regla_id is not None else ''
+            print(f"{c.fecha:<21} {anterior:>10} {c.precio:>10.2f}  {regla}")
+        print("-" * 70)
+        return True
+
+    def eliminar_producto(self, producto_id: int):
+        """
+        Elimina un producto del inventario
+        
+        Args:
+            producto_id: ID del producto a eliminar
+        """
+        try:
+            try:
+                producto = inventario.eliminar_producto(self.conn, producto_id)
+            except inventario.ProductoConVentas as e:
+                print(f"⚠️  Advertencia: {e}")
+                try:
+                    respuesta = input("¿Desea continuar con la eliminación? (s/n): ")
+                except EOFError:
+                    respuesta = 'n'
+                if respuesta.lower() != 's':
+                    print("❌ Operación cancelada")
+                    return
+                producto = inventario.eliminar_producto(self.conn, producto_id, forzar=True)
+            self._olvidar_producto(producto_id)
+            
+            print(f"✅ Producto '{producto.nombre}' eliminado exitosamente")
+            
+        except inventario.ProductoNoEncontrado as e:
+            print(f"❌ {e}")
+        except sqlite3.Error as e:
+            print(f"❌ Error al eliminar producto: {e}")
+
+
+def ejecutar_sucursales(args: argparse.Namespace, busy_timeout_ms: Optional[int] = None) -> bool:
+    """
+    Ejecuta una operación del comando sucursales en todas las sucursales
+
+    Returns:
+        False si no se pudo leer el registro o alguna sucursal falló
+    """
+    import sucursales
+    try:
+        registradas = sucursales.cargar(args.sucursales)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+
+    if args.operacion == 'lista':
+        if args.formato == 'json':
+            json.dump([s._asdict() for s in registradas], sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        else:
+            print(f"\n🏬 SUCURSALES ({len(registradas)})\n")
+            for sucursal in registradas:
+                print(f"   {sucursal.nombre:<20} {sucursal.db}")
+            print()
+        return True
+
+    coordinador = sucursales.Coordinador(registradas, busy_timeout_ms, args.hilos)
+    try:
+        if args.operacion == 'existencias':
+            resultado = coordinador.existencias(args.codigo)
+        elif args.operacion == 'buscar':
+            resultado = coordinador.buscar(args.termino, args.limit)
+        elif args.operacion == 'stock-bajo':
+            resultado = coordinador.stock_bajo(args.limit or None)
+        elif args.operacion == 'estadisticas':
+            resultado = coordinador.estadisticas()
+        else:
+            resultado = coordinador.reporte(args.tipo, args.desde, args.hasta, args.top)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+
+    if args.formato == 'json':
+        json.dump(resultado.como_dict(), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        _imprimir_sucursales(args, resultado)
+    for nombre, error in resultado.errores.items():
+        print(f"❌ Sucursal '{nombre}': {error}", file=sys.stderr)
+    return not resultado.errores
+
+
+def ejecutar_restaurar(args: argparse.Namespace) -> bool:
+    """
+    Lista los respaldos o restaura uno en args.destino
+
+    Returns:
+        False si no hay respaldos o la base restaurada no pasó la verificación
+    """
+    import respaldos
+    directorio = args.directorio or respaldos.directorio_default(args.db)
+    try:
+        if args.lista or not args.destino:
+            disponibles = respaldos.leer_indice(directorio)
+            if not disponibles:
+                print(f"📭 No hay respaldos en {directorio}")
+                return True
+            print(f"\n🗄️  RESPALDOS EN {directorio}\n")
+            print(f"{'Nombre':<20} {'Tipo':<12} {'Fecha':<20} {'Páginas':>14} {'MB':>9}")
+            print("-" * 79)
+            for r in disponibles:
+                print(f"{r['nombre']:<20} {r['tipo']:<12} {r['fecha']:<20} "
+                      f"{r['paginas_escritas']:>6}/{r['paginas']:<7} {r['bytes'] / 1024 / 1024:>9.2f}")
+            print("-" * 79)
+            return True
+        datos = respaldos.restaurar(directorio, args.destino, args.hasta)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    except sqlite3.Error as e:
+        print(f"❌ Error al verificar la base restaurada: {e}")
+        return False
+    print(f"✅ Respaldo {datos['respaldo']} restaurado en {args.destino} "
+          f"({datos['bytes'] / 1024 / 1024:.1f} MB, {len(datos['aplicados'])} respaldos aplicados, "
+          f"{datos['segundos']:.2f}s)")
+    print("🔍 Idéntica a la copia original; integrity_check: ok")
+    return True
+
+
+def _imprimir_sucursales(args: argparse.Namespace, resultado: "sucursales.Resultado"):
+    """Tabla de una operación del comando sucursales"""
+    import sucursales
+    datos = resultado.datos
+    if args.operacion == 'existencias':
+        if not datos:
+            print(f"📭 Ninguna sucursal tiene el código {args.codigo}")
+        else:
+            print(f"\n📦 {datos[0]['nombre']} ({args.codigo})\n")
+            print(f"{'Sucursal':<20} {'Stock':>8} {'Mínimo':>8} {'Precio':>12} {'Ubicación':<15}")
+            print("-" * 67)
+            for fila in datos:
+                print(f"{fila['sucursal'][:19]:<20} {fila['stock_actual']:>8} {fila['stock_minimo']:>8} "
+                      f"{'$' + format(fila['precio'], ',.2f'):>12} {fila['ubicacion'] or 'N/A':<15}")
+            print("-" * 67)
+            print(f"📦 Total: {sum(f['stock_actual'] or 0 for f in datos)} piezas en {len(datos)} sucursales")
+    elif args.operacion == 'buscar':
+        if not datos:
+            print(f"📭 No se encontraron productos con '{args.termino}'")
+        for fila in datos:
+            detalle = ', '.join(f"{nombre}: {stock}" for nombre, stock in fila['stock'].items())
+            print(f"🔹 {fila['nombre']} ({fila['codigo_barras'] or 'sin código'}) "
+                  f"${fila['precio']:.2f} | Stock total: {fila['stock_total']} ({detalle})")
+    elif args.operacion == 'stock-bajo':
+        print("\n⚠️  ALERTA: STOCK BAJO EN LAS SUCURSALES\n")
+        print(f"{'Sucursal':<15} {'ID':<6} {'Nombre':<30} {'Código':<15} {'Stock':<8} {'Mínimo':<8}")
+        print("-" * 87)
+        for fila in datos:
+            print(f"{fila['sucursal'][:14]:<15} {fila['id']:<6} {fila['nombre'][:28]:<30} "
+                  f"{fila['codigo_barras'] or 'N/A':<15} {fila['stock_actual']:<8} {fila['stock_minimo']:<8}")
+        print("-" * 87)
+        print(f"⚠️  {len(datos)} alertas")
+    elif args.operacion == 'estadisticas':
+        total = datos['total']
+        print("\n📊 ESTADÍSTICAS DE TODAS LAS SUCURSALES\n")
+        print(f"{'Sucursal':<20} {'Productos':>10} {'Inventario':>16} {'Stock bajo':>11} "
+              f"{'Ventas':>10} {'Monto':>16}")
+        print("-" * 88)
+        for nombre, d in list(datos['sucursales'].items()) + [('TOTAL', total)]:
+            print(f"{nombre[:19]:<20} {d['total_productos']:>10} "
+                  f"{'$' + format(d['valor_inventario'], ',.2f'):>16} {d['productos_stock_bajo']:>11} "
+                  f"{d['total_ventas']:>10} {'$' + format(d['monto_ventas'], ',.2f'):>16}")
+        print("-" * 88)
+        print(f"📅 Ventas de hoy: {total['ventas_hoy']} (${total['monto_hoy']:,.2f})")
+        if total['mas_vendido']:
+            mejor = total['mas_vendido']
+            print(f"🏆 Más vendido en una sucursal: {mejor['nombre']} "
+                  f"({mejor['unidades']} unidades en {mejor['sucursal']})")
+    else:
+        ancho_clave = 16 if args.tipo == 'productos' else 28
+        print(f"\n📈 REPORTE DE VENTAS POR {args.tipo.upper()} EN TODAS LAS SUCURSALES\n")
+        nombre = f" {'Nombre':<32}" if args.tipo == 'productos' else ''
+        print(f"{'Clave':<{ancho_clave}}{nombre} {'Ventas':>10} {'Unidades':>12} {'Monto':>16}")
+        for fila in datos:
+            nombre = f" {fila['nombre'][:30]:<32}" if args.tipo == 'productos' else ''
+            print(f"{str(fila['clave'])[:ancho_clave - 1]:<{ancho_clave}}{nombre} {fila['ventas']:>10} "
+                  f"{fila['unidades']:>12} {'$' + format(fila['monto'], ',.2f'):>16}")
+    if args.quiet:
+        return
+    mas_lenta = max(resultado.segundos_por_sucursal.values(), default=0)
+    print(f"⏱️  {len(resultado.segundos_por_sucursal)} sucursales en {resultado.segundos:.3f}s "
+          f"(la más lenta: {mas_lenta:.3f}s)", file=sys.stderr)
+
+
+def configurar_perfilado(args: argparse.Namespace) -> Optional["perfilado.Perfilador"]:
+    """
+    Activa el perfilado si se pidió con --profile o con TLAPALERIA_PERFIL
+
+    Las opciones de la línea de comandos reemplazan a las del entorno.
+
+    Returns:
+        El perfilador activo, o None
+    """
+    # --profile-salida implica --profile; sin ruta, la traza va a stderr
+    traza = args.profile_salida or ('-' if args.profile else None)
+    if traza is None and not os.environ.get("TLAPALERIA_PERFIL"):
+        return None
+    import perfilado
+    perfilador = perfilado.desde_entorno()
+    if perfilador is None:
+        if traza is None:
+            return None
+        perfilador = perfilado.Perfilador(traza=traza)
+    elif traza is not None:
+        perfilador.traza = traza
+    if args.profile_lentas_ms is not None:
+        perfilador.umbral = args.profile_lentas_ms / 1000
+    if args.profile_log_lentas:
+        perfilador.log_lentas = args.profile_log_lentas
+    elif perfilador.log_lentas is None:
+        perfilador.log_lentas = os.path.splitext(args.db)[0] + '_consultas_lentas.log'
+    if args.profile_prometheus:
+        perfilador.prometheus = args.profile_prometheus
+    perfilado.activar(perfilador)
+    return perfilador
+
+
+def medir_comando(nombre: str):
+    """perfilado.comando() si algo activó el perfilado; si no, un bloque que no hace nada"""
+    # Sin el módulo cargado no puede haber perfilador activo, y así los
+    # comandos sin --profile no lo importan
+    perfilado = sys.modules.get('perfilado')
+    if perfilado is None:
+        return nullcontext()
+    return perfilado.comando(nombre)
+
+
+# Registro de subcomandos
+#
+# Cada subcomando es una entrada de COMANDOS: su ayuda, la función que lo
+# ejecuta y la que agrega sus argumentos. construir_parser() solo registra los
+# nombres; los argumentos (y los módulos de sus valores por defecto) se
+# construyen cuando argparse elige el subcomando, así cada ejecución paga solo
+# el suyo. ejecutar recibe (cli, args, parser) y devuelve False si el comando
+# falló, lo que termina el proceso con código 1.
+
+class Comando(NamedTuple):
+    """Subcomando de la CLI registrado en COMANDOS"""
+    ayuda: str
+    ejecutar: Callable[[Optional[TlapaleriaCLI], argparse.Namespace, argparse.ArgumentParser],
+                       Optional[bool]]
+    argumentos: Optional[Callable[[argparse.ArgumentParser], None]] = None
+    # False: no abre la base de --db (cli llega como None fuera de una sesión)
+    base: bool = True
+
+
+class _SubparserDiferido(argparse.ArgumentParser):
+    """Subparser que agrega sus argumentos la primera vez que se usa"""
+
+    def __init__(self, *args, argumentos: Optional[Callable] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._argumentos = argumentos
+
+    def _completar(self):
+        if self._argumentos is not None:
+            argumentos, self._argumentos = self._argumentos, None
+            argumentos(self)
+
+    def parse_known_args(self, args=None, namespace=None):
+        self._completar()
+        return super().parse_known_args(args, namespace)
+
+    def format_usage(self):
+        self._completar()
+        return super().format_usage()
+
+    def format_help(self):
+        self._completar()
+        return super().format_help()
+
+
+def _argumentos_listar(parser: argparse.ArgumentParser):
+    parser.add_argument('--limit', type=parsear_limite, default=50,
+                        help='Número máximo de productos a mostrar')
+    parser.add_argument('--after', metavar='TOKEN', help='Continúa después de la página anterior')
+    parser.add_argument('--format', dest='formato', choices=salida.FORMATOS, default='tabla',
+                        help='Formato de salida')
+
+
+def _argumentos_buscar(parser: argparse.ArgumentParser):
+    parser.add_argument('termino', help='Término de búsqueda')
+    parser.add_argument('--limit', type=parsear_limite, default=20, help='Resultados por página')
+    parser.add_argument('--pagina', type=int, default=1, help='Número de página')
+    parser.add_argument('--subcadena', action='store_true',
+                        help='Busca el texto en cualquier parte de la palabra (más lento)')
+
+
+def _argumentos_agregar(parser: argparse.ArgumentParser):
+    parser.add_argument('nombre', help='Nombre del producto')
+    parser.add_argument('precio', type=float, help='Precio del producto')
+    parser.add_argument('--stock', type=int, default=0, help='Stock inicial')
+    parser.add_argument('--codigo', help='Código de barras')
+    parser.add_argument('--descripcion', help='Descripción del producto')
+    parser.add_argument('--stock-minimo', type=int, default=10, help='Stock mínimo')
+    parser.add_argument('--categoria', help='Categoría del producto')
+    parser.add_argument('--ubicacion', help='Ubicación en la tienda')
+    parser.add_argument('--proveedor', help='Nombre del proveedor')
+
+
+def _argumentos_importar(parser: argparse.ArgumentParser):
+    import catalogo
+    parser.add_argument('archivo', help='Archivo .csv o .jsonl')
+    parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Formato del archivo')
+    parser.add_argument('--lote', type=int, default=catalogo.TAMANO_LOTE_DEFAULT,
+                        help='Filas por transacción')
+
+
+def _argumentos_exportar(parser: argparse.ArgumentParser):
+    import catalogo
+    parser.add_argument('archivo', help="Archivo de salida ('-' para la salida estándar)")
+    parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Formato del archivo')
+    parser.add_argument('--lote', type=int, default=catalogo.TAMANO_LOTE_DEFAULT,
+                        help='Filas leídas por lote')
+
+
+def _argumentos_actualizar_stock(parser: argparse.ArgumentParser):
+    parser.add_argument('id', type=int, help='ID del producto')
+    parser.add_argument('stock', type=int, help='Nuevo valor de stock')
+
+
+def _argumentos_stock_bajo(parser: argparse.ArgumentParser):
+    parser.add_argument('--limit', type=parsear_limite, default=None, help='Productos por página')
+    parser.add_argument('--after', metavar='TOKEN', help='Continúa después de la página anterior')
+    parser.add_argument('--format', dest='formato', choices=salida.FORMATOS, default='tabla',
+                        help='Formato de salida')
+
+
+def _argumentos_reabastecer(parser: argparse.ArgumentParser):
+    parser.add_argument('--historia', type=int, metavar='DIAS',
+                        help='Días de ventas a analizar (por defecto: 365)')
+    parser.add_argument('--entrega', type=int, metavar='DIAS',
+                        help='Días de entrega del proveedor (por defecto: 7)')
+    parser.add_argument('--cobertura', type=int, metavar='DIAS',
+                        help='Días de venta que cubre cada pedido (por defecto: 30)')
+    parser.add_argument('--proveedor', help='Solo productos de este proveedor')
+    parser.add_argument('--limit', type=int, default=None, help='Productos a mostrar')
+    parser.add_argument('--todos', action='store_true',
+                        help='Incluye productos que no necesitan pedido')
+    parser.add_argument('--format', dest='formato', choices=salida.FORMATOS, default='tabla',
+                        help='Formato de salida')
+
+
+def _argumentos_reporte(parser: argparse.ArgumentParser):
+    import reportes
+    parser.add_argument('tipo', choices=reportes.TIPOS, help='Tipo de reporte')
+    parser.add_argument('--desde', metavar='AAAA-MM-DD', help='Primer día incluido')
+    parser.add_argument('--hasta', metavar='AAAA-MM-DD', help='Último día incluido')
+    parser.add_argument('--top', type=int, default=reportes.TOP_DEFAULT,
+                        help='Productos a mostrar en el reporte productos')
+    parser.add_argument('--procesos', type=int, default=None,
+                        help='Procesos en paralelo (por defecto uno por CPU)')
+    parser.add_argument('--format', dest='formato', choices=salida.FORMATOS, default='tabla',
+                        help='Formato de salida')
+    parser.add_argument('--verificar', action='store_true',
+                        help='Compara con el cálculo en un solo proceso')
+
+
+def _argumentos_venta(parser: argparse.ArgumentParser):
+    parser.add_argument('producto_id', type=int, help='ID del producto')
+    parser.add_argument('cantidad', type=int, help='Cantidad vendida')
+    parser.add_argument('--usuario', type=int, default=1, help='ID del usuario')
+
+
+def _argumentos_venta_lote(parser: argparse.ArgumentParser):
+    parser.add_argument('lineas', nargs='*', type=parsear_linea_venta,
+                        help='Líneas del ticket en formato ID:CANTIDAD')
+    parser.add_argument('--archivo', help='Archivo CSV o JSONL con tickets')
+    parser.add_argument('--tickets-por-commit', type=int, default=1,
+                        help='Tickets agrupados en cada commit')
+    parser.add_argument('--usuario', type=int, default=1, help='ID del usuario')
+
+
+def _ejecutar_venta_lote(cli: TlapaleriaCLI, args: argparse.Namespace,
+                         parser: argparse.ArgumentParser):
+    if args.archivo:
+        try:
+            tickets = leer_tickets(args.archivo)
+        except (OSError, ValueError) as e:
+            print(f"❌ Error al leer tickets: {e}")
+            return False
+    elif args.lineas:
+        tickets = [{'lineas': args.lineas}]
+    else:
+        parser.error("venta-lote requiere líneas ID:CANTIDAD o --archivo")
+    return cli.registrar_venta_lote(tickets, args.usuario, args.tickets_por_commit)['fallo'] is None
+
+
+def _argumentos_escanear(parser: argparse.ArgumentParser):
+    parser.add_argument('codigo', help='Código de barras completo')
+    parser.add_argument('--vender', type=int, default=0, metavar='CANTIDAD',
+                        help='Registra la venta de esta cantidad')
+    parser.add_argument('--usuario', type=int, default=1, help='ID del usuario')
+
+
+def _argumentos_recalcular(parser: argparse.ArgumentParser):
+    parser.add_argument('--verificar', action='store_true',
+                        help='Solo compara con el cálculo completo, sin reconstruir')
+
+
+def _argumentos_archivar(parser: argparse.ArgumentParser):
+    grupo_corte = parser.add_mutually_exclusive_group()
+    grupo_corte.add_argument('--antes-de', metavar='AAAA-MM-DD',
+                             help='Archiva las ventas anteriores al mes de esta fecha')
+    grupo_corte.add_argument('--meses', type=int, default=12,
+                             help='Meses completos que se conservan en la base (por defecto 12)')
+    parser.add_argument('--archivo', metavar='RUTA',
+                        help='Archivo histórico (por defecto <base>_archivo.db)')
+    parser.add_argument('--sin-compactar', action='store_true',
+                        help='No ejecuta VACUUM al terminar')
+
+
+def _argumentos_conteo(parser: argparse.ArgumentParser):
+    parser.add_argument('archivo', nargs='?', default='-',
+                        help="Códigos escaneados, uno por línea o CODIGO,CANTIDAD "
+                             "('-' o sin archivo: entrada estándar)")
+    grupo_alcance = parser.add_mutually_exclusive_group()
+    grupo_alcance.add_argument('--completo', action='store_true',
+                               help='Conteo de todo el catálogo: lo no escaneado queda en 0')
+    grupo_alcance.add_argument('--categoria', help='Conteo de una categoría completa')
+    grupo_alcance.add_argument('--ubicacion', help='Conteo de un área (prefijo de ubicación)')
+    parser.add_argument('--simular', action='store_true',
+                        help='Solo muestra las diferencias, sin ajustar el stock')
+    parser.add_argument('--usuario', type=int, default=1, help='ID del usuario')
+    parser.add_argument('--limit', type=int, default=20, help='Diferencias a mostrar')
+    parser.add_argument('--format', dest='formato', choices=salida.FORMATOS, default='tabla',
+                        help='Formato de salida')
+
+
+def _ejecutar_conteo(cli: TlapaleriaCLI, args: argparse.Namespace,
+                     parser: argparse.ArgumentParser) -> bool:
+    if args.completo:
+        alcance, valor = 'completo', None
+    elif args.categoria:
+        alcance, valor = 'categoria', args.categoria
+    elif args.ubicacion:
+        alcance, valor = 'ubicacion', args.ubicacion
+    else:
+        alcance, valor = 'contados', None
+    return cli.conteo_fisico(args.archivo, alcance, valor, args.simular, args.usuario,
+                             args.limit, args.formato)
+
+
+def _argumentos_movimientos(parser: argparse.ArgumentParser):
+    parser.add_argument('id', type=int, help='ID del producto')
+    parser.add_argument('--en', metavar='FECHA',
+                        help='Stock al final de AAAA-MM-DD (o en AAAA-MM-DD HH:MM:SS)')
+    parser.add_argument('--limit', type=int, default=20, help='Movimientos a mostrar')
+    parser.add_argument('--format', dest='formato', choices=salida.FORMATOS,
+                        default='tabla', help='Formato de salida')
+
+
+def _argumentos_verificar_stock(parser: argparse.ArgumentParser):
+    parser.add_argument('--instantanea', action='store_true',
+                        help='Si coincide, guarda una instantánea del stock')
+
+
+def _argumentos_cache(parser: argparse.ArgumentParser):
+    parser.add_argument('--format', dest='formato', choices=('tabla', 'json'),
+                        default='tabla', help='Formato de salida')
+
+
+def _argumentos_vigilar(parser: argparse.ArgumentParser):
+    import alertas_stock
+    parser.add_argument('--umbral', action='append', metavar='CATEGORIA=N', default=[],
+                        help='Umbral de stock bajo de una categoría (CATEGORIA= lo quita); '
+                             'se guarda en la base')
+    parser.add_argument('--desde', type=int, metavar='EVENTO',
+                        help='Continúa después de este evento sin repetir las alertas activas')
+    parser.add_argument('--intervalo', type=float, default=alertas_stock.INTERVALO_DEFAULT_S,
+                        help='Segundos entre revisiones')
+    parser.add_argument('--duracion', type=float, metavar='SEGUNDOS',
+                        help='Termina después de estos segundos')
+
+
+def _ejecutar_vigilar(cli: TlapaleriaCLI, args: argparse.Namespace,
+                      parser: argparse.ArgumentParser) -> bool:
+    import alertas_stock
+    try:
+        umbrales = [alertas_stock.parsear_umbral(texto) for texto in args.umbral]
+    except ValueError as e:
+        parser.error(str(e))
+    return cli.vigilar(umbrales, args.desde, args.intervalo, args.duracion)
+
+
+def _argumentos_respaldar(parser: argparse.ArgumentParser):
+    import respaldos
+    parser.add_argument('--directorio', metavar='RUTA',
+                        help='Directorio de respaldos (por defecto <base>_respaldos)')
+    parser.add_argument('--completo', action='store_true',
+                        help='Respaldo completo aunque haya uno anterior')
+    parser.add_argument('--paginas', type=int, default=None,
+                        help=f'Páginas por paso de la copia (por defecto un solo paso '
+                             f'con WAL, {respaldos.PAGINAS_POR_PASO} sin WAL)')
+    parser.add_argument('--nivel', type=int, choices=range(1, 10),
+                        default=respaldos.NIVEL_COMPRESION, metavar='1-9',
+                        help='Nivel de compresión gzip')
+    parser.add_argument('--verificar', action='store_true',
+                        help='Restaura el respaldo en un temporal y comprueba su integridad')
+
+
+def _argumentos_restaurar(parser: argparse.ArgumentParser):
+    parser.add_argument('destino', nargs='?',
+                        help='Archivo de la base restaurada (no debe existir)')
+    parser.add_argument('--directorio', metavar='RUTA',
+                        help='Directorio de respaldos (por defecto <base>_respaldos)')
+    parser.add_argument('--hasta', metavar='NOMBRE',
+                        help='Respaldo a restaurar (por defecto el más reciente)')
+    parser.add_argument('--lista', action='store_true',
+                        help='Solo muestra los respaldos disponibles')
+
+
+def _argumentos_reprecio(parser: argparse.ArgumentParser):
+    grupo_cambio = parser.add_mutually_exclusive_group()
+    grupo_cambio.add_argument('--porcentaje', type=float, metavar='P',
+                              help='Sube (o baja, con negativo) los precios P%%')
+    grupo_cambio.add_argument('--monto', type=float, metavar='M', help='Suma M a los precios')
+    grupo_cambio.add_argument('--precio', type=float, metavar='X', help='Fija el precio en X')
+    grupo_cambio.add_argument('--programados', action='store_true',
+                              help='Muestra las reglas con precios pendientes')
+    grupo_cambio.add_argument('--cancelar', type=int, metavar='REGLA',
+                              help='Cancela los precios pendientes de una regla')
+    parser.add_argument('--categoria', help='Solo productos de esta categoría')
+    parser.add_argument('--proveedor', help='Solo productos de este proveedor')
+    parser.add_argument('--todos', action='store_true',
+                        help='Todo el catálogo (sin --categoria ni --proveedor)')
+    parser.add_argument('--redondeo', type=float, metavar='R',
+                        help='Redondea los precios nuevos al múltiplo de R más cercano')
+    parser.add_argument('--desde', metavar='FECHA',
+                        help="Programa los precios desde AAAA-MM-DD o 'AAAA-MM-DD HH:MM' (UTC)")
+    parser.add_argument('--descripcion', help='Motivo del cambio (se guarda con la regla)')
+    parser.add_argument('--simular', action='store_true',
+                        help='Solo muestra cuántos productos y cuánto cambiarían')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='Cambios de ejemplo a mostrar al simular')
+
+
+def _ejecutar_reprecio(cli: TlapaleriaCLI, args: argparse.Namespace,
+                       parser: argparse.ArgumentParser) -> bool:
+    import precios
+    if args.programados or args.cancelar is not None:
+        return cli.precios_programados(args.cancelar)
+    if args.porcentaje is not None:
+        tipo, valor = 'porcentaje', args.porcentaje
+    elif args.monto is not None:
+        tipo, valor = 'monto', args.monto
+    elif args.precio is not None:
+        tipo, valor = 'precio', args.precio
+    else:
+        parser.error("reprecio necesita --porcentaje, --monto o --precio")
+    if not (args.categoria or args.proveedor or args.todos):
+        parser.error("reprecio necesita --categoria, --proveedor o --todos")
+    regla = precios.Regla(tipo, valor, args.categoria, args.proveedor, args.redondeo,
+                          args.descripcion)
+    return cli.reprecio(regla, args.desde, args.simular, args.limit)
+
+
+def _argumentos_precios(parser: argparse.ArgumentParser):
+    parser.add_argument('id', type=int, help='ID del producto')
+    parser.add_argument('--en', metavar='FECHA',
+                        help='Precio al final de AAAA-MM-DD (o en AAAA-MM-DD HH:MM:SS)')
+    parser.add_argument('--limit', type=int, default=20, help='Cambios a mostrar')
+    parser.add_argument('--format', dest='formato', choices=('tabla', 'json'),
+                        default='tabla', help='Formato de salida')
+
+
+def _argumentos_eliminar(parser: argparse.ArgumentParser):
+    parser.add_argument('id', type=int, help='ID del producto a eliminar')
+
+
+def _argumentos_servidor(parser: argparse.ArgumentParser):
+    parser.add_argument('--socket', default=SOCKET_PATH_DEFAULT,
+                        help=f'Ruta del socket (por defecto: {SOCKET_PATH_DEFAULT})')
+
+
+def _ejecutar_sesion(cli: Optional[TlapaleriaCLI], args: argparse.Namespace,
+                     parser: argparse.ArgumentParser):
+    import servidor_cli
+    if args.comando == 'repl':
+        servidor_cli.repl(args.db, args.busy_timeout)
+    else:
+        servidor_cli.servir(args.db, args.socket, args.busy_timeout)
+
+
+def _argumentos_servicio(parser: argparse.ArgumentParser):
+    parser.add_argument('--socket', default=SOCKET_SERVICIO_DEFAULT,
+                        help=f'Ruta del socket (por defecto: {SOCKET_SERVICIO_DEFAULT})')
+    parser.add_argument('--lectores', type=int, default=4,
+                        help='Conexiones de solo lectura en paralelo (por defecto 4)')
+    parser.add_argument('--agrupar-ms', type=int, default=None, metavar='MS',
+                        help='Agrupa cambios de stock y ventas en una transacción cada MS')
+    parser.add_argument('--agrupar-max', type=int, default=1000, metavar='N',
+                        help='Operaciones máximas por transacción agrupada')
+    parser.add_argument('--diario', metavar='RUTA',
+                        help='Diario de las escrituras agrupadas (por defecto <base>_escrituras.diario)')
+
+
+def _ejecutar_servicio(cli: Optional[TlapaleriaCLI], args: argparse.Namespace,
+                       parser: argparse.ArgumentParser) -> bool:
+    import asyncio
+    import servicio
+    try:
+        asyncio.run(servicio.servir(args.db, args.socket, args.lectores, args.busy_timeout,
+                                    args.agrupar_ms, args.agrupar_max, args.diario))
+    except sqlite3.Error as e:
+        print(f"❌ Error al iniciar el servicio: {e}")
+        return False
+    return True
+
+
+def _argumentos_sucursales(parser: argparse.ArgumentParser):
+    import reportes
+    import sucursales
+    parser.add_argument('--hilos', type=int, default=None,
+                        help='Sucursales consultadas a la vez (por defecto todas)')
+    parser.add_argument('--format', dest='formato', choices=('tabla', 'json'),
+                        default='tabla', help='Formato de salida')
+    operaciones = parser.add_subparsers(dest='operacion', metavar='OPERACION')
+    operaciones.required = True
+    operaciones.add_parser('lista', help='Sucursales registradas')
+    parser_existencias = operaciones.add_parser(
+        'existencias', help='Stock de un código de barras en cada sucursal')
+    parser_existencias.add_argument('codigo', help='Código de barras')
+    parser_buscar = operaciones.add_parser('buscar', help='Busca en todas las sucursales')
+    parser_buscar.add_argument('termino', help='Término de búsqueda')
+    parser_buscar.add_argument('--limit', type=int, default=sucursales.LIMITE_DEFAULT,
+                               help='Productos a mostrar')
+    parser_bajo = operaciones.add_parser('stock-bajo', help='Alertas de todas las sucursales')
+    parser_bajo.add_argument('--limit', type=int, default=sucursales.LIMITE_DEFAULT,
+                             help='Alertas a mostrar (0: todas)')
+    operaciones.add_parser('estadisticas', help='Totales y detalle por sucursal')
+    parser_reporte = operaciones.add_parser('reporte', help='Reporte de ventas combinado')
+    parser_reporte.add_argument('tipo', choices=reportes.TIPOS, help='Tipo de reporte')
+    parser_reporte.add_argument('--desde', metavar='AAAA-MM-DD', help='Primer día incluido')
+    parser_reporte.add_argument('--hasta', metavar='AAAA-MM-DD', help='Último día incluido')
+    parser_reporte.add_argument('--top', type=int, default=reportes.TOP_DEFAULT,
+                                help='Productos a mostrar en el reporte productos')
+
+
+def _ejecutar_sucursales(cli: Optional[TlapaleriaCLI], args: argparse.Namespace,
+                         parser: argparse.ArgumentParser) -> bool:
+    # Fuera de una sesión no hay cli: la espera viene de --busy-timeout
+    busy_timeout_ms = cli.busy_timeout_ms if cli else args.busy_timeout
+    with medir_comando(args.comando):
+        return ejecutar_sucursales(args, busy_timeout_ms)
+
+
+COMANDOS: Dict[str, Comando] = {
+    'listar': Comando(
+        'Lista todos los productos',
+        lambda cli, args, _: cli.listar_productos(args.limit, args.after, args.formato),
+        _argumentos_listar),
+    'buscar': Comando(
+        'Busca productos por nombre, código o descripción',
+        lambda cli, args, _: cli.buscar_producto(args.termino, args.limit, args.pagina,
+                                                 args.subcadena),
+        _argumentos_buscar),
+    'reindexar': Comando(
+        'Reconstruye el índice de búsqueda',
+        lambda cli, args, _: cli.reindexar()),
+    'agregar': Comando(
+        'Agrega un nuevo producto',
+        lambda cli, args, _: cli.agregar_producto(
+            nombre=args.nombre, precio=args.precio, stock=args.stock, codigo_barras=args.codigo,
+            descripcion=args.descripcion, stock_minimo=args.stock_minimo,
+            categoria=args.categoria, ubicacion=args.ubicacion, proveedor=args.proveedor),
+        _argumentos_agregar),
+    'importar': Comando(
+        'Importa productos desde CSV o JSONL',
+        lambda cli, args, _: cli.importar_catalogo(args.archivo, args.formato, args.lote),
+        _argumentos_importar),
+    'exportar': Comando(
+        'Exporta el catálogo a CSV o JSONL',
+        lambda cli, args, _: cli.exportar_catalogo(args.archivo, args.formato, args.lote),
+        _argumentos_exportar),
+    'actualizar-stock': Comando(
+        'Actualiza el stock de un producto',
+        lambda cli, args, _: cli.actualizar_stock(args.id, args.stock),
+        _argumentos_actualizar_stock),
+    'stock-bajo': Comando(
+        'Muestra productos con stock bajo',
+        lambda cli, args, _: cli.stock_bajo(args.limit, args.after, args.formato),
+        _argumentos_stock_bajo),
+    'reabastecer': Comando(
+        'Lista de compra sugerida según el pronóstico de demanda',
+        lambda cli, args, _: cli.reabastecer(args.historia, args.entrega, args.cobertura,
+                                             args.proveedor, args.limit, args.todos, args.formato),
+        _argumentos_reabastecer),
+    'reporte': Comando(
+        'Reportes de ventas por día, categoría, proveedor, usuario o productos',
+        lambda cli, args, _: cli.reporte(args.tipo, args.desde, args.hasta, args.top,
+                                         args.procesos, args.formato, args.verificar),
+        _argumentos_reporte),
+    'venta': Comando(
+        'Registra una venta',
+        lambda cli, args, _: cli.registrar_venta(args.producto_id, args.cantidad, args.usuario),
+        _argumentos_venta),
+    'venta-lote': Comando(
+        'Registra uno o varios tickets de venta', _ejecutar_venta_lote, _argumentos_venta_lote),
+    'escanear': Comando(
+        'Consulta o vende un producto por código de barras',
+        lambda cli, args, _: cli.escanear(args.codigo, args.vender, args.usuario),
+        _argumentos_escanear),
+    'estadisticas': Comando(
+        'Muestra estadísticas del sistema',
+        lambda cli, args, _: cli.estadisticas()),
+    'recalcular': Comando(
+        'Reconstruye y verifica las estadísticas materializadas',
+        lambda cli, args, _: cli.recalcular(args.verificar),
+        _argumentos_recalcular),
+    'archivar': Comando(
+        'Mueve las ventas antiguas a un archivo histórico',
+        lambda cli, args, _: cli.archivar(args.antes_de, args.meses, args.archivo,
+                                          not args.sin_compactar),
+        _argumentos_archivar),
+    'conteo': Comando(
+        'Concilia un conteo físico (códigos escaneados) y ajusta el stock',
+        _ejecutar_conteo, _argumentos_conteo),
+    'movimientos': Comando(
+        'Movimientos de stock de un producto o su stock en una fecha',
+        lambda cli, args, _: cli.movimientos_producto(args.id, args.en, args.limit, args.formato),
+        _argumentos_movimientos),
+    'verificar-stock': Comando(
+        'Compara el stock de todo el catálogo con el libro de movimientos',
+        lambda cli, args, _: cli.verificar_stock(args.instantanea),
+        _argumentos_verificar_stock),
+    'cache': Comando(
+        'Memoria y tasa de aciertos de la caché del catálogo (repl y servidor)',
+        lambda cli, args, _: cli.estado_cache(args.formato),
+        _argumentos_cache),
+    'vigilar': Comando(
+        'Emite en JSON las alertas de stock bajo nuevas o resueltas',
+        _ejecutar_vigilar, _argumentos_vigilar),
+    'respaldar': Comando(
+        'Respaldo en línea, incremental y comprimido, de la base',
+        lambda cli, args, _: cli.respaldar(args.directorio, args.completo, args.paginas,
+                                           args.nivel, args.verificar),
+        _argumentos_respaldar),
+    # Solo lee el directorio de respaldos; la base de --db no se abre
+    'restaurar': Comando(
+        'Reconstruye la base desde los respaldos y comprueba su integridad',
+        lambda cli, args, _: ejecutar_restaurar(args),
+        _argumentos_restaurar, base=False),
+    'reprecio': Comando(
+        'Cambia precios en masa por categoría o proveedor, ahora o en una fecha',
+        _ejecutar_reprecio, _argumentos_reprecio),
+    'precios': Comando(
+        'Historial de precios de un producto o su precio en una fecha',
+        lambda cli, args, _: cli.historial_precios(args.id, args.en, args.limit, args.formato),
+        _argumentos_precios),
+    'eliminar': Comando(
+        'Elimina un producto',
+        lambda cli, args, _: cli.eliminar_producto(args.id),
+        _argumentos_eliminar),
+    # Los modos persistentes abren su propia conexión
+    'repl': Comando(
+        'Sesión interactiva con una conexión persistente', _ejecutar_sesion, base=False),
+    'servidor': Comando(
+        'Servidor en socket Unix que acepta comandos como JSON por línea',
+        _ejecutar_sesion, _argumentos_servidor, base=False),
+    'servicio': Comando(
+        'Servicio JSON concurrente: un hilo escritor y varios lectores',
+        _ejecutar_servicio, _argumentos_servicio, base=False),
+    # Cada sucursal abre su propia base
+    'sucursales': Comando(
+        'Consultas sobre todas las sucursales a la vez',
+        _ejecutar_sucursales, _argumentos_sucursales, base=False),
+}
+
+
+def construir_parser(comando: Optional[str] = None) -> argparse.ArgumentParser:
+    """
+    Construye el parser con las opciones globales y los subcomandos de COMANDOS
+
+    Los argumentos de cada subcomando se agregan hasta que se usa (ver
+    _SubparserDiferido).
+
+    Args:
+        comando: Registra solo este subcomando (main ya sabe cuál se pidió);
+                 sin él, todos, como necesitan la ayuda general y las sesiones
+    """
+    parser = argparse.ArgumentParser(
+        description="🛠️  Tlapalería CLI - Sistema de gestión para tlapalería",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  python tlapaleria_cli.py listar
+  python tlapaleria_cli.py buscar "martillo"
+  python tlapaleria_cli.py agregar "Martillo" 250.50 --stock 10 --categoria "Herramientas"
+  python tlapaleria_cli.py stock-bajo
+  python tlapaleria_cli.py reabastecer --proveedor "Ferretería Nacional"
+  python tlapaleria_cli.py reporte categoria --desde 2024-01-01 --hasta 2024-12-31
+  python tlapaleria_cli.py venta 1 2
+  python tlapaleria_cli.py escanear 7501234567890 --vender 1
+  python tlapaleria_cli.py --quiet venta 1 2
+  python tlapaleria_cli.py venta-lote 1:2 3:1 7:4
+  python tlapaleria_cli.py venta-lote --archivo tickets.csv --tickets-por-commit 50
+  python tlapaleria_cli.py estadisticas
+  python tlapaleria_cli.py archivar --meses 12
+  python tlapaleria_cli.py conteo escaneos.txt --ubicacion "Pasillo B" --simular
+  python tlapaleria_cli.py movimientos 24 --en 2024-06-30
+  python tlapaleria_cli.py verificar-stock --instantanea
+  python tlapaleria_cli.py reprecio --porcentaje 8 --proveedor "Truper" --redondeo 0.5 --desde 2024-07-01
+  python tlapaleria_cli.py precios 24 --en 2024-06-30
+  python tlapaleria_cli.py respaldar --verificar
+  python tlapaleria_cli.py restaurar /tmp/restaurada.db
+  python tlapaleria_cli.py servidor --socket /tmp/tlapaleria.sock
+  python tlapaleria_cli.py servicio --lectores 8
+  python tlapaleria_cli.py --sucursal centro stock-bajo
+  python tlapaleria_cli.py sucursales existencias 7501234567890
+  python tlapaleria_cli.py --profile reporte productos
+  python tlapaleria_cli.py --profile-salida perfil.jsonl --profile-prometheus tlapaleria.prom reporte dia
+        """
+    )
+    parser.add_argument('--db', default=DB_PATH_DEFAULT,
+                        help=f'Ruta a la base de datos (por defecto: {DB_PATH_DEFAULT})')
+    parser.add_argument('--sucursal', metavar='NOMBRE',
+                        help='Usa la base de esta sucursal en lugar de --db')
+    parser.add_argument('--sucursales', metavar='RUTA',
+                        help='Directorio o JSON con las bases de las sucursales '
+                             '(por defecto: $TLAPALERIA_SUCURSALES o backend/sucursales)')
+    parser.add_argument('--busy-timeout', type=int, default=None, metavar='MS',
+                        help='Espera máxima por bloqueos de otros procesos en milisegundos')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Omite los avisos de conexión, progreso y tiempos (errores sí)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Mide las consultas del comando y escribe su traza JSON en stderr')
+    parser.add_argument('--profile-salida', metavar='RUTA',
+                        help='Agrega la traza JSON a RUTA en lugar de stderr (implica --profile)')
+    parser.add_argument('--profile-lentas-ms', type=float, default=None, metavar='MS',
+                        help='Umbral de las consultas lentas '
+                             '(por defecto: $TLAPALERIA_PERFIL_LENTAS_MS o 50)')
+    parser.add_argument('--profile-log-lentas', metavar='RUTA',
+                        help='Log de consultas lentas (por defecto junto a la base)')
+    parser.add_argument('--profile-prometheus', metavar='RUTA',
+                        help='Archivo de métricas en formato de texto de Prometheus')
+    
+    subparsers = parser.add_subparsers(dest='comando', help='Comandos disponibles',
+                                       parser_class=_SubparserDiferido)
+    for nombre, entrada in COMANDOS.items():
+        if comando is None or nombre == comando:
+            subparsers.add_parser(nombre, help=entrada.ayuda, argumentos=entrada.argumentos)
+    
+    return parser
+
+
+# Opciones globales cuyo valor va en el siguiente argumento
+_OPCIONES_CON_VALOR = ('--db', '--sucursal', '--sucursales', '--busy-timeout',
+                       '--profile-salida', '--profile-lentas-ms', '--profile-log-lentas',
+                       '--profile-prometheus')
+
+
+def comando_pedido(argv: List[str]) -> Optional[str]:
+    """
+    Subcomando de argv sin construir el parser completo
+
+    Returns:
+        El nombre del subcomando, o None si se pidió la ayuda general o no es
+        seguro saberlo (por ejemplo con opciones abreviadas); entonces main
+        construye el parser con todos los subcomandos
+    """
+    valor = False
+    for texto in argv:
+        if valor:
+            valor = False
+        elif texto in _OPCIONES_CON_VALOR:
+            valor = True
+        elif texto in ('-h', '--help'):
+            return None
+        elif not texto.startswith('-'):
+            return texto if texto in COMANDOS else None
+    return None
+
+
+def ejecutar_comando(cli: TlapaleriaCLI, args: argparse.Namespace,
+                     parser: argparse.ArgumentParser):
+    """
+    Ejecuta un subcomando ya interpretado con la instancia del CLI
+
+    Args:
+        cli: Instancia de TlapaleriaCLI; abre la base la primera vez que se usa
+        args: Argumentos devueltos por el parser
+        parser: Parser usado, para reportar errores de uso
+    """
+    entrada = COMANDOS[args.comando]
+    if entrada.base and cli.conectado:
+        # En una sesión persistente la base ya está abierta: los precios
+        # programados vencidos entran en vigor antes de leer o vender (al
+        # abrirla, _connect ya lo hace)
+        cli.precios_al_dia()
+    if entrada.ejecutar(cli, args, parser) is False:
+        sys.exit(1)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Función principal que maneja los argumentos de línea de comandos"""
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = construir_parser(comando_pedido(argv))
+    args = parser.parse_args(argv)
+    
+    if not args.comando:
+        parser.print_help()
+        return
+    
+    configurar_perfilado(args)
+    try:
+        ejecutar_principal(args, parser)
+    finally:
+        # Métricas pendientes del perfilado (también de servidor y servicio)
+        perfilado = sys.modules.get('perfilado')
+        if perfilado is not None:
+            perfilado.cerrar()
+
+
+def ejecutar_principal(args: argparse.Namespace, parser: argparse.ArgumentParser):
+    """Ejecuta el comando ya interpretado: un comando suelto o un modo persistente"""
+    if args.sucursal:
+        import sucursales
+        try:
+            args.db = sucursales.ruta_de(args.sucursal, args.sucursales)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    entrada = COMANDOS[args.comando]
+    if not entrada.base:
+        if entrada.ejecutar(None, args, parser) is False:
+            sys.exit(1)
+        return
+    
+    # La apertura y las migraciones cuentan como parte del comando
+    with medir_comando(args.comando):
+        cli = TlapaleriaCLI(args.db, args.busy_timeout, silencioso=args.quiet)
+        try:
+            ejecutar_comando(cli, args, parser)
+        finally:
+            cli.close()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Operaciones del inventario sin interfaz: consultas y escrituras que devuelven
+resultados tipados
+
+Ninguna función imprime ni pide confirmación; las reglas del negocio que
+rechazan una operación (producto inexistente, stock insuficiente, código de
+barras repetido, producto con ventas) se señalan con excepciones derivadas
+de ErrorInventario. La CLI (tlapaleria_cli.py) presenta estos resultados en
+la terminal y el servicio asíncrono (servicio.py) los atiende para muchos
+clientes a la vez.
+
+Todas las funciones reciben la conexión: no guardan estado, así que pueden
+usarse desde cualquier hilo que sea dueño de su propia conexión. Las
+escrituras usan transaccion_escritura (BEGIN IMMEDIATE con reintentos).
+"""
+
+import sqlite3
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import precios
+import salida
+from conexion_db import transaccion_escritura
+
+COLUMNAS_PRODUCTO = ('id', 'nombre', 'descripcion', 'codigo_barras', 'precio', 'stock_actual',
+                     'stock_minimo', 'categoria', 'ubicacion', 'proveedor')
+
+
+class Producto(NamedTuple):
+    """Fila de productos (mismo orden que COLUMNAS_PRODUCTO)"""
+    id: int
+    nombre: str
+    descripcion: Optional[str]
+    codigo_barras: Optional[str]
+    precio: float
+    stock_actual: int
+    stock_minimo: int
+    categoria: Optional[str]
+    ubicacion: Optional[str]
+    proveedor: Optional[str]
+
+
+class Pagina(NamedTuple):
+    """Página de un listado y token de la siguiente (None si es la última)"""
+    productos: List[Producto]
+    siguiente: Optional[str]
+
+
+class Venta(NamedTuple):
+    """Venta registrada y stock que quedó del producto"""
+    id: int
+    producto_id: int
+    nombre: str
+    cantidad: int
+    precio_unitario: float
+    total: float
+    stock_restante: int
+
+
+class Estadisticas(NamedTuple):
+    """Estadísticas generales leídas de los resúmenes (ver resumenes.leer)"""
+    total_productos: int
+    valor_inventario: float
+    productos_stock_bajo: int
+    total_ventas: int
+    monto_ventas: float
+    mas_vendido: Optional[Tuple[str, int]]
+    ventas_hoy: int
+    monto_hoy: float
+
+
+class ErrorInventario(ValueError):
+    """Operación rechazada por una regla del inventario"""
+
+
+class ProductoNoEncontrado(ErrorInventario):
+    def __init__(self, producto_id: int):
+        super().__init__(f"No se encontró producto con ID: {producto_id}")
+        self.producto_id = producto_id
+
+
+class StockInsuficiente(ErrorInventario):
+    def __init__(self, producto_id: int, disponible: int, solicitado: int):
+        super().__init__(f"Stock insuficiente. Disponible: {disponible}, Solicitado: {solicitado}")
+        self.producto_id = producto_id
+        self.disponible = disponible
+        self.solicitado = solicitado
+
+
+class CantidadInvalida(ErrorInventario):
+    def __init__(self, producto_id: int, cantidad: int):
+        super().__init__(f"Cantidad inválida para producto {producto_id}: {cantidad}")
+        self.producto_id = producto_id
+        self.cantidad = cantidad
+
+
+class CodigoDuplicado(ErrorInventario):
+    def __init__(self, codigo_barras: Optional[str]):
+        super().__init__("El código de barras ya existe en el sistema")
+        self.codigo_barras = codigo_barras
+
+
+class ProductoConVentas(ErrorInventario):
+    def __init__(self, producto_id: int, ventas: int):
+        super().__init__(f"Este producto tiene {ventas} ventas registradas")
+        self.producto_id = producto_id
+        self.ventas = ventas
+
+
+_SELECT_PRODUCTO = f"SELECT {', '.join(COLUMNAS_PRODUCTO)} FROM productos"
+
+
+def _producto(fila: Optional[Sequence]) -> Optional[Producto]:
+    return Producto(*fila) if fila is not None else None
+
+
+def obtener_producto(conn: sqlite3.Connection, producto_id: int) -> Optional[Producto]:
+    """Producto por ID, o None si no existe"""
+    return _producto(conn.execute(f"{_SELECT_PRODUCTO} WHERE id = ?", (producto_id,)).fetchone())
+
+
+def producto_por_codigo(conn: sqlite3.Connection, codigo: str) -> Optional[Producto]:
+    """Producto por código de barras exacto (índice UNIQUE), o None si no existe"""
+    return _producto(conn.execute(f"{_SELECT_PRODUCTO} WHERE codigo_barras = ?",
+                                  (codigo,)).fetchone())
+
+
+def consultar_productos(conn: sqlite3.Connection, limite: int, despues: Optional[str] = None,
+                        columnas: Sequence[str] = COLUMNAS_PRODUCTO) -> sqlite3.Cursor:
+    """
+    Ejecuta el listado ordenado por (nombre, id) a partir de un token de página
+
+    Pide limite + 1 filas para saber si hay otra página (ver salida.emitir).
+
+    Raises:
+        ValueError: Si el token o el límite no son válidos
+    """
+    salida.validar_limite(limite)
+    condicion = ""
+    parametros: List = []
+    if despues:
+        condicion = "WHERE (nombre, id) > (?, ?)"
+        parametros = salida.decodificar_cursor(despues, 2)
+    return conn.execute(f"""
+        SELECT {', '.join(columnas)}
+        FROM productos
+        {condicion}
+        ORDER BY nombre, id
+        LIMIT ?
+    """, (*parametros, limite + 1))
+
+
+def consultar_stock_bajo(conn: sqlite3.Connection, limite: Optional[int] = None,
+                         despues: Optional[str] = None,
+                         columnas: Sequence[str] = COLUMNAS_PRODUCTO) -> sqlite3.Cursor:
+    """
+    Ejecuta la consulta de stock bajo ordenada por (stock_actual, id)
+
+    Lee la lista de alertas (alertas_stock.py): recorre solo los productos en
+    alerta y stock_minimo es el umbral en efecto (el de la categoría si tiene).
+    Con limite None trae todos los productos; si no, pide limite + 1 filas.
+
+    Raises:
+        ValueError: Si el token o el límite no son válidos
+    """
+    import alertas_stock
+    salida.validar_limite(limite)
+    return alertas_stock.consultar(conn, limite, despues, columnas)
+
+
+def en_alerta(conn: sqlite3.Connection, producto_id: int) -> bool:
+    """
+    Si el producto está en la lista de alertas de stock bajo
+
+    Es la misma fuente que stock-bajo y estadisticas: respeta el umbral de la
+    categoría, que stock_minimo del producto no refleja.
+    """
+    return conn.execute("SELECT 1 FROM alertas_stock WHERE producto_id = ?",
+                        (producto_id,)).fetchone() is not None
+
+
+def _paginar(cursor: sqlite3.Cursor, limite: Optional[int], clave_orden) -> Pagina:
+    filas = cursor.fetchall()
+    hay_mas = limite is not None and len(filas) > limite
+    productos = [Producto(*fila) for fila in (filas[:limite] if hay_mas else filas)]
+    siguiente = salida.codificar_cursor(clave_orden(productos[-1])) if hay_mas else None
+    return Pagina(productos, siguiente)
+
+
+def listar(conn: sqlite3.Connection, limite: int = 50, despues: Optional[str] = None) -> Pagina:
+    """Página de productos ordenados por nombre"""
+    return _paginar(consultar_productos(conn, limite, despues), limite,
+                    lambda p: (p.nombre, p.id))
+
+
+def stock_bajo(conn: sqlite3.Connection, limite: Optional[int] = None,
+               despues: Optional[str] = None) -> Pagina:
+    """Página de productos en alerta de stock bajo, los más escasos primero"""
+    return _paginar(consultar_stock_bajo(conn, limite, despues), limite,
+                    lambda p: (p.stock_actual, p.id))
+
+
+def buscar(conn: sqlite3.Connection, termino: str, limite: int = 20, pagina: int = 1,
+           usar_fts: bool = True) -> List[Producto]:
+    """Busca productos por relevancia (ver busqueda.buscar)"""
+    import busqueda
+    filas = busqueda.buscar(conn, termino, limite, (max(pagina, 1) - 1) * limite, usar_fts)
+    return [Producto(*fila) for fila in filas]
+
+
+def estadisticas(conn: sqlite3.Connection) -> Estadisticas:
+    """Estadísticas generales desde las tablas de resumen"""
+    import resumenes
+    return Estadisticas(**resumenes.leer(conn))
+
+
+def agregar_producto(conn: sqlite3.Connection, nombre: str, precio: float, stock: int = 0,
+                     codigo_barras: Optional[str] = None, descripcion: Optional[str] = None,
+                     stock_minimo: int = 10, categoria: Optional[str] = None,
+                     ubicacion: Optional[str] = None,
+                     proveedor: Optional[str] = None) -> Producto:
+    """
+    Agrega un producto al inventario
+
+    Raises:
+        CodigoDuplicado: Si el código de barras ya está registrado
+    """
+    try:
+        with transaccion_escritura(conn):
+            cursor = conn.execute("""
+                INSERT INTO productos
+                (nombre, descripcion, codigo_barras, precio, stock_actual,
+                 stock_minimo, categoria, ubicacion, proveedor)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (nombre, descripcion, codigo_barras, precio, stock,
+                  stock_minimo, categoria, ubicacion, proveedor))
+    except sqlite3.IntegrityError:
+        raise CodigoDuplicado(codigo_barras)
+    return Producto(cursor.lastrowid, nombre, descripcion, codigo_barras, precio, stock,
+                    stock_minimo, categoria, ubicacion, proveedor)
+
+
+def actualizar_stock(conn: sqlite3.Connection, producto_id: int, nuevo_stock: int) -> Producto:
+    """
+    Fija el stock de un producto
+
+    Raises:
+        ProductoNoEncontrado: Si el producto no existe
+    """
+    with transaccion_escritura(conn):
+        cursor = conn.execute("""
+            UPDATE productos
+            SET stock_actual = ?, fecha_actualizacion = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (nuevo_stock, producto_id))
+        if cursor.rowcount == 0:
+            raise ProductoNoEncontrado(producto_id)
+        producto = obtener_producto(conn, producto_id)
+    return producto
+
+
+def registrar_venta(conn: sqlite3.Connection, producto_id: int, cantidad: int,
+                    usuario_id: int = 1) -> Venta:
+    """
+    Registra una venta y descuenta el stock
+
+    BEGIN IMMEDIATE: nadie más puede vender el mismo stock entre la
+    verificación y el descuento. Los precios programados que ya vencieron
+    se aplican antes de leer el precio.
+
+    Raises:
+        CantidadInvalida: Si la cantidad no es positiva
+        ProductoNoEncontrado: Si el producto no existe
+        StockInsuficiente: Si no hay stock para la cantidad pedida
+    """
+    # Una cantidad negativa pasaría la verificación de stock y lo aumentaría
+    if cantidad <= 0:
+        raise CantidadInvalida(producto_id, cantidad)
+    with transaccion_escritura(conn):
+        precios.al_dia(conn)
+        fila = conn.execute(
+            "SELECT nombre, precio, stock_actual FROM productos WHERE id = ?", (producto_id,)
+        ).fetchone()
+        if not fila:
+            raise ProductoNoEncontrado(producto_id)
+        nombre, precio, stock_actual = fila
+        if stock_actual < cantidad:
+            raise StockInsuficiente(producto_id, stock_actual, cantidad)
+
+        total = precio * cantidad
+        venta_id = conn.execute("""
+            INSERT INTO ventas (producto_id, usuario_id, cantidad, precio_unitario, total)
+            VALUES (?, ?, ?, ?, ?)
+        """, (producto_id, usuario_id, cantidad, precio, total)).lastrowid
+        conn.execute("""
+            UPDATE productos
+            SET stock_actual = stock_actual - ?, fecha_actualizacion = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (cantidad, producto_id))
+    return Venta(venta_id, producto_id, nombre, cantidad, precio, total, stock_actual - cantidad)
+
+
+def eliminar_producto(conn: sqlite3.Connection, producto_id: int,
+                      forzar: bool = False) -> Producto:
+    """
+    Elimina un producto
+
+    Args:
+        forzar: Elimina aunque el producto tenga ventas registradas
+
+    Raises:
+        ProductoNoEncontrado: Si el producto no existe
+        ProductoConVentas: Si tiene ventas y no se pidió forzar
+    """
+    with transaccion_escritura(conn):
+        producto = obtener_producto(conn, producto_id)
+        if producto is None:
+            raise ProductoNoEncontrado(producto_id)
+        if not forzar:
+            ventas = conn.execute("SELECT COUNT(*) FROM ventas WHERE producto_id = ?",
+                                  (producto_id,)).fetchone()[0]
+            if ventas:
+                raise ProductoConVentas(producto_id, ventas)
+        conn.execute("DELETE FROM productos WHERE id = ?", (producto_id,))
+    return producto
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Libro de movimientos de stock e instantáneas para consultar el stock en una fecha
+
+productos.stock_actual se sobrescribe en cada venta o ajuste. Para conservar
+la historia, unos triggers agregan a movimientos_stock un renglón por cada
+cambio de stock (alta del producto, ventas, ajustes, conteos, bajas) con la
+diferencia aplicada. Al estar en triggers se registran todos los caminos que
+cambian el stock: la CLI, el servicio, la cola de escrituras, los conteos y
+el backend de Node. El libro solo crece: nadie actualiza ni borra movimientos.
+
+Las instantáneas (stock_instantaneas) guardan el stock de un producto en un
+momento y el último movimiento que incluyen. El stock en una fecha se obtiene
+con la última instantánea anterior a la fecha (una búsqueda en el índice) más
+los movimientos entre la instantánea y la fecha, que son pocos si las
+instantáneas se toman con regularidad (tomar_instantanea, por ejemplo cada
+noche). Al crear el libro se toma una instantánea de todo el catálogo: antes
+de ella no hay historia.
+
+Las instantáneas se calculan desde el libro, no desde stock_actual, para que
+verificar() detecte cualquier cambio que no haya pasado por el libro.
+"""
+
+import sqlite3
+from typing import List, NamedTuple, Optional
+
+# Fecha posterior a cualquier movimiento: stock_en con ella da el stock actual del libro
+FIN_DE_LOS_TIEMPOS = '9999-12-31 23:59:59'
+
+# Migración 8 de inicializar_db
+SQL_CREAR_LIBRO = [
+    """
+    CREATE TABLE IF NOT EXISTS movimientos_stock (
+        id INTEGER PRIMARY KEY,
+        producto_id INTEGER NOT NULL,
+        fecha DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        cambio INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_movimientos_stock_producto
+    ON movimientos_stock (producto_id, fecha)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_instantaneas (
+        producto_id INTEGER NOT NULL,
+        fecha DATETIME NOT NULL,
+        stock INTEGER NOT NULL,
+        -- Último movimiento incluido en stock
+        movimiento_id INTEGER NOT NULL,
+        PRIMARY KEY (producto_id, fecha)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movimientos_productos_ai AFTER INSERT ON productos BEGIN
+        -- También con stock 0: marca desde cuándo existe el producto
+        INSERT INTO movimientos_stock (producto_id, cambio)
+        VALUES (new.id, COALESCE(new.stock_actual, 0));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movimientos_productos_au AFTER UPDATE OF stock_actual ON productos
+    WHEN new.stock_actual IS NOT old.stock_actual BEGIN
+        INSERT INTO movimientos_stock (producto_id, cambio)
+        VALUES (new.id, COALESCE(new.stock_actual, 0) - COALESCE(old.stock_actual, 0));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movimientos_productos_ad AFTER DELETE ON productos
+    WHEN COALESCE(old.stock_actual, 0) != 0 BEGIN
+        INSERT INTO movimientos_stock (producto_id, cambio) VALUES (old.id, -old.stock_actual);
+    END
+    """,
+    # El punto de partida del libro: el stock de todo el catálogo hoy
+    """
+    INSERT OR IGNORE INTO stock_instantaneas (producto_id, fecha, stock, movimiento_id)
+    SELECT id, CURRENT_TIMESTAMP, COALESCE(stock_actual, 0), 0 FROM productos
+    """,
+]
+
+# Stock de cada producto según el libro: su última instantánea más los
+# movimientos posteriores, en una sola pasada por cada tabla
+_SQL_STOCK_SEGUN_LIBRO = """
+    WITH ultima AS (
+        -- MAX() con columnas sueltas: stock y fecha son los de la fila con
+        -- el movimiento_id más alto de cada producto
+        SELECT producto_id, MAX(movimiento_id) AS movimiento_id, stock
+        FROM stock_instantaneas
+        GROUP BY producto_id
+    ),
+    posteriores AS (
+        SELECT m.producto_id, SUM(m.cambio) AS cambio, MAX(m.id) AS movimiento_id,
+               COUNT(*) AS movimientos
+        FROM movimientos_stock m
+        LEFT JOIN ultima u ON u.producto_id = m.producto_id
+        WHERE m.id > COALESCE(u.movimiento_id, 0)
+        GROUP BY m.producto_id
+    ),
+    libro AS (
+        SELECT u.producto_id, u.stock + COALESCE(p.cambio, 0) AS stock,
+               COALESCE(p.movimiento_id, u.movimiento_id) AS movimiento_id,
+               COALESCE(p.movimientos, 0) AS movimientos
+        FROM ultima u LEFT JOIN posteriores p ON p.producto_id = u.producto_id
+        UNION ALL
+        SELECT p.producto_id, p.cambio, p.movimiento_id, p.movimientos
+        FROM posteriores p
+        WHERE p.producto_id NOT IN (SELECT producto_id FROM ultima)
+    )
+"""
+
+
+class Movimiento(NamedTuple):
+    """Cambio de stock y stock que dejó"""
+    id: int
+    fecha: str
+    cambio: int
+    stock: int
+
+
+class Discrepancia(NamedTuple):
+    """Producto cuyo stock_actual no coincide con el libro"""
+    producto_id: int
+    nombre: Optional[str]
+    stock_actual: Optional[int]
+    stock_libro: int
+
+
+def normalizar_fecha(fecha: str) -> str:
+    """'AAAA-MM-DD' se refiere al final de ese día; una fecha con hora se usa tal cual"""
+    fecha = fecha.strip().replace('T', ' ')
+    return f"{fecha} 23:59:59" if len(fecha) == 10 else fecha
+
+
+def stock_en(conn: sqlite3.Connection, producto_id: int, fecha: str) -> Optional[int]:
+    """
+    Stock de un producto al final de una fecha (o en una fecha y hora)
+
+    Busca la última instantánea anterior en el índice y suma los
+    movimientos entre ella y la fecha.
+
+    Returns:
+        El stock, o None si la fecha es anterior a la historia del producto
+    """
+    fecha = normalizar_fecha(fecha)
+    instantanea = conn.execute("""
+        SELECT fecha, stock, movimiento_id FROM stock_instantaneas
+        WHERE producto_id = ? AND fecha <= ?
+        ORDER BY fecha DESC
+        LIMIT 1
+    """, (producto_id, fecha)).fetchone()
+    desde, stock, movimiento_id = instantanea or ('', 0, 0)
+
+    cambio, movimientos = conn.execute("""
+        SELECT SUM(cambio), COUNT(*) FROM movimientos_stock
+        WHERE producto_id = ? AND fecha >= ? AND fecha <= ? AND id > ?
+    """, (producto_id, desde, fecha, movimiento_id)).fetchone()
+    if instantanea is None and not movimientos:
+        return None
+    return stock + (cambio or 0)
+
+
+def historial(conn: sqlite3.Connection, producto_id: int, limite: int = 20) -> List[Movimiento]:
+    """Últimos movimientos de un producto, el más reciente primero, con el stock que dejó cada uno"""
+    actual = stock_en(conn, producto_id, FIN_DE_LOS_TIEMPOS)
+    if actual is None:
+        return []
+    filas = conn.execute("""
+        SELECT id, fecha, cambio,
+               ? - COALESCE(SUM(cambio) OVER (ORDER BY fecha DESC, id DESC
+                                             ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0)
+        FROM movimientos_stock
+        WHERE producto_id = ?
+        ORDER BY fecha DESC, id DESC
+        LIMIT ?
+    """, (actual, producto_id, limite))
+    return [Movimiento(*fila) for fila in filas]
+
+
+def verificar(conn: sqlite3.Connection) -> List[Discrepancia]:
+    """
+    Compara stock_actual de todo el catálogo con el libro en una sola pasada
+
+    Los productos eliminados deben quedar en 0 en el libro.
+
+    Returns:
+        Productos cuyo stock no coincide (lista vacía si todo cuadra)
+    """
+    filas = conn.execute(_SQL_STOCK_SEGUN_LIBRO + """
+        SELECT p.id, p.nombre, p.stock_actual, COALESCE(l.stock, 0)
+        FROM productos p LEFT JOIN libro l ON l.producto_id = p.id
+        WHERE COALESCE(p.stock_actual, 0) != COALESCE(l.stock, 0)
+        UNION ALL
+        SELECT l.producto_id, NULL, NULL, l.stock
+        FROM libro l
+        WHERE l.stock != 0 AND l.producto_id NOT IN (SELECT id FROM productos)
+        ORDER BY 1
+    """)
+    return [Discrepancia(*fila) for fila in filas]
+
+
+def tomar_instantanea(conn: sqlite3.Connection) -> int:
+    """
+    Guarda el stock según el libro de los productos con movimientos desde su
+    última instantánea (dentro de la transacción actual)
+
+    Returns:
+        Número de instantáneas creadas
+    """
+    antes = conn.total_changes
+    conn.execute(_SQL_STOCK_SEGUN_LIBRO + """
+        INSERT OR IGNORE INTO stock_instantaneas (producto_id, fecha, stock, movimiento_id)
+        SELECT producto_id, CURRENT_TIMESTAMP, stock, movimiento_id
+        FROM libro
+        WHERE movimientos > 0
+    """)
+    # rowcount no se llena en un INSERT que empieza con WITH
+    return conn.total_changes - antes
@@ -0,0 +1,658 @@
+#!/usr/bin/env python3
+"""
+Perfilado de consultas: qué sentencias ejecuta cada comando y cuánto cuestan
+
+Se activa con --profile en la CLI o con TLAPALERIA_PERFIL en el entorno
+(útil para los procesos de larga duración: servidor y servicio). Mientras no
+esté activo, conectar() abre conexiones normales y nada de este módulo está
+en el camino de las consultas.
+
+Activo, conectar() abre las conexiones con ConexionPerfilada. Sus cursores
+miden cada sentencia:
+
+- Tiempo: el de execute() y el de cada fetch/iteración, sin contar lo que
+  haga Python con las filas entre una y otra.
+- Filas devueltas, y filas modificadas (rowcount) en INSERT/UPDATE/DELETE.
+- Pasos de la máquina virtual de SQLite, con set_progress_handler: se cuenta
+  un aviso cada PASOS_POR_AVISO instrucciones, así que la cifra es
+  aproximada (múltiplo de esa cantidad).
+- Sentencias internas, con set_trace_callback: SQLite avisa también de los
+  programas de los triggers y del BEGIN implícito que ejecuta una sentencia.
+
+Las mediciones se agrupan por comando (un comando de la CLI, una petición
+del servidor o del servicio, un lote de la cola de escrituras) y por texto
+de la sentencia. Al terminar el comando:
+
+- Se emite una traza JSON en una línea (a stderr o agregada a un archivo).
+- Las ejecuciones que pasaron de 'lentas_ms' se agregan al log de consultas
+  lentas (JSON por línea) con su EXPLAIN QUERY PLAN.
+- Los contadores se acumulan para el archivo de métricas en formato de
+  texto de Prometheus (para el textfile collector de node_exporter). El
+  archivo se reescribe de forma atómica sumando a lo que ya tenía, así que
+  los contadores crecen a lo largo de muchas ejecuciones de la CLI.
+
+Solo se mide lo que ocurre dentro de un comando y en el hilo que lo abrió;
+cada hilo del servicio lleva su propio comando.
+"""
+
+import fcntl
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Instrucciones de la VM de SQLite entre dos avisos del progress handler
+PASOS_POR_AVISO = 100
+
+LENTAS_MS_DEFAULT = float(os.environ.get("TLAPALERIA_PERFIL_LENTAS_MS", "50"))
+
+# Segundos mínimos entre dos escrituras del archivo de métricas en procesos
+# de larga duración; cerrar() siempre escribe lo pendiente
+INTERVALO_EXPORTACION_S = 10.0
+
+# Ejecuciones lentas que se detallan en la traza de un comando
+LENTAS_EN_TRAZA = 20
+
+# Límites de los buckets del histograma de duración de comandos (segundos)
+BUCKETS_SEGUNDOS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Familias de métricas exportadas: nombre, tipo, ayuda
+METRICAS = (
+    ('tlapaleria_comando_segundos', 'histogram', 'Duración de los comandos'),
+    ('tlapaleria_sentencias_total', 'counter', 'Ejecuciones de sentencias SQL'),
+    ('tlapaleria_sentencias_segundos_total', 'counter', 'Tiempo en sentencias SQL'),
+    ('tlapaleria_sentencias_filas_total', 'counter', 'Filas devueltas por las sentencias'),
+    ('tlapaleria_sentencias_modificadas_total', 'counter', 'Filas modificadas por las sentencias'),
+    ('tlapaleria_sentencias_pasos_vm_total', 'counter', 'Pasos de la VM de SQLite (aproximados)'),
+    ('tlapaleria_sentencias_lentas_total', 'counter', 'Ejecuciones más lentas que el umbral'),
+)
+
+_LINEA_METRICA = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)$')
+
+# Sentencias para las que EXPLAIN QUERY PLAN dice algo útil
+_CON_PLAN = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def normalizar_sql(sql: str) -> str:
+    """Texto de la sentencia en una línea, para agrupar ejecuciones"""
+    return ' '.join(sql.split())
+
+
+def tipo_sentencia(sql: str) -> str:
+    """Primera palabra de la sentencia en mayúsculas (SELECT, UPDATE, ...)"""
+    palabras = sql.split(None, 1)
+    return palabras[0].upper().rstrip(';') if palabras else ''
+
+
+class _Estadistica:
+    """Acumulado de todas las ejecuciones de un mismo texto en un comando"""
+    __slots__ = ('texto', 'sql', 'tipo', 'ejecuciones', 'segundos', 'maximo', 'filas', 'modificadas',
+                 'pasos', 'internas', 'lentas')
+
+    def __init__(self, texto: str):
+        # El texto original se conserva para EXPLAIN: al normalizar, un
+        # comentario '--' se comería el resto de la sentencia
+        self.texto = texto
+        self.sql = normalizar_sql(texto)
+        self.tipo = tipo_sentencia(texto)
+        self.ejecuciones = 0
+        self.segundos = 0.0
+        self.maximo = 0.0
+        self.filas = 0
+        self.modificadas = 0
+        self.pasos = 0
+        self.internas = 0
+        self.lentas = 0
+
+
+class _Medicion:
+    """Una ejecución: de execute() a la última fila leída"""
+    __slots__ = ('estadistica', 'conexion', 'parametros', 'segundos', 'filas', 'pasos',
+                 'internas', 'lenta', 'plan')
+
+    def __init__(self, estadistica: _Estadistica, conexion, parametros):
+        self.estadistica = estadistica
+        self.conexion = conexion
+        self.parametros = parametros
+        self.segundos = 0.0
+        self.filas = 0
+        self.pasos = 0
+        self.internas = -1  # el aviso de la propia sentencia no cuenta
+        self.lenta = False
+        self.plan: List[str] = []
+
+
+class _Traza:
+    """Mediciones de un comando en curso"""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.fecha = datetime.now().isoformat(timespec='milliseconds')
+        self.inicio = time.perf_counter()
+        self.estadisticas: Dict[str, _Estadistica] = {}
+        self.lentas: List[_Medicion] = []
+        self.planes: Dict[str, List[str]] = {}
+
+
+class Perfilador:
+    """
+    Configuración del perfilado y contadores acumulados del proceso
+
+    Uso:
+        perfilado.activar(Perfilador(traza='-', prometheus='/var/lib/node_exporter/tlapaleria.prom'))
+        with perfilado.comando('reporte'):
+            ...
+        perfilado.cerrar()
+    """
+
+    def __init__(self, traza: Optional[str] = '-', lentas_ms: float = LENTAS_MS_DEFAULT,
+                 log_lentas: Optional[str] = None, prometheus: Optional[str] = None,
+                 intervalo_exportacion_s: float = INTERVALO_EXPORTACION_S):
+        """
+        Args:
+            traza: Archivo al que se agrega la traza JSON de cada comando,
+                   '-' para stderr o None para no emitirla
+            lentas_ms: Umbral en milisegundos de una ejecución lenta
+            log_lentas: Archivo JSON por línea de consultas lentas (None: sin log)
+            prometheus: Archivo de métricas en formato de texto de Prometheus
+            intervalo_exportacion_s: Segundos mínimos entre escrituras de las métricas
+        """
+        self.traza = traza
+        self.umbral = lentas_ms / 1000
+        self.log_lentas = log_lentas
+        self.prometheus = prometheus
+        self.intervalo_exportacion_s = intervalo_exportacion_s
+        self._local = threading.local()
+        self._bloqueo = threading.Lock()
+        # (nombre de la muestra, etiquetas) -> valor sumado desde la última exportación
+        self._pendientes: Dict[Tuple[str, str], float] = {}
+        self._ultima_exportacion = time.monotonic()
+
+    # --- Mediciones (hilo del comando) ---
+
+    def _traza_actual(self) -> Optional[_Traza]:
+        return getattr(self._local, 'traza', None)
+
+    def iniciar(self, sql: str, conexion: sqlite3.Connection, parametros) -> Optional[_Medicion]:
+        """Empieza a medir una ejecución si hay un comando en curso en este hilo"""
+        traza = self._traza_actual()
+        if traza is None:
+            return None
+        estadistica = traza.estadisticas.get(sql)
+        if estadistica is None:
+            estadistica = traza.estadisticas[sql] = _Estadistica(sql)
+        estadistica.ejecuciones += 1
+        return _Medicion(estadistica, conexion, parametros)
+
+    def entrar(self, medicion: _Medicion):
+        self._local.medicion = medicion
+
+    def salir(self, medicion: _Medicion, segundos: float, filas: int = 0):
+        """Suma un tramo de la ejecución (execute o un fetch)"""
+        self._local.medicion = None
+        medicion.segundos += segundos
+        medicion.filas += filas
+        estadistica = medicion.estadistica
+        estadistica.segundos += segundos
+        estadistica.filas += filas
+        if medicion.segundos > estadistica.maximo:
+            estadistica.maximo = medicion.segundos
+        if not medicion.lenta and medicion.segundos >= self.umbral:
+            medicion.lenta = True
+            estadistica.lentas += 1
+            traza = self._local.traza
+            traza.lentas.append(medicion)
+            # El plan se pide ahora, mientras la conexión sigue abierta
+            plan = traza.planes.get(estadistica.sql)
+            if plan is None:
+                self._local.explicando = True
+                try:
+                    plan = traza.planes[estadistica.sql] = explicar(
+                        medicion.conexion, estadistica.texto, medicion.parametros)
+                finally:
+                    self._local.explicando = False
+            medicion.plan = plan
+
+    def aviso_progreso(self) -> int:
+        medicion = getattr(self._local, 'medicion', None)
+        if medicion is not None:
+            medicion.pasos += PASOS_POR_AVISO
+            medicion.estadistica.pasos += PASOS_POR_AVISO
+        return 0
+
+    def aviso_sentencia(self, _sql: str):
+        if getattr(self._local, 'explicando', False):
+            return
+        medicion = getattr(self._local, 'medicion', None)
+        if medicion is not None:
+            medicion.internas += 1
+            if medicion.internas > 0:
+                medicion.estadistica.internas += 1
+
+    # --- Comandos ---
+
+    @contextmanager
+    def comando(self, nombre: str) -> Iterator[None]:
+        """
+        Mide las sentencias que ejecute este hilo hasta salir del bloque
+
+        Un comando dentro de otro se mide como parte del de afuera.
+
+        Args:
+            nombre: Nombre del comando en la traza y en las métricas
+        """
+        if self._traza_actual() is not None:
+            yield
+            return
+        traza = self._local.traza = _Traza(nombre)
+        try:
+            yield
+        finally:
+            self._local.traza = None
+            self._local.medicion = None
+            self._terminar(traza)
+
+    def _terminar(self, traza: _Traza):
+        segundos = time.perf_counter() - traza.inicio
+        lentas = [{
+            'sql': medicion.estadistica.sql,
+            'ms': round(medicion.segundos * 1000, 3),
+            'filas': medicion.filas,
+            'pasos_vm': medicion.pasos,
+            'plan': medicion.plan,
+        } for medicion in traza.lentas]
+
+        estadisticas = sorted(traza.estadisticas.values(), key=lambda e: e.segundos, reverse=True)
+        resumen = {
+            'comando': traza.nombre,
+            'fecha': traza.fecha,
+            'pid': os.getpid(),
+            'ms': round(segundos * 1000, 3),
+            'ms_sql': round(sum(e.segundos for e in estadisticas) * 1000, 3),
+            'ejecuciones': sum(e.ejecuciones for e in estadisticas),
+            'filas': sum(e.filas for e in estadisticas),
+            'pasos_vm': sum(e.pasos for e in estadisticas),
+            'lentas': len(lentas),
+            'sentencias': [{
+                'sql': e.sql,
+                'tipo': e.tipo,
+                'ejecuciones': e.ejecuciones,
+                'ms': round(e.segundos * 1000, 3),
+                'ms_max': round(e.maximo * 1000, 3),
+                'filas': e.filas,
+                'modificadas': e.modificadas,
+                'pasos_vm': e.pasos,
+                'internas': e.internas,
+                'lentas': e.lentas,
+            } for e in estadisticas],
+            'detalle_lentas': lentas[:LENTAS_EN_TRAZA],
+        }
+
+        try:
+            if self.traza:
+                _escribir_linea(self.traza, resumen)
+            if self.log_lentas and lentas:
+                comunes = {'fecha': traza.fecha, 'comando': traza.nombre, 'pid': resumen['pid']}
+                for lenta in lentas:
+                    _escribir_linea(self.log_lentas, dict(comunes, **lenta))
+        except OSError as e:
+            print(f"⚠️  No se pudo escribir el perfil: {e}", file=sys.stderr)
+
+        self._acumular(traza.nombre, segundos, estadisticas)
+
+    # --- Métricas ---
+
+    def _acumular(self, nombre: str, segundos: float, estadisticas: List[_Estadistica]):
+        comando = _etiquetas(comando=nombre)
+        with self._bloqueo:
+            pendientes = self._pendientes
+            for limite in BUCKETS_SEGUNDOS + (float('inf'),):
+                clave = ('tlapaleria_comando_segundos_bucket',
+                         _etiquetas(comando=nombre, le=_numero(limite)))
+                pendientes[clave] = pendientes.get(clave, 0) + (segundos <= limite)
+            for muestra, valor in (('tlapaleria_comando_segundos_sum', segundos),
+                                   ('tlapaleria_comando_segundos_count', 1)):
+                pendientes[(muestra, comando)] = pendientes.get((muestra, comando), 0) + valor
+            for e in estadisticas:
+                etiquetas = _etiquetas(comando=nombre, tipo=e.tipo)
+                for muestra, valor in (('tlapaleria_sentencias_total', e.ejecuciones),
+                                       ('tlapaleria_sentencias_segundos_total', e.segundos),
+                                       ('tlapaleria_sentencias_filas_total', e.filas),
+                                       ('tlapaleria_sentencias_modificadas_total', e.modificadas),
+                                       ('tlapaleria_sentencias_pasos_vm_total', e.pasos),
+                                       ('tlapaleria_sentencias_lentas_total', e.lentas)):
+                    clave = (muestra, etiquetas)
+                    pendientes[clave] = pendientes.get(clave, 0) + valor
+        if time.monotonic() - self._ultima_exportacion >= self.intervalo_exportacion_s:
+            self.exportar()
+
+    def exportar(self):
+        """Suma los contadores pendientes al archivo de métricas"""
+        with self._bloqueo:
+            pendientes, self._pendientes = self._pendientes, {}
+            self._ultima_exportacion = time.monotonic()
+        if not self.prometheus or not pendientes:
+            return
+        try:
+            exportar_prometheus(self.prometheus, pendientes)
+        except OSError as e:
+            print(f"⚠️  No se pudieron escribir las métricas: {e}", file=sys.stderr)
+
+
+def _etiquetas(**valores: str) -> str:
+    partes = []
+    for clave, valor in valores.items():
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{clave}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+
+def _numero(valor: float) -> str:
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(int(valor)) if float(valor).is_integer() else repr(valor)
+
+
+def _orden_muestra(muestra: Tuple[Tuple[str, str], float]):
+    # Los buckets de cada histograma van en orden numérico de 'le'
+    (nombre, etiquetas), _ = muestra
+    limite = re.search(r'le="([^"]*)"', etiquetas)
+    if limite is None:
+        return nombre, etiquetas, 0.0
+    return nombre, etiquetas[:limite.start()], float(limite.group(1))
+
+
+def _escribir_linea(ruta: str, registro: Dict):
+    linea = json.dumps(registro, ensure_ascii=False)
+    if ruta == '-':
+        print(linea, file=sys.stderr)
+        return
+    with open(ruta, 'a', encoding='utf-8') as archivo:
+        archivo.write(linea + '\n')
+
+
+def explicar(conn: Optional[sqlite3.Connection], sql: str, parametros) -> List[str]:
+    """
+    EXPLAIN QUERY PLAN de una sentencia como renglones indentados por nivel
+
+    Usa un cursor simple para que la consulta del plan no se mida. Devuelve
+    una lista vacía si la sentencia no tiene plan o no se puede explicar.
+    """
+    if conn is None or tipo_sentencia(sql) not in _CON_PLAN:
+        return []
+    try:
+        filas = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql,
+                                             parametros or ()).fetchall()
+    except (sqlite3.Error, ValueError):
+        return []
+    niveles = {0: -1}
+    renglones = []
+    for nodo, padre, _, detalle in filas:
+        niveles[nodo] = niveles.get(padre, -1) + 1
+        renglones.append('  ' * niveles[nodo] + detalle)
+    return renglones
+
+
+def leer_prometheus(ruta: str) -> Dict[Tuple[str, str], float]:
+    """Muestras de un archivo de métricas de texto (las líneas # se ignoran)"""
+    muestras: Dict[Tuple[str, str], float] = {}
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            for linea in archivo:
+                coincidencia = _LINEA_METRICA.match(linea.strip())
+                if coincidencia:
+                    nombre, etiquetas, valor = coincidencia.groups()
+                    try:
+                        muestras[(nombre, etiquetas or '')] = float(valor)
+                    except ValueError:
+                        continue
+    except FileNotFoundError:
+        pass
+    return muestras
+
+
+def exportar_prometheus(ruta: str, sumar: Dict[Tuple[str, str], float]):
+    """
+    Suma muestras al archivo de métricas y lo reemplaza de forma atómica
+
+    Un archivo de bloqueo junto a las métricas serializa a los procesos que
+    exportan al mismo tiempo.
+    """
+    with open(ruta + '.lock', 'a') as bloqueo:
+        fcntl.flock(bloqueo, fcntl.LOCK_EX)
+        muestras = leer_prometheus(ruta)
+        for clave, valor in sumar.items():
+            muestras[clave] = muestras.get(clave, 0) + valor
+
+        lineas = []
+        for familia, tipo, ayuda in METRICAS:
+            lineas.append(f"# HELP {familia} {ayuda}")
+            lineas.append(f"# TYPE {familia} {tipo}")
+            if tipo == 'histogram':
+                nombres = (familia + '_bucket', familia + '_sum', familia + '_count')
+            else:
+                nombres = (familia,)
+            for nombre in nombres:
+                for (muestra, etiquetas), valor in sorted(muestras.items(), key=_orden_muestra):
+                    if muestra == nombre:
+                        lineas.append(f"{muestra}{etiquetas} {_numero(round(valor, 6))}")
+
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            archivo.write('\n'.join(lineas) + '\n')
+        os.replace(temporal, ruta)
+
+
+class CursorPerfilado(sqlite3.Cursor):
+    """Cursor que mide sus sentencias en el perfilador activo"""
+
+    _medicion: Optional[_Medicion] = None
+
+    def _medir(self, sql: str, parametros) -> Optional[_Medicion]:
+        perfilador = _activo
+        if perfilador is None:
+            return None
+        self._medicion = perfilador.iniciar(sql, self.connection, parametros)
+        return self._medicion
+
+    def _registrar_modificadas(self, medicion: _Medicion):
+        if self.description is None and self.rowcount > 0:
+            medicion.estadistica.modificadas += self.rowcount
+
+    def execute(self, sql, parametros=()):
+        medicion = self._medir(sql, parametros)
+        if medicion is None:
+            return super().execute(sql, parametros)
+        _activo.entrar(medicion)
+        inicio = time.perf_counter()
+        try:
+            super().execute(sql, parametros)
+        finally:
+            _activo.salir(medicion, time.perf_counter() - inicio)
+        self._registrar_modificadas(medicion)
+        return self
+
+    def executemany(self, sql, secuencia):
+        # El plan de una sentencia lenta se obtiene con el primer juego de parámetros
+        secuencia = iter(secuencia)
+        primero = next(secuencia, None)
+        medicion = self._medir(sql, primero)
+        if primero is not None:
+            secuencia = _encadenar(primero, secuencia)
+        if medicion is None:
+            return super().executemany(sql, secuencia)
+        _activo.entrar(medicion)
+        inicio = time.perf_counter()
+        try:
+            super().executemany(sql, secuencia)
+        finally:
+            _activo.salir(medicion, time.perf_counter() - inicio)
+        self._registrar_modificadas(medicion)
+        return self
+
+    def executescript(self, script):
+        medicion = self._medir(script, None)
+        if medicion is None:
+            return super().executescript(script)
+        _activo.entrar(medicion)
+        inicio = time.perf_counter()
+        try:
+            super().executescript(script)
+        finally:
+            _activo.salir(medicion, time.perf_counter() - inicio)
+        return self
+
+    def _leer(self, leer, *args):
+        medicion = self._medicion
+        if medicion is None or _activo is None:
+            return leer(*args)
+        _activo.entrar(medicion)
+        inicio = time.perf_counter()
+        filas = 0
+        try:
+            resultado = leer(*args)
+            if isinstance(resultado, list):
+                filas = len(resultado)
+            elif resultado is not None:
+                filas = 1
+            return resultado
+        finally:
+            _activo.salir(medicion, time.perf_counter() - inicio, filas)
+
+    def fetchone(self):
+        return self._leer(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._leer(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._leer(super().fetchall)
+
+    def __next__(self):
+        medicion = self._medicion
+        if medicion is None or _activo is None:
+            return super().__next__()
+        _activo.entrar(medicion)
+        inicio = time.perf_counter()
+        filas = 0
+        try:
+            fila = super().__next__()
+            filas = 1
+            return fila
+        finally:
+            _activo.salir(medicion, time.perf_counter() - inicio, filas)
+
+
+def _encadenar(primero, resto):
+    yield primero
+    yield from resto
+
+
+class ConexionPerfilada(sqlite3.Connection):
+    """Conexión cuyos cursores, commit y rollback se miden"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        perfilador = _activo
+        if perfilador is not None:
+            self.set_progress_handler(perfilador.aviso_progreso, PASOS_POR_AVISO)
+            self.set_trace_callback(perfilador.aviso_sentencia)
+
+    def cursor(self, factory=CursorPerfilado):
+        return super().cursor(factory)
+
+    # Connection.execute() de sqlite3 no pasa por cursor(): se redirige aquí
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        return self.cursor().executemany(sql, secuencia)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def _terminar_transaccion(self, sentencia: str, terminar):
+        perfilador = _activo
+        medicion = perfilador.iniciar(sentencia, self, None) if perfilador is not None else None
+        if medicion is None:
+            return terminar()
+        perfilador.entrar(medicion)
+        inicio = time.perf_counter()
+        try:
+            return terminar()
+        finally:
+            perfilador.salir(medicion, time.perf_counter() - inicio)
+
+    def commit(self):
+        if not self.in_transaction:
+            return super().commit()
+        return self._terminar_transaccion('COMMIT', super().commit)
+
+    def rollback(self):
+        if not self.in_transaction:
+            return super().rollback()
+        return self._terminar_transaccion('ROLLBACK', super().rollback)
+
+
+_activo: Optional[Perfilador] = None
+
+
+def activar(perfilador: Optional[Perfilador]):
+    """Activa el perfilado para las conexiones que se abran después (None lo desactiva)"""
+    global _activo
+    _activo = perfilador
+
+
+def activo() -> Optional[Perfilador]:
+    """Perfilador activo, o None"""
+    return _activo
+
+
+def fabrica_conexion():
+    """Clase de conexión que debe usar conectar()"""
+    return ConexionPerfilada if _activo is not None else sqlite3.Connection
+
+
+def comando(nombre: str):
+    """Perfilador.comando() del perfilador activo; sin perfilado no hace nada"""
+    if _activo is None:
+        return _sin_perfilado()
+    return _activo.comando(nombre)
+
+
+@contextmanager
+def _sin_perfilado() -> Iterator[None]:
+    yield
+
+
+def desde_entorno() -> Optional[Perfilador]:
+    """
+    Perfilador configurado con variables de entorno, o None si TLAPALERIA_PERFIL no está
+
+    TLAPALERIA_PERFIL               archivo de trazas, '-' o '1' para stderr
+    TLAPALERIA_PERFIL_LENTAS_MS     umbral de las consultas lentas
+    TLAPALERIA_PERFIL_LOG_LENTAS    log de consultas lentas
+    TLAPALERIA_PERFIL_PROMETHEUS    archivo de métricas de Prometheus
+    """
+    traza = os.environ.get("TLAPALERIA_PERFIL")
+    if not traza:
+        return None
+    return Perfilador(
+        traza='-' if traza == '1' else traza,
+        log_lentas=os.environ.get("TLAPALERIA_PERFIL_LOG_LENTAS") or None,
+        prometheus=os.environ.get("TLAPALERIA_PERFIL_PROMETHEUS") or None,
+    )
+
+
+def cerrar():
+    """Escribe las métricas pendientes del perfilador activo y lo desactiva"""
+    perfilador = _activo
+    if perfilador is not None:
+        perfilador.exportar()
+    activar(None)
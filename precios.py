@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Cambios de precio masivos, historial de precios y precios programados
+
+Un reprecio es una regla (porcentaje, monto o precio fijo, con redondeo
+opcional) sobre los productos de una categoría y/o un proveedor. Se aplica
+con un solo UPDATE en una transacción, no producto por producto, y queda
+registrada en reglas_precio.
+
+Un trigger agrega a historial_precios un renglón por cada cambio de precio,
+venga de donde venga (reprecio, importar, el backend de Node). Para saber
+qué regla lo causó, reprecio anota la regla en precios_en_curso dentro de su
+transacción y la borra antes de confirmar; fuera de ella la fila está vacía.
+
+Con vigente_desde en el futuro la regla no toca productos: calcula los
+precios nuevos con los precios de ese momento y los deja en
+precios_programados. Nadie tiene que estar despierto a esa hora: al_dia()
+los pasa a productos la primera vez que se vende o se ejecuta un comando
+después de la fecha. Mientras no haya precios vencidos, al_dia() es una sola
+búsqueda en el índice de vigencia. El historial registra esos cambios con la
+fecha de vigencia, no con la de aplicación.
+
+Las fechas están en UTC, como CURRENT_TIMESTAMP.
+"""
+
+import datetime
+import sqlite3
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from conexion_db import transaccion_escritura
+
+TIPOS = ('porcentaje', 'monto', 'precio')
+
+# Migración 11 de inicializar_db
+SQL_CREAR_PRECIOS = [
+    """
+    CREATE TABLE IF NOT EXISTS reglas_precio (
+        id INTEGER PRIMARY KEY,
+        descripcion TEXT,
+        categoria TEXT,
+        proveedor TEXT,
+        tipo TEXT NOT NULL,
+        valor REAL NOT NULL,
+        redondeo REAL,
+        vigente_desde DATETIME NOT NULL,
+        productos INTEGER NOT NULL DEFAULT 0,
+        fecha_creacion DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS historial_precios (
+        id INTEGER PRIMARY KEY,
+        producto_id INTEGER NOT NULL,
+        fecha DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        precio_anterior REAL,
+        precio REAL,
+        regla_id INTEGER
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_historial_precios_producto
+    ON historial_precios (producto_id, fecha)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS precios_programados (
+        producto_id INTEGER NOT NULL,
+        vigente_desde DATETIME NOT NULL,
+        precio REAL NOT NULL,
+        regla_id INTEGER,
+        PRIMARY KEY (producto_id, vigente_desde)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_precios_programados_vigencia
+    ON precios_programados (vigente_desde)
+    """,
+    # Una sola fila; solo tiene valores dentro de la transacción de un reprecio
+    """
+    CREATE TABLE IF NOT EXISTS precios_en_curso (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        regla_id INTEGER,
+        fecha DATETIME
+    )
+    """,
+    "INSERT OR IGNORE INTO precios_en_curso (id) VALUES (1)",
+    # Precio inicial: antes de este renglón el producto no existía
+    """
+    CREATE TRIGGER IF NOT EXISTS historial_precios_ai AFTER INSERT ON productos BEGIN
+        INSERT INTO historial_precios (producto_id, precio_anterior, precio)
+        VALUES (new.id, NULL, new.precio);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS historial_precios_au AFTER UPDATE OF precio ON productos
+    WHEN new.precio IS NOT old.precio BEGIN
+        INSERT INTO historial_precios (producto_id, fecha, precio_anterior, precio, regla_id)
+        SELECT new.id, COALESCE(fecha, CURRENT_TIMESTAMP), old.precio, new.precio, regla_id
+        FROM precios_en_curso WHERE id = 1;
+    END
+    """,
+]
+
+_SQL_HAY_VENCIDOS = """
+    SELECT 1 FROM precios_programados WHERE vigente_desde <= CURRENT_TIMESTAMP LIMIT 1
+"""
+
+
+class Regla(NamedTuple):
+    """Cambio de precio: tipo y valor, a qué productos y cómo redondear"""
+    tipo: str
+    valor: float
+    categoria: Optional[str] = None
+    proveedor: Optional[str] = None
+    redondeo: Optional[float] = None
+    descripcion: Optional[str] = None
+
+
+class CambioPrecio(NamedTuple):
+    """Renglón del historial de precios"""
+    id: int
+    fecha: str
+    precio_anterior: Optional[float]
+    precio: Optional[float]
+    regla_id: Optional[int]
+    regla: Optional[str]
+
+
+class Programada(NamedTuple):
+    """Regla con precios pendientes de entrar en vigor"""
+    regla_id: Optional[int]
+    vigente_desde: str
+    productos: int
+    descripcion: Optional[str]
+
+
+def normalizar_vigencia(fecha: str) -> str:
+    """
+    'AAAA-MM-DD' es el inicio de ese día; también acepta 'AAAA-MM-DD HH:MM[:SS]'
+
+    Raises:
+        ValueError: Si la fecha no es válida
+    """
+    texto = fecha.strip().replace('T', ' ')
+    try:
+        valor = datetime.datetime.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f"Fecha inválida '{fecha}', use AAAA-MM-DD o 'AAAA-MM-DD HH:MM'")
+    return valor.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def validar(regla: Regla):
+    """
+    Raises:
+        ValueError: Si el tipo no existe o el valor no tiene sentido para el tipo
+    """
+    if regla.tipo not in TIPOS:
+        raise ValueError(f"Tipo de regla desconocido: {regla.tipo}")
+    if regla.tipo == 'porcentaje' and regla.valor <= -100:
+        raise ValueError("Un porcentaje de -100 o menos deja los precios en 0")
+    if regla.tipo == 'precio' and regla.valor <= 0:
+        raise ValueError("El precio debe ser mayor que 0")
+    if regla.redondeo is not None and regla.redondeo <= 0:
+        raise ValueError("El redondeo debe ser mayor que 0")
+
+
+def _expresion(regla: Regla) -> Tuple[str, list]:
+    """Expresión SQL del precio nuevo en función de la columna precio"""
+    if regla.tipo == 'porcentaje':
+        sql, parametros = "precio * (1 + ? / 100.0)", [regla.valor]
+    elif regla.tipo == 'monto':
+        sql, parametros = "precio + ?", [regla.valor]
+    else:
+        sql, parametros = "?", [regla.valor]
+    if regla.redondeo:
+        sql, parametros = f"ROUND(({sql}) / ?) * ?", parametros + [regla.redondeo, regla.redondeo]
+    return f"ROUND({sql}, 2)", parametros
+
+
+def _filtro(regla: Regla) -> Tuple[str, list]:
+    condiciones, parametros = [], []
+    if regla.categoria is not None:
+        condiciones.append("categoria = ?")
+        parametros.append(regla.categoria)
+    if regla.proveedor is not None:
+        condiciones.append("proveedor = ?")
+        parametros.append(regla.proveedor)
+    return ' AND '.join(condiciones) or '1', parametros
+
+
+def simular(conn: sqlite3.Connection, regla: Regla, limite: int = 20) -> Dict:
+    """
+    Productos que cambiarían con la regla, sin modificar nada
+
+    Returns:
+        Productos que cambian, valor del inventario antes y después, y una
+        muestra de (id, nombre, precio, precio nuevo) con los cambios más grandes
+    """
+    validar(regla)
+    expresion, parametros_expresion = _expresion(regla)
+    filtro, parametros_filtro = _filtro(regla)
+    productos, antes, despues = conn.execute(f"""
+        SELECT COUNT(*), COALESCE(SUM(precio * stock_actual), 0),
+               COALESCE(SUM({expresion} * stock_actual), 0)
+        FROM productos WHERE {filtro} AND precio IS NOT {expresion}
+    """, parametros_expresion + parametros_filtro + parametros_expresion).fetchone()
+    muestra = conn.execute(f"""
+        SELECT id, nombre, precio, {expresion} AS nuevo FROM productos
+        WHERE {filtro} AND precio IS NOT {expresion}
+        ORDER BY ABS({expresion} - precio) DESC, id
+        LIMIT ?
+    """, parametros_expresion + parametros_filtro + parametros_expresion * 2 + [limite]).fetchall()
+    return {'productos': productos, 'valor_antes': antes, 'valor_despues': despues,
+            'muestra': muestra}
+
+
+def reprecio(conn: sqlite3.Connection, regla: Regla,
+             vigente_desde: Optional[str] = None) -> Dict:
+    """
+    Aplica una regla de precios, o la programa si vigente_desde es futura
+
+    Todo ocurre en una transacción de escritura con una sentencia por paso,
+    sin importar cuántos productos cambien.
+
+    Args:
+        regla: La regla a aplicar
+        vigente_desde: Fecha UTC desde la que rigen los precios nuevos
+                       (None o una fecha pasada: ya)
+
+    Returns:
+        id de la regla, productos que cambian, si quedó programada y segundos
+
+    Raises:
+        ValueError: Si la regla no es válida o dejaría algún precio en 0 o menos
+    """
+    validar(regla)
+    inicio = time.perf_counter()
+    expresion, parametros_expresion = _expresion(regla)
+    filtro, parametros_filtro = _filtro(regla)
+
+    with transaccion_escritura(conn):
+        ahora = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+        programada = vigente_desde is not None and vigente_desde > ahora
+        invalidos = conn.execute(f"""
+            SELECT COUNT(*) FROM productos WHERE {filtro} AND {expresion} <= 0
+        """, parametros_filtro + parametros_expresion).fetchone()[0]
+        if invalidos:
+            raise ValueError(f"La regla deja {invalidos} productos con precio de 0 o menos")
+
+        regla_id = conn.execute("""
+            INSERT INTO reglas_precio
+                (descripcion, categoria, proveedor, tipo, valor, redondeo, vigente_desde)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (regla.descripcion, regla.categoria, regla.proveedor, regla.tipo, regla.valor,
+              regla.redondeo, vigente_desde if programada else ahora)).lastrowid
+
+        if programada:
+            cambios = conn.execute(f"""
+                INSERT OR REPLACE INTO precios_programados
+                    (producto_id, vigente_desde, precio, regla_id)
+                SELECT id, ?, {expresion}, ? FROM productos WHERE {filtro}
+            """, [vigente_desde] + parametros_expresion + [regla_id] + parametros_filtro).rowcount
+        else:
+            conn.execute("UPDATE precios_en_curso SET regla_id = ?, fecha = NULL WHERE id = 1",
+                         (regla_id,))
+            cambios = conn.execute(f"""
+                UPDATE productos
+                SET precio = {expresion}, fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE {filtro} AND precio IS NOT {expresion}
+            """, parametros_expresion + parametros_filtro + parametros_expresion).rowcount
+            conn.execute("UPDATE precios_en_curso SET regla_id = NULL, fecha = NULL WHERE id = 1")
+        conn.execute("UPDATE reglas_precio SET productos = ? WHERE id = ?", (cambios, regla_id))
+
+    return {'regla_id': regla_id, 'productos': cambios, 'programada': programada,
+            'vigente_desde': vigente_desde if programada else ahora,
+            'segundos': time.perf_counter() - inicio}
+
+
+def aplicar_vencidos(conn: sqlite3.Connection) -> int:
+    """
+    Pasa a productos los precios programados que ya entraron en vigor
+    (dentro de la transacción actual)
+
+    Returns:
+        Número de productos cuyo precio cambió
+    """
+    ahora = conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+    grupos = conn.execute("""
+        SELECT DISTINCT vigente_desde, regla_id FROM precios_programados
+        WHERE vigente_desde <= ?
+        ORDER BY vigente_desde
+    """, (ahora,)).fetchall()
+    cambios = 0
+    for vigente_desde, regla_id in grupos:
+        conn.execute("UPDATE precios_en_curso SET regla_id = ?, fecha = ? WHERE id = 1",
+                     (regla_id, vigente_desde))
+        cambios += conn.execute("""
+            UPDATE productos
+            SET precio = pp.precio, fecha_actualizacion = CURRENT_TIMESTAMP
+            FROM precios_programados pp
+            WHERE pp.producto_id = productos.id AND pp.vigente_desde = ?
+              AND pp.regla_id IS ? AND productos.precio IS NOT pp.precio
+        """, (vigente_desde, regla_id)).rowcount
+    if grupos:
+        conn.execute("UPDATE precios_en_curso SET regla_id = NULL, fecha = NULL WHERE id = 1")
+        conn.execute("DELETE FROM precios_programados WHERE vigente_desde <= ?", (ahora,))
+    return cambios
+
+
+def al_dia(conn: sqlite3.Connection) -> int:
+    """
+    Aplica los precios programados vencidos, si hay
+
+    Dentro de una transacción abierta los aplica en ella; si no, abre una
+    propia. Sin precios vencidos solo consulta el índice de vigencia.
+
+    Returns:
+        Número de productos cuyo precio cambió
+    """
+    try:
+        if conn.execute(_SQL_HAY_VENCIDOS).fetchone() is None:
+            return 0
+    except sqlite3.OperationalError:
+        # Base sin la migración 11
+        return 0
+    if conn.in_transaction:
+        return aplicar_vencidos(conn)
+    with transaccion_escritura(conn):
+        return aplicar_vencidos(conn)
+
+
+def programadas(conn: sqlite3.Connection) -> List[Programada]:
+    """Reglas con precios pendientes, la más próxima primero"""
+    filas = conn.execute("""
+        SELECT pp.regla_id, pp.vigente_desde, COUNT(*), r.descripcion
+        FROM precios_programados pp LEFT JOIN reglas_precio r ON r.id = pp.regla_id
+        GROUP BY pp.regla_id, pp.vigente_desde
+        ORDER BY pp.vigente_desde, pp.regla_id
+    """)
+    return [Programada(*fila) for fila in filas]
+
+
+def cancelar(conn: sqlite3.Connection, regla_id: int) -> int:
+    """
+    Quita los precios pendientes de una regla (dentro de la transacción actual)
+
+    Returns:
+        Número de precios programados que se quitaron
+    """
+    return conn.execute("DELETE FROM precios_programados WHERE regla_id = ?",
+                        (regla_id,)).rowcount
+
+
+def precio_en(conn: sqlite3.Connection, producto_id: int, fecha: str) -> Optional[float]:
+    """
+    Precio de un producto en una fecha (pasada o futura)
+
+    Para fechas futuras toma en cuenta los precios programados. Si el
+    producto no tiene historial, su precio actual vale para cualquier fecha.
+
+    Returns:
+        El precio, o None si el producto no existía en esa fecha
+    """
+    programado = conn.execute("""
+        SELECT precio FROM precios_programados
+        WHERE producto_id = ? AND vigente_desde <= ?
+        ORDER BY vigente_desde DESC LIMIT 1
+    """, (producto_id, fecha)).fetchone()
+    if programado is not None:
+        return programado[0]
+    anterior = conn.execute("""
+        SELECT precio FROM historial_precios
+        WHERE producto_id = ? AND fecha <= ?
+        ORDER BY fecha DESC, id DESC LIMIT 1
+    """, (producto_id, fecha)).fetchone()
+    if anterior is not None:
+        return anterior[0]
+    # Antes del primer cambio registrado regía su precio anterior
+    siguiente = conn.execute("""
+        SELECT precio_anterior FROM historial_precios
+        WHERE producto_id = ? AND fecha > ?
+        ORDER BY fecha, id LIMIT 1
+    """, (producto_id, fecha)).fetchone()
+    if siguiente is not None:
+        return siguiente[0]
+    actual = conn.execute("SELECT precio FROM productos WHERE id = ?", (producto_id,)).fetchone()
+    return actual[0] if actual else None
+
+
+def historial(conn: sqlite3.Connection, producto_id: int, limite: int = 20) -> List[CambioPrecio]:
+    """Últimos cambios de precio de un producto, el más reciente primero"""
+    filas = conn.execute("""
+        SELECT h.id, h.fecha, h.precio_anterior, h.precio, h.regla_id,
+               COALESCE(r.descripcion, r.tipo || ' ' || r.valor)
+        FROM historial_precios h LEFT JOIN reglas_precio r ON r.id = h.regla_id
+        WHERE h.producto_id = ?
+        ORDER BY h.fecha DESC, h.id DESC
+        LIMIT ?
+    """, (producto_id, limite))
+    return [CambioPrecio(*fila) for fila in filas]
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Pronóstico de demanda y puntos de reorden para todo el catálogo
+
+Calcula, para todos los productos a la vez, la demanda diaria esperada, el
+stock de seguridad, el punto de reorden y la cantidad sugerida de compra.
+El servicio de Node (backend/src/services/inventarioInteligente.js) hace lo
+mismo producto por producto, con una consulta por producto.
+
+Las ventas de los últimos N días se leen en una sola consulta, agrupadas por
+(producto, día), y se guardan en tres arreglos compactos (posición del
+producto, día y unidades). Las estadísticas de cada producto se obtienen con
+sumas ponderadas sobre esos arreglos. No se necesita una matriz densa de
+productos x días, porque los días sin venta aportan cero:
+
+    media móvil          suma de las unidades de la ventana / ventana
+    suavizado exponencial  suma de unidades * alfa * (1 - alfa)^(días atrás)
+    desviación           a partir de la suma de cuadrados de la ventana
+
+Si NumPy está instalado las sumas se hacen con np.bincount; si no, con
+arreglos de la biblioteca estándar (array) en un solo recorrido. Ambos
+caminos dan el mismo resultado.
+
+    stock_seguridad = z * desviación * raíz(tiempo_entrega)
+    punto_reorden   = demanda * tiempo_entrega + stock_seguridad (nunca menor que stock_minimo)
+    cantidad        = punto_reorden + demanda * días_cobertura - stock_actual
+                      (solo si stock_actual <= punto_reorden)
+"""
+
+import math
+import sqlite3
+import time
+from array import array
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depende del entorno
+    np = None
+
+# Días de historial que se leen
+DIAS_HISTORIA_DEFAULT = 365
+# Días de la media móvil y de la desviación
+VENTANA_DEFAULT = 28
+# Peso del día más reciente en el suavizado exponencial
+ALFA_DEFAULT = 0.1
+# Días entre pedir y recibir la mercancía (el servicio de Node usa 7)
+TIEMPO_ENTREGA_DEFAULT = 7
+# Días de venta que debe cubrir cada pedido
+DIAS_COBERTURA_DEFAULT = 30
+# Factor del nivel de servicio: 1.65 ~ 95% de los ciclos sin faltantes
+Z_SERVICIO_DEFAULT = 1.65
+
+
+def numpy_disponible() -> bool:
+    """Indica si el cálculo puede usar NumPy"""
+    return np is not None
+
+
+def _cargar_productos(conn: sqlite3.Connection) -> List[tuple]:
+    """Productos ordenados por id: (id, nombre, stock_actual, stock_minimo, proveedor, precio)"""
+    return conn.execute("""
+        SELECT id, nombre, COALESCE(stock_actual, 0), COALESCE(stock_minimo, 0),
+               proveedor, precio
+        FROM productos
+        ORDER BY id
+    """).fetchall()
+
+
+def _cargar_ventas_diarias(conn: sqlite3.Connection, dias_historia: int) -> List[tuple]:
+    """
+    Unidades vendidas por (producto, día) en los últimos dias_historia días
+
+    El día 0 es el más antiguo y el día dias_historia - 1 es hoy.
+    """
+    desde = f"-{int(dias_historia) - 1} days"
+    return conn.execute("""
+        SELECT producto_id,
+               CAST(julianday(fecha_venta) - julianday(date('now', ?)) AS INTEGER) AS dia,
+               SUM(cantidad)
+        FROM ventas
+        WHERE fecha_venta >= date('now', ?)
+        GROUP BY producto_id, dia
+    """, (desde, desde)).fetchall()
+
+
+def _estadisticas_numpy(ids: List[int], ventas: List[tuple], dias_historia: int,
+                        ventana: int, alfa: float) -> tuple:
+    """Sumas por producto con np.bincount; devuelve (suma, suma de cuadrados, suavizado)"""
+    n = len(ids)
+    if not ventas or not n:
+        ceros = np.zeros(n)
+        return ceros, ceros, ceros
+    datos = np.array(ventas, dtype=np.float64)
+    producto = datos[:, 0].astype(np.int64)
+    dia = datos[:, 1].astype(np.int64)
+    unidades = datos[:, 2]
+
+    # ids viene ordenado: la posición de cada producto se busca en bloque.
+    # Se descartan ventas de productos que ya no existen o con fecha futura
+    ids_ordenados = np.array(ids, dtype=np.int64)
+    posicion = np.minimum(np.searchsorted(ids_ordenados, producto), n - 1)
+    validas = (ids_ordenados[posicion] == producto) & (dia >= 0) & (dia < dias_historia)
+    posicion, dia, unidades = posicion[validas], dia[validas], unidades[validas]
+
+    atras = dias_historia - 1 - dia
+    en_ventana = atras < ventana
+    suma = np.bincount(posicion[en_ventana], weights=unidades[en_ventana], minlength=n)
+    cuadrados = np.bincount(posicion[en_ventana], weights=unidades[en_ventana] ** 2, minlength=n)
+    suavizado = np.bincount(posicion, weights=unidades * alfa * (1 - alfa) ** atras, minlength=n)
+    return suma, cuadrados, suavizado
+
+
+def _estadisticas_array(ids: List[int], ventas: List[tuple], dias_historia: int,
+                        ventana: int, alfa: float) -> tuple:
+    """Mismas sumas que _estadisticas_numpy con arreglos de la biblioteca estándar"""
+    n = len(ids)
+    posiciones = {producto_id: i for i, producto_id in enumerate(ids)}
+    suma = array('d', bytes(8 * n))
+    cuadrados = array('d', bytes(8 * n))
+    suavizado = array('d', bytes(8 * n))
+    pesos = [alfa * (1 - alfa) ** atras for atras in range(dias_historia)]
+
+    for producto_id, dia, unidades in ventas:
+        i = posiciones.get(producto_id)
+        if i is None or not 0 <= dia < dias_historia:
+            continue
+        atras = dias_historia - 1 - dia
+        suavizado[i] += unidades * pesos[atras]
+        if atras < ventana:
+            suma[i] += unidades
+            cuadrados[i] += unidades * unidades
+    return suma, cuadrados, suavizado
+
+
+def calcular(conn: sqlite3.Connection,
+             dias_historia: int = DIAS_HISTORIA_DEFAULT,
+             ventana: int = VENTANA_DEFAULT,
+             alfa: float = ALFA_DEFAULT,
+             tiempo_entrega: int = TIEMPO_ENTREGA_DEFAULT,
+             dias_cobertura: int = DIAS_COBERTURA_DEFAULT,
+             z_servicio: float = Z_SERVICIO_DEFAULT,
+             todos: bool = False,
+             usar_numpy: Optional[bool] = None) -> Dict:
+    """
+    Calcula demanda, punto de reorden y compra sugerida de todos los productos
+
+    Args:
+        conn: Conexión abierta
+        dias_historia: Días de ventas que se leen
+        ventana: Días de la media móvil y la desviación
+        alfa: Factor del suavizado exponencial (0 < alfa <= 1)
+        tiempo_entrega: Días entre el pedido y la recepción
+        dias_cobertura: Días de venta que debe cubrir el pedido
+        z_servicio: Factor del nivel de servicio para el stock de seguridad
+        todos: Incluye también los productos que no necesitan pedido
+        usar_numpy: Forzar (True) o evitar (False) NumPy; por defecto si está instalado
+
+    Returns:
+        Diccionario con 'productos' (filas analizadas), 'motor' ('numpy' o
+        'array'), 'segundos' y 'sugerencias': lista de diccionarios ordenada
+        por días de stock restante
+    """
+    if not 0 < alfa <= 1:
+        raise ValueError(f"alfa debe estar entre 0 y 1: {alfa}")
+    if dias_historia < 1 or ventana < 1:
+        raise ValueError("dias_historia y ventana deben ser positivos")
+    ventana = min(ventana, dias_historia)
+    if usar_numpy is None:
+        usar_numpy = numpy_disponible()
+    elif usar_numpy and not numpy_disponible():
+        raise RuntimeError("NumPy no está instalado")
+
+    inicio = time.perf_counter()
+    productos = _cargar_productos(conn)
+    ventas = _cargar_ventas_diarias(conn, dias_historia)
+    ids = [fila[0] for fila in productos]
+
+    calcular_sumas = _estadisticas_numpy if usar_numpy else _estadisticas_array
+    suma, cuadrados, suavizado = calcular_sumas(ids, ventas, dias_historia, ventana, alfa)
+    raiz_entrega = math.sqrt(tiempo_entrega)
+
+    sugerencias = []
+    for i, (producto_id, nombre, stock, stock_minimo, proveedor, precio) in enumerate(productos):
+        media = float(suma[i]) / ventana
+        varianza = max(0.0, float(cuadrados[i]) / ventana - media * media)
+        # Redondeo: una venta de hace meses deja un residuo ínfimo que no es demanda
+        demanda = round(float(suavizado[i]), 4)
+        stock_seguridad = z_servicio * math.sqrt(varianza) * raiz_entrega
+        punto_reorden = max(math.ceil(demanda * tiempo_entrega + stock_seguridad), stock_minimo)
+        necesita = stock <= punto_reorden
+        if not necesita and not todos:
+            continue
+        objetivo = punto_reorden + math.ceil(demanda * dias_cobertura)
+        cantidad = max(objetivo - stock, 0) if necesita else 0
+        sugerencias.append({
+            'id': producto_id,
+            'nombre': nombre,
+            'proveedor': proveedor,
+            'stock_actual': stock,
+            'stock_minimo': stock_minimo,
+            'demanda_diaria': round(demanda, 3),
+            'media_movil': round(media, 3),
+            'stock_seguridad': math.ceil(stock_seguridad),
+            'punto_reorden': punto_reorden,
+            'dias_restantes': round(stock / demanda, 1) if demanda > 0 else None,
+            'cantidad_sugerida': cantidad,
+            'costo_estimado': round(cantidad * (precio or 0), 2),
+        })
+
+    # Primero lo que se agota antes; los productos sin demanda al final
+    sugerencias.sort(key=lambda s: (s['dias_restantes'] is None,
+                                    s['dias_restantes'] or 0, s['id']))
+    return {
+        'productos': len(productos),
+        'motor': 'numpy' if usar_numpy else 'array',
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'sugerencias': sugerencias,
+    }
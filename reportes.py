@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Reportes de ventas por rango de fechas, calculados en paralelo
+
+El historial de ventas se divide en rangos de fechas con aproximadamente el
+mismo número de ventas (usando resumen_ventas_diarias, que ya tiene el conteo
+por día). Cada rango se agrega en un proceso distinto con su propia conexión
+de solo lectura. Los agregados parciales se combinan al final. En modo WAL
+las lecturas no bloquean a las escrituras, así que los reportes pueden
+correr mientras la tienda sigue vendiendo.
+
+Tipos de reporte (los mismos que ofrece backend/src/routes/metrics.js):
+    dia        ventas, unidades y monto por día
+    categoria  por categoría del producto
+    proveedor  por proveedor del producto
+    usuario    por usuario que registró la venta
+    productos  los N productos más vendidos (por unidades)
+
+Las ventas anteriores al corte del archivo (archivo.py) se suman en el proceso
+principal: los meses completos salen de ventas_mensuales y los días sueltos
+(y el reporte por día) de las filas del archivo adjunto.
+
+referencia() calcula lo mismo con una sola consulta sobre todo el rango;
+sirve para verificar que la versión paralela da el mismo resultado.
+"""
+
+import datetime
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+import archivo
+from conexion_db import conectar
+
+TIPOS = ('dia', 'categoria', 'proveedor', 'usuario', 'productos')
+
+TOP_DEFAULT = 10
+
+# Con menos ventas que esto no vale la pena lanzar procesos
+VENTAS_MINIMAS_PARALELO = 50_000
+
+# Expresión de agrupación y JOIN de cada tipo de reporte
+_AGRUPACION = {
+    'dia': ("date(v.fecha_venta)", ""),
+    'categoria': ("COALESCE(p.categoria, 'Sin categoría')",
+                  "LEFT JOIN productos p ON p.id = v.producto_id"),
+    'proveedor': ("COALESCE(p.proveedor, 'Sin proveedor')",
+                  "LEFT JOIN productos p ON p.id = v.producto_id"),
+    'usuario': ("v.usuario_id", ""),
+    'productos': ("v.producto_id", ""),
+}
+
+# Agregado por clave: [ventas, unidades, monto]
+Parcial = Dict[object, List]
+
+
+def _sql_agregado(tipo: str, tabla: str = 'ventas') -> str:
+    """Consulta que agrega las ventas de un rango [desde, hasta)"""
+    clave, join = _AGRUPACION[tipo]
+    return f"""
+        SELECT {clave} AS clave, COUNT(*), SUM(v.cantidad), SUM(v.total)
+        FROM {tabla} v
+        {join}
+        WHERE v.fecha_venta >= ? AND v.fecha_venta < ?
+        GROUP BY clave
+    """
+
+
+def _sql_mensual(tipo: str) -> str:
+    """Consulta que agrega ventas_mensuales de los meses [desde, hasta) ('AAAA-MM')"""
+    clave, join = _AGRUPACION[tipo]
+    return f"""
+        SELECT {clave} AS clave, SUM(v.ventas), SUM(v.unidades), SUM(v.monto)
+        FROM ventas_mensuales v
+        {join}
+        WHERE v.mes >= ? AND v.mes < ?
+        GROUP BY clave
+    """
+
+
+def _siguiente_mes(fecha: str) -> str:
+    """Primer día del mes que empieza en fecha o después ('AAAA-MM-DD')"""
+    if fecha.endswith('-01'):
+        return fecha
+    dia = datetime.date.fromisoformat(fecha)
+    return (dia.replace(day=28) + datetime.timedelta(days=4)).replace(day=1).isoformat()
+
+
+def _agregar_archivadas(conn: sqlite3.Connection, tipo: str, desde: str,
+                        hasta: str) -> Parcial:
+    """
+    Agrega las ventas archivadas de [desde, hasta) en el proceso principal
+
+    Returns:
+        Agregado vacío si no hay archivo o el rango es posterior al corte
+
+    Raises:
+        ValueError: Si hace falta leer filas del archivo y no se encuentra
+    """
+    corte = archivo.corte_actual(conn)
+    if not corte or desde >= corte:
+        return {}
+    fin = min(hasta, corte)
+
+    # Meses completos desde los acumulados; el resto desde las filas archivadas
+    sueltos = [(desde, fin)]
+    parciales = []
+    if tipo != 'dia':
+        mes_inicio = _siguiente_mes(desde)
+        mes_fin = fin[:8] + '01'
+        if mes_inicio < mes_fin:
+            parciales.append({clave: [ventas, unidades, monto]
+                              for clave, ventas, unidades, monto in conn.execute(
+                                  _sql_mensual(tipo), (mes_inicio[:7], mes_fin[:7]))})
+            sueltos = [(desde, mes_inicio), (mes_fin, fin)]
+    sueltos = [(a, b) for a, b in sueltos if a < b]
+    if sueltos:
+        if not archivo.adjuntar(conn):
+            raise ValueError(f"No se encontró el archivo de ventas históricas "
+                             f"({archivo.ruta_registrada(conn)})")
+        for a, b in sueltos:
+            parciales.append({clave: [ventas, unidades, monto]
+                              for clave, ventas, unidades, monto in conn.execute(
+                                  _sql_agregado(tipo, f"{archivo.ESQUEMA}.ventas"), (a, b))})
+    return combinar(parciales)
+
+
+def limites(desde: Optional[str], hasta: Optional[str]) -> Tuple[str, str]:
+    """Convierte fechas inclusivas 'AAAA-MM-DD' en el rango semiabierto [desde, hasta)"""
+    try:
+        inicio = datetime.date.fromisoformat(desde).isoformat() if desde else '0000-01-01'
+        # El día 'hasta' completo: todo lo anterior al día siguiente
+        fin = ((datetime.date.fromisoformat(hasta) + datetime.timedelta(days=1)).isoformat()
+               if hasta else '9999-12-31')
+    except ValueError:
+        raise ValueError(f"Fecha inválida (se espera AAAA-MM-DD): {desde or hasta!r}")
+    return inicio, fin
+
+
+def particionar(conn: sqlite3.Connection, desde: str, hasta: str,
+                partes: int) -> List[Tuple[str, str]]:
+    """
+    Divide [desde, hasta) en rangos de días con un número de ventas parecido
+
+    Usa los conteos por día de resumen_ventas_diarias, así que no recorre ventas.
+
+    Returns:
+        Lista de rangos (inicio, fin) semiabiertos que cubren [desde, hasta)
+    """
+    dias = conn.execute("""
+        SELECT fecha, ventas FROM resumen_ventas_diarias
+        WHERE fecha >= date(?) AND fecha < ? AND ventas > 0
+        ORDER BY fecha
+    """, (desde, hasta)).fetchall()
+    total = sum(ventas for _, ventas in dias)
+    if partes <= 1 or len(dias) <= 1 or total == 0:
+        return [(desde, hasta)]
+
+    cortes = []
+    acumulado = 0
+    objetivo = total / partes
+    for fecha, ventas in dias:
+        if acumulado >= objetivo * (len(cortes) + 1) and len(cortes) < partes - 1:
+            cortes.append(fecha)
+        acumulado += ventas
+    limites = [desde] + cortes + [hasta]
+    return [(limites[i], limites[i + 1]) for i in range(len(limites) - 1)
+            if limites[i] < limites[i + 1]]
+
+
+def agregar_rango(db_path: str, tipo: str, desde: str, hasta: str) -> Parcial:
+    """
+    Agrega las ventas de un rango con una conexión propia de solo lectura
+
+    Se ejecuta en los procesos del pool, por eso recibe la ruta y no una conexión.
+    """
+    conn = conectar(db_path, solo_lectura=True)
+    try:
+        return {clave: [ventas, unidades, monto]
+                for clave, ventas, unidades, monto in conn.execute(_sql_agregado(tipo),
+                                                                     (desde, hasta))}
+    finally:
+        conn.close()
+
+
+def combinar(parciales: List[Parcial]) -> Parcial:
+    """Suma los agregados parciales de cada rango"""
+    total: Parcial = {}
+    for parcial in parciales:
+        for clave, (ventas, unidades, monto) in parcial.items():
+            acumulado = total.get(clave)
+            if acumulado is None:
+                total[clave] = [ventas, unidades, monto]
+            else:
+                acumulado[0] += ventas
+                acumulado[1] += unidades
+                acumulado[2] += monto
+    return total
+
+
+def ordenar(tipo: str, agregado: Parcial, top: int = TOP_DEFAULT) -> List[Dict]:
+    """Filas del reporte en su orden final (sin nombres de producto)"""
+    filas = [{'clave': clave, 'ventas': ventas, 'unidades': unidades, 'monto': round(monto, 2)}
+             for clave, (ventas, unidades, monto) in agregado.items()]
+    if tipo == 'dia':
+        filas.sort(key=lambda f: f['clave'])
+    elif tipo == 'productos':
+        filas.sort(key=lambda f: (-f['unidades'], f['clave']))
+        filas = filas[:top]
+    else:
+        filas.sort(key=lambda f: (-f['monto'], str(f['clave'])))
+    return filas
+
+
+def _filas(conn: sqlite3.Connection, tipo: str, agregado: Parcial, top: int) -> List[Dict]:
+    """Ordena el agregado combinado y le da la forma final del reporte"""
+    filas = ordenar(tipo, agregado, top)
+    if tipo == 'productos':
+        nombres = {}
+        if filas:
+            marcas = ','.join('?' * len(filas))
+            nombres = dict(conn.execute(
+                f"SELECT id, nombre FROM productos WHERE id IN ({marcas})",
+                [f['clave'] for f in filas]
+            ))
+        for fila in filas:
+            fila['nombre'] = nombres.get(fila['clave'], '(eliminado)')
+    return filas
+
+
+def generar(conn: sqlite3.Connection, db_path: str, tipo: str,
+            desde: Optional[str] = None, hasta: Optional[str] = None,
+            top: int = TOP_DEFAULT, procesos: Optional[int] = None) -> Dict:
+    """
+    Genera un reporte agregando rangos de fechas en un pool de procesos
+
+    Args:
+        conn: Conexión del proceso principal (para particionar y leer nombres)
+        db_path: Ruta de la base de datos que abren los procesos
+        tipo: Uno de TIPOS
+        desde: Primer día incluido 'AAAA-MM-DD' (por defecto el inicio del historial)
+        hasta: Último día incluido 'AAAA-MM-DD' (por defecto todo el historial)
+        top: Productos a mostrar en el reporte 'productos'
+        procesos: Procesos del pool (por defecto uno por CPU)
+
+    Returns:
+        Diccionario con 'filas', 'rangos', 'procesos' y 'segundos'
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de reporte desconocido: {tipo}")
+    inicio = time.perf_counter()
+    procesos = max(1, procesos or os.cpu_count() or 1)
+    desde, hasta = limites(desde, hasta)
+
+    total_ventas = conn.execute("SELECT total_ventas FROM resumen_global WHERE id = 1").fetchone()
+    if total_ventas and total_ventas[0] < VENTAS_MINIMAS_PARALELO:
+        procesos = 1
+
+    # La parte archivada casi no tiene filas en ventas: se reparte solo lo
+    # posterior al corte, pero el primer rango sigue empezando en 'desde'
+    corte = archivo.corte_actual(conn)
+    rangos = particionar(conn, max(desde, corte) if corte and corte < hasta else desde,
+                         hasta, procesos)
+    rangos[0] = (desde, rangos[0][1])
+    if procesos == 1 or len(rangos) == 1:
+        parciales = [agregar_rango(db_path, tipo, a, b) for a, b in rangos]
+    else:
+        # concurrent.futures importa multiprocessing y logging: solo se paga
+        # cuando el reporte de verdad se reparte en procesos
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(procesos, len(rangos))) as pool:
+            parciales = list(pool.map(agregar_rango, [db_path] * len(rangos),
+                                      [tipo] * len(rangos),
+                                      [a for a, _ in rangos], [b for _, b in rangos]))
+
+    parciales.append(_agregar_archivadas(conn, tipo, desde, hasta))
+
+    return {
+        'filas': _filas(conn, tipo, combinar(parciales), top),
+        'rangos': rangos,
+        'procesos': min(procesos, len(rangos)),
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def agregado(conn: sqlite3.Connection, tipo: str, desde: Optional[str] = None,
+             hasta: Optional[str] = None) -> Parcial:
+    """Agregado completo de [desde, hasta] (incluye lo archivado) con una sola consulta"""
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de reporte desconocido: {tipo}")
+    desde, hasta = limites(desde, hasta)
+    parcial = {clave: [ventas, unidades, monto]
+               for clave, ventas, unidades, monto in conn.execute(_sql_agregado(tipo),
+                                                                    (desde, hasta))}
+    return combinar([parcial, _agregar_archivadas(conn, tipo, desde, hasta)])
+
+
+def referencia(conn: sqlite3.Connection, tipo: str, desde: Optional[str] = None,
+               hasta: Optional[str] = None, top: int = TOP_DEFAULT) -> List[Dict]:
+    """Mismo reporte que generar() con una sola consulta en el proceso actual"""
+    return _filas(conn, tipo, agregado(conn, tipo, desde, hasta), top)
+
+
+def diferencias(filas: List[Dict], esperadas: List[Dict]) -> List[str]:
+    """Compara dos reportes fila por fila (montos con tolerancia de un centavo)"""
+    if len(filas) != len(esperadas):
+        return [f"{len(filas)} filas, se esperaban {len(esperadas)}"]
+    errores = []
+    for fila, esperada in zip(filas, esperadas):
+        if (fila['clave'], fila['ventas'], fila['unidades']) != \
+                (esperada['clave'], esperada['ventas'], esperada['unidades']) or \
+                abs(fila['monto'] - esperada['monto']) > 0.01:
+            errores.append(f"{fila} != {esperada}")
+    return errores
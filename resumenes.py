@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Estadísticas materializadas que se actualizan con cada escritura
+
+En lugar de recorrer productos y ventas completos en cada llamada a
+estadisticas, unos triggers mantienen al día:
+
+- resumen_global: una sola fila con total de productos, valor del
+  inventario, productos en stock bajo, número y monto de ventas (los
+  productos en stock bajo los cuentan los triggers de alertas_stock.py)
+- resumen_productos_vendidos: unidades, monto y ventas por producto
+- resumen_ventas_diarias: ventas, unidades y monto por día
+
+Al estar en triggers, las escrituras del backend de Node también se reflejan.
+recalcular() reconstruye todo desde cero y verificar() compara los
+resúmenes con el cálculo completo.
+
+Las ventas archivadas (archivo.py) siguen contando: los totales y el detalle
+por producto suman ventas_mensuales, y los días anteriores al corte del
+archivo conservan su resumen diario porque sus filas ya no están en ventas.
+"""
+
+import sqlite3
+from typing import Dict, List
+
+import alertas_stock
+import archivo
+
+# Tolerancia para comparar montos acumulados en punto flotante
+TOLERANCIA_MONTOS = 0.01
+
+SQL_CREAR_RESUMENES = [
+    """
+    CREATE TABLE IF NOT EXISTS resumen_global (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_productos INTEGER NOT NULL DEFAULT 0,
+        valor_inventario REAL NOT NULL DEFAULT 0,
+        productos_stock_bajo INTEGER NOT NULL DEFAULT 0,
+        total_ventas INTEGER NOT NULL DEFAULT 0,
+        monto_ventas REAL NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS resumen_productos_vendidos (
+        producto_id INTEGER PRIMARY KEY,
+        unidades INTEGER NOT NULL DEFAULT 0,
+        monto REAL NOT NULL DEFAULT 0,
+        ventas INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_resumen_productos_unidades
+    ON resumen_productos_vendidos (unidades)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS resumen_ventas_diarias (
+        fecha TEXT PRIMARY KEY,
+        ventas INTEGER NOT NULL DEFAULT 0,
+        unidades INTEGER NOT NULL DEFAULT 0,
+        monto REAL NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT OR IGNORE INTO resumen_global (id) VALUES (1)",
+
+    # Inventario: altas, bajas y cambios de precio o stock
+    """
+    CREATE TRIGGER IF NOT EXISTS resumen_productos_ai AFTER INSERT ON productos BEGIN
+        UPDATE resumen_global SET
+            total_productos = total_productos + 1,
+            valor_inventario = valor_inventario + COALESCE(new.precio * new.stock_actual, 0),
+            productos_stock_bajo = productos_stock_bajo
+                + COALESCE(new.stock_actual <= new.stock_minimo, 0)
+        WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resumen_productos_ad AFTER DELETE ON productos BEGIN
+        UPDATE resumen_global SET
+            total_productos = total_productos - 1,
+            valor_inventario = valor_inventario - COALESCE(old.precio * old.stock_actual, 0),
+            productos_stock_bajo = productos_stock_bajo
+                - COALESCE(old.stock_actual <= old.stock_minimo, 0)
+        WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resumen_productos_au
+    AFTER UPDATE OF precio, stock_actual, stock_minimo ON productos BEGIN
+        UPDATE resumen_global SET
+            valor_inventario = valor_inventario
+                + COALESCE(new.precio * new.stock_actual, 0)
+                - COALESCE(old.precio * old.stock_actual, 0),
+            productos_stock_bajo = productos_stock_bajo
+                + COALESCE(new.stock_actual <= new.stock_minimo, 0)
+                - COALESCE(old.stock_actual <= old.stock_minimo, 0)
+        WHERE id = 1;
+    END
+    """,
+
+    # Ventas
+    """
+    CREATE TRIGGER IF NOT EXISTS resumen_ventas_ai AFTER INSERT ON ventas BEGIN
+        UPDATE resumen_global SET
+            total_ventas = total_ventas + 1,
+            monto_ventas = monto_ventas + new.total
+        WHERE id = 1;
+        INSERT INTO resumen_productos_vendidos (producto_id, unidades, monto, ventas)
+        VALUES (new.producto_id, new.cantidad, new.total, 1)
+        ON CONFLICT (producto_id) DO UPDATE SET
+            unidades = unidades + excluded.unidades,
+            monto = monto + excluded.monto,
+            ventas = ventas + 1;
+        INSERT INTO resumen_ventas_diarias (fecha, ventas, unidades, monto)
+        VALUES (date(new.fecha_venta), 1, new.cantidad, new.total)
+        ON CONFLICT (fecha) DO UPDATE SET
+            ventas = ventas + 1,
+            unidades = unidades + excluded.unidades,
+            monto = monto + excluded.monto;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resumen_ventas_ad AFTER DELETE ON ventas BEGIN
+        UPDATE resumen_global SET
+            total_ventas = total_ventas - 1,
+            monto_ventas = monto_ventas - old.total
+        WHERE id = 1;
+        UPDATE resumen_productos_vendidos SET
+            unidades = unidades - old.cantidad,
+            monto = monto - old.total,
+            ventas = ventas - 1
+        WHERE producto_id = old.producto_id;
+        UPDATE resumen_ventas_diarias SET
+            ventas = ventas - 1,
+            unidades = unidades - old.cantidad,
+            monto = monto - old.total
+        WHERE fecha = date(old.fecha_venta);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resumen_ventas_au
+    AFTER UPDATE OF producto_id, cantidad, total, fecha_venta ON ventas BEGIN
+        UPDATE resumen_global SET
+            monto_ventas = monto_ventas - old.total + new.total
+        WHERE id = 1;
+        UPDATE resumen_productos_vendidos SET
+            unidades = unidades - old.cantidad,
+            monto = monto - old.total,
+            ventas = ventas - 1
+        WHERE producto_id = old.producto_id;
+        INSERT INTO resumen_productos_vendidos (producto_id, unidades, monto, ventas)
+        VALUES (new.producto_id, new.cantidad, new.total, 1)
+        ON CONFLICT (producto_id) DO UPDATE SET
+            unidades = unidades + excluded.unidades,
+            monto = monto + excluded.monto,
+            ventas = ventas + 1;
+        UPDATE resumen_ventas_diarias SET
+            ventas = ventas - 1,
+            unidades = unidades - old.cantidad,
+            monto = monto - old.total
+        WHERE fecha = date(old.fecha_venta);
+        INSERT INTO resumen_ventas_diarias (fecha, ventas, unidades, monto)
+        VALUES (date(new.fecha_venta), 1, new.cantidad, new.total)
+        ON CONFLICT (fecha) DO UPDATE SET
+            ventas = ventas + 1,
+            unidades = unidades + excluded.unidades,
+            monto = monto + excluded.monto;
+    END
+    """,
+]
+
+# Triggers de productos desde la migración 10: los de SQL_CREAR_RESUMENES
+# también contaban productos_stock_bajo con stock_minimo; ahora ese conteo lo
+# llevan los triggers de alertas_stock.py, que respetan los umbrales por categoría
+SQL_TRIGGERS_PRODUCTOS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS resumen_productos_ai AFTER INSERT ON productos BEGIN
+        UPDATE resumen_global SET
+            total_productos = total_productos + 1,
+            valor_inventario = valor_inventario + COALESCE(new.precio * new.stock_actual, 0)
+        WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resumen_productos_ad AFTER DELETE ON productos BEGIN
+        UPDATE resumen_global SET
+            total_productos = total_productos - 1,
+            valor_inventario = valor_inventario - COALESCE(old.precio * old.stock_actual, 0)
+        WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resumen_productos_au
+    AFTER UPDATE OF precio, stock_actual ON productos BEGIN
+        UPDATE resumen_global SET
+            valor_inventario = valor_inventario
+                + COALESCE(new.precio * new.stock_actual, 0)
+                - COALESCE(old.precio * old.stock_actual, 0)
+        WHERE id = 1;
+    END
+    """,
+]
+
+
+# Llenado inicial de la migración 4, tal como se publicó. No usa recalcular()
+# para que la migración no cambie cuando recalcular() aprenda cosas nuevas
+# (ventas archivadas, umbrales por categoría)
+SQL_LLENAR_RESUMENES = [
+    """
+    UPDATE resumen_global SET
+        (total_productos, valor_inventario, productos_stock_bajo) = (
+            SELECT COUNT(*),
+                   COALESCE(SUM(precio * stock_actual), 0),
+                   COALESCE(SUM(stock_actual <= stock_minimo), 0)
+            FROM productos
+        ),
+        (total_ventas, monto_ventas) = (
+            SELECT COUNT(*), COALESCE(SUM(total), 0) FROM ventas
+        )
+    WHERE id = 1
+    """,
+    "DELETE FROM resumen_productos_vendidos",
+    """
+    INSERT INTO resumen_productos_vendidos (producto_id, unidades, monto, ventas)
+    SELECT producto_id, SUM(cantidad), SUM(total), COUNT(*)
+    FROM ventas
+    GROUP BY producto_id
+    """,
+    "DELETE FROM resumen_ventas_diarias",
+    """
+    INSERT INTO resumen_ventas_diarias (fecha, ventas, unidades, monto)
+    SELECT date(fecha_venta), COUNT(*), SUM(cantidad), SUM(total)
+    FROM ventas
+    GROUP BY date(fecha_venta)
+    """,
+]
+
+
+def crear_resumenes(conn: sqlite3.Connection):
+    """Crea las tablas y triggers de resúmenes y los llena (migración 4, dentro de la transacción actual)"""
+    for sql in SQL_CREAR_RESUMENES + SQL_LLENAR_RESUMENES:
+        conn.execute(sql)
+
+
+def separar_stock_bajo(conn: sqlite3.Connection):
+    """
+    Deja de contar productos_stock_bajo en los triggers de productos
+    (migración 10, dentro de la transacción actual)
+
+    Va después de alertas_stock.crear_alertas: desde ahí el conteo sigue a
+    la lista de alertas, que respeta los umbrales por categoría.
+    """
+    for trigger in ('resumen_productos_ai', 'resumen_productos_ad', 'resumen_productos_au'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for sql in SQL_TRIGGERS_PRODUCTOS:
+        conn.execute(sql)
+    conn.execute("UPDATE resumen_global SET productos_stock_bajo = ? WHERE id = 1",
+                 (alertas_stock.contar_completo(conn),))
+
+
+def recalcular(conn: sqlite3.Connection):
+    """Reconstruye todos los resúmenes desde productos y ventas (dentro de la transacción actual)"""
+    conn.execute("""
+        UPDATE resumen_global SET
+            (total_productos, valor_inventario) = (
+                SELECT COUNT(*), COALESCE(SUM(precio * stock_actual), 0) FROM productos
+            ),
+            productos_stock_bajo = ?,
+            (total_ventas, monto_ventas) = (
+                SELECT COUNT(*), COALESCE(SUM(total), 0) FROM ventas
+            )
+        WHERE id = 1
+    """, (alertas_stock.contar_completo(conn),))
+    conn.execute("DELETE FROM resumen_productos_vendidos")
+    conn.execute("""
+        INSERT INTO resumen_productos_vendidos (producto_id, unidades, monto, ventas)
+        SELECT producto_id, SUM(cantidad), SUM(total), COUNT(*)
+        FROM ventas
+        GROUP BY producto_id
+    """)
+    corte = archivo.corte_actual(conn)
+    if corte:
+        conn.execute("""
+            UPDATE resumen_global SET
+                total_ventas = total_ventas + (SELECT COALESCE(SUM(ventas), 0) FROM ventas_mensuales),
+                monto_ventas = monto_ventas + (SELECT COALESCE(SUM(monto), 0) FROM ventas_mensuales)
+            WHERE id = 1
+        """)
+        conn.execute("""
+            INSERT INTO resumen_productos_vendidos (producto_id, unidades, monto, ventas)
+            SELECT producto_id, SUM(unidades), SUM(monto), SUM(ventas)
+            FROM ventas_mensuales WHERE true
+            GROUP BY producto_id
+            ON CONFLICT (producto_id) DO UPDATE SET
+                unidades = unidades + excluded.unidades,
+                monto = monto + excluded.monto,
+                ventas = ventas + excluded.ventas
+        """)
+    # Los días archivados ya no tienen filas en ventas: se conserva su resumen
+    conn.execute("DELETE FROM resumen_ventas_diarias WHERE fecha >= ?", (corte or '',))
+    conn.execute("""
+        INSERT INTO resumen_ventas_diarias (fecha, ventas, unidades, monto)
+        SELECT date(fecha_venta), COUNT(*), SUM(cantidad), SUM(total)
+        FROM ventas
+        WHERE fecha_venta >= ?
+        GROUP BY date(fecha_venta)
+    """, (corte or '',))
+
+
+def leer(conn: sqlite3.Connection) -> Dict:
+    """
+    Lee las estadísticas desde los resúmenes sin recorrer productos ni ventas
+
+    Returns:
+        Diccionario con total_productos, valor_inventario,
+        productos_stock_bajo, total_ventas, monto_ventas, mas_vendido
+        ((nombre, unidades) o None), ventas_hoy y monto_hoy
+    """
+    fila = conn.execute("""
+        SELECT total_productos, valor_inventario, productos_stock_bajo,
+               total_ventas, monto_ventas
+        FROM resumen_global WHERE id = 1
+    """).fetchone()
+    resultado = dict(zip(
+        ('total_productos', 'valor_inventario', 'productos_stock_bajo',
+         'total_ventas', 'monto_ventas'),
+        fila
+    ))
+    # Recorre el índice de unidades de mayor a menor y se detiene en el
+    # primer producto que todavía existe
+    resultado['mas_vendido'] = conn.execute("""
+        SELECT p.nombre, r.unidades
+        FROM resumen_productos_vendidos r
+        JOIN productos p ON p.id = r.producto_id
+        WHERE r.unidades > 0
+        ORDER BY r.unidades DESC
+        LIMIT 1
+    """).fetchone()
+    hoy = conn.execute("""
+        SELECT ventas, monto FROM resumen_ventas_diarias WHERE fecha = date('now')
+    """).fetchone()
+    resultado['ventas_hoy'], resultado['monto_hoy'] = hoy or (0, 0.0)
+    return resultado
+
+
+def calcular_completo(conn: sqlite3.Connection) -> Dict:
+    """Calcula las mismas estadísticas que leer() recorriendo las tablas completas"""
+    total_productos, valor_inventario = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(precio * stock_actual), 0) FROM productos
+    """).fetchone()
+    stock_bajo = alertas_stock.contar_completo(conn)
+    total_ventas, monto_ventas = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(total), 0) FROM ventas"
+    ).fetchone()
+    archivadas = ""
+    if archivo.corte_actual(conn):
+        ventas_archivadas, monto_archivado = conn.execute(
+            "SELECT COALESCE(SUM(ventas), 0), COALESCE(SUM(monto), 0) FROM ventas_mensuales"
+        ).fetchone()
+        total_ventas += ventas_archivadas
+        monto_ventas += monto_archivado
+        archivadas = "UNION ALL SELECT producto_id, unidades FROM ventas_mensuales"
+    mas_vendido = conn.execute(f"""
+        SELECT p.nombre, SUM(v.cantidad) as total_vendido
+        FROM (SELECT producto_id, cantidad FROM ventas {archivadas}) v
+        JOIN productos p ON v.producto_id = p.id
+        GROUP BY v.producto_id
+        ORDER BY total_vendido DESC
+        LIMIT 1
+    """).fetchone()
+    ventas_hoy, monto_hoy = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(total), 0) FROM ventas
+        WHERE date(fecha_venta) = date('now')
+    """).fetchone()
+    return {
+        'total_productos': total_productos,
+        'valor_inventario': valor_inventario,
+        'productos_stock_bajo': stock_bajo,
+        'total_ventas': total_ventas,
+        'monto_ventas': monto_ventas,
+        'mas_vendido': mas_vendido,
+        'ventas_hoy': ventas_hoy,
+        'monto_hoy': monto_hoy,
+    }
+
+
+def verificar(conn: sqlite3.Connection) -> List[str]:
+    """
+    Compara los resúmenes con el cálculo completo
+
+    Returns:
+        Lista de diferencias (vacía si los resúmenes son consistentes)
+    """
+    rapido = leer(conn)
+    completo = calcular_completo(conn)
+    diferencias = []
+    for llave, esperado in completo.items():
+        actual = rapido[llave]
+        if llave == 'mas_vendido':
+            # Con empates el nombre puede diferir; se comparan las unidades
+            esperado = esperado[1] if esperado else None
+            actual = actual[1] if actual else None
+            iguales = esperado == actual
+        elif isinstance(esperado, float) or isinstance(actual, float):
+            iguales = abs((esperado or 0) - (actual or 0)) <= TOLERANCIA_MONTOS
+        else:
+            iguales = esperado == actual
+        if not iguales:
+            diferencias.append(f"{llave}: resumen={actual} completo={esperado}")
+
+    # Detalle por producto y por día (los días archivados no se pueden
+    # recalcular desde ventas)
+    corte = archivo.corte_actual(conn)
+    archivadas = ("UNION ALL SELECT producto_id, unidades FROM ventas_mensuales"
+                  if corte else "")
+    por_producto = conn.execute(f"""
+        SELECT COUNT(*) FROM (
+            SELECT producto_id, SUM(cantidad) AS unidades
+            FROM (SELECT producto_id, cantidad FROM ventas {archivadas})
+            GROUP BY producto_id
+        ) v
+        LEFT JOIN resumen_productos_vendidos r ON r.producto_id = v.producto_id
+        WHERE r.unidades IS NOT v.unidades
+    """).fetchone()[0]
+    if por_producto:
+        diferencias.append(f"resumen_productos_vendidos: {por_producto} productos con unidades distintas")
+    por_dia = conn.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT date(fecha_venta) AS fecha, SUM(cantidad) AS unidades
+            FROM ventas WHERE fecha_venta >= ? GROUP BY date(fecha_venta)
+        ) v
+        LEFT JOIN resumen_ventas_diarias r ON r.fecha = v.fecha
+        WHERE r.unidades IS NOT v.unidades
+    """, (corte or '',)).fetchone()[0]
+    if por_dia:
+        diferencias.append(f"resumen_ventas_diarias: {por_dia} días con unidades distintas")
+    return diferencias
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Salida en streaming de listados: tabla decorada o formatos para otras herramientas
+
+Las filas se leen del cursor con fetchmany y se escriben conforme llegan, sin
+cargar el resultado completo en memoria. Los listados paginan por llave
+(keyset): el token de "siguiente página" codifica los valores de orden de la
+última fila mostrada, y la siguiente consulta empieza justo después de ella
+usando el índice, sin OFFSET.
+
+Formatos:
+    tabla  Tabla con emojis para personas (predeterminado)
+    json   {"filas": [...], "siguiente": "TOKEN" | null}
+    csv    Encabezado y filas; el token va a stderr como "# siguiente: TOKEN"
+    tsv    Igual que csv, separado por tabuladores
+"""
+
+import base64
+import csv
+import json
+import sqlite3
+import sys
+from typing import Callable, List, Optional, Sequence, TextIO, Tuple
+
+FORMATOS = ('tabla', 'json', 'csv', 'tsv')
+
+# Filas leídas por cada fetchmany
+TAMANO_LOTE_SALIDA = 500
+
+
+def codificar_cursor(valores: Sequence) -> str:
+    """Convierte los valores de orden de una fila en un token opaco para --after"""
+    texto = json.dumps(list(valores), ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token: str, cantidad: int) -> List:
+    """
+    Recupera los valores de orden desde un token de --after
+
+    Raises:
+        ValueError: Si el token no es válido
+    """
+    try:
+        relleno = '=' * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + relleno).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Token de página inválido: {token!r}")
+    if not isinstance(valores, list) or len(valores) != cantidad:
+        raise ValueError(f"Token de página inválido: {token!r}")
+    return valores
+
+
+def validar_limite(limite: Optional[int]):
+    """
+    Rechaza tamaños de página menores que 1 (None: sin límite)
+
+    Raises:
+        ValueError: Si el límite no es positivo
+    """
+    if limite is not None and limite < 1:
+        raise ValueError(f"El límite debe ser mayor que cero: {limite}")
+
+
+class _Pagina:
+    """Recorre el cursor por lotes con fetchmany, hasta 'limite' filas
+
+    La consulta debe pedir limite + 1 filas: si llega la fila extra hay
+    otra página, y así no se genera un token que lleve a una página vacía.
+    """
+
+    def __init__(self, cursor: sqlite3.Cursor, limite: Optional[int]):
+        validar_limite(limite)
+        self.cursor = cursor
+        self.limite = limite
+        self.total = 0
+        self.ultima = None
+        self.hay_mas = False
+
+    def __iter__(self):
+        while True:
+            lote = self.cursor.fetchmany(TAMANO_LOTE_SALIDA)
+            if not lote:
+                return
+            for fila in lote:
+                if self.limite is not None and self.total >= self.limite:
+                    self.hay_mas = True
+                    return
+                self.total += 1
+                self.ultima = fila
+                yield fila
+
+    def siguiente(self, clave_orden: Callable[[Tuple], Sequence]) -> Optional[str]:
+        """Token de la siguiente página, o None si esta es la última"""
+        if not self.hay_mas:
+            return None
+        return codificar_cursor(clave_orden(self.ultima))
+
+
+def emitir(cursor: sqlite3.Cursor, columnas: Sequence[str], formato: str,
+           clave_orden: Callable[[Tuple], Sequence], limite: Optional[int] = None,
+           encabezado: str = '', renglon: Optional[Callable[[Tuple], str]] = None,
+           pie: Optional[Callable[[int, Optional[str]], str]] = None,
+           vacio: str = '', archivo: Optional[TextIO] = None) -> Tuple[int, Optional[str]]:
+    """
+    Escribe las filas de un cursor ya ejecutado en el formato pedido
+
+    Args:
+        cursor: Cursor con la consulta ya ejecutada
+        columnas: Nombres de las columnas de cada fila
+        formato: Uno de FORMATOS
+        clave_orden: Devuelve los valores de orden de una fila (para el token)
+        limite: Tamaño de página (la consulta debe pedir limite + 1 filas)
+        encabezado: Texto antes de la primera fila (solo formato tabla)
+        renglon: Formatea una fila (solo formato tabla)
+        pie: Texto final a partir del total y el token (solo formato tabla)
+        vacio: Mensaje cuando no hay filas (solo formato tabla)
+        archivo: Destino (por defecto sys.stdout)
+
+    Returns:
+        (filas escritas, token de la siguiente página o None)
+
+    Raises:
+        ValueError: Si el límite no es positivo
+    """
+    archivo = archivo or sys.stdout
+    pagina = _Pagina(cursor, limite)
+
+    if formato == 'tabla':
+        for fila in pagina:
+            if pagina.total == 1 and encabezado:
+                archivo.write(encabezado)
+            archivo.write(renglon(fila) + '\n')
+        siguiente = pagina.siguiente(clave_orden)
+        if pagina.total == 0:
+            if vacio:
+                archivo.write(vacio + '\n')
+        elif pie:
+            archivo.write(pie(pagina.total, siguiente))
+        return pagina.total, siguiente
+
+    if formato == 'json':
+        archivo.write('{"filas": [')
+        for fila in pagina:
+            archivo.write((',\n' if pagina.total > 1 else '\n')
+                          + json.dumps(dict(zip(columnas, fila)), ensure_ascii=False))
+        siguiente = pagina.siguiente(clave_orden)
+        archivo.write(f'\n], "siguiente": {json.dumps(siguiente)}}}\n')
+        return pagina.total, siguiente
+
+    escritor = csv.writer(archivo, delimiter='\t' if formato == 'tsv' else ',',
+                          lineterminator='\n')
+    escritor.writerow(columnas)
+    escritor.writerows(pagina)
+    siguiente = pagina.siguiente(clave_orden)
+    if siguiente:
+        print(f"# siguiente: {siguiente}", file=sys.stderr)
+    return pagina.total, siguiente
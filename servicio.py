@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Servicio asíncrono del inventario para muchos clientes a la vez
+
+Las operaciones de inventario.py se ejecutan fuera del loop de asyncio:
+
+- Un hilo escritor con la única conexión de lectura y escritura. SQLite
+  admite un solo escritor a la vez; con un hilo dedicado las escrituras se
+  atienden en orden sin competir por el bloqueo dentro del proceso.
+- Un grupo de hilos lectores, cada uno con su propia conexión de solo
+  lectura. En modo WAL las lecturas no esperan a las escrituras, y el
+  módulo sqlite3 suelta el GIL mientras SQLite ejecuta la consulta, así que
+  varias lecturas avanzan al mismo tiempo.
+
+Las corrutinas del servicio solo encolan el trabajo y esperan su resultado,
+de modo que el loop sigue atendiendo otras peticiones (app móvil, web,
+lectores de código de barras).
+
+Con agrupar_ms, actualizar_stock y registrar_venta pasan por la cola de
+escrituras agrupadas (cola_escrituras.py): muchas operaciones por
+transacción, con diario para no perder las ya confirmadas. Las demás
+escrituras siguen en el hilo escritor.
+
+servir() expone el servicio en un socket Unix. Protocolo: una petición JSON
+por línea, por ejemplo
+    {"id": 7, "op": "buscar", "args": {"termino": "martillo"}}
+y una respuesta JSON por línea con el mismo id:
+    {"id": 7, "ok": true, "resultado": [...], "ms": 1.2}
+    {"id": 8, "ok": false, "error": "Stock insuficiente...", "tipo": "StockInsuficiente"}
+Las peticiones de una misma conexión se atienden en paralelo; las respuestas
+pueden llegar en otro orden y se asocian por id.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import busqueda
+import cola_escrituras
+import inventario
+import perfilado
+from conexion_db import conectar
+from inicializar_db import aplicar_migraciones
+
+LECTORES_DEFAULT = 4
+
+# Operaciones que acepta servir()
+OPERACIONES = (
+    'producto', 'producto_por_codigo', 'listar', 'stock_bajo', 'buscar', 'estadisticas',
+    'agregar_producto', 'actualizar_stock', 'registrar_venta', 'eliminar_producto',
+)
+
+
+class _GrupoConexiones:
+    """Hilos con una conexión propia cada uno que toman trabajos de una cola común"""
+
+    def __init__(self, nombre: str, hilos: int, abrir: Callable[[], sqlite3.Connection]):
+        self._cola: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._hilos = [
+            threading.Thread(target=self._trabajar, args=(abrir,), name=f"{nombre}-{i}",
+                             daemon=True)
+            for i in range(hilos)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def _trabajar(self, abrir: Callable[[], sqlite3.Connection]):
+        conn = None
+        error_apertura = None
+        try:
+            conn = abrir()
+        except sqlite3.Error as e:
+            error_apertura = e
+        try:
+            while True:
+                trabajo = self._cola.get()
+                if trabajo is None:
+                    return
+                futuro, funcion, args = trabajo
+                if not futuro.set_running_or_notify_cancel():
+                    continue
+                if error_apertura is not None:
+                    futuro.set_exception(error_apertura)
+                    continue
+                try:
+                    # Con el perfilado activo cada trabajo es un comando
+                    with perfilado.comando(funcion.__name__):
+                        resultado = funcion(conn, *args)
+                    futuro.set_result(resultado)
+                except BaseException as e:
+                    futuro.set_exception(e)
+                finally:
+                    # Ningún trabajo debe dejar una transacción abierta
+                    if conn.in_transaction:
+                        conn.rollback()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def enviar(self, funcion: Callable, *args) -> Future:
+        """Encola funcion(conn, *args) y devuelve su Future"""
+        futuro: Future = Future()
+        self._cola.put((futuro, funcion, args))
+        return futuro
+
+    def pendientes(self) -> int:
+        """Trabajos en espera (aproximado)"""
+        return self._cola.qsize()
+
+    def cerrar(self):
+        """Termina los trabajos encolados, cierra las conexiones y espera a los hilos"""
+        for _ in self._hilos:
+            self._cola.put(None)
+        for hilo in self._hilos:
+            hilo.join()
+
+
+class ServicioInventario:
+    """
+    Operaciones del inventario como corrutinas
+
+    Uso:
+        async with ServicioInventario("backend/tlapaleria.db", lectores=8) as servicio:
+            producto = await servicio.producto_por_codigo("7501234567890")
+            venta = await servicio.registrar_venta(producto.id, 2)
+    """
+
+    def __init__(self, db_path: str, lectores: int = LECTORES_DEFAULT,
+                 busy_timeout_ms: Optional[int] = None, agrupar_ms: Optional[int] = None,
+                 agrupar_max: int = cola_escrituras.MAX_OPERACIONES_DEFAULT,
+                 diario: Optional[str] = None):
+        """
+        Abre la conexión escritora (aplicando migraciones) y los lectores
+
+        Args:
+            db_path: Ruta al archivo de base de datos SQLite
+            lectores: Hilos con conexión de solo lectura
+            busy_timeout_ms: Espera máxima por bloqueos de otros procesos
+            agrupar_ms: Activa la cola de escrituras agrupadas con este intervalo
+            agrupar_max: Operaciones máximas por lote de la cola
+            diario: Diario de la cola (por defecto junto a la base)
+
+        Raises:
+            sqlite3.Error: Si no se puede abrir o migrar la base de datos
+        """
+        self.db_path = db_path
+        self.lectores = max(1, lectores)
+
+        def abrir_escritor():
+            conn = conectar(db_path, busy_timeout_ms)
+            aplicar_migraciones(conn)
+            return conn
+
+        self._escritor = _GrupoConexiones('escritor', 1, abrir_escritor)
+        try:
+            # Los lectores abren en solo lectura: la base y su esquema deben existir
+            self._fts = self._escritor.enviar(busqueda.asegurar_indice).result()
+        except BaseException:
+            self._escritor.cerrar()
+            raise
+        self._cola = None
+        if agrupar_ms is not None:
+            try:
+                self._cola = cola_escrituras.ColaEscrituras(db_path, diario, agrupar_ms,
+                                                            agrupar_max, busy_timeout_ms)
+            except BaseException:
+                self._escritor.cerrar()
+                raise
+        self._lectores = _GrupoConexiones(
+            'lector', self.lectores, lambda: conectar(db_path, busy_timeout_ms, solo_lectura=True)
+        )
+        self._cerrado = False
+
+    async def __aenter__(self) -> "ServicioInventario":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.cerrar()
+
+    async def _leer(self, funcion: Callable, *args) -> Any:
+        return await asyncio.wrap_future(self._lectores.enviar(funcion, *args))
+
+    async def _escribir(self, funcion: Callable, *args) -> Any:
+        return await asyncio.wrap_future(self._escritor.enviar(funcion, *args))
+
+    async def producto(self, producto_id: int) -> Optional[inventario.Producto]:
+        """Producto por ID, o None"""
+        return await self._leer(inventario.obtener_producto, producto_id)
+
+    async def producto_por_codigo(self, codigo: str) -> Optional[inventario.Producto]:
+        """Producto por código de barras, o None"""
+        return await self._leer(inventario.producto_por_codigo, codigo)
+
+    async def listar(self, limite: int = 50, despues: Optional[str] = None) -> inventario.Pagina:
+        """Página de productos ordenados por nombre"""
+        return await self._leer(inventario.listar, limite, despues)
+
+    async def stock_bajo(self, limite: Optional[int] = None,
+                         despues: Optional[str] = None) -> inventario.Pagina:
+        """Página de productos con stock bajo"""
+        return await self._leer(inventario.stock_bajo, limite, despues)
+
+    async def buscar(self, termino: str, limite: int = 20,
+                     pagina: int = 1) -> List[inventario.Producto]:
+        """Búsqueda por relevancia"""
+        return await self._leer(inventario.buscar, termino, limite, pagina, self._fts)
+
+    async def estadisticas(self) -> inventario.Estadisticas:
+        """Estadísticas generales"""
+        return await self._leer(inventario.estadisticas)
+
+    async def agregar_producto(self, nombre: str, precio: float, stock: int = 0,
+                               codigo_barras: Optional[str] = None,
+                               descripcion: Optional[str] = None, stock_minimo: int = 10,
+                               categoria: Optional[str] = None, ubicacion: Optional[str] = None,
+                               proveedor: Optional[str] = None) -> inventario.Producto:
+        """Agrega un producto (ver inventario.agregar_producto)"""
+        return await self._escribir(inventario.agregar_producto, nombre, precio, stock,
+                                    codigo_barras, descripcion, stock_minimo, categoria,
+                                    ubicacion, proveedor)
+
+    async def actualizar_stock(self, producto_id: int, stock: int) -> inventario.Producto:
+        """Fija el stock de un producto"""
+        if self._cola is not None:
+            return await asyncio.wrap_future(self._cola.fijar_stock(producto_id, stock))
+        return await self._escribir(inventario.actualizar_stock, producto_id, stock)
+
+    async def registrar_venta(self, producto_id: int, cantidad: int,
+                              usuario_id: int = 1) -> inventario.Venta:
+        """Registra una venta y descuenta el stock"""
+        if self._cola is not None:
+            return await asyncio.wrap_future(self._cola.vender(producto_id, cantidad, usuario_id))
+        return await self._escribir(inventario.registrar_venta, producto_id, cantidad, usuario_id)
+
+    async def eliminar_producto(self, producto_id: int,
+                                forzar: bool = False) -> inventario.Producto:
+        """Elimina un producto (con forzar, aunque tenga ventas)"""
+        return await self._escribir(inventario.eliminar_producto, producto_id, forzar)
+
+    def estado(self) -> Dict[str, int]:
+        """Lectores y trabajos en espera de cada cola"""
+        estado = {
+            'lectores': self.lectores,
+            'lecturas_pendientes': self._lectores.pendientes(),
+            'escrituras_pendientes': self._escritor.pendientes(),
+        }
+        if self._cola is not None:
+            estado['agrupadas_pendientes'] = self._cola.pendientes()
+        return estado
+
+    async def cerrar(self):
+        """Espera los trabajos pendientes y cierra todas las conexiones"""
+        if self._cerrado:
+            return
+        self._cerrado = True
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._lectores.cerrar)
+        if self._cola is not None:
+            await loop.run_in_executor(None, self._cola.cerrar)
+        await loop.run_in_executor(None, self._escritor.cerrar)
+
+
+def a_json(valor: Any) -> Any:
+    """Convierte los resultados tipados (NamedTuple) en estructuras para json"""
+    if hasattr(valor, '_asdict'):
+        return {clave: a_json(v) for clave, v in valor._asdict().items()}
+    if isinstance(valor, (list, tuple)):
+        return [a_json(v) for v in valor]
+    return valor
+
+
+async def atender(servicio: ServicioInventario, peticion: Dict) -> Dict:
+    """
+    Ejecuta una petición del protocolo y arma su respuesta
+
+    Los errores de la petición o del inventario se devuelven en la respuesta;
+    nunca se propagan. Cualquier otra excepción también se responde (como
+    error interno) y su traza queda en stderr.
+    """
+    inicio = time.perf_counter()
+    respuesta: Dict[str, Any] = {'id': peticion.get('id') if isinstance(peticion, dict) else None}
+    try:
+        if not isinstance(peticion, dict) or peticion.get('op') not in OPERACIONES:
+            raise ValueError(f"Operación desconocida; use una de: {', '.join(OPERACIONES)}")
+        args = peticion.get('args') or {}
+        if not isinstance(args, dict):
+            raise ValueError("'args' debe ser un objeto")
+        resultado = await getattr(servicio, peticion['op'])(**args)
+        respuesta.update(ok=True, resultado=a_json(resultado))
+    except TypeError as e:
+        respuesta.update(ok=False, error=f"Argumentos inválidos: {e}", tipo='TypeError')
+    except (ValueError, sqlite3.Error) as e:
+        respuesta.update(ok=False, error=str(e), tipo=type(e).__name__)
+    except Exception as e:
+        # Un error de programación en una operación no debe dejar al cliente
+        # esperando: se registra en stderr y se responde como error interno
+        print(f"❌ Error inesperado en la petición {respuesta['id']!r}:", file=sys.stderr)
+        traceback.print_exc()
+        respuesta.update(ok=False, error=f"Error interno: {e}", tipo=type(e).__name__)
+    respuesta['ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+    return respuesta
+
+
+async def _atender_conexion(servicio: ServicioInventario, lector: asyncio.StreamReader,
+                            escritor: asyncio.StreamWriter):
+    """Lee peticiones de una conexión y responde cada una al terminar"""
+    bloqueo = asyncio.Lock()
+    tareas = set()
+
+    async def responder(linea: bytes):
+        try:
+            peticion = json.loads(linea)
+        except ValueError as e:
+            respuesta = {'id': None, 'ok': False, 'error': f"JSON inválido: {e}",
+                         'tipo': 'ValueError'}
+        else:
+            respuesta = await atender(servicio, peticion)
+        async with bloqueo:
+            escritor.write(json.dumps(respuesta, ensure_ascii=False).encode('utf-8') + b'\n')
+            await escritor.drain()
+
+    try:
+        while True:
+            linea = await lector.readline()
+            if not linea:
+                break
+            if not linea.strip():
+                continue
+            tarea = asyncio.ensure_future(responder(linea))
+            tareas.add(tarea)
+            tarea.add_done_callback(tareas.discard)
+        if tareas:
+            await asyncio.gather(*tareas, return_exceptions=True)
+    except ConnectionError:
+        pass
+    finally:
+        escritor.close()
+
+
+async def servir(db_path: str, socket_path: str, lectores: int = LECTORES_DEFAULT,
+                 busy_timeout_ms: Optional[int] = None, agrupar_ms: Optional[int] = None,
+                 agrupar_max: int = cola_escrituras.MAX_OPERACIONES_DEFAULT,
+                 diario: Optional[str] = None):
+    """
+    Atiende el protocolo JSON en un socket Unix hasta recibir SIGINT o SIGTERM
+
+    Args:
+        db_path: Ruta al archivo de base de datos SQLite
+        socket_path: Ruta del socket Unix a crear
+        lectores: Hilos con conexión de solo lectura
+        busy_timeout_ms: Espera máxima por bloqueos de otros procesos
+        agrupar_ms: Activa la cola de escrituras agrupadas con este intervalo
+        agrupar_max: Operaciones máximas por lote de la cola
+        diario: Diario de la cola (por defecto junto a la base)
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    servicio = ServicioInventario(db_path, lectores, busy_timeout_ms, agrupar_ms, agrupar_max,
+                                  diario)
+    servidor = await asyncio.start_unix_server(
+        lambda lector, escritor: _atender_conexion(servicio, lector, escritor), path=socket_path
+    )
+    os.chmod(socket_path, 0o660)
+
+    detener = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(senal, detener.set)
+    print(f"🔌 Servicio escuchando en {socket_path} con {servicio.lectores} lectores "
+          f"(Ctrl+C para detener)")
+    try:
+        await detener.wait()
+    finally:
+        servidor.close()
+        await servidor.wait_closed()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        await servicio.cerrar()
+        print("🛑 Servicio detenido")
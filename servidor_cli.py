@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Modo persistente de la Tlapalería CLI: sesión interactiva (REPL) y servidor
+en socket Unix. Ambos mantienen una sola conexión abierta a la base de datos
+y el parser construido, de modo que cada comando solo paga su consulta.
+
+Protocolo del servidor: una petición JSON por línea, por ejemplo
+    {"argv": ["venta", "1", "2"]}
+y una respuesta JSON por línea:
+    {"ok": true, "salida": "...", "ms": 0.42}
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shlex
+import signal
+import socketserver
+import sys
+import time
+from typing import Dict, List, Optional
+
+import perfilado
+import sucursales
+from interfaz_cli import TlapaleriaCLI, construir_parser, ejecutar_comando
+
+
+# Comandos que no tienen sentido dentro de una sesión persistente
+COMANDOS_EXCLUIDOS = ('repl', 'servidor', 'servicio', 'vigilar')
+
+
+class SesionCLI:
+    """Conexión y parser reutilizables para ejecutar muchos comandos seguidos"""
+
+    def __init__(self, db_path: str, busy_timeout_ms: Optional[int] = None):
+        self.parser = construir_parser()
+        # La sesión dura lo suficiente para que la caché del catálogo se pague sola
+        self.cli = TlapaleriaCLI(db_path, busy_timeout_ms, cache=True)
+
+    def ejecutar(self, argv: List[str]) -> bool:
+        """
+        Ejecuta un comando escribiendo su salida en sys.stdout
+
+        Returns:
+            True si el comando se interpretó y ejecutó, False si hubo error de uso
+        """
+        try:
+            # Sin --db, args.db queda en None en lugar del valor por defecto
+            # para distinguirlo de un --db explícito
+            args = self.parser.parse_args(argv, argparse.Namespace(db=None))
+        except SystemExit as e:
+            # --help termina con código 0 y sí es una ejecución correcta
+            return e.code == 0
+
+        if not args.comando:
+            self.parser.print_help()
+            return True
+        if args.comando in COMANDOS_EXCLUIDOS:
+            print(f"❌ El comando '{args.comando}' no está disponible en esta sesión")
+            return False
+        ajenas = self._opciones_ajenas(args)
+        if ajenas:
+            print(f"❌ Opciones no disponibles en esta sesión: {', '.join(ajenas)}")
+            print(f"   La sesión usa {self.cli.db_path}; para otra base o configuración "
+                  f"ejecute tlapaleria_cli.py directamente")
+            return False
+        args.db = self.cli.db_path
+        self.cli.silencioso = args.quiet
+
+        try:
+            with perfilado.comando(args.comando):
+                ejecutar_comando(self.cli, args, self.parser)
+        except SystemExit as e:
+            return e.code == 0
+        except Exception as e:
+            # Un comando con error no debe terminar la sesión
+            print(f"❌ Error inesperado en '{args.comando}': {e}")
+            return False
+        finally:
+            # Ningún comando debe dejar una transacción abierta entre peticiones
+            if self.cli.conn.in_transaction:
+                self.cli.conn.rollback()
+        return True
+
+    def _opciones_ajenas(self, args: argparse.Namespace) -> List[str]:
+        """
+        Opciones globales del comando que la sesión no puede respetar
+
+        La conexión es la de la sesión: un --db, --sucursal o --busy-timeout
+        distinto del suyo se ignoraría en silencio. El perfilado de la sesión
+        se configura al iniciarla, con TLAPALERIA_PERFIL.
+
+        Returns:
+            Las opciones rechazadas, tal como se mostrarían al usuario
+        """
+        ajenas = []
+        propia = os.path.realpath(self.cli.db_path)
+        if args.db is not None and os.path.realpath(args.db) != propia:
+            ajenas.append(f"--db {args.db}")
+        if args.sucursal:
+            try:
+                ruta = os.path.realpath(sucursales.ruta_de(args.sucursal, args.sucursales))
+            except ValueError:
+                ruta = None
+            if ruta != propia:
+                ajenas.append(f"--sucursal {args.sucursal}")
+        if args.busy_timeout is not None and args.busy_timeout != self.cli.busy_timeout_ms:
+            ajenas.append(f"--busy-timeout {args.busy_timeout}")
+        for opcion, valor in (('--profile', args.profile), ('--profile-salida', args.profile_salida),
+                              ('--profile-lentas-ms', args.profile_lentas_ms),
+                              ('--profile-log-lentas', args.profile_log_lentas),
+                              ('--profile-prometheus', args.profile_prometheus)):
+            if valor:
+                ajenas.append(opcion)
+        return ajenas
+
+    def ejecutar_capturado(self, argv: List[str]) -> Dict:
+        """
+        Ejecuta un comando capturando su salida, para responder por el socket
+
+        La entrada estándar se sustituye por un flujo vacío: los comandos que
+        piden confirmación (eliminar) la consideran cancelada.
+        """
+        salida = io.StringIO()
+        stdin_original = sys.stdin
+        sys.stdin = io.StringIO()
+        inicio = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(salida), contextlib.redirect_stderr(salida):
+                ok = self.ejecutar(argv)
+        finally:
+            sys.stdin = stdin_original
+        return {
+            'ok': ok,
+            'salida': salida.getvalue(),
+            'ms': round((time.perf_counter() - inicio) * 1000, 3),
+        }
+
+    def close(self):
+        """Cierra la conexión de la sesión"""
+        self.cli.close()
+
+
+def repl(db_path: str, busy_timeout_ms: Optional[int] = None):
+    """
+    Sesión interactiva: acepta los mismos subcomandos que la CLI
+
+    Args:
+        db_path: Ruta al archivo de base de datos SQLite
+        busy_timeout_ms: Espera máxima por bloqueos de otros procesos
+    """
+    sesion = SesionCLI(db_path, busy_timeout_ms)
+    print("🛠️  Tlapalería REPL - escriba 'ayuda' para ver comandos o 'salir' para terminar")
+    try:
+        while True:
+            try:
+                linea = input("tlapaleria> ")
+            except EOFError:
+                print()
+                break
+            except KeyboardInterrupt:
+                print()
+                continue
+
+            linea = linea.strip()
+            if not linea:
+                continue
+            if linea in ('salir', 'exit', 'quit'):
+                break
+            if linea == 'ayuda':
+                linea = '--help'
+
+            try:
+                argv = shlex.split(linea)
+            except ValueError as e:
+                print(f"❌ Línea inválida: {e}")
+                continue
+            sesion.ejecutar(argv)
+    finally:
+        sesion.close()
+
+
+class _ManejadorComandos(socketserver.StreamRequestHandler):
+    """Atiende una conexión del socket: una petición JSON por línea"""
+
+    def handle(self):
+        for linea in self.rfile:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                peticion = json.loads(linea)
+                argv = peticion['argv'] if isinstance(peticion, dict) else peticion
+                if not isinstance(argv, list):
+                    raise ValueError("'argv' debe ser una lista")
+                respuesta = self.server.sesion.ejecutar_capturado([str(a) for a in argv])
+            except (ValueError, KeyError) as e:
+                respuesta = {'ok': False, 'salida': f"❌ Petición inválida: {e}\n", 'ms': 0.0}
+            self.wfile.write(json.dumps(respuesta, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _ServidorUnix(socketserver.UnixStreamServer):
+    """Servidor secuencial: una sola conexión a SQLite atiende todas las peticiones"""
+
+    def __init__(self, socket_path: str, sesion: SesionCLI):
+        self.sesion = sesion
+        super().__init__(socket_path, _ManejadorComandos)
+
+
+def servir(db_path: str, socket_path: str, busy_timeout_ms: Optional[int] = None):
+    """
+    Inicia el servidor en un socket Unix hasta recibir SIGINT o SIGTERM
+
+    Args:
+        db_path: Ruta al archivo de base de datos SQLite
+        socket_path: Ruta del socket Unix a crear
+        busy_timeout_ms: Espera máxima por bloqueos de otros procesos
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    sesion = SesionCLI(db_path, busy_timeout_ms)
+    servidor = _ServidorUnix(socket_path, sesion)
+    os.chmod(socket_path, 0o660)
+
+    def _terminar(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _terminar)
+    print(f"🔌 Escuchando en {socket_path} (Ctrl+C para detener)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        sesion.close()
+        print("🛑 Servidor detenido")
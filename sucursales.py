@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Varias sucursales, una base por sucursal, y consultas que las recorren todas
+
+Cada sucursal tiene su propio archivo SQLite con el esquema completo (se
+opera con la CLI de siempre usando --db o --sucursal). Las sucursales se
+registran de dos formas:
+
+- un directorio: cada archivo .db es una sucursal y su nombre es el del
+  archivo (los archivos de ventas históricas *_archivo.db no cuentan)
+- un archivo JSON {"nombre": "ruta", ...}; las rutas relativas son relativas
+  al JSON
+
+El Coordinador ejecuta la misma consulta en todas las sucursales a la vez,
+un hilo por sucursal con su propia conexión, y combina los resultados. El
+módulo sqlite3 suelta el GIL mientras SQLite ejecuta la consulta, así que los
+hilos avanzan en paralelo sin el costo de lanzar procesos ni de serializar
+resultados. ATTACH no sirve para esto: una sola conexión ejecuta sus
+consultas una tras otra y admite pocas bases adjuntas. La latencia queda
+cerca de la de la sucursal más lenta y no de la suma, mientras haya núcleos
+libres o las lecturas esperen al disco.
+
+Una sucursal que falla (archivo dañado, bloqueada) no detiene la consulta:
+su error se informa aparte y el resultado combina las demás.
+
+Los productos de distintas sucursales se reconocen por código de barras (o
+por nombre si no tienen), y los usuarios por correo.
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import alertas_stock
+import inventario
+import reportes
+from conexion_db import conectar
+from inicializar_db import aplicar_migraciones
+
+DIRECTORIO_DEFAULT = os.environ.get("TLAPALERIA_SUCURSALES", "backend/sucursales")
+
+LIMITE_DEFAULT = 20
+
+COLUMNAS_STOCK_BAJO = ('id', 'nombre', 'codigo_barras', 'stock_actual', 'stock_minimo',
+                       'categoria', 'proveedor')
+
+
+class Sucursal(NamedTuple):
+    nombre: str
+    db: str
+
+
+class Resultado(NamedTuple):
+    """Resultado combinado, errores por sucursal y tiempos"""
+    datos: object
+    errores: Dict[str, str]
+    segundos: float
+    segundos_por_sucursal: Dict[str, float]
+
+    def como_dict(self) -> Dict:
+        return {'datos': self.datos, 'errores': self.errores, 'segundos': round(self.segundos, 4),
+                'segundos_por_sucursal': {nombre: round(s, 4)
+                                          for nombre, s in self.segundos_por_sucursal.items()}}
+
+
+def cargar(ruta: Optional[str] = None) -> List[Sucursal]:
+    """
+    Sucursales registradas en un directorio o en un archivo JSON
+
+    Sin ruta se usa DIRECTORIO_DEFAULT.
+
+    Raises:
+        ValueError: Si la ruta no existe, el JSON no es válido, falta alguna
+                    base o no hay sucursales
+    """
+    ruta = ruta or DIRECTORIO_DEFAULT
+    if os.path.isdir(ruta):
+        sucursales = [Sucursal(archivo[:-3], os.path.join(ruta, archivo))
+                      for archivo in sorted(os.listdir(ruta))
+                      if archivo.endswith('.db') and not archivo.endswith('_archivo.db')]
+    elif os.path.isfile(ruta):
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                registro = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"No se pudo leer el registro de sucursales {ruta}: {e}")
+        if not isinstance(registro, dict):
+            raise ValueError(f"{ruta} debe ser un objeto {{\"nombre\": \"ruta\"}}")
+        base = os.path.dirname(os.path.abspath(ruta))
+        sucursales = [Sucursal(nombre, os.path.join(base, db)) for nombre, db in registro.items()]
+        faltantes = [s.nombre for s in sucursales if not os.path.isfile(s.db)]
+        if faltantes:
+            raise ValueError(f"No existe la base de: {', '.join(faltantes)}")
+    else:
+        raise ValueError(f"No existe el registro de sucursales: {ruta}")
+    if not sucursales:
+        raise ValueError(f"No hay sucursales en {ruta}")
+    return sucursales
+
+
+def ruta_de(nombre: str, ruta: Optional[str] = None) -> str:
+    """
+    Base de datos de una sucursal registrada
+
+    Raises:
+        ValueError: Si la sucursal no está registrada
+    """
+    ruta = ruta or DIRECTORIO_DEFAULT
+    for sucursal in cargar(ruta):
+        if sucursal.nombre == nombre:
+            return sucursal.db
+    raise ValueError(f"No hay una sucursal llamada '{nombre}' en {ruta}")
+
+
+def _clave_producto(codigo_barras: Optional[str], nombre: str) -> str:
+    return codigo_barras or f"nombre:{nombre}"
+
+
+class Coordinador:
+    """
+    Ejecuta consultas en todas las sucursales en paralelo y combina los resultados
+
+    Uso:
+        coordinador = Coordinador(sucursales.cargar("backend/sucursales"))
+        resultado = coordinador.existencias("7501234567890")
+    """
+
+    def __init__(self, sucursales: List[Sucursal], busy_timeout_ms: Optional[int] = None,
+                 hilos: Optional[int] = None):
+        self.sucursales = sucursales
+        self.busy_timeout_ms = busy_timeout_ms
+        self.hilos = max(1, hilos or len(sucursales))
+
+    def _en_sucursal(self, sucursal: Sucursal, consulta: Callable, args: tuple):
+        inicio = time.perf_counter()
+        try:
+            conn = conectar(sucursal.db, self.busy_timeout_ms)
+            try:
+                aplicar_migraciones(conn)
+                return consulta(conn, *args), None, time.perf_counter() - inicio
+            finally:
+                conn.close()
+        except (sqlite3.Error, ValueError) as e:
+            return None, str(e), time.perf_counter() - inicio
+
+    def en_todas(self, consulta: Callable, *args):
+        """
+        Ejecuta consulta(conn, *args) en cada sucursal, cada una en su hilo
+
+        Returns:
+            (resultados por sucursal sin las que fallaron, errores, segundos por sucursal)
+        """
+        # Importado aquí para que cargar el registro de sucursales (--sucursal)
+        # no pague concurrent.futures en cada comando
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(self.hilos, len(self.sucursales))) as pool:
+            futuros = [pool.submit(self._en_sucursal, s, consulta, args) for s in self.sucursales]
+            respuestas = [futuro.result() for futuro in futuros]
+        resultados, errores, segundos = {}, {}, {}
+        for sucursal, (resultado, error, tiempo) in zip(self.sucursales, respuestas):
+            segundos[sucursal.nombre] = tiempo
+            if error is None:
+                resultados[sucursal.nombre] = resultado
+            else:
+                errores[sucursal.nombre] = error
+        return resultados, errores, segundos
+
+    def _combinar(self, consulta: Callable, combinar: Callable, *args) -> Resultado:
+        inicio = time.perf_counter()
+        resultados, errores, segundos = self.en_todas(consulta, *args)
+        return Resultado(combinar(resultados), errores, time.perf_counter() - inicio, segundos)
+
+    # --- Consultas ---
+
+    def existencias(self, codigo: str) -> Resultado:
+        """Sucursales que tienen el producto de un código de barras, con más stock primero"""
+        def combinar(resultados):
+            filas = [{'sucursal': nombre, **producto._asdict()}
+                     for nombre, producto in resultados.items() if producto is not None]
+            filas.sort(key=lambda f: (-(f['stock_actual'] or 0), f['sucursal']))
+            return filas
+        return self._combinar(inventario.producto_por_codigo, combinar, codigo)
+
+    def buscar(self, termino: str, limite: int = LIMITE_DEFAULT) -> Resultado:
+        """
+        Busca en todas las sucursales y agrupa por producto
+
+        Las puntuaciones de relevancia de bases distintas no son comparables:
+        cada producto toma la mejor posición que tuvo en alguna sucursal.
+        """
+        def combinar(resultados):
+            grupos: Dict[str, Dict] = {}
+            for nombre, productos in resultados.items():
+                for posicion, producto in enumerate(productos):
+                    clave = _clave_producto(producto.codigo_barras, producto.nombre)
+                    grupo = grupos.get(clave)
+                    if grupo is None or posicion < grupo['posicion']:
+                        anterior = grupo['stock'] if grupo else {}
+                        grupo = grupos[clave] = {
+                            'posicion': posicion, 'codigo_barras': producto.codigo_barras,
+                            'nombre': producto.nombre, 'categoria': producto.categoria,
+                            'precio': producto.precio, 'stock': anterior,
+                        }
+                    grupo['stock'][nombre] = producto.stock_actual
+            filas = sorted(grupos.values(), key=lambda g: (g['posicion'], g['nombre']))[:limite]
+            for fila in filas:
+                fila['stock_total'] = sum(s or 0 for s in fila['stock'].values())
+                del fila['posicion']
+            return filas
+        return self._combinar(inventario.buscar, combinar, termino, limite)
+
+    def stock_bajo(self, limite: Optional[int] = LIMITE_DEFAULT) -> Resultado:
+        """Alertas de stock bajo de todas las sucursales, las más escasas primero"""
+        def consulta(conn):
+            return alertas_stock.consultar(conn, limite, None, COLUMNAS_STOCK_BAJO).fetchall()
+
+        def combinar(resultados):
+            # Cada sucursal ya viene ordenada por (stock_actual, id)
+            ordenadas = [[(fila[3], nombre, fila) for fila in filas]
+                         for nombre, filas in resultados.items()]
+            filas = [{'sucursal': nombre, **dict(zip(COLUMNAS_STOCK_BAJO, fila))}
+                     for _, nombre, fila in heapq.merge(*ordenadas, key=lambda t: t[:2])]
+            return filas[:limite] if limite else filas
+        return self._combinar(consulta, combinar)
+
+    def estadisticas(self) -> Resultado:
+        """Totales de todas las sucursales y el detalle de cada una"""
+        def combinar(resultados):
+            por_sucursal = {nombre: datos._asdict() for nombre, datos in resultados.items()}
+            sumables = ('total_productos', 'valor_inventario', 'productos_stock_bajo',
+                        'total_ventas', 'monto_ventas', 'ventas_hoy', 'monto_hoy')
+            total = {campo: sum(d[campo] for d in por_sucursal.values()) for campo in sumables}
+            # El más vendido de cada sucursal sale de su resumen; entre
+            # sucursales se muestra el que más vendió en una sola sucursal
+            candidatos = [(d['mas_vendido'][1], nombre, d['mas_vendido'][0])
+                          for nombre, d in por_sucursal.items() if d['mas_vendido']]
+            mejor = max(candidatos, default=None)
+            total['mas_vendido'] = ({'nombre': mejor[2], 'unidades': mejor[0], 'sucursal': mejor[1]}
+                                    if mejor else None)
+            return {'total': total, 'sucursales': por_sucursal}
+        return self._combinar(inventario.estadisticas, combinar)
+
+    def reporte(self, tipo: str, desde: Optional[str] = None, hasta: Optional[str] = None,
+                top: int = reportes.TOP_DEFAULT) -> Resultado:
+        """
+        Reporte de ventas de todas las sucursales (mismos tipos que reportes.py)
+
+        Cada sucursal agrega su rango completo; los productos se combinan por
+        código de barras y los usuarios por correo.
+
+        Raises:
+            ValueError: Si el tipo o las fechas no son válidos
+        """
+        if tipo not in reportes.TIPOS:
+            raise ValueError(f"Tipo de reporte desconocido: {tipo}")
+        reportes.limites(desde, hasta)
+
+        def consulta(conn):
+            parcial = reportes.agregado(conn, tipo, desde, hasta)
+            if tipo == 'productos':
+                claves = {fila[0]: (_clave_producto(fila[1], fila[2]), fila[2]) for fila in
+                          conn.execute("SELECT id, codigo_barras, nombre FROM productos")}
+            elif tipo == 'usuario':
+                claves = {fila[0]: (fila[1], None) for fila in
+                          conn.execute("SELECT id, email FROM usuarios")}
+            else:
+                return parcial, {}
+            nombres = {}
+            traducidos = []
+            for clave, valores in parcial.items():
+                nueva, nombre = claves.get(clave, (f"id:{clave}", None))
+                nombres[nueva] = nombre or '(eliminado)'
+                traducidos.append({nueva: valores})
+            return reportes.combinar(traducidos), nombres
+
+        def combinar(resultados):
+            filas = reportes.ordenar(tipo, reportes.combinar([p for p, _ in resultados.values()]),
+                                     top)
+            if tipo == 'productos':
+                nombres = {}
+                for _, parcial_nombres in resultados.values():
+                    nombres.update(parcial_nombres)
+                for fila in filas:
+                    fila['nombre'] = nombres.get(fila['clave'], '(eliminado)')
+            return filas
+        return self._combinar(consulta, combinar)
@@ -0,0 +1,26 @@
+"""
+Configuración común de las pruebas
+
+Los módulos de la tlapalería están en la raíz del repositorio (sin paquete),
+igual que los importan tlapaleria_cli.py y benchmarks/.
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from inicializar_db import aplicar_migraciones  # noqa: E402
+
+
+@pytest.fixture
+def conn_memoria():
+    """Base en memoria con todas las migraciones aplicadas"""
+    conn = sqlite3.connect(':memory:')
+    aplicar_migraciones(conn)
+    yield conn
+    conn.close()
@@ -0,0 +1,28 @@
+"""
+Alertas de stock bajo con umbrales por categoría
+
+La marca de stock bajo de listar, buscar y escanear, la lista de stock-bajo
+y el conteo de estadisticas deben coincidir.
+"""
+
+import alertas_stock
+import inventario
+
+
+def test_umbral_de_categoria_en_todas_las_vistas(conn_memoria):
+    inventario.agregar_producto(conn_memoria, 'Brocha', 20.0, 25, stock_minimo=5,
+                                categoria='Pinturas')
+    inventario.agregar_producto(conn_memoria, 'Martillo', 90.0, 25, stock_minimo=5,
+                                categoria='Herramientas')
+    alertas_stock.fijar_umbral(conn_memoria, 'Pinturas', 30)
+    conn_memoria.commit()
+
+    brocha, martillo = inventario.listar(conn_memoria).productos
+    assert inventario.en_alerta(conn_memoria, brocha.id)
+    assert not inventario.en_alerta(conn_memoria, martillo.id)
+    assert [p.id for p in inventario.stock_bajo(conn_memoria).productos] == [brocha.id]
+    assert inventario.estadisticas(conn_memoria).productos_stock_bajo == 1
+
+    alertas_stock.fijar_umbral(conn_memoria, 'Pinturas', None)
+    conn_memoria.commit()
+    assert not inventario.en_alerta(conn_memoria, brocha.id)
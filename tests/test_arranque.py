@@ -0,0 +1,71 @@
+"""
+Arranque en frío de la CLI
+
+Mide escanear en procesos nuevos, como benchmarks/arranque_cli.py pero con
+menos rondas, y revisa que venta y escanear no carguen los módulos de los
+demás subcomandos.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+from conexion_db import conectar
+from inicializar_db import aplicar_migraciones
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'benchmarks'))
+from arranque_cli import ENTORNO, PRESUPUESTO_MS, RAIZ, medir  # noqa: E402
+
+RONDAS = 7
+CODIGO = '7500000000001'
+
+# Módulos que solo usan otros subcomandos
+PESADOS = {'alertas_stock', 'archivo', 'busqueda', 'cache_productos', 'catalogo', 'conteo',
+           'movimientos', 'perfilado', 'reportes', 'resumenes', 'sucursales'}
+
+
+@pytest.fixture
+def db_arranque(tmp_path):
+    """Base migrada con un producto; las migraciones quedan fuera de la medición"""
+    ruta = str(tmp_path / 'arranque.db')
+    conn = conectar(ruta)
+    aplicar_migraciones(conn)
+    conn.execute("INSERT INTO productos (nombre, codigo_barras, precio, stock_actual) "
+                 "VALUES ('Martillo', ?, 120, 50)", (CODIGO,))
+    conn.commit()
+    conn.close()
+    return ruta
+
+
+def test_escanear_dentro_del_presupuesto(db_arranque):
+    procesos = {
+        'interprete': ['-c', 'pass'],
+        'escanear': ['tlapaleria_cli.py', '--db', db_arranque, '--quiet', 'escanear', CODIGO],
+    }
+    # Una ronda sin medir llena __pycache__ y la caché de disco
+    for argv in procesos.values():
+        medir(argv)
+    muestras = {nombre: [] for nombre in procesos}
+    for _ in range(RONDAS):
+        for nombre, argv in procesos.items():
+            muestras[nombre].append(medir(argv))
+    arranque = statistics.median(muestras['escanear']) - statistics.median(muestras['interprete'])
+    assert arranque < PRESUPUESTO_MS, f"arranque de {arranque:.1f} ms"
+
+
+@pytest.mark.parametrize('comando', [['escanear', CODIGO], ['venta', '1', '1']])
+def test_comandos_basicos_no_cargan_otros_modulos(db_arranque, comando):
+    codigo = ("import json, sys\n"
+              "import interfaz_cli\n"
+              "interfaz_cli.main(sys.argv[1:])\n"
+              "print(json.dumps(sorted(sys.modules)))\n")
+    salida = subprocess.run([sys.executable, '-c', codigo, '--db', db_arranque, '--quiet']
+                            + comando, capture_output=True, text=True, check=True, cwd=RAIZ,
+                            env=ENTORNO).stdout
+    cargados = set(json.loads(salida.strip().splitlines()[-1]))
+    assert not cargados & PESADOS, sorted(cargados & PESADOS)
@@ -0,0 +1,46 @@
+"""
+Búsqueda de productos: índice FTS5 y búsqueda por subcadena
+"""
+
+import pytest
+
+import busqueda
+import inventario
+
+
+@pytest.fixture
+def conn(conn_memoria):
+    if not busqueda.asegurar_indice(conn_memoria):
+        pytest.skip("SQLite sin FTS5")
+    inventario.agregar_producto(conn_memoria, 'Martillo de uña', 120.0, 10,
+                                codigo_barras='7501234567890')
+    inventario.agregar_producto(conn_memoria, 'Desarmador plano', 45.0, 10,
+                                codigo_barras='7509876543210')
+    conn_memoria.commit()
+    return conn_memoria
+
+
+def _nombres(filas):
+    return [fila[1] for fila in filas]
+
+
+def test_prefijo_sin_acentos(conn):
+    assert _nombres(busqueda.buscar(conn, 'desármador')) == ['Desarmador plano']
+    assert _nombres(busqueda.buscar(conn, 'mart')) == ['Martillo de uña']
+
+
+def test_sin_coincidencias_por_palabra_no_recorre_con_like(conn):
+    assert busqueda.buscar(conn, 'illo') == []
+    assert _nombres(busqueda.buscar(conn, 'illo', usar_fts=False)) == ['Martillo de uña']
+
+
+def test_fragmento_de_codigo_usa_subcadena(conn):
+    assert _nombres(busqueda.buscar(conn, '4567')) == ['Martillo de uña']
+
+
+@pytest.mark.parametrize('termino, esperado', [
+    ('0629', True), ('7501234567890', True), ('a', True), ('martillo 5', True),
+    ('martillo', False), ('illo', False), ('ma', False),
+])
+def test_requiere_subcadena(termino, esperado):
+    assert busqueda.requiere_subcadena(termino) is esperado
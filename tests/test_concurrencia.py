@@ -0,0 +1,87 @@
+"""
+Varios procesos escribiendo la misma base a la vez
+
+Cada proceso abre su propia conexión (como varias CLI y el servicio) y vende
+el mismo producto. Con WAL, busy_timeout y BEGIN IMMEDIATE con reintentos
+(conexion_db.py) ninguno debe ver "database is locked", y el stock no debe
+venderse de más.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import inventario
+import resumenes
+from conexion_db import conectar
+from inicializar_db import aplicar_migraciones
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROCESOS = 6
+VENTAS_POR_PROCESO = 60
+STOCK_INICIAL = 300
+
+# Cada proceso espera el archivo de arranque para que todos empiecen juntos
+VENDEDOR = """
+import json, os, sqlite3, sys, time
+db, arranque, usuario, ventas = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+import inventario
+from conexion_db import conectar
+conn = conectar(db)
+while not os.path.exists(arranque):
+    time.sleep(0.001)
+resultado = {'vendidas': 0, 'agotado': 0, 'errores': []}
+for _ in range(ventas):
+    try:
+        inventario.registrar_venta(conn, 1, 1, usuario)
+        inventario.registrar_venta(conn, 2, 2, usuario)
+        resultado['vendidas'] += 1
+    except inventario.StockInsuficiente:
+        resultado['agotado'] += 1
+    except sqlite3.Error as e:
+        resultado['errores'].append(str(e))
+conn.close()
+print(json.dumps(resultado))
+"""
+
+
+def test_vendedores_concurrentes_sin_bloqueos_ni_sobreventa(tmp_path):
+    db = str(tmp_path / 'concurrencia.db')
+    conn = conectar(db)
+    aplicar_migraciones(conn)
+    inventario.agregar_producto(conn, 'Martillo', 100.0, STOCK_INICIAL)
+    inventario.agregar_producto(conn, 'Clavos', 1.5, 10_000)
+    conn.close()
+
+    arranque = str(tmp_path / 'arranque')
+    procesos = [subprocess.Popen([sys.executable, '-c', VENDEDOR, db, arranque, str(usuario),
+                                  str(VENTAS_POR_PROCESO)],
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                 cwd=RAIZ)
+                for usuario in range(1, PROCESOS + 1)]
+    open(arranque, 'w').close()
+    resultados = []
+    for proceso in procesos:
+        stdout, stderr = proceso.communicate(timeout=120)
+        assert proceso.returncode == 0, stderr
+        resultados.append(json.loads(stdout))
+
+    errores = [error for r in resultados for error in r['errores']]
+    assert errores == []
+    vendidas = sum(r['vendidas'] for r in resultados)
+    # Se piden 360 martillos y hay 300: exactamente el stock, ni uno más
+    assert vendidas == STOCK_INICIAL
+    assert sum(r['agotado'] for r in resultados) == PROCESOS * VENTAS_POR_PROCESO - STOCK_INICIAL
+
+    conn = conectar(db)
+    stock = dict(conn.execute("SELECT id, stock_actual FROM productos"))
+    assert stock == {1: 0, 2: 10_000 - 2 * vendidas}
+    por_producto = dict(conn.execute(
+        "SELECT producto_id, SUM(cantidad) FROM ventas GROUP BY producto_id"))
+    assert por_producto == {1: vendidas, 2: 2 * vendidas}
+    monto, = conn.execute("SELECT SUM(total) FROM ventas").fetchone()
+    assert monto == vendidas * (100.0 + 2 * 1.5)
+    # Los resúmenes que mantienen los triggers también cuadran
+    assert resumenes.verificar(conn) == []
+    conn.close()
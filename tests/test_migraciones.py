@@ -0,0 +1,60 @@
+"""
+Migraciones del esquema
+
+Una base que se quedó en una versión intermedia debe terminar igual que una
+nueva al aplicar las migraciones que le faltan.
+"""
+
+import sqlite3
+
+import alertas_stock
+import inicializar_db
+import resumenes
+
+
+def _migrar_hasta(conn, version, monkeypatch):
+    monkeypatch.setattr(inicializar_db, 'MIGRACIONES',
+                        [m for m in inicializar_db.MIGRACIONES if m[0] <= version])
+    inicializar_db.aplicar_migraciones(conn)
+    monkeypatch.undo()
+
+
+def _agregar(conn, nombre, stock, minimo, categoria='Pinturas'):
+    conn.execute("INSERT INTO productos (nombre, precio, stock_actual, stock_minimo, categoria) "
+                 "VALUES (?, 10, ?, ?, ?)", (nombre, stock, minimo, categoria))
+
+
+def test_migracion_4_cuenta_stock_bajo_con_stock_minimo(monkeypatch):
+    conn = sqlite3.connect(':memory:')
+    _migrar_hasta(conn, 3, monkeypatch)
+    _agregar(conn, 'Brocha', 2, 5)
+    conn.commit()
+    _migrar_hasta(conn, 4, monkeypatch)
+    # Tal como se publicó: los triggers de productos llevan el conteo
+    _agregar(conn, 'Rodillo', 1, 5)
+    _agregar(conn, 'Thinner', 40, 5)
+    conn.commit()
+    assert resumenes.leer(conn)['productos_stock_bajo'] == 2
+
+
+def test_base_intermedia_termina_con_el_conteo_de_alertas(monkeypatch):
+    conn = sqlite3.connect(':memory:')
+    _migrar_hasta(conn, 4, monkeypatch)
+    _agregar(conn, 'Brocha', 2, 5)
+    _agregar(conn, 'Thinner', 20, 5)
+    conn.commit()
+    inicializar_db.aplicar_migraciones(conn)
+
+    alertas_stock.fijar_umbral(conn, 'Pinturas', 30)
+    _agregar(conn, 'Rodillo', 25, 5)
+    conn.commit()
+    assert resumenes.leer(conn)['productos_stock_bajo'] == 3
+    assert resumenes.verificar(conn) == []
+
+
+def test_base_nueva_y_migrada_tienen_los_mismos_triggers(conn_memoria, monkeypatch):
+    conn = sqlite3.connect(':memory:')
+    _migrar_hasta(conn, 4, monkeypatch)
+    inicializar_db.aplicar_migraciones(conn)
+    sql = "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name"
+    assert conn.execute(sql).fetchall() == conn_memoria.execute(sql).fetchall()
@@ -0,0 +1,43 @@
+"""
+Planes de las consultas críticas (EXPLAIN QUERY PLAN)
+
+Si una migración o un cambio de consulta hace que alguna vuelva a recorrer
+la tabla completa, estas pruebas fallan.
+"""
+
+import pytest
+
+from inicializar_db import PLANES_ESPERADOS, plan_consulta
+
+
+@pytest.mark.parametrize('descripcion, sql, indice', PLANES_ESPERADOS,
+                         ids=[descripcion for descripcion, _, _ in PLANES_ESPERADOS])
+def test_consulta_usa_su_indice(conn_memoria, descripcion, sql, indice):
+    plan = plan_consulta(conn_memoria, sql)
+    assert any(indice in paso for paso in plan), f"{descripcion}: {' | '.join(plan)}"
+
+
+@pytest.mark.parametrize('sql, indice', [
+    ("SELECT SUM(cantidad) FROM ventas WHERE producto_id = 7 "
+     "AND fecha_venta >= '2024-01-01' AND fecha_venta < '2024-02-01'",
+     'idx_ventas_producto_fecha'),
+    ("SELECT SUM(total) FROM ventas "
+     "WHERE fecha_venta >= '2024-01-01' AND fecha_venta < '2024-02-01'",
+     'idx_ventas_fecha'),
+    ("SELECT id, nombre FROM productos ORDER BY nombre, id LIMIT 50",
+     'idx_productos_nombre'),
+    ("SELECT id FROM productos WHERE stock_actual <= stock_minimo ORDER BY stock_actual",
+     'idx_productos_stock_bajo'),
+])
+def test_indices_principales_sin_recorrido_completo(conn_memoria, sql, indice):
+    plan = plan_consulta(conn_memoria, sql)
+    assert any(indice in paso for paso in plan), ' | '.join(plan)
+    # Un SCAN de la tabla sin índice es justo la regresión que se quiere detectar
+    assert not any(paso.startswith('SCAN') and 'INDEX' not in paso for paso in plan), \
+        ' | '.join(plan)
+
+
+def test_indice_de_stock_bajo_es_parcial(conn_memoria):
+    sql, = conn_memoria.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'idx_productos_stock_bajo'").fetchone()
+    assert 'WHERE stock_actual <= stock_minimo' in sql
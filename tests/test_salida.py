@@ -0,0 +1,40 @@
+"""
+Paginación por llave de salida.emitir
+"""
+
+import io
+import sqlite3
+
+import pytest
+
+import salida
+
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(1, 6)])
+    return lambda limite: conn.execute("SELECT id FROM t ORDER BY id LIMIT ?",
+                                       (limite + 1 if limite is not None else -1,))
+
+
+def _emitir(cursor, limite):
+    destino = io.StringIO()
+    total, siguiente = salida.emitir(cursor(limite), ['id'], 'json', lambda fila: fila,
+                                     limite=limite, archivo=destino)
+    return total, siguiente
+
+
+@pytest.mark.parametrize('limite, total, hay_mas', [(1, 1, True), (4, 4, True), (5, 5, False),
+                                                    (None, 5, False)])
+def test_limite_y_token(cursor, limite, total, hay_mas):
+    escritas, siguiente = _emitir(cursor, limite)
+    assert escritas == total
+    assert (siguiente is not None) == hay_mas
+
+
+@pytest.mark.parametrize('limite', [0, -2])
+def test_limite_no_positivo_se_rechaza(cursor, limite):
+    with pytest.raises(ValueError):
+        _emitir(cursor, limite)
@@ -0,0 +1,41 @@
+"""
+Respuestas del protocolo del servicio (servicio.atender)
+"""
+
+import asyncio
+
+import pytest
+
+import inventario
+from conexion_db import conectar
+from inicializar_db import aplicar_migraciones
+from servicio import ServicioInventario, atender
+
+
+@pytest.fixture
+def db_servicio(tmp_path):
+    ruta = str(tmp_path / 'servicio.db')
+    conn = conectar(ruta)
+    aplicar_migraciones(conn)
+    inventario.agregar_producto(conn, 'Martillo', 120.0, 10)
+    conn.close()
+    return ruta
+
+
+@pytest.mark.parametrize('agrupar_ms', [None, 5], ids=['directo', 'cola'])
+@pytest.mark.parametrize('cantidad', [0, -3])
+def test_venta_con_cantidad_no_positiva_es_error_del_cliente(db_servicio, tmp_path,
+                                                             agrupar_ms, cantidad):
+    async def probar():
+        async with ServicioInventario(db_servicio, lectores=1, agrupar_ms=agrupar_ms,
+                                      diario=str(tmp_path / 'diario')) as servicio:
+            respuesta = await atender(servicio, {
+                'id': 1, 'op': 'registrar_venta',
+                'args': {'producto_id': 1, 'cantidad': cantidad}})
+            producto = await servicio.producto(1)
+        return respuesta, producto
+
+    respuesta, producto = asyncio.run(probar())
+    assert respuesta['ok'] is False
+    assert respuesta['tipo'] == 'CantidadInvalida'
+    assert producto.stock_actual == 10
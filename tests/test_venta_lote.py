@@ -0,0 +1,48 @@
+"""
+Ventas en lote (TlapaleriaCLI.registrar_venta_lote)
+"""
+
+import pytest
+
+import inventario
+from interfaz_cli import TlapaleriaCLI
+
+
+@pytest.fixture
+def cli(tmp_path):
+    cli = TlapaleriaCLI(str(tmp_path / 'lote.db'), silencioso=True)
+    inventario.agregar_producto(cli.conn, 'Martillo', 100.0, 50)
+    inventario.agregar_producto(cli.conn, 'Clavos', 2.0, 500)
+    yield cli
+    cli.close()
+
+
+def _stock(cli):
+    return [fila[0] for fila in cli.conn.execute("SELECT stock_actual FROM productos ORDER BY id")]
+
+
+def test_error_inesperado_no_deja_la_transaccion_abierta(cli, capsys):
+    def tickets():
+        yield {'lineas': [(1, 2)]}
+        yield {'lineas': [(2, 10)]}
+        raise RuntimeError("lector roto")
+
+    with pytest.raises(RuntimeError):
+        cli.registrar_venta_lote(tickets(), tickets_por_commit=10)
+    assert not cli.conn.in_transaction
+    # El grupo sin confirmar se revirtió completo
+    assert _stock(cli) == [50, 500]
+    # Y la conexión sigue sirviendo para el siguiente lote
+    resumen = cli.registrar_venta_lote([{'lineas': [(1, 1)]}])
+    assert resumen['tickets'] == 1 and resumen['fallo'] is None
+    assert _stock(cli) == [49, 500]
+
+
+def test_aplica_precios_programados_vencidos_antes_de_cobrar(cli, capsys):
+    cli.conn.execute("INSERT INTO precios_programados (producto_id, vigente_desde, precio) "
+                     "VALUES (1, '2000-01-01 00:00:00', 120.0)")
+    cli.conn.commit()
+    resumen = cli.registrar_venta_lote([{'lineas': [(1, 2), (2, 5)]}])
+    assert resumen['monto'] == pytest.approx(2 * 120.0 + 5 * 2.0)
+    assert cli.conn.execute(
+        "SELECT precio_unitario FROM ventas WHERE producto_id = 1").fetchone()[0] == 120.0
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Cliente ligero para el servidor de la Tlapalería CLI
+
+Reenvía los argumentos al servidor (python3 tlapaleria_cli.py servidor) y
+muestra su salida. Solo importa módulos mínimos para arrancar rápido; si el
+servidor no está disponible ejecuta el comando con la CLI normal.
+
+Uso:
+    python3 tlapaleria_cliente.py venta 1 2
+    TLAPALERIA_SOCKET=/ruta/al.sock python3 tlapaleria_cliente.py listar
+"""
+
+import json
+import os
+import socket
+import sys
+from typing import Dict, List
+
+SOCKET_PATH_DEFAULT = os.environ.get("TLAPALERIA_SOCKET", "/tmp/tlapaleria.sock")
+
+
+def enviar_comando(argv: List[str], socket_path: str = SOCKET_PATH_DEFAULT) -> Dict:
+    """
+    Envía un comando al servidor y devuelve su respuesta
+
+    Args:
+        argv: Argumentos del comando, igual que en la CLI
+        socket_path: Ruta del socket Unix del servidor
+
+    Returns:
+        Diccionario con ok, salida y ms
+
+    Raises:
+        OSError: Si no se puede conectar con el servidor
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexion:
+        conexion.connect(socket_path)
+        conexion.sendall(json.dumps({'argv': argv}).encode('utf-8') + b'\n')
+        with conexion.makefile('rb') as respuesta:
+            return json.loads(respuesta.readline())
+
+
+def main():
+    """Reenvía sys.argv al servidor, o a la CLI normal si no hay servidor"""
+    argv = sys.argv[1:]
+    try:
+        respuesta = enviar_comando(argv)
+    except OSError:
+        import interfaz_cli
+        sys.argv = [sys.argv[0]] + argv
+        interfaz_cli.main()
+        return
+
+    sys.stdout.write(respuesta['salida'])
+    sys.exit(0 if respuesta['ok'] else 1)
+
+
+if __name__ == "__main__":
+    main()